@@ -0,0 +1,73 @@
+"""HTTP caching helpers for read endpoints."""
+
+import hashlib
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional
+from fastapi import Request, Response
+
+# 読み取りエンドポイントのCache-Control（既定は毎回ETagで再検証）
+CACHE_CONTROL = os.getenv("API_CACHE_CONTROL", "private, no-cache")
+
+
+def make_etag(*parts: Any) -> str:
+    """行のバージョン情報（ID・更新日時など）から弱いETagを作成
+
+    レスポンス本体を組み立てずに計算できるよう、本体ではなく本体を決める
+    行のバージョンから求める。リスク・評価・対策の行は作成後に更新されないため、
+    IDと作成日時の組で内容が決まる。本体のバイト列（圧縮の有無、JSONの
+    直列化）までは保証しないため、意味的に同じことを示す弱いETagとする。
+
+    Args:
+        parts: エンドポイントの種別と行のバージョン情報
+
+    Returns:
+        W/ 接頭辞と引用符付きのETag
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, datetime):
+            part = part.isoformat()
+        digest.update(str(part).encode())
+        digest.update(b"\x00")
+    return f'W/"{digest.hexdigest()[:32]}"'
+
+
+def _opaque_tag(tag: str) -> str:
+    """弱い比較用に W/ 接頭辞を取り除く"""
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """If-None-MatchがETagに弱い比較で一致するか（一致すれば304を返せる）
+
+    If-None-Matchには弱い比較を使う（RFC 9110 13.1.2）。W/ の有無は問わない。
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = _opaque_tag(etag)
+    return any(_opaque_tag(tag) == opaque for tag in header.split(","))
+
+
+def cache_headers(etag: str, cache_control: Optional[str] = None) -> Dict[str, str]:
+    """ETagとCache-Controlのヘッダー"""
+    return {"ETag": etag, "Cache-Control": cache_control or CACHE_CONTROL}
+
+
+def not_modified(etag: str, cache_control: Optional[str] = None) -> Response:
+    """304 Not Modifiedのレスポンス（本体なし）"""
+    return Response(status_code=304, headers=cache_headers(etag, cache_control))
+
+
+def with_cache_headers(
+    response: Response,
+    etag: str,
+    cache_control: Optional[str] = None
+) -> Response:
+    """レスポンスにETagとCache-Controlを付与"""
+    response.headers.update(cache_headers(etag, cache_control))
+    return response
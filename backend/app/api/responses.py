@@ -0,0 +1,62 @@
+"""Fast JSON responses for list endpoints."""
+
+from typing import Any, Iterable, List, Type
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from app.schemas.risk import RiskResponse
+from app.schemas.evaluation import CountermeasureResponse
+from app.schemas.meta_countermeasure import (
+    MetaCountermeasureResponse,
+    IntegratedMetaCountermeasureResponse,
+)
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+class ListResponder:
+    """{"<field>": [...]} 形式のレスポンスを作成する
+
+    要素のリストのTypeAdapterを一度だけ構築し、ORMインスタンスや
+    RETURNINGの行から属性で1回だけ検証して、pydantic-coreで直接JSONに変換する。
+    Responseを返すため、FastAPIによるresponse_modelでの再検証・再変換は行われない
+    （response_modelはAPIドキュメント用に指定したままにする）。
+
+    Args:
+        item_model: 要素のレスポンススキーマ
+        field: リストを格納するキー
+    """
+
+    def __init__(self, item_model: Type[BaseModel], field: str):
+        self.adapter = TypeAdapter(List[item_model])
+        self._prefix = b'{"' + field.encode() + b'":'
+
+    def render(self, items: Iterable[Any]) -> bytes:
+        """JSONのバイト列に変換"""
+        validated = self.adapter.validate_python(list(items), from_attributes=True)
+        return self._prefix + self.adapter.dump_json(validated) + b"}"
+
+    def __call__(self, items: Iterable[Any], status_code: int = 200) -> Response:
+        return json_response(self.render(items), status_code)
+
+
+def json_response(body: bytes, status_code: int = 200) -> Response:
+    """変換済みのJSONからレスポンスを作成
+
+    同時リクエストの合流時は、変換済みのJSONを共有して各リクエストで包む。
+    """
+    return Response(content=body, status_code=status_code, media_type=JSON_MEDIA_TYPE)
+
+
+def model_response(model: Type[BaseModel], obj: Any, status_code: int = 200) -> Response:
+    """単一のORMインスタンス・行を1回の検証でJSONレスポンスに変換"""
+    body = model.model_validate(obj, from_attributes=True).model_dump_json()
+    return json_response(body.encode(), status_code)
+
+
+# リストエンドポイント用（インポート時に1回だけ構築）
+risks_response = ListResponder(RiskResponse, "identified_risks")
+countermeasures_response = ListResponder(CountermeasureResponse, "countermeasures")
+meta_countermeasures_response = ListResponder(MetaCountermeasureResponse, "meta_countermeasures")
+integrated_meta_countermeasures_response = ListResponder(
+    IntegratedMetaCountermeasureResponse, "integrated_meta_countermeasures"
+)
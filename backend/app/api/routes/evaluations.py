@@ -1,13 +1,30 @@
 """Evaluations API routes."""
 
-from fastapi import APIRouter, Depends, HTTPException
+import os
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 
 from app.database.base import get_db
+from app.database.persistence import insert_returning, delete_all
 from app.models import RiskEvaluation, Countermeasure
-from app.schemas.evaluation import CountermeasuresListResponse, CountermeasureResponse
+from app.schemas.evaluation import (
+    CountermeasuresListResponse,
+    CountermeasureResponse,
+    CountermeasureSuggestionResponse,
+    CountermeasureSuggestionsListResponse,
+)
 from app.services.countermeasure_generation import CountermeasureGenerationService
-from app.llm.client import LLMClientFactory
+from app.services.countermeasure_library import countermeasure_library
+from app.api.responses import (
+    countermeasures_response,
+    meta_countermeasures_response,
+    integrated_meta_countermeasures_response,
+    json_response,
+)
+from app.api.caching import make_etag, is_not_modified, not_modified, with_cache_headers
+from app.services.single_flight import single_flight
+from app.llm.client import LLMClient, get_llm_client
 
 router = APIRouter()
 
@@ -15,9 +32,16 @@ router = APIRouter()
 @router.post("/{evaluation_id}/generate-countermeasures", response_model=CountermeasuresListResponse)
 async def generate_countermeasures(
     evaluation_id: str,
-    db: Session = Depends(get_db)
+    reuse: Optional[bool] = None,
+    db: Session = Depends(get_db),
+    llm_client: LLMClient = Depends(get_llm_client)
 ):
-    """対策を生成"""
+    """対策を生成
+
+    reuseが有効な場合（省略時は環境変数COUNTERMEASURE_REUSE、既定は無効）、対策ライブラリに
+    閾値以上類似した過去の評価があれば、LLMを呼ばずにその対策を再利用する。
+    再利用した対策はsource_measure_idに再利用元の対策IDを持つ。
+    """
     # 評価結果を取得
     evaluation = db.query(RiskEvaluation).filter(
         RiskEvaluation.evaluation_id == evaluation_id
@@ -26,39 +50,60 @@ async def generate_countermeasures(
     if not evaluation:
         raise HTTPException(status_code=404, detail="Evaluation not found")
 
-    # LLMクライアントの作成
-    llm_client = LLMClientFactory.create()
+    if reuse is None:
+        reuse = os.getenv("COUNTERMEASURE_REUSE", "false").lower() == "true"
 
-    # 対策導出サービスの実行
+    library = countermeasure_library.load(db)
     service = CountermeasureGenerationService(llm_client)
-    countermeasures = await service.generate_countermeasures(evaluation)
-
-    # データベースに保存
-    for measure in countermeasures:
-        db.add(measure)
-    db.commit()
-
-    # レスポンスの作成
-    measure_responses = [
-        CountermeasureResponse(
-            measure_id=measure.measure_id,
-            evaluation_id=measure.evaluation_id,
-            strategy_type=measure.strategy_type,
-            description=measure.description,
-            priority=measure.priority,
-            feasibility=measure.feasibility,
-            implementation_timeline=measure.implementation_timeline,
-            expected_effect=measure.expected_effect
-        )
-        for measure in countermeasures
-    ]
-
-    return CountermeasuresListResponse(countermeasures=measure_responses)
+    bind = db.get_bind()
+
+    async def generate_and_persist():
+        # 合流した処理は最初の呼び出し元のリクエストが終わっても続くため、
+        # リクエストのセッションではなく専用のセッションで読み込み・保存する
+        session = Session(bind=bind, autoflush=False)
+        try:
+            evaluation = session.get(RiskEvaluation, evaluation_id)
+
+            # 対策ライブラリから類似した過去の対策を再利用
+            if reuse:
+                match = library.best_match(evaluation)
+                sources = library.source_countermeasures(session, match.entry.evaluation_id) if match else []
+                if match and not sources:
+                    # 他のワーカーで削除された評価は候補から外す
+                    library.discard([match.entry.evaluation_id])
+                if sources:
+                    # 同じ再利用元から複製済みであれば、複製し直さずに既存の行を返す
+                    rows = library.reused_countermeasures(session, evaluation_id, sources)
+                    if not rows:
+                        rows = insert_returning(session, library.reuse(sources, evaluation))
+                        session.commit()
+                    return countermeasures_response.render(rows)
+
+            # 対策導出サービスの実行
+            countermeasures = await service.generate_countermeasures(evaluation)
+
+            # データベースに一括保存し、保存された行からレスポンスを作成
+            rows = insert_returning(session, countermeasures)
+            session.commit()
+            library.add(evaluation)
+
+            return countermeasures_response.render(rows)
+        finally:
+            session.close()
+
+    # 同一評価の同時リクエストは1回の再利用・LLM呼び出しに合流させる
+    body = await single_flight.do(
+        service.coalesce_key(evaluation, reuse),
+        generate_and_persist
+    )
+
+    return json_response(body)
 
 
 @router.get("/{evaluation_id}/countermeasures", response_model=CountermeasuresListResponse)
 async def get_countermeasures(
     evaluation_id: str,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """評価に関連する対策を取得"""
@@ -69,38 +114,66 @@ async def get_countermeasures(
     if not evaluation:
         raise HTTPException(status_code=404, detail="Evaluation not found")
 
+    # 対策の行は作成後に更新されない（再生成は削除と追加）ため、IDと作成日時でETagを決める
+    versions = db.query(Countermeasure.measure_id, Countermeasure.created_at).filter(
+        Countermeasure.evaluation_id == evaluation_id
+    ).all()
+    etag = make_etag("countermeasures", evaluation_id, *(part for row in versions for part in row))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
     countermeasures = db.query(Countermeasure).filter(
         Countermeasure.evaluation_id == evaluation_id
     ).all()
 
-    measure_responses = [
-        CountermeasureResponse(
-            measure_id=measure.measure_id,
-            evaluation_id=measure.evaluation_id,
-            strategy_type=measure.strategy_type,
-            description=measure.description,
-            priority=measure.priority,
-            feasibility=measure.feasibility,
-            implementation_timeline=measure.implementation_timeline,
-            expected_effect=measure.expected_effect
-        )
-        for measure in countermeasures
-    ]
+    return with_cache_headers(countermeasures_response(countermeasures), etag)
+
+
+@router.get("/{evaluation_id}/countermeasure-suggestions", response_model=CountermeasureSuggestionsListResponse)
+async def get_countermeasure_suggestions(
+    evaluation_id: str,
+    limit: int = Query(5, ge=1, le=50),
+    threshold: Optional[float] = Query(None, ge=0.0, le=1.0),
+    db: Session = Depends(get_db)
+):
+    """対策ライブラリから類似した過去の評価の対策を取得（LLMは呼ばない）"""
+    evaluation = db.query(RiskEvaluation).filter(
+        RiskEvaluation.evaluation_id == evaluation_id
+    ).first()
+
+    if not evaluation:
+        raise HTTPException(status_code=404, detail="Evaluation not found")
 
-    return CountermeasuresListResponse(countermeasures=measure_responses)
+    library = countermeasure_library.load(db)
+    suggestions = []
+    for match in library.search(evaluation, limit=limit, threshold=threshold):
+        sources = library.source_countermeasures(db, match.entry.evaluation_id)
+        if not sources:
+            library.discard([match.entry.evaluation_id])
+            continue
+        suggestions.append(CountermeasureSuggestionResponse(
+            source_evaluation_id=match.entry.evaluation_id,
+            risk_description=match.entry.risk_description,
+            guideword=match.entry.guideword,
+            similarity=round(match.score, 4),
+            countermeasures=[CountermeasureResponse.model_validate(measure) for measure in sources]
+        ))
+
+    return CountermeasureSuggestionsListResponse(suggestions=suggestions)
 
 
 # メタ対策関連のエンドポイント
 
 from app.models import MetaCountermeasure
-from app.schemas.meta_countermeasure import MetaCountermeasuresListResponse, MetaCountermeasureResponse
+from app.schemas.meta_countermeasure import MetaCountermeasuresListResponse
 from app.services.meta_countermeasure_generation import MetaCountermeasureGenerationService
 
 
 @router.post("/{evaluation_id}/generate-meta-countermeasures", response_model=MetaCountermeasuresListResponse)
 async def generate_meta_countermeasures(
     evaluation_id: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    llm_client: LLMClient = Depends(get_llm_client)
 ):
     """メタ対策を生成"""
     # 評価結果を取得
@@ -111,38 +184,39 @@ async def generate_meta_countermeasures(
     if not evaluation:
         raise HTTPException(status_code=404, detail="Evaluation not found")
 
-    # LLMクライアントの作成
-    llm_client = LLMClientFactory.create()
-
     # メタ対策生成サービスの実行
     service = MetaCountermeasureGenerationService(llm_client)
-    meta_countermeasures = await service.generate_meta_countermeasures(evaluation)
-
-    # データベースに保存
-    for meta in meta_countermeasures:
-        db.add(meta)
-    db.commit()
-
-    # レスポンスの作成
-    meta_responses = [
-        MetaCountermeasureResponse(
-            meta_id=meta.meta_id,
-            evaluation_id=meta.evaluation_id,
-            target_axis=meta.target_axis,
-            meta_approach=meta.meta_approach,
-            example=meta.example,
-            priority=meta.priority,
-            applicability=meta.applicability
-        )
-        for meta in meta_countermeasures
-    ]
-
-    return MetaCountermeasuresListResponse(meta_countermeasures=meta_responses)
+    bind = db.get_bind()
+
+    async def generate_and_persist():
+        # 合流した処理は専用のセッションで行う（generate_countermeasuresと同様）
+        session = Session(bind=bind, autoflush=False)
+        try:
+            meta_countermeasures = await service.generate_meta_countermeasures(
+                session.get(RiskEvaluation, evaluation_id)
+            )
+
+            # データベースに一括保存し、保存された行からレスポンスを作成
+            rows = insert_returning(session, meta_countermeasures)
+            session.commit()
+
+            return meta_countermeasures_response.render(rows)
+        finally:
+            session.close()
+
+    # 同一評価の同時リクエストは1回のLLM呼び出しに合流させる
+    body = await single_flight.do(
+        service.coalesce_key(evaluation),
+        generate_and_persist
+    )
+
+    return json_response(body)
 
 
 @router.get("/{evaluation_id}/meta-countermeasures", response_model=MetaCountermeasuresListResponse)
 async def get_meta_countermeasures(
     evaluation_id: str,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """評価に関連するメタ対策を取得"""
@@ -153,32 +227,51 @@ async def get_meta_countermeasures(
     if not evaluation:
         raise HTTPException(status_code=404, detail="Evaluation not found")
 
+    meta_ids = db.query(MetaCountermeasure.meta_id).filter(
+        MetaCountermeasure.evaluation_id == evaluation_id
+    ).all()
+    etag = make_etag("meta-countermeasures", evaluation_id, *(meta_id for meta_id, in meta_ids))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
     meta_countermeasures = db.query(MetaCountermeasure).filter(
         MetaCountermeasure.evaluation_id == evaluation_id
     ).all()
 
-    meta_responses = [
-        MetaCountermeasureResponse(
-            meta_id=meta.meta_id,
-            evaluation_id=meta.evaluation_id,
-            target_axis=meta.target_axis,
-            meta_approach=meta.meta_approach,
-            example=meta.example,
-            priority=meta.priority,
-            applicability=meta.applicability
-        )
-        for meta in meta_countermeasures
-    ]
+    return with_cache_headers(meta_countermeasures_response(meta_countermeasures), etag)
+
 
-    return MetaCountermeasuresListResponse(meta_countermeasures=meta_responses)
+def _expansion_origins(db: Session, meta: MetaCountermeasure):
+    """展開結果の複製元となりうる他のメタ対策とその評価
+
+    統合メタ対策の展開で複製された対策は、代表と同じハッシュを持つ。
+    """
+    source_hashes = {measure.source_hash for measure in meta.countermeasures if measure.source_hash}
+    if not source_hashes:
+        return []
+
+    return db.query(MetaCountermeasure, RiskEvaluation).join(
+        Countermeasure, Countermeasure.meta_id == MetaCountermeasure.meta_id
+    ).join(
+        RiskEvaluation, RiskEvaluation.evaluation_id == MetaCountermeasure.evaluation_id
+    ).filter(
+        Countermeasure.source_hash.in_(source_hashes),
+        MetaCountermeasure.meta_id != meta.meta_id
+    ).distinct().all()
 
 
 @router.post("/meta/{meta_id}/generate-countermeasures", response_model=CountermeasuresListResponse)
 async def generate_countermeasures_from_meta(
     meta_id: str,
-    db: Session = Depends(get_db)
+    force: bool = False,
+    db: Session = Depends(get_db),
+    llm_client: LLMClient = Depends(get_llm_client)
 ):
-    """メタ対策から具体的な対策を生成"""
+    """メタ対策から具体的な対策を生成
+
+    メタ対策と評価の内容が変わっていなければ既存の展開結果を返す。
+    forceを指定した場合は常に再生成し、既存の展開結果を置き換える。
+    """
     # メタ対策を取得
     meta = db.query(MetaCountermeasure).filter(
         MetaCountermeasure.meta_id == meta_id
@@ -195,31 +288,196 @@ async def generate_countermeasures_from_meta(
     if not evaluation:
         raise HTTPException(status_code=404, detail="Evaluation not found")
 
-    # LLMクライアントの作成
-    llm_client = LLMClientFactory.create()
-
     # 対策導出サービスの実行
     service = CountermeasureGenerationService(llm_client)
-    countermeasures = await service.generate_from_meta_countermeasure(meta, evaluation)
-
-    # データベースに保存
-    for measure in countermeasures:
-        db.add(measure)
-    db.commit()
-
-    # レスポンスの作成
-    measure_responses = [
-        CountermeasureResponse(
-            measure_id=measure.measure_id,
-            evaluation_id=measure.evaluation_id,
-            strategy_type=measure.strategy_type,
-            description=measure.description,
-            priority=measure.priority,
-            feasibility=measure.feasibility,
-            implementation_timeline=measure.implementation_timeline,
-            expected_effect=measure.expected_effect
-        )
-        for measure in countermeasures
-    ]
-
-    return CountermeasuresListResponse(countermeasures=measure_responses)
+
+    # 展開済みで内容が変わっていなければ再生成しない
+    if not force and service.is_current_expansion(
+        meta.countermeasures, meta, evaluation, _expansion_origins(db, meta)
+    ):
+        return countermeasures_response(meta.countermeasures)
+
+    bind = db.get_bind()
+
+    async def generate_and_persist():
+        # 合流した処理は専用のセッションで行う（generate_countermeasuresと同様）
+        session = Session(bind=bind, autoflush=False)
+        try:
+            meta = session.get(MetaCountermeasure, meta_id)
+            countermeasures = await service.generate_from_meta_countermeasure(
+                meta, session.get(RiskEvaluation, meta.evaluation_id)
+            )
+
+            # 古い展開結果を置き換えてデータベースに一括保存
+            delete_all(session, meta.countermeasures)
+            rows = insert_returning(session, countermeasures)
+            session.commit()
+
+            return countermeasures_response.render(rows)
+        finally:
+            session.close()
+
+    # 同一メタ対策の同時リクエストは1回のLLM呼び出しに合流させる
+    body = await single_flight.do(
+        service.meta_coalesce_key(meta, evaluation),
+        generate_and_persist
+    )
+
+    return json_response(body)
+
+
+# 複数リスクのメタ対策統合
+
+from app.schemas.meta_countermeasure import (
+    MetaIntegrationRequest,
+    IntegratedMetaCountermeasuresListResponse,
+    IntegratedMetaExpandRequest,
+)
+from app.services.meta_integration import MetaIntegrationService, MetaCluster
+
+
+@router.post("/meta/integrate", response_model=IntegratedMetaCountermeasuresListResponse)
+async def integrate_meta_countermeasures(
+    request: MetaIntegrationRequest,
+    db: Session = Depends(get_db),
+    llm_client: LLMClient = Depends(get_llm_client)
+):
+    """複数の評価のメタ対策を生成・統合
+
+    未生成の評価のメタ対策を並行して生成し、軸ごとに類似アプローチを統合する。
+    expandを指定した場合は代表ごとに1回だけ具体的対策に展開する。
+    """
+    evaluation_ids = list(dict.fromkeys(request.evaluation_ids))
+    evaluations = db.query(RiskEvaluation).filter(
+        RiskEvaluation.evaluation_id.in_(evaluation_ids)
+    ).all()
+
+    if len(evaluations) != len(evaluation_ids):
+        found = {e.evaluation_id for e in evaluations}
+        missing = [eid for eid in evaluation_ids if eid not in found]
+        raise HTTPException(status_code=404, detail=f"Evaluation not found: {', '.join(missing)}")
+
+    evaluations_by_id = {e.evaluation_id: e for e in evaluations}
+    evaluations = [evaluations_by_id[eid] for eid in evaluation_ids]
+
+    # メタ対策統合サービスの実行
+    service = MetaIntegrationService(llm_client)
+    bind = db.get_bind()
+
+    async def integrate_and_persist():
+        # 合流した処理は専用のセッションで行う（generate_countermeasuresと同様）
+        session = Session(bind=bind, autoflush=False)
+        try:
+            evaluations_by_id = {
+                e.evaluation_id: e for e in session.query(RiskEvaluation).filter(
+                    RiskEvaluation.evaluation_id.in_(evaluation_ids)
+                )
+            }
+            evaluations = [evaluations_by_id[eid] for eid in evaluation_ids]
+
+            # 未生成の評価のメタ対策を並行生成
+            new_metas = await service.generate_missing(evaluations)
+            insert_returning(session, new_metas)
+            session.commit()
+
+            metas = [meta for e in evaluations for meta in e.meta_countermeasures]
+            clusters = service.cluster(metas)
+
+            if request.expand:
+                measures = await service.expand_all(clusters, evaluations_by_id)
+
+                # 古い展開結果を置き換えてデータベースに一括保存
+                delete_all(session, [stale for cluster in clusters for stale in cluster.replaced])
+                insert_returning(session, measures)
+                session.commit()
+
+            # レスポンスの作成
+            return integrated_meta_countermeasures_response.render(
+                {
+                    "meta_id": cluster.representative.meta_id,
+                    "evaluation_id": cluster.representative.evaluation_id,
+                    "target_axis": cluster.representative.target_axis,
+                    "meta_approach": cluster.representative.meta_approach,
+                    "example": cluster.representative.example,
+                    "priority": cluster.representative.priority,
+                    "applicability": cluster.representative.applicability,
+                    "member_meta_ids": [m.meta_id for m in cluster.members],
+                    "evaluation_ids": cluster.evaluation_ids,
+                    "countermeasures": cluster.representative.countermeasures
+                }
+                for cluster in clusters
+            )
+        finally:
+            session.close()
+
+    # 同一評価集合の同時リクエストは1回の処理に合流させる
+    body = await single_flight.do(
+        service.coalesce_key(evaluations, request.expand),
+        integrate_and_persist
+    )
+
+    return json_response(body)
+
+
+@router.post("/meta/{meta_id}/expand-integrated", response_model=CountermeasuresListResponse)
+async def expand_integrated_meta_countermeasure(
+    meta_id: str,
+    request: IntegratedMetaExpandRequest,
+    db: Session = Depends(get_db),
+    llm_client: LLMClient = Depends(get_llm_client)
+):
+    """統合メタ対策（代表）を1回だけ展開し、メンバーに複製"""
+    representative = db.query(MetaCountermeasure).filter(
+        MetaCountermeasure.meta_id == meta_id
+    ).first()
+
+    if not representative:
+        raise HTTPException(status_code=404, detail="Meta countermeasure not found")
+
+    member_ids = [mid for mid in dict.fromkeys(request.member_meta_ids) if mid != meta_id]
+    members = db.query(MetaCountermeasure).filter(
+        MetaCountermeasure.meta_id.in_(member_ids)
+    ).all() if member_ids else []
+
+    if len(members) != len(member_ids):
+        raise HTTPException(status_code=404, detail="Meta countermeasure not found")
+
+    evaluation = db.query(RiskEvaluation).filter(
+        RiskEvaluation.evaluation_id == representative.evaluation_id
+    ).first()
+
+    if not evaluation:
+        raise HTTPException(status_code=404, detail="Evaluation not found")
+
+    service = MetaIntegrationService(llm_client)
+    cluster = MetaCluster(representative=representative, members=[representative, *members])
+    bind = db.get_bind()
+
+    async def expand_and_persist():
+        # 合流した処理は専用のセッションで行う（generate_countermeasuresと同様）
+        session = Session(bind=bind, autoflush=False)
+        try:
+            representative = session.get(MetaCountermeasure, meta_id)
+            members = session.query(MetaCountermeasure).filter(
+                MetaCountermeasure.meta_id.in_(member_ids)
+            ).all() if member_ids else []
+            evaluation = session.get(RiskEvaluation, representative.evaluation_id)
+            cluster = MetaCluster(representative=representative, members=[representative, *members])
+            measures = await service.expand(cluster, {evaluation.evaluation_id: evaluation})
+
+            # 古い展開結果を置き換えてデータベースに一括保存
+            delete_all(session, cluster.replaced)
+            insert_returning(session, measures)
+            session.commit()
+
+            return countermeasures_response.render(representative.countermeasures)
+        finally:
+            session.close()
+
+    # 代表の展開は同時リクエストでも1回に合流させる
+    body = await single_flight.do(
+        service.expand_coalesce_key(cluster, evaluation),
+        expand_and_persist
+    )
+
+    return json_response(body)
@@ -0,0 +1,51 @@
+"""Assessment export API routes."""
+
+from typing import List, Literal, Optional
+from urllib.parse import quote
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.database.base import get_db
+from app.services.export import ExportService, FORMATS
+
+router = APIRouter()
+
+
+def content_disposition(filename: str) -> str:
+    """ダウンロードのContent-Disposition（RFC 6266、非ASCIIはRFC 5987で符号化）"""
+    fallback = "".join(
+        c if c.isascii() and c.isprintable() and c not in '"\\' else "_" for c in filename
+    )
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+@router.get("")
+async def export_assessments(
+    format: Literal["csv", "jsonl", "xlsx"] = "xlsx",
+    datasets: Optional[List[str]] = Query(None),
+    situation_id: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """状況・リスク・評価・メタ対策・対策をCSV/JSONL/XLSXで書き出し
+
+    行をサーバーサイドカーソルから取得しながら送る（Content-Lengthなしの
+    チャンク転送）ため、全件の書き出しでもすぐにダウンロードが始まる。
+    CSVは1つのデータセットのみ（省略時は "risks"）。
+    """
+    try:
+        datasets = ExportService.resolve_datasets(format, datasets)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # 依存関係のセッションはレスポンスの送信前に閉じられるため、
+    # 同じ接続先で書き出し用のセッションを作成する
+    bind = db.get_bind()
+    service = ExportService(lambda: Session(bind=bind, autoflush=False))
+    filename = service.filename(format, situation_id)
+
+    return StreamingResponse(
+        service.stream(format, datasets, situation_id),
+        media_type=FORMATS[format].media_type,
+        headers={"Content-Disposition": content_disposition(filename)}
+    )
@@ -1,13 +1,18 @@
 """Risks API routes."""
 
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 
 from app.database.base import get_db
+from app.database.persistence import insert_returning
 from app.models import IdentifiedRisk, RiskEvaluation
 from app.schemas.evaluation import EvaluationResponse
-from app.services.risk_evaluation import RiskEvaluationService
-from app.llm.client import LLMClientFactory
+from app.api.responses import json_response, model_response
+from app.api.caching import make_etag, is_not_modified, not_modified, with_cache_headers
+from app.services.risk_evaluation import RiskEvaluationService, MAX_SAMPLES
+from app.services.single_flight import single_flight
+from app.llm.client import LLMClient, get_llm_client
 
 router = APIRouter()
 
@@ -15,9 +20,16 @@ router = APIRouter()
 @router.post("/{risk_id}/evaluate", response_model=EvaluationResponse)
 async def evaluate_risk(
     risk_id: str,
-    db: Session = Depends(get_db)
+    samples: Optional[int] = Query(None, ge=1, le=MAX_SAMPLES),
+    aggregation: Optional[Literal["median", "majority"]] = None,
+    db: Session = Depends(get_db),
+    llm_client: LLMClient = Depends(get_llm_client)
 ):
-    """リスクを評価"""
+    """リスクを評価
+
+    samples を2以上にすると一貫性モードで評価する（軸ごとにk件のサンプルを
+    aggregation で集約し、分散と一致率を保存する）。省略時は EVALUATION_SAMPLES。
+    """
     # リスクを取得
     risk = db.query(IdentifiedRisk).filter(
         IdentifiedRisk.risk_id == risk_id
@@ -26,24 +38,38 @@ async def evaluate_risk(
     if not risk:
         raise HTTPException(status_code=404, detail="Risk not found")
 
-    # LLMクライアントの作成
-    llm_client = LLMClientFactory.create()
-
     # リスク評価サービスの実行
-    service = RiskEvaluationService(llm_client)
-    evaluation = await service.evaluate_risk(risk)
+    service = RiskEvaluationService(llm_client, samples=samples, aggregation=aggregation)
+    bind = db.get_bind()
+
+    async def evaluate_and_persist():
+        # 合流した処理は最初の呼び出し元のリクエストが終わっても続くため、
+        # リクエストのセッションではなく専用のセッションで読み込み・保存する
+        session = Session(bind=bind, autoflush=False)
+        try:
+            evaluation = await service.evaluate_risk(session.get(IdentifiedRisk, risk_id))
 
-    # データベースに保存
-    db.add(evaluation)
-    db.commit()
-    db.refresh(evaluation)
+            # データベースに保存し、保存された行を変換して返す
+            [row] = insert_returning(session, [evaluation])
+            session.commit()
 
-    return evaluation
+            return EvaluationResponse.model_validate(row).model_dump_json().encode()
+        finally:
+            session.close()
+
+    # 同一リスクの同時評価リクエストは1回のLLM呼び出しに合流させる
+    body = await single_flight.do(
+        service.coalesce_key(risk),
+        evaluate_and_persist
+    )
+
+    return json_response(body)
 
 
 @router.get("/{risk_id}/evaluation", response_model=EvaluationResponse)
 async def get_risk_evaluation(
     risk_id: str,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """リスクの評価結果を取得"""
@@ -54,4 +80,8 @@ async def get_risk_evaluation(
     if not evaluation:
         raise HTTPException(status_code=404, detail="Evaluation not found")
 
-    return evaluation
+    etag = make_etag("evaluation", evaluation.evaluation_id, evaluation.evaluated_at)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    return with_cache_headers(model_response(EvaluationResponse, evaluation), etag)
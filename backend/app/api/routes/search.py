@@ -0,0 +1,47 @@
+"""Search API routes."""
+
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.database.base import get_db
+from app.schemas.search import SearchHitResponse, SearchResponse
+from app.services.search import SearchService, SearchFilters, SEARCH_FIELDS
+
+router = APIRouter()
+
+
+@router.get("", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1),
+    kinds: Optional[List[str]] = Query(None),
+    situation_id: Optional[str] = None,
+    min_severity: Optional[int] = Query(None, ge=1, le=5),
+    min_frequency: Optional[int] = Query(None, ge=1, le=5),
+    min_avoidability: Optional[int] = Query(None, ge=1, le=5),
+    risk_level: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """リスク記述・評価根拠・対策・メタ対策を全文検索
+
+    評価スコアの条件は、対象のリスクの評価結果で絞り込む。
+    """
+    unknown = [kind for kind in kinds or [] if kind not in SEARCH_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown kinds: {unknown}")
+
+    filters = SearchFilters(
+        kinds=kinds,
+        situation_id=situation_id,
+        min_severity=min_severity,
+        min_frequency=min_frequency,
+        min_avoidability=min_avoidability,
+        risk_level=risk_level,
+    )
+    hits = SearchService().search(db, q, filters, limit)
+
+    return SearchResponse(
+        query=q,
+        hits=[SearchHitResponse.model_validate(hit) for hit in hits]
+    )
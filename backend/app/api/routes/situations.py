@@ -1,15 +1,32 @@
 """Situations API routes."""
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import AsyncIterator, Callable, List
 
 from app.database.base import get_db
-from app.models import RiskSituation
-from app.schemas.situation import SituationCreate, SituationResponse
+from app.database.persistence import insert_returning
+from app.models import RiskSituation, IdentifiedRisk
+from app.schemas.situation import (
+    SituationCreate,
+    SituationResponse,
+    SituationReassessRequest,
+    SituationReassessResponse,
+    RiskChangeResponse,
+    AutoAssessEvent,
+)
 from app.schemas.risk import RisksListResponse, RiskResponse
+from app.schemas.evaluation import EvaluationResponse, CountermeasureResponse
+from app.api.responses import risks_response, json_response, model_response
+from app.api.caching import make_etag, is_not_modified, not_modified, with_cache_headers
 from app.services.risk_identification import RiskIdentificationService
-from app.llm.client import LLMClientFactory
+from app.services.assessment_pipeline import AssessmentPipeline, PipelineEvent, PipelineStage
+from app.services.reassessment import ReassessmentService, ReassessmentPlan, SITUATION_FIELDS
+from app.services.countermeasure_library import countermeasure_library
+from app.services.single_flight import single_flight
+from app.llm.client import LLMClient, get_llm_client
+from app.llm.context import Priority, current_priority, scheduling
 
 router = APIRouter()
 
@@ -26,15 +43,15 @@ async def create_situation(
         ai_type=situation_data.ai_type,
         deployment_stage=situation_data.deployment_stage
     )
-    db.add(situation)
+    [row] = insert_returning(db, [situation])
     db.commit()
-    db.refresh(situation)
-    return situation
+    return model_response(SituationResponse, row, status_code=201)
 
 
 @router.get("/{situation_id}", response_model=SituationResponse)
 async def get_situation(
     situation_id: str,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """リスク状況を取得"""
@@ -45,13 +62,18 @@ async def get_situation(
     if not situation:
         raise HTTPException(status_code=404, detail="Situation not found")
 
-    return situation
+    etag = make_etag("situation", situation.situation_id, situation.updated_at)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    return with_cache_headers(model_response(SituationResponse, situation), etag)
 
 
 @router.post("/{situation_id}/identify-risks", response_model=RisksListResponse)
 async def identify_risks(
     situation_id: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    llm_client: LLMClient = Depends(get_llm_client)
 ):
     """リスクを特定"""
     # 状況を取得
@@ -62,38 +84,106 @@ async def identify_risks(
     if not situation:
         raise HTTPException(status_code=404, detail="Situation not found")
 
-    # LLMクライアントの作成
-    llm_client = LLMClientFactory.create()
-
     # リスク特定サービスの実行
     service = RiskIdentificationService(llm_client)
-    risks = await service.identify_risks(situation)
+    bind = db.get_bind()
 
-    # データベースに保存
-    for risk in risks:
-        db.add(risk)
-    db.commit()
+    async def identify_and_persist():
+        # 合流した処理は最初の呼び出し元のリクエストが終わっても続くため、
+        # リクエストのセッションではなく専用のセッションで読み込み・保存する
+        session = Session(bind=bind, autoflush=False)
+        try:
+            risks = await service.identify_risks(session.get(RiskSituation, situation_id))
 
-    # レスポンスの作成
-    risk_responses = [
-        RiskResponse(
-            risk_id=risk.risk_id,
-            situation_id=risk.situation_id,
-            category=risk.category,
-            guideword=risk.guideword,
-            risk_description=risk.risk_description,
-            affected_area=risk.affected_area,
-            confidence_score=risk.confidence_score
-        )
-        for risk in risks
-    ]
+            # データベースに一括保存し、保存された行からレスポンスを作成
+            rows = insert_returning(session, risks)
+            session.commit()
+
+            return risks_response.render(rows)
+        finally:
+            session.close()
+
+    # 同一状況・同一プロンプトの同時リクエストは1回のLLM呼び出しに合流させる
+    body = await single_flight.do(
+        service.coalesce_key(situation),
+        identify_and_persist
+    )
+
+    return json_response(body)
+
+
+@router.post("/{situation_id}/auto-assess")
+async def auto_assess(
+    situation_id: str,
+    db: Session = Depends(get_db),
+    llm_client: LLMClient = Depends(get_llm_client)
+):
+    """リスク特定・評価・対策導出を続けて実行し、進捗をNDJSONで返す
+
+    特定されたリスクは応答全体を待たずに評価・対策導出へ渡される。各行は
+    AutoAssessEvent（risk / evaluation / countermeasures / error、最後にdone）で、
+    結果は行を送る前に保存される。
+    """
+    situation = db.query(RiskSituation).filter(
+        RiskSituation.situation_id == situation_id
+    ).first()
+
+    if not situation:
+        raise HTTPException(status_code=404, detail="Situation not found")
+
+    # 依存関係のセッションはレスポンスの送信前に閉じられるため、
+    # 同じ接続先で保存用のセッションを作成する
+    bind = db.get_bind()
+    pipeline = AssessmentPipeline(llm_client)
+
+    return StreamingResponse(
+        _persist_events(pipeline.run(situation), lambda: Session(bind=bind, autoflush=False)),
+        media_type="application/x-ndjson"
+    )
 
-    return RisksListResponse(identified_risks=risk_responses)
+
+async def _persist_events(
+    events: AsyncIterator[PipelineEvent],
+    session_factory: Callable[[], Session]
+) -> AsyncIterator[bytes]:
+    """パイプラインの結果を届いた順に保存し、イベントをNDJSONの行に変換"""
+    db = session_factory()
+    library = countermeasure_library.load(db)
+    try:
+        async for event in events:
+            line = AutoAssessEvent(stage=event.stage)
+            if event.stage == PipelineStage.RISK:
+                [row] = insert_returning(db, [event.risk])
+                db.commit()
+                line.risk = RiskResponse.model_validate(row)
+            elif event.stage == PipelineStage.EVALUATION:
+                [row] = insert_returning(db, [event.evaluation])
+                db.commit()
+                line.evaluation = EvaluationResponse.model_validate(row)
+            elif event.stage == PipelineStage.COUNTERMEASURES:
+                rows = insert_returning(db, event.countermeasures)
+                db.commit()
+                library.add(event.evaluation)
+                line.risk_id = event.risk.risk_id
+                line.strategy = event.strategy
+                line.countermeasures = [CountermeasureResponse.model_validate(r) for r in rows]
+            elif event.stage == PipelineStage.ERROR:
+                line.failed_stage = event.failed_stage
+                line.risk_id = event.risk.risk_id if event.risk is not None else None
+                line.detail = event.detail
+            else:
+                line.counts = event.counts
+                line.elapsed = event.elapsed
+            yield line.model_dump_json(exclude_none=True).encode() + b"\n"
+    finally:
+        await events.aclose()
+        db.close()
 
 
 @router.get("/{situation_id}/risks", response_model=RisksListResponse)
 async def get_situation_risks(
     situation_id: str,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """状況に関連するリスクを取得"""
@@ -104,22 +194,113 @@ async def get_situation_risks(
     if not situation:
         raise HTTPException(status_code=404, detail="Situation not found")
 
-    from app.models import IdentifiedRisk
+    # リスクの行は作成後に更新されないため、IDの一覧でETagを決める
+    risk_ids = db.query(IdentifiedRisk.risk_id).filter(
+        IdentifiedRisk.situation_id == situation_id
+    ).all()
+    etag = make_etag("risks", situation_id, *(risk_id for risk_id, in risk_ids))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
     risks = db.query(IdentifiedRisk).filter(
         IdentifiedRisk.situation_id == situation_id
     ).all()
 
-    risk_responses = [
-        RiskResponse(
-            risk_id=risk.risk_id,
-            situation_id=risk.situation_id,
-            category=risk.category,
-            guideword=risk.guideword,
-            risk_description=risk.risk_description,
-            affected_area=risk.affected_area,
-            confidence_score=risk.confidence_score
+    return with_cache_headers(risks_response(risks), etag)
+
+
+@router.post("/{situation_id}/reassess", response_model=SituationReassessResponse)
+async def reassess_situation(
+    situation_id: str,
+    situation_data: SituationReassessRequest,
+    db: Session = Depends(get_db),
+    llm_client: LLMClient = Depends(get_llm_client)
+):
+    """状況を編集し、差分のみリスクアセスメントをやり直す
+
+    更新後の状況でリスクを再特定して既存のリスクと対応付け、変化していない
+    リスクは評価結果・対策ごと保持する。新規または実質的に変化したリスクのみ
+    保存・評価し、置き換えられた・該当しなくなったリスクは削除する。
+    状況に変更がなければLLMは呼ばない。
+    """
+    situation = db.query(RiskSituation).filter(
+        RiskSituation.situation_id == situation_id
+    ).first()
+
+    if not situation:
+        raise HTTPException(status_code=404, detail="Situation not found")
+
+    service = ReassessmentService(llm_client)
+    guidewords = situation_data.guidewords
+    bind = db.get_bind()
+
+    async def reassess_and_persist():
+        # 合流した処理は専用のセッションで行う（identify_risksと同様）
+        session = Session(bind=bind, autoflush=False)
+        try:
+            situation = session.get(RiskSituation, situation_id)
+            diff = service.diff(situation, situation_data)
+            risks = session.query(IdentifiedRisk).filter(
+                IdentifiedRisk.situation_id == situation_id
+            ).all()
+
+            plan = ReassessmentPlan(unchanged=service.scope(risks, guidewords))
+            rows, evaluations = [], []
+            if diff.changed:
+                for name in SITUATION_FIELDS:
+                    setattr(situation, name, getattr(situation_data, name))
+
+                identified = await service.identify(situation, guidewords)
+                plan = service.match(service.scope(risks, guidewords), identified)
+
+                # 新規・変化したリスクのみ保存・評価し、古いリスクを置き換える
+                rows = insert_returning(session, plan.new_risks)
+                if situation_data.evaluate:
+                    evaluations = insert_returning(session, await service.evaluate(rows))
+                deleted = service.delete_risks(session, [r.risk_id for r in plan.obsolete_risks])
+
+            # コミットで既存リスクの属性が失効する前にIDを取り出す
+            unchanged_risk_ids = [r.risk_id for r in plan.unchanged]
+            changed_risks = [
+                RiskChangeResponse(
+                    previous_risk_id=change.previous.risk_id,
+                    risk_id=row.risk_id,
+                    similarity=round(change.similarity, 4)
+                )
+                for change, row in zip(plan.changed, rows)
+            ]
+            removed_risk_ids = [r.risk_id for r in plan.removed]
+            if diff.changed:
+                session.commit()
+                countermeasure_library.discard(deleted)
+
+            current = session.query(IdentifiedRisk).filter(
+                IdentifiedRisk.situation_id == situation_id
+            ).all()
+            response = SituationReassessResponse(
+                situation=SituationResponse.model_validate(situation),
+                changed_fields=diff.changed_fields,
+                added_sentences=diff.added_sentences,
+                removed_sentences=diff.removed_sentences,
+                identified_risks=[RiskResponse.model_validate(r) for r in current],
+                unchanged_risk_ids=unchanged_risk_ids,
+                changed_risks=changed_risks,
+                added_risk_ids=[row.risk_id for row in rows[len(plan.changed):]],
+                removed_risk_ids=removed_risk_ids,
+                evaluations=[EvaluationResponse.model_validate(e) for e in evaluations],
+            )
+            return response.model_dump_json().encode()
+        finally:
+            session.close()
+
+    # 同一状況・同一内容の同時リクエストは1回の再アセスメントに合流させる
+    # 再特定・再評価は多数のLLM呼び出しになるため、BATCHとして画面操作の呼び出しを優先させる
+    # （呼び出し元がBACKFILLを指定していればそのまま）
+    priority = Priority.BATCH if current_priority() == Priority.INTERACTIVE else None
+    with scheduling(priority=priority):
+        body = await single_flight.do(
+            service.coalesce_key(situation, situation_data, guidewords, situation_data.evaluate),
+            reassess_and_persist
         )
-        for risk in risks
-    ]
 
-    return RisksListResponse(identified_risks=risk_responses)
+    return json_response(body)
@@ -0,0 +1,140 @@
+"""Assessment snapshot API routes."""
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database.base import get_db
+from app.models import RiskSituation, AssessmentSnapshot
+from app.schemas.snapshot import (
+    SnapshotCreate,
+    SnapshotResponse,
+    SnapshotsListResponse,
+    SnapshotDetailResponse,
+    SnapshotDiffResponse,
+)
+from app.api.responses import ListResponder, json_response, model_response
+from app.api.caching import make_etag, is_not_modified, not_modified, with_cache_headers
+from app.services.snapshots import snapshot_service
+from app.services.single_flight import single_flight, make_key
+
+router = APIRouter()
+
+# スナップショットは変更されないため、同じURLの内容は常に同じ
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+snapshots_response = ListResponder(SnapshotResponse, "snapshots")
+
+
+def _get_situation(db: Session, situation_id: str) -> RiskSituation:
+    situation = db.query(RiskSituation).filter(
+        RiskSituation.situation_id == situation_id
+    ).first()
+    if not situation:
+        raise HTTPException(status_code=404, detail="Situation not found")
+    return situation
+
+
+def _get_snapshot(db: Session, situation_id: str, version: int) -> AssessmentSnapshot:
+    snapshot = snapshot_service.get(db, situation_id, version)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return snapshot
+
+
+@router.post("/{situation_id}/snapshots", response_model=SnapshotResponse, status_code=201)
+async def create_snapshot(
+    situation_id: str,
+    snapshot_data: SnapshotCreate,
+    db: Session = Depends(get_db)
+):
+    """状況のツリー全体を変更不可能なバージョンとして保存"""
+    situation = _get_situation(db, situation_id)
+
+    async def snapshot_and_persist():
+        try:
+            row = snapshot_service.create(db, situation, snapshot_data.label)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Snapshot version conflict")
+        return SnapshotResponse.model_validate(row).model_dump_json().encode()
+
+    # 同一状況の同時リクエストは1つのバージョンに合流させる
+    body = await single_flight.do(
+        make_key("snapshot", situation_id, snapshot_data.label or ""),
+        snapshot_and_persist
+    )
+
+    return json_response(body, status_code=201)
+
+
+@router.get("/{situation_id}/snapshots", response_model=SnapshotsListResponse)
+async def list_snapshots(
+    situation_id: str,
+    db: Session = Depends(get_db)
+):
+    """状況のスナップショットの一覧を取得（バージョン順）"""
+    _get_situation(db, situation_id)
+
+    snapshots = db.query(
+        AssessmentSnapshot.snapshot_id,
+        AssessmentSnapshot.situation_id,
+        AssessmentSnapshot.version,
+        AssessmentSnapshot.label,
+        AssessmentSnapshot.is_keyframe,
+        AssessmentSnapshot.change_count,
+        AssessmentSnapshot.created_at,
+    ).filter(
+        AssessmentSnapshot.situation_id == situation_id
+    ).order_by(AssessmentSnapshot.version).all()
+
+    return snapshots_response(snapshots)
+
+
+@router.get("/{situation_id}/snapshots/{version}", response_model=SnapshotDetailResponse)
+async def get_snapshot(
+    situation_id: str,
+    version: int,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """バージョンの状況ツリーを取得"""
+    snapshot = _get_snapshot(db, situation_id, version)
+
+    etag = make_etag("snapshot", snapshot.snapshot_id)
+    if is_not_modified(request, etag):
+        return not_modified(etag, IMMUTABLE_CACHE_CONTROL)
+
+    detail = SnapshotDetailResponse(
+        **SnapshotResponse.model_validate(snapshot).model_dump(),
+        tree=snapshot_service.load(db, snapshot)
+    )
+    return with_cache_headers(
+        model_response(SnapshotDetailResponse, detail), etag, IMMUTABLE_CACHE_CONTROL
+    )
+
+
+@router.get(
+    "/{situation_id}/snapshots/{from_version}/diff/{to_version}",
+    response_model=SnapshotDiffResponse
+)
+async def diff_snapshots(
+    situation_id: str,
+    from_version: int,
+    to_version: int,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """2つのバージョンの差分を取得（変化した値のみ）"""
+    before = _get_snapshot(db, situation_id, from_version)
+    after = _get_snapshot(db, situation_id, to_version)
+
+    etag = make_etag("snapshot-diff", before.snapshot_id, after.snapshot_id)
+    if is_not_modified(request, etag):
+        return not_modified(etag, IMMUTABLE_CACHE_CONTROL)
+
+    diff = snapshot_service.diff(db, before, after)
+    return with_cache_headers(
+        model_response(SnapshotDiffResponse, diff), etag, IMMUTABLE_CACHE_CONTROL
+    )
@@ -0,0 +1,72 @@
+"""LLM scheduling context for API requests."""
+
+import ipaddress
+import os
+from typing import List, Optional, Union
+from fastapi.responses import ORJSONResponse
+from app.llm.context import Priority, scheduling
+
+# 優先度クラスとテナント（クォータの単位）を指定するリクエストヘッダー
+PRIORITY_HEADER = b"x-llm-priority"
+TENANT_HEADER = b"x-tenant-id"
+
+
+def parse_networks(spec: str) -> List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]:
+    """カンマ区切りのアドレス・CIDRを解析（例: "127.0.0.1,10.0.0.0/8"）"""
+    return [
+        ipaddress.ip_network(entry.strip(), strict=False)
+        for entry in spec.split(",") if entry.strip()
+    ]
+
+
+class SchedulingMiddleware:
+    """リクエストヘッダーからLLM呼び出しの優先度クラスとテナントを設定する
+
+    ヘッダーがなければ INTERACTIVE（画面操作）として扱う。ポートフォリオ全体の
+    再実行などのスクリプトは "X-LLM-Priority: batch" を付けて呼び出す。
+
+    ヘッダーは信頼できる接続元（LLM_SCHEDULING_TRUSTED_NETWORKS、社内のスクリプトや
+    テナントを付与するプロキシ）からのものだけを使う。それ以外の接続元のヘッダーは
+    無視して既定値（INTERACTIVE、テナントなし）で扱い、他のテナントのクォータを
+    使われないようにする。
+
+    Args:
+        app: ASGIアプリケーション
+        trusted_networks: ヘッダーを信頼する接続元のアドレス・CIDR（カンマ区切り、既定は環境変数）
+    """
+
+    def __init__(self, app, trusted_networks: Optional[str] = None):
+        self.app = app
+        self.trusted_networks = parse_networks(
+            trusted_networks if trusted_networks is not None
+            else os.getenv("LLM_SCHEDULING_TRUSTED_NETWORKS", "")
+        )
+
+    def is_trusted(self, scope) -> bool:
+        """接続元がヘッダーを信頼できるアドレスか"""
+        client = scope.get("client")
+        if not client or not self.trusted_networks:
+            return False
+        try:
+            address = ipaddress.ip_address(client[0])
+        except ValueError:
+            return False
+        return any(address in network for network in self.trusted_networks)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.is_trusted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        priority = headers.get(PRIORITY_HEADER, b"").decode("latin-1").lower() or None
+        tenant = headers.get(TENANT_HEADER, b"").decode("latin-1") or None
+        if priority is not None and priority not in Priority.ALL:
+            response = ORJSONResponse(status_code=400, content={
+                "detail": f"Invalid X-LLM-Priority: {priority} (expected one of {', '.join(Priority.ALL)})"
+            })
+            await response(scope, receive, send)
+            return
+
+        with scheduling(priority=priority, tenant=tenant):
+            await self.app(scope, receive, send)
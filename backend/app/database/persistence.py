@@ -0,0 +1,163 @@
+"""Bulk persistence helpers for route handlers."""
+
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Sequence
+from sqlalchemy import delete, event, insert, inspect
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+from app.database.base import Base
+
+# コミットされた行を受け取るリスナー（テーブル名 → 行のリスト）
+InsertListener = Callable[[Dict[str, List[Any]]], None]
+_insert_listeners: List[InsertListener] = []
+
+
+def on_committed_inserts(listener: InsertListener) -> InsertListener:
+    """insert_returningで保存された行のコミット後に呼ばれるリスナーを登録
+
+    ロールバックされた行は通知しない。検索インデックスなどの
+    インメモリの派生データを保存と同時に更新するために使う。
+    """
+    _insert_listeners.append(listener)
+    return listener
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_inserts(session: Session) -> None:
+    inserted = session.info.pop("inserted_rows", None)
+    if not inserted:
+        return
+    for listener in _insert_listeners:
+        listener(inserted)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_inserts(session: Session) -> None:
+    session.info.pop("inserted_rows", None)
+
+
+def _column_values(obj: Base) -> Dict[str, Any]:
+    """インスタンスの列の値（未設定の列にはPython側のデフォルトを適用）"""
+    mapper = inspect(obj).mapper
+    values = {}
+    for attr in mapper.column_attrs:
+        column = attr.columns[0]
+        value = getattr(obj, attr.key)
+        if value is None and column.default is not None:
+            default = column.default
+            if default.is_callable:
+                value = default.arg(None)
+            elif default.is_scalar:
+                value = default.arg
+        values[column.key] = value
+    return values
+
+
+def insert_returning(db: Session, objects: Sequence[Base]) -> List[Row]:
+    """インスタンスをエンティティ種別ごとに1回の複数行INSERTで保存
+
+    セッションの作業単位（db.add → flush）を経由せず、種別ごとにまとめて
+    INSERTし、RETURNINGで保存された行を受け取る（refreshの往復が不要）。
+    RETURNINGに対応していないデータベースでは挿入した値をそのまま返す。
+    コミットは呼び出し側で行う。
+
+    Args:
+        db: データベースセッション
+        objects: 保存するモデルのインスタンス（未永続化）
+
+    Returns:
+        保存された行のリスト（objectsと同じ順序、列名の属性でアクセスできる）
+    """
+    if not objects:
+        return []
+
+    # エンティティ種別ごとにまとめる（出現順を保つ）
+    groups: Dict[Any, List[int]] = {}
+    params: List[Dict[str, Any]] = []
+    for i, obj in enumerate(objects):
+        params.append(_column_values(obj))
+        groups.setdefault(type(obj).__table__, []).append(i)
+
+    dialect = db.get_bind().dialect
+    supports_returning = (
+        dialect.insert_executemany_returning_sort_by_parameter_order
+        if len(objects) > 1 else dialect.insert_returning
+    )
+
+    rows: List[Any] = [None] * len(objects)
+    for table, indexes in groups.items():
+        group_params = [params[i] for i in indexes]
+        if supports_returning:
+            result = db.execute(
+                insert(table).returning(*table.c, sort_by_parameter_order=True),
+                group_params
+            )
+            group_rows = result.all()
+        else:
+            db.execute(insert(table), group_params)
+            group_rows = [SimpleNamespace(**p) for p in group_params]
+        for i, row in zip(indexes, group_rows):
+            rows[i] = row
+        if _insert_listeners:
+            db.info.setdefault("inserted_rows", {}).setdefault(table.name, []).extend(group_rows)
+
+    return rows
+
+
+def insert_records(db: Session, records: Sequence[Any], chunk_size: int = 1000) -> None:
+    """レコード（app.services.records）をテーブルごとに一括INSERT
+
+    ORMのインスタンスを作らず、chunk_size件ずつ executemany で保存する。
+    RETURNINGは使わず、コミット後のリスナーにはレコード自体を渡す。
+    コミットは呼び出し側で行う。
+    """
+    groups: Dict[Any, List[Any]] = {}
+    for record in records:
+        groups.setdefault(record.MODEL.__table__, []).append(record)
+
+    for table, group in groups.items():
+        for start in range(0, len(group), chunk_size):
+            chunk = group[start:start + chunk_size]
+            db.execute(insert(table), [record.values() for record in chunk])
+        if _insert_listeners:
+            db.info.setdefault("inserted_rows", {}).setdefault(table.name, []).extend(group)
+
+
+def delete_all(db: Session, objects: Sequence[Base]) -> None:
+    """インスタンスをエンティティ種別ごとに1回のDELETEで削除
+
+    コミットは呼び出し側で行う。
+    """
+    groups: Dict[Any, List[Any]] = {}
+    for obj in objects:
+        groups.setdefault(type(obj), []).append(inspect(obj).identity[0])
+
+    for model, keys in groups.items():
+        primary_key = inspect(model).primary_key[0]
+        db.execute(delete(model.__table__).where(primary_key.in_(keys)))
+
+
+def insert_ignore(db: Session, model: Any, params: Sequence[Dict[str, Any]]) -> None:
+    """主キーが既に存在する行を無視して一括INSERT
+
+    内容アドレス化された行（同じキーなら同じ内容）の保存に使う。
+    PostgreSQL・SQLiteでは ON CONFLICT DO NOTHING、それ以外では
+    既存のキーを除いてからINSERTする。コミットは呼び出し側で行う。
+    """
+    if not params:
+        return
+    table = model.__table__
+    primary_key = inspect(model).primary_key[0]
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        keys = [p[primary_key.key] for p in params]
+        existing = {key for key, in db.query(primary_key).filter(primary_key.in_(keys))}
+        params = [p for p in params if p[primary_key.key] not in existing]
+        if params:
+            db.execute(insert(table), params)
+        return
+    db.execute(dialect_insert(table).on_conflict_do_nothing(index_elements=[primary_key.key]), params)
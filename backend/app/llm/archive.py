@@ -0,0 +1,558 @@
+"""Append-only archive of LLM interactions for replay and offline analysis."""
+
+import asyncio
+import gzip
+import hashlib
+import itertools
+import mmap
+import os
+import time
+import zlib
+from dataclasses import asdict, dataclass, fields
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Type
+
+import orjson
+
+from app.llm.client import LLMClient
+from app.llm.context import (
+    RawCapture,
+    capture_raw_responses,
+    current_call_site,
+    current_priority,
+    current_tenant,
+    match_call_site,
+)
+from app.llm.structured import T, parse_structured
+from app.llm.tokens import ContextWindowExceededError, estimate_tokens
+
+# セグメントのファイル名（プロセスごとに別のファイルへ書く）
+SEGMENT_SUFFIX = ".jsonl.gz"
+
+
+class Outcome:
+    """呼び出しの結果の種別"""
+    OK = "ok"
+    # 応答が出力スキーマに合わなかった（構造化出力の呼び出しのみ）
+    PARSE_ERROR = "parse_error"
+    ERROR = "error"
+    # ストリームを最後まで読まずにやめた
+    INCOMPLETE = "incomplete"
+
+
+def prompt_hash(prompt: str, system_prompt: Optional[str] = None) -> str:
+    """システムプロンプトとプロンプトのハッシュ（再生時の照合キー）"""
+    digest = hashlib.sha256()
+    digest.update((system_prompt or "").encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+@dataclass(slots=True)
+class ArchiveRecord:
+    """LLM呼び出し1回分の記録
+
+    response はプロバイダーが返した解析前の応答のテキスト（ツールの使用では
+    ツールの入力のJSON）。sample_structured ではサンプルごとのテキストの配列。
+    トークン数はプロバイダーの報告値で、報告がない場合は文字種からの概算
+    （tokens_estimated）。
+    """
+    ts: float
+    method: str
+    call_site: Optional[str]
+    prompt_hash: str
+    prompt: str
+    system_prompt: Optional[str]
+    response: Optional[str]
+    outcome: str
+    latency: float
+    input_tokens: int
+    output_tokens: int
+    tokens_estimated: bool = False
+    error: Optional[str] = None
+    schema: Optional[str] = None
+    n: int = 1
+    priority: Optional[str] = None
+    tenant: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ArchiveRecord":
+        # 後から追加した項目を持たない古い記録も読めるように、既知の項目だけ渡す
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in names})
+
+    def texts(self) -> List[str]:
+        """応答のテキスト（sample_structured はサンプルごと）"""
+        if self.response is None:
+            return []
+        if self.method == "sample_structured":
+            return orjson.loads(self.response)
+        return [self.response]
+
+
+class ArchiveWriter:
+    """記録をメモリに溜め、まとめて圧縮してセグメントに追記する
+
+    append はLLM呼び出しの経路で呼ばれるため、バッファに積むだけで返る。
+    バッファは flush_interval 秒ごと（と close 時）に別スレッドで書き出す。
+    1回の書き出しは1つのgzipメンバーとしてセグメントの末尾に追記するため、
+    書き込み中のセグメントもそのまま読める（途中で止まった末尾は読み飛ばす）。
+    セグメントが segment_bytes を超えると新しいセグメントに切り替える。
+    書き出しが追いつかずバッファが max_buffer 件に達した場合、以降の記録は捨てて
+    件数を数える（LLM呼び出しを待たせない）。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 64 * 1024 * 1024,
+        flush_interval: float = 1.0,
+        max_buffer: int = 10000
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer: List[ArchiveRecord] = []
+        self._lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._segment: Optional[str] = None
+        self._segment_size = 0
+        self._sequence = itertools.count(1)
+        self.written = 0
+        self.dropped = 0
+        self.segments_created = 0
+
+    def append(self, record: ArchiveRecord) -> None:
+        """記録をバッファに追加する（書き出しは待たない）"""
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            return
+        self._buffer.append(record)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # イベントループの外（同期的なスクリプト）ではflush()で書き出す
+            return
+        if self._flusher is None or self._flusher.done() or self._flusher.get_loop() is not loop:
+            self._flusher = loop.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self) -> None:
+        while self._buffer:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """バッファの記録を書き出す"""
+        async with self._lock:
+            batch, self._buffer = self._buffer, []
+            if batch:
+                await asyncio.to_thread(self._write, batch)
+
+    def _write(self, batch: List[ArchiveRecord]) -> None:
+        data = gzip.compress(
+            b"".join(orjson.dumps(record.to_dict()) + b"\n" for record in batch),
+            compresslevel=6
+        )
+        if self._segment is None or self._segment_size + len(data) > self.segment_bytes:
+            self._rotate()
+        with open(self._segment, "ab") as f:
+            f.write(data)
+        self._segment_size += len(data)
+        self.written += len(batch)
+
+    def _rotate(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"llm-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{next(self._sequence):04d}"
+        self._segment = os.path.join(self.directory, name + SEGMENT_SUFFIX)
+        self._segment_size = 0
+        self.segments_created += 1
+
+    async def close(self) -> None:
+        """定期的な書き出しを止め、残りの記録を書き出す"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+            "segments_created": self.segments_created,
+            "segment": self._segment,
+        }
+
+
+class ArchiveReader:
+    """セグメントの記録を古い順に読む
+
+    セグメントはメモリマップして展開するため、ファイル全体を読み込まない。
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def segments(self) -> List[str]:
+        """セグメントのパス（作成順）"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(n for n in os.listdir(self.directory) if n.endswith(SEGMENT_SUFFIX))
+        return [os.path.join(self.directory, n) for n in names]
+
+    def records(
+        self,
+        call_site: Optional[str] = None,
+        outcome: Optional[str] = None
+    ) -> Iterator[ArchiveRecord]:
+        """記録を返す
+
+        Args:
+            call_site: 呼び出し箇所で絞り込む（前方一致）
+            outcome: 結果の種別で絞り込む
+        """
+        for path in self.segments():
+            for record in self._read_segment(path):
+                if call_site is not None and match_call_site(record.call_site, [call_site]) is None:
+                    continue
+                if outcome is not None and record.outcome != outcome:
+                    continue
+                yield record
+
+    def _read_segment(self, path: str) -> Iterator[ArchiveRecord]:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with gzip.GzipFile(fileobj=mapped, mode="rb") as stream:
+                    try:
+                        for line in stream:
+                            yield ArchiveRecord.from_dict(orjson.loads(line))
+                    except (EOFError, gzip.BadGzipFile, zlib.error, orjson.JSONDecodeError):
+                        # 書き出しの途中で止まった末尾
+                        return
+
+
+class ArchivingLLMClient(LLMClient):
+    """バックエンドの呼び出しとその応答をアーカイブに記録するLLMクライアント
+
+    構造化出力の呼び出しでは、バックエンドがJSONの解析・スキーマの検証の前に
+    報告した応答のテキスト（context.capture_raw_responses）を記録するため、
+    検証に失敗した応答もそのまま残る。トークン数はプロバイダーが報告した値を使い、
+    報告がない場合（ストリーミングなど）は文字種から概算する。
+    記録は呼び出しの完了後にバッファへ積むだけで、書き出しは待たない。
+    スケジューラーで包む場合は内側に置く（待ち時間を遅延に含めない）。
+    """
+
+    def __init__(self, backend: LLMClient, writer: ArchiveWriter):
+        self.backend = backend
+        self.writer = writer
+
+    def _record(
+        self,
+        method: str,
+        prompt: str,
+        system_prompt: Optional[str],
+        started: float,
+        capture: RawCapture,
+        response: Optional[str],
+        outcome: str,
+        error: Optional[BaseException] = None,
+        schema: Optional[type] = None,
+        n: int = 1
+    ) -> None:
+        estimated = capture.input_tokens is None
+        self.writer.append(ArchiveRecord(
+            ts=time.time(),
+            method=method,
+            call_site=current_call_site(),
+            prompt_hash=prompt_hash(prompt, system_prompt),
+            prompt=prompt,
+            system_prompt=system_prompt,
+            response=response,
+            outcome=outcome,
+            latency=round(time.monotonic() - started, 4),
+            input_tokens=(
+                estimate_tokens((system_prompt or "") + prompt) if estimated else capture.input_tokens
+            ),
+            output_tokens=estimate_tokens(response or "") if estimated else capture.output_tokens,
+            tokens_estimated=estimated,
+            error=f"{type(error).__name__}: {error}" if error is not None else None,
+            schema=schema.__name__ if schema is not None else None,
+            n=n,
+            priority=current_priority(),
+            tenant=current_tenant()
+        ))
+
+    @staticmethod
+    def _outcome(error: BaseException) -> str:
+        # json.JSONDecodeError / pydantic.ValidationError はいずれもValueError
+        if isinstance(error, ValueError) and not isinstance(error, ContextWindowExceededError):
+            return Outcome.PARSE_ERROR
+        return Outcome.ERROR
+
+    async def call(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None
+    ) -> str:
+        started = time.monotonic()
+        with capture_raw_responses() as capture:
+            try:
+                response = await self.backend.call(prompt=prompt, system_prompt=system_prompt)
+            except Exception as e:
+                self._record("call", prompt, system_prompt, started, capture, None, Outcome.ERROR, e)
+                raise
+        self._record("call", prompt, system_prompt, started, capture, response, Outcome.OK)
+        return response
+
+    async def call_structured(
+        self,
+        prompt: str,
+        schema: Type[T],
+        system_prompt: Optional[str] = None
+    ) -> T:
+        started = time.monotonic()
+        with capture_raw_responses() as capture:
+            try:
+                output = await self.backend.call_structured(prompt, schema, system_prompt)
+            except Exception as e:
+                # 解析・検証の前に報告された最後の応答が、失敗した応答
+                response = capture.texts[-1] if capture.texts else None
+                self._record(
+                    "call_structured", prompt, system_prompt, started, capture, response,
+                    self._outcome(e), e, schema
+                )
+                raise
+        # 応答を報告しないバックエンドでは検証済みのオブジェクトのJSONを残す
+        response = capture.texts[-1] if capture.texts else output.model_dump_json()
+        self._record(
+            "call_structured", prompt, system_prompt, started, capture, response,
+            Outcome.OK, schema=schema
+        )
+        return output
+
+    async def sample_structured(
+        self,
+        prompt: str,
+        schema: Type[T],
+        n: int,
+        system_prompt: Optional[str] = None
+    ) -> List[T]:
+        started = time.monotonic()
+        with capture_raw_responses() as capture:
+            try:
+                outputs = await self.backend.sample_structured(prompt, schema, n, system_prompt)
+            except Exception as e:
+                response = orjson.dumps(capture.texts).decode() if capture.texts else None
+                self._record(
+                    "sample_structured", prompt, system_prompt, started, capture, response,
+                    self._outcome(e), e, schema, n
+                )
+                raise
+        texts = capture.texts or [output.model_dump_json() for output in outputs]
+        self._record(
+            "sample_structured", prompt, system_prompt, started, capture,
+            orjson.dumps(texts).decode(), Outcome.OK, schema=schema, n=n
+        )
+        return outputs
+
+    async def stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        started = time.monotonic()
+        pieces: List[str] = []
+        outcome, error = Outcome.INCOMPLETE, None
+        try:
+            async for piece in self.backend.stream(prompt=prompt, system_prompt=system_prompt):
+                pieces.append(piece)
+                yield piece
+            outcome = Outcome.OK
+        except Exception as e:
+            outcome, error = Outcome.ERROR, e
+            raise
+        finally:
+            # ストリーミングの応答はトークン数を含まないため概算する
+            self._record(
+                "stream", prompt, system_prompt, started, RawCapture(), "".join(pieces), outcome, error
+            )
+
+    async def close(self) -> None:
+        await self.writer.close()
+        await self.backend.close()
+
+
+class ReplayMissError(LookupError):
+    """再生する記録が見つからない"""
+
+
+class ReplayLLMClient(LLMClient):
+    """アーカイブの応答を返すLLMクライアント（LLMを呼び出さない）
+
+    記録した実行をサービスにもう一度通し、パーサーやプロンプトの変更の影響を
+    オフラインで確かめるために使う。match で記録との照合方法を選ぶ。
+
+    - "prompt": システムプロンプトとプロンプトが同じ記録（ハッシュで照合）
+    - "call_site": 同じ呼び出し箇所の記録。プロンプトを変えた版に、記録した
+      応答を順に流す場合に使う
+
+    同じキーの記録は記録した順に返し、使い切ると先頭に戻る。検証に失敗した
+    記録も解析前の応答を返すため、現在のパーサーで同じように解析される。
+    応答のない記録（呼び出し自体の失敗）は使わない。見つからない場合は
+    fallback に渡すか、ReplayMissError を送出する。
+    """
+
+    MATCHES = ("prompt", "call_site")
+
+    def __init__(
+        self,
+        records: Iterable[ArchiveRecord],
+        match: str = "prompt",
+        fallback: Optional[LLMClient] = None
+    ):
+        if match not in self.MATCHES:
+            raise ValueError(f"Unknown replay match: {match}")
+        self.match = match
+        self.fallback = fallback
+        self._records: Dict[Optional[str], List[ArchiveRecord]] = {}
+        self._cursor: Dict[Optional[str], int] = {}
+        for record in records:
+            if record.outcome in (Outcome.OK, Outcome.PARSE_ERROR) and record.response is not None:
+                self._records.setdefault(self._key(record.prompt_hash, record.call_site), []).append(record)
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_directory(cls, directory: str, **kwargs: Any) -> "ReplayLLMClient":
+        """アーカイブのディレクトリの全記録から作成"""
+        return cls(ArchiveReader(directory).records(), **kwargs)
+
+    def _key(self, digest: str, site: Optional[str]) -> Optional[str]:
+        return digest if self.match == "prompt" else site
+
+    def _next(self, prompt: str, system_prompt: Optional[str]) -> Optional[ArchiveRecord]:
+        key = self._key(prompt_hash(prompt, system_prompt), current_call_site())
+        records = self._records.get(key)
+        if not records:
+            self.misses += 1
+            if self.fallback is None:
+                raise ReplayMissError(f"No archived response for call site {current_call_site()}")
+            return None
+        position = self._cursor.get(key, 0)
+        self._cursor[key] = position + 1
+        self.hits += 1
+        return records[position % len(records)]
+
+    async def call(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None
+    ) -> str:
+        record = self._next(prompt, system_prompt)
+        if record is None:
+            return await self.fallback.call(prompt=prompt, system_prompt=system_prompt)
+        return record.texts()[0]
+
+    async def call_structured(
+        self,
+        prompt: str,
+        schema: Type[T],
+        system_prompt: Optional[str] = None
+    ) -> T:
+        record = self._next(prompt, system_prompt)
+        if record is None:
+            return await self.fallback.call_structured(prompt, schema, system_prompt)
+        # テキストの応答もコードブロックなどを取り除いて検証する
+        return parse_structured(record.texts()[0], schema)
+
+    async def sample_structured(
+        self,
+        prompt: str,
+        schema: Type[T],
+        n: int,
+        system_prompt: Optional[str] = None
+    ) -> List[T]:
+        record = self._next(prompt, system_prompt)
+        if record is None:
+            return await self.fallback.sample_structured(prompt, schema, n, system_prompt)
+        texts = record.texts()
+        return [parse_structured(text, schema) for text in itertools.islice(itertools.cycle(texts), n)]
+
+    async def close(self) -> None:
+        if self.fallback is not None:
+            await self.fallback.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def summarize(records: Iterable[ArchiveRecord]) -> Dict[Optional[str], Dict[str, Any]]:
+    """呼び出し箇所ごとの件数・結果の内訳・トークン数（概算）・遅延（秒）"""
+    groups: Dict[Optional[str], List[ArchiveRecord]] = {}
+    for record in records:
+        groups.setdefault(record.call_site, []).append(record)
+
+    summary = {}
+    for site, group in groups.items():
+        latencies = sorted(record.latency for record in group)
+        outcomes: Dict[str, int] = {}
+        for record in group:
+            outcomes[record.outcome] = outcomes.get(record.outcome, 0) + 1
+        summary[site] = {
+            "calls": len(group),
+            "outcomes": outcomes,
+            "input_tokens": sum(record.input_tokens for record in group),
+            "output_tokens": sum(record.output_tokens for record in group),
+            "latency_p50": latencies[int(0.5 * (len(latencies) - 1))],
+            "latency_p95": latencies[int(0.95 * (len(latencies) - 1))],
+        }
+    return summary
+
+
+def reparse(record: ArchiveRecord, schema: Optional[Type[T]] = None) -> Optional[str]:
+    """記録した応答を現在の出力スキーマで検証し直した結果（OK / PARSE_ERROR）
+
+    schema を省略すると記録したスキーマ名（app.schemas.llm_output）を使う。
+    応答がない、またはスキーマが分からない記録はNone。
+    """
+    if schema is None and record.schema is not None:
+        from app.schemas import llm_output
+        schema = getattr(llm_output, record.schema, None)
+    if schema is None or record.response is None:
+        return None
+    try:
+        for text in record.texts():
+            parse_structured(text, schema)
+    except ValueError:
+        return Outcome.PARSE_ERROR
+    return Outcome.OK
+
+
+def archive_enabled() -> bool:
+    """共有クライアントの呼び出しをアーカイブに記録するか（LLM_ARCHIVE）"""
+    return os.getenv("LLM_ARCHIVE", "false").lower() == "true"
+
+
+def archive_directory() -> str:
+    return os.getenv("LLM_ARCHIVE_DIR", "./llm-archive")
+
+
+def create_archive_writer() -> ArchiveWriter:
+    """環境変数の設定からアーカイブの書き出しを作成（ディレクトリは最初の書き出しで作る）"""
+    return ArchiveWriter(
+        directory=archive_directory(),
+        segment_bytes=int(float(os.getenv("LLM_ARCHIVE_SEGMENT_MB", "64")) * 1024 * 1024),
+        flush_interval=float(os.getenv("LLM_ARCHIVE_FLUSH_SECONDS", "1.0")),
+        max_buffer=int(os.getenv("LLM_ARCHIVE_BUFFER", "10000"))
+    )
+
+
+# アプリケーション全体で共有するインスタンス
+llm_archive = create_archive_writer()
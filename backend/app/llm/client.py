@@ -1,8 +1,63 @@
 """LLM client implementations."""
 
-from typing import Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Type
 from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from enum import Enum
+import asyncio
+import importlib
+import json
 import os
+import time
+from app.llm.context import current_call_site, report_raw_response, report_usage
+from app.llm.prompts import ContinuationPrompt
+from app.llm.structured import T, parse_structured, response_format, tool_definition
+from app.llm.tokens import MAX_CONTINUATIONS, TruncatedResponseError, plan_budget
+
+
+def _openai_usage(response: Any) -> Tuple[Optional[int], Optional[int]]:
+    """Chat Completionsの応答が報告した (入力, 出力) のトークン数"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None, None
+    return usage.prompt_tokens, usage.completion_tokens
+
+
+# 400エラーのうち、構造化出力のパラメーターに対応していないことを示す文言
+_UNSUPPORTED_MARKERS = (
+    "not supported", "unsupported", "does not support", "not available",
+    "extra inputs are not permitted", "unrecognized", "unknown parameter",
+)
+
+
+def _structured_output_unsupported(error: Exception, *params: str) -> bool:
+    """400エラーの原因が構造化出力のパラメーター（params）に対応していないことか
+
+    それ以外の400（入力が長すぎる、メッセージが不正など）はテキストに切り替えても
+    解決しないため、呼び出し側に送出する。
+    """
+    message = str(getattr(error, "message", None) or error).lower()
+    mentioned = getattr(error, "param", None) in params or any(param in message for param in params)
+    return mentioned and any(marker in message for marker in _UNSUPPORTED_MARKERS)
+
+
+class RefusalError(ValueError):
+    """モデルが応答を拒否した（または内容のない応答を返した）"""
+
+
+def _message_content(choice: Any) -> str:
+    """Chat Completionsの候補の本文（拒否・内容なしの場合はRefusalError）"""
+    refusal = getattr(choice.message, "refusal", None)
+    if refusal:
+        raise RefusalError(f"Model refused to respond: {refusal}")
+    if choice.message.content is None:
+        raise RefusalError(f"Model returned no content (finish_reason={choice.finish_reason})")
+    return choice.message.content
+
+
+def structured_output_enabled() -> bool:
+    """プロバイダーのネイティブな構造化出力を使うか（LLM_STRUCTURED_OUTPUT）"""
+    return os.getenv("LLM_STRUCTURED_OUTPUT", "true").lower() == "true"
 
 
 class LLMClient(ABC):
@@ -17,18 +72,121 @@ class LLMClient(ABC):
         """LLM APIを呼び出す"""
         pass
 
+    async def call_structured(
+        self,
+        prompt: str,
+        schema: Type[T],
+        system_prompt: Optional[str] = None
+    ) -> T:
+        """出力スキーマ（Pydanticモデル）に沿った応答を検証済みのオブジェクトで返す
+
+        既定の実装はテキストで呼び出し、応答からJSONを取り出して検証する。
+        プロバイダーの構造化出力に対応するクライアントはこれを上書きし、
+        非対応のモデルではこの実装にフォールバックする。
+
+        Raises:
+            ValueError: 応答がスキーマに合わない場合
+        """
+        response = await self.call(prompt=prompt, system_prompt=system_prompt)
+        report_raw_response(response)
+        return parse_structured(response, schema)
+
+    async def sample_structured(
+        self,
+        prompt: str,
+        schema: Type[T],
+        n: int,
+        system_prompt: Optional[str] = None
+    ) -> List[T]:
+        """同じプロンプトから独立にn件の応答を生成し、検証済みのオブジェクトで返す
+
+        既定の実装はcall_structuredをn回並行して呼び出す。1回のリクエストで
+        複数の候補を生成できるプロバイダー（OpenAIのn）のクライアントはこれを上書きする。
+
+        Raises:
+            ValueError: 応答がスキーマに合わない場合
+        """
+        return list(await asyncio.gather(*[
+            self.call_structured(prompt, schema, system_prompt) for _ in range(n)
+        ]))
+
+    async def stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """応答テキストを生成された順に断片で返す
+
+        既定の実装は応答全体を1つの断片として返す。ストリーミングに対応する
+        クライアントはこれを上書きする。出力が上限で途切れても続きは生成しない
+        （呼び出し側は届いた分だけを使う）。
+        """
+        yield await self.call(prompt=prompt, system_prompt=system_prompt)
+
+    async def close(self) -> None:
+        """接続プールなどのリソースを解放する"""
+
+
+async def generate_with_continuation(
+    model: str,
+    prompt: str,
+    system_prompt: Optional[str],
+    complete: Callable[[str, int], Awaitable[Tuple[str, bool]]]
+) -> str:
+    """出力が上限で途切れた場合に続きを生成して連結する
+
+    max_tokensは呼び出し箇所の予算とコンテキストウィンドウの残りから毎回決める。
+
+    Args:
+        model: モデル名
+        prompt: プロンプト
+        system_prompt: システムプロンプト
+        complete: (これまでの出力, max_tokens) を受け取り、(出力全体, 途切れたか) を返す関数
+
+    Raises:
+        ContextWindowExceededError: プロンプトがコンテキストウィンドウに収まらない場合
+        TruncatedResponseError: 続きの生成を繰り返しても途切れる場合
+    """
+    site = current_call_site()
+    output = ""
+    for _ in range(MAX_CONTINUATIONS + 1):
+        budget = plan_budget(model, site, system_prompt, prompt, output)
+        output, truncated = await complete(output, budget.max_tokens)
+        if not truncated:
+            return output
+    raise TruncatedResponseError(
+        f"Response for {site or 'unknown call site'} was still truncated "
+        f"after {MAX_CONTINUATIONS} continuations"
+    )
+
 
 class OpenAIClient(LLMClient):
     """OpenAI APIクライアント"""
 
-    def __init__(self, api_key: str, model: str = "gpt-4"):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4",
+        base_url: Optional[str] = None,
+        http_client: Optional[Any] = None,
+        structured_output: Optional[bool] = None
+    ):
         try:
             from openai import AsyncOpenAI
         except ImportError:
             raise ImportError("openai package is required. Install with: pip install openai")
 
-        self.client = AsyncOpenAI(api_key=api_key)
+        # base_url / http_client を指定するとローカルの代替サーバーに接続できる
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=http_client
+        )
         self.model = model
+        # ネイティブの構造化出力を使うか（非対応のモデルと分かった時点でFalseにする）
+        self.structured_output = (
+            structured_output_enabled() if structured_output is None else structured_output
+        )
 
     async def call(
         self,
@@ -48,58 +206,585 @@ class OpenAIClient(LLMClient):
             "content": prompt
         })
 
+        async def complete(output: str, max_tokens: int) -> Tuple[str, bool]:
+            continuation = [
+                {"role": "assistant", "content": output},
+                {"role": "user", "content": ContinuationPrompt.USER_PROMPT}
+            ] if output else []
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages + continuation,
+                temperature=0.7,
+                max_tokens=max_tokens
+            )
+            choice = response.choices[0]
+            report_usage(*_openai_usage(response))
+            return output + (choice.message.content or ""), choice.finish_reason == "length"
+
+        return await generate_with_continuation(self.model, prompt, system_prompt, complete)
+
+    async def stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        budget = plan_budget(self.model, current_call_site(), system_prompt, prompt)
+
         response = await self.client.chat.completions.create(
             model=self.model,
             messages=messages,
             temperature=0.7,
-            max_tokens=2000
+            max_tokens=budget.max_tokens,
+            stream=True
         )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
-        return response.choices[0].message.content
+    async def call_structured(
+        self,
+        prompt: str,
+        schema: Type[T],
+        system_prompt: Optional[str] = None
+    ) -> T:
+        """response_format（json_schema、strict）で出力をスキーマに制約する"""
+        if not self.structured_output:
+            return await super().call_structured(prompt, schema, system_prompt)
+
+        from openai import BadRequestError
+
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        budget = plan_budget(self.model, current_call_site(), system_prompt, prompt)
+
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=budget.max_tokens,
+                response_format=response_format(schema)
+            )
+        except BadRequestError as e:
+            if not _structured_output_unsupported(e, "response_format", "json_schema"):
+                raise
+            # json_schemaに対応していないモデル。以降はテキストで呼び出す
+            self.structured_output = False
+            return await super().call_structured(prompt, schema, system_prompt)
+
+        report_usage(*_openai_usage(response))
+        choice = response.choices[0]
+        if choice.finish_reason == "length":
+            # 途中で切れたJSONは続きを生成できるテキストで取り直す
+            return await super().call_structured(prompt, schema, system_prompt)
+        content = _message_content(choice)
+        report_raw_response(content)
+        return schema.model_validate_json(content)
+
+    async def sample_structured(
+        self,
+        prompt: str,
+        schema: Type[T],
+        n: int,
+        system_prompt: Optional[str] = None
+    ) -> List[T]:
+        """1回のリクエストでn件の候補（choices）を生成する
+
+        プロンプトの入力トークンは1回分の課金で済む。途中で切れた候補は
+        call_structuredで個別に取り直す。
+        """
+        if n == 1:
+            return [await self.call_structured(prompt, schema, system_prompt)]
+
+        from openai import BadRequestError
+
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        budget = plan_budget(self.model, current_call_site(), system_prompt, prompt)
+        structured = self.structured_output
+        options = {"response_format": response_format(schema)} if structured else {}
+
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=budget.max_tokens,
+                n=n,
+                **options
+            )
+        except BadRequestError as e:
+            if not structured or not _structured_output_unsupported(e, "response_format", "json_schema"):
+                raise
+            # json_schemaに対応していないモデル。以降はテキストで呼び出す
+            self.structured_output = False
+            return await self.sample_structured(prompt, schema, n, system_prompt)
+
+        report_usage(*_openai_usage(response))
+
+        async def parse(choice: Any) -> T:
+            if choice.finish_reason == "length":
+                return await self.call_structured(prompt, schema, system_prompt)
+            content = _message_content(choice)
+            report_raw_response(content)
+            if structured:
+                return schema.model_validate_json(content)
+            return parse_structured(content, schema)
+
+        return list(await asyncio.gather(*[parse(choice) for choice in response.choices]))
+
+    async def close(self) -> None:
+        await self.client.close()
 
 
 class ClaudeClient(LLMClient):
     """Anthropic Claude APIクライアント"""
 
-    def __init__(self, api_key: str, model: str = "claude-3-opus-20240229"):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "claude-3-opus-20240229",
+        base_url: Optional[str] = None,
+        http_client: Optional[Any] = None,
+        structured_output: Optional[bool] = None
+    ):
         try:
             from anthropic import AsyncAnthropic
         except ImportError:
             raise ImportError("anthropic package is required. Install with: pip install anthropic")
 
-        self.client = AsyncAnthropic(api_key=api_key)
+        # base_url / http_client を指定するとローカルの代替サーバーに接続できる
+        self.client = AsyncAnthropic(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=http_client
+        )
         self.model = model
+        # ネイティブの構造化出力を使うか（非対応のモデルと分かった時点でFalseにする）
+        self.structured_output = (
+            structured_output_enabled() if structured_output is None else structured_output
+        )
 
     async def call(
         self,
         prompt: str,
         system_prompt: Optional[str] = None
     ) -> str:
-        message = await self.client.messages.create(
-            model=self.model,
-            max_tokens=2000,
-            system=system_prompt or "",
-            messages=[
+        async def complete(output: str, max_tokens: int) -> Tuple[str, bool]:
+            messages = [
                 {
                     "role": "user",
                     "content": prompt
                 }
             ]
+            # 途切れた出力をアシスタントの応答の冒頭として渡し、続きを生成させる
+            # （末尾の空白で終わる冒頭は受け付けられないため取り除く）
+            output = output.rstrip()
+            if output:
+                messages.append({"role": "assistant", "content": output})
+            message = await self.client.messages.create(
+                model=self.model,
+                max_tokens=max_tokens,
+                system=system_prompt or "",
+                messages=messages
+            )
+            report_usage(message.usage.input_tokens, message.usage.output_tokens)
+            return output + message.content[0].text, message.stop_reason == "max_tokens"
+
+        return await generate_with_continuation(self.model, prompt, system_prompt, complete)
+
+    async def stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        budget = plan_budget(self.model, current_call_site(), system_prompt, prompt)
+        response = await self.client.messages.create(
+            model=self.model,
+            max_tokens=budget.max_tokens,
+            system=system_prompt or "",
+            messages=[{"role": "user", "content": prompt}],
+            stream=True
+        )
+        async for event in response:
+            if event.type == "content_block_delta":
+                yield event.delta.text
+
+    async def call_structured(
+        self,
+        prompt: str,
+        schema: Type[T],
+        system_prompt: Optional[str] = None
+    ) -> T:
+        """出力スキーマを入力とするツールの使用を強制し、その入力を出力として受け取る"""
+        if not self.structured_output:
+            return await super().call_structured(prompt, schema, system_prompt)
+
+        from anthropic import BadRequestError
+
+        tool = tool_definition(schema)
+        budget = plan_budget(self.model, current_call_site(), system_prompt, prompt)
+
+        try:
+            # 使用しているSDKのバージョンはtoolsを引数に持たないため、リクエスト本文で渡し、
+            # tool_useのブロックを含む応答はJSONのまま受け取る
+            message = await self.client.post("/v1/messages", cast_to=object, body={
+                "model": self.model,
+                "max_tokens": budget.max_tokens,
+                "system": system_prompt or "",
+                "messages": [{"role": "user", "content": prompt}],
+                "tools": [tool],
+                "tool_choice": {"type": "tool", "name": tool["name"]}
+            })
+        except BadRequestError as e:
+            if not _structured_output_unsupported(e, "tools", "tool_choice", "tool use"):
+                raise
+            # ツールの使用に対応していないモデル。以降はテキストで呼び出す
+            self.structured_output = False
+            return await super().call_structured(prompt, schema, system_prompt)
+
+        usage = message.get("usage") or {}
+        report_usage(usage.get("input_tokens"), usage.get("output_tokens"))
+        for block in message["content"]:
+            if block["type"] == "tool_use" and message["stop_reason"] != "max_tokens":
+                report_raw_response(json.dumps(block["input"], ensure_ascii=False))
+                return schema.model_validate(block["input"])
+        # 途中で切れた場合は続きを生成できるテキストで取り直す
+        return await super().call_structured(prompt, schema, system_prompt)
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+class BatchStatus(str, Enum):
+    """バッチジョブの状態"""
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+@dataclass(slots=True)
+class BatchRequest:
+    """バッチに含める1件のリクエスト"""
+    custom_id: str
+    prompt: str
+    system_prompt: Optional[str] = None
+    # max_tokensを決める呼び出し箇所（CallSite）
+    call_site: Optional[str] = None
+
+
+@dataclass
+class BatchJob:
+    """プロバイダー側のバッチジョブ"""
+    batch_id: str
+    status: BatchStatus
+    request_count: int = 0
+    output_location: Optional[str] = None
+
+
+@dataclass
+class BatchResults:
+    """バッチの実行結果（custom_idごとの応答テキストとエラー）"""
+    outputs: Dict[str, str] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+
+class LLMBatchClient(ABC):
+    """LLMバッチAPIクライアントの抽象基底クラス
+
+    大量のプロンプトをまとめて投入し、後から結果を回収する。
+    対話的な応答時間が不要な夜間の一括評価などで使用する。
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        transport: Optional[Any] = None
+    ):
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("httpx package is required. Install with: pip install httpx")
+
+        # transportを差し替えることで、テスト時はローカルの代替サーバーを使用できる
+        self.http = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            transport=transport,
+            timeout=60.0
+        )
+
+    @abstractmethod
+    async def submit(self, requests: List[BatchRequest]) -> BatchJob:
+        """バッチを投入する"""
+        pass
+
+    @abstractmethod
+    async def retrieve(self, batch_id: str) -> BatchJob:
+        """バッチの状態を取得する"""
+        pass
+
+    @abstractmethod
+    async def results(self, job: BatchJob) -> BatchResults:
+        """完了したバッチの結果を取得する"""
+        pass
+
+    async def wait(
+        self,
+        batch_id: str,
+        poll_interval: float = 60.0,
+        timeout: Optional[float] = None
+    ) -> BatchJob:
+        """バッチの完了（または失敗）まで待機する"""
+        started = time.monotonic()
+        while True:
+            job = await self.retrieve(batch_id)
+            if job.status != BatchStatus.IN_PROGRESS:
+                return job
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError(f"Batch {batch_id} did not finish within {timeout}s")
+            await asyncio.sleep(poll_interval)
+
+    async def close(self) -> None:
+        """HTTPクライアントを閉じる"""
+        await self.http.aclose()
+
+    @staticmethod
+    def _parse_jsonl(content: str) -> List[Dict]:
+        """JSONL形式のテキストを解析"""
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+class OpenAIBatchClient(LLMBatchClient):
+    """OpenAI Batch APIクライアント
+
+    リクエストをJSONLファイルとしてアップロードし、/v1/chat/completions
+    向けのバッチを作成する。結果は出力ファイルから取得する。
+    """
+
+    STATUS_MAPPING = {
+        "validating": BatchStatus.IN_PROGRESS,
+        "in_progress": BatchStatus.IN_PROGRESS,
+        "finalizing": BatchStatus.IN_PROGRESS,
+        "cancelling": BatchStatus.IN_PROGRESS,
+        "completed": BatchStatus.COMPLETED,
+        "failed": BatchStatus.FAILED,
+        "expired": BatchStatus.FAILED,
+        "cancelled": BatchStatus.FAILED,
+    }
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4",
+        base_url: str = "https://api.openai.com/v1",
+        transport: Optional[Any] = None
+    ):
+        super().__init__(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            transport=transport
+        )
+        self.model = model
+
+    def _build_line(self, request: BatchRequest) -> Dict:
+        """1リクエスト分のJSONL行を生成"""
+        messages = []
+        if request.system_prompt:
+            messages.append({"role": "system", "content": request.system_prompt})
+        messages.append({"role": "user", "content": request.prompt})
+        budget = plan_budget(self.model, request.call_site, request.system_prompt, request.prompt)
+
+        return {
+            "custom_id": request.custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": self.model,
+                "messages": messages,
+                "temperature": 0.7,
+                "max_tokens": budget.max_tokens
+            }
+        }
+
+    def _to_job(self, data: Dict) -> BatchJob:
+        return BatchJob(
+            batch_id=data["id"],
+            status=self.STATUS_MAPPING.get(data["status"], BatchStatus.IN_PROGRESS),
+            request_count=(data.get("request_counts") or {}).get("total", 0),
+            output_location=data.get("output_file_id")
+        )
+
+    async def submit(self, requests: List[BatchRequest]) -> BatchJob:
+        content = "\n".join(
+            json.dumps(self._build_line(r), ensure_ascii=False) for r in requests
         )
 
-        return message.content[0].text
+        upload = await self.http.post(
+            "/files",
+            data={"purpose": "batch"},
+            files={"file": ("batch.jsonl", content.encode("utf-8"), "application/jsonl")}
+        )
+        upload.raise_for_status()
+
+        response = await self.http.post("/batches", json={
+            "input_file_id": upload.json()["id"],
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h"
+        })
+        response.raise_for_status()
+        return self._to_job(response.json())
+
+    async def retrieve(self, batch_id: str) -> BatchJob:
+        response = await self.http.get(f"/batches/{batch_id}")
+        response.raise_for_status()
+        return self._to_job(response.json())
+
+    async def results(self, job: BatchJob) -> BatchResults:
+        results = BatchResults()
+        if not job.output_location:
+            return results
+
+        response = await self.http.get(f"/files/{job.output_location}/content")
+        response.raise_for_status()
+
+        for line in self._parse_jsonl(response.text):
+            body = (line.get("response") or {}).get("body") or {}
+            if line.get("error") or "choices" not in body:
+                results.errors[line["custom_id"]] = json.dumps(
+                    line.get("error") or body, ensure_ascii=False
+                )
+            elif body["choices"][0].get("finish_reason") == "length":
+                # バッチでは続きを生成できないため、途切れた出力は失敗として扱う
+                results.errors[line["custom_id"]] = "Response truncated at max_tokens"
+            else:
+                results.outputs[line["custom_id"]] = body["choices"][0]["message"]["content"]
+
+        return results
+
+
+class ClaudeBatchClient(LLMBatchClient):
+    """Anthropic Message Batches APIクライアント
+
+    リクエストをJSONで一括投入し、結果はresults_urlのJSONLから取得する。
+    """
+
+    STATUS_MAPPING = {
+        "in_progress": BatchStatus.IN_PROGRESS,
+        "canceling": BatchStatus.IN_PROGRESS,
+        "ended": BatchStatus.COMPLETED,
+    }
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "claude-3-opus-20240229",
+        base_url: str = "https://api.anthropic.com",
+        transport: Optional[Any] = None
+    ):
+        super().__init__(
+            base_url=base_url,
+            headers={
+                "x-api-key": api_key,
+                "anthropic-version": "2023-06-01"
+            },
+            transport=transport
+        )
+        self.model = model
+
+    def _build_request(self, request: BatchRequest) -> Dict:
+        """1リクエスト分のパラメータを生成"""
+        budget = plan_budget(self.model, request.call_site, request.system_prompt, request.prompt)
+        return {
+            "custom_id": request.custom_id,
+            "params": {
+                "model": self.model,
+                "max_tokens": budget.max_tokens,
+                "system": request.system_prompt or "",
+                "messages": [
+                    {
+                        "role": "user",
+                        "content": request.prompt
+                    }
+                ]
+            }
+        }
+
+    def _to_job(self, data: Dict) -> BatchJob:
+        counts = data.get("request_counts") or {}
+        return BatchJob(
+            batch_id=data["id"],
+            status=self.STATUS_MAPPING.get(
+                data["processing_status"], BatchStatus.IN_PROGRESS
+            ),
+            request_count=sum(counts.values()),
+            output_location=data.get("results_url")
+        )
+
+    async def submit(self, requests: List[BatchRequest]) -> BatchJob:
+        response = await self.http.post("/v1/messages/batches", json={
+            "requests": [self._build_request(r) for r in requests]
+        })
+        response.raise_for_status()
+        return self._to_job(response.json())
+
+    async def retrieve(self, batch_id: str) -> BatchJob:
+        response = await self.http.get(f"/v1/messages/batches/{batch_id}")
+        response.raise_for_status()
+        return self._to_job(response.json())
+
+    async def results(self, job: BatchJob) -> BatchResults:
+        results = BatchResults()
+        if not job.output_location:
+            return results
+
+        response = await self.http.get(job.output_location)
+        response.raise_for_status()
+
+        for line in self._parse_jsonl(response.text):
+            result = line.get("result") or {}
+            if result.get("type") == "succeeded" and result["message"].get("stop_reason") == "max_tokens":
+                results.errors[line["custom_id"]] = "Response truncated at max_tokens"
+            elif result.get("type") == "succeeded":
+                results.outputs[line["custom_id"]] = result["message"]["content"][0]["text"]
+            else:
+                results.errors[line["custom_id"]] = json.dumps(result, ensure_ascii=False)
+
+        return results
 
 
 class LLMClientFactory:
     """LLMクライアントのファクトリー"""
 
+    DEFAULT_MODELS = {
+        "openai": "gpt-4",
+        "claude": "claude-3-opus-20240229",
+    }
+
     @staticmethod
     def create(
         provider: Optional[str] = None,
         api_key: Optional[str] = None,
         model: Optional[str] = None
     ) -> LLMClient:
-        """プロバイダーに応じたクライアントを生成"""
+        """プロバイダーに応じたクライアントを生成
+
+        プロバイダーが明示されず、環境変数 LLM_ROUTES が設定されている場合は
+        呼び出し箇所ごとにバックエンドを振り分けるルーティングクライアントを返す。
+        """
+        routes = os.getenv("LLM_ROUTES")
+        if provider is None and routes:
+            return LLMClientFactory.create_routing(routes)
+
         # 環境変数から取得
         provider = provider or os.getenv("LLM_PROVIDER", "openai")
 
@@ -115,5 +800,155 @@ class LLMClientFactory:
             if not api_key:
                 raise ValueError("ANTHROPIC_API_KEY is required")
             return ClaudeClient(api_key, model)
+        elif provider == "fake":
+            from app.llm.fake import FakeLLMClient
+            return FakeLLMClient()
+        elif provider == "replay":
+            # アーカイブの応答を再生する（LLMを呼び出さない）
+            from app.llm.archive import ReplayLLMClient, archive_directory
+            return ReplayLLMClient.from_directory(
+                os.getenv("LLM_REPLAY_DIR") or archive_directory(),
+                match=os.getenv("LLM_REPLAY_MATCH", "prompt")
+            )
         else:
             raise ValueError(f"Unknown provider: {provider}")
+
+    @staticmethod
+    def create_routing(routes: str) -> LLMClient:
+        """ルーティング設定からルーティングクライアントを生成
+
+        設定は "呼び出し箇所=プロバイダー:モデル,プロバイダー:モデル;..." の形式。
+        例: "risk_identification=claude:claude-3-opus-20240229,openai:gpt-4;
+        risk_evaluation=openai:gpt-3.5-turbo"
+        ルートにないステップは LLM_PROVIDER / LLM_MODEL のバックエンドを使用する。
+        """
+        from app.llm.routing import RoutingLLMClient
+
+        backends: Dict[str, LLMClient] = {}
+
+        def backend(spec: str) -> LLMClient:
+            spec = spec.strip()
+            if spec not in backends:
+                provider, _, model = spec.partition(":")
+                # モデル未指定時はプロバイダー既定のモデル（LLM_MODELは使わない）
+                backends[spec] = LLMClientFactory.create(
+                    provider,
+                    model=model or LLMClientFactory.DEFAULT_MODELS.get(provider)
+                )
+            return backends[spec]
+
+        parsed: Dict[str, List[LLMClient]] = {}
+        for entry in routes.split(";"):
+            if not entry.strip():
+                continue
+            site, _, specs = entry.partition("=")
+            if not specs:
+                raise ValueError(f"Invalid LLM_ROUTES entry: {entry}")
+            parsed[site.strip()] = [backend(spec) for spec in specs.split(",")]
+
+        default = LLMClientFactory.create(os.getenv("LLM_PROVIDER", "openai"))
+
+        return RoutingLLMClient(
+            routes=parsed,
+            default=[default],
+            hedge=os.getenv("LLM_HEDGE", "true").lower() == "true",
+            hedge_delay=float(os.getenv("LLM_HEDGE_DELAY", "5.0"))
+        )
+
+    @staticmethod
+    def create_batch(
+        provider: Optional[str] = None,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        base_url: Optional[str] = None,
+        transport: Optional[Any] = None
+    ) -> LLMBatchClient:
+        """プロバイダーに応じたバッチクライアントを生成"""
+        provider = provider or os.getenv("LLM_PROVIDER", "openai")
+
+        if provider == "openai":
+            api_key = api_key or os.getenv("OPENAI_API_KEY")
+            model = model or os.getenv("LLM_MODEL", "gpt-4")
+            base_url = base_url or os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+            if not api_key:
+                raise ValueError("OPENAI_API_KEY is required")
+            return OpenAIBatchClient(api_key, model, base_url, transport)
+        elif provider == "claude":
+            api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+            model = model or os.getenv("LLM_MODEL", "claude-3-opus-20240229")
+            base_url = base_url or os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com")
+            if not api_key:
+                raise ValueError("ANTHROPIC_API_KEY is required")
+            return ClaudeBatchClient(api_key, model, base_url, transport)
+        else:
+            raise ValueError(f"Unknown provider: {provider}")
+
+
+# プロバイダーごとのSDKのモジュール
+SDK_MODULES = {
+    "openai": "openai",
+    "claude": "anthropic",
+}
+
+
+def configured_providers() -> List[str]:
+    """LLM_PROVIDER / LLM_ROUTES で使用するプロバイダー"""
+    providers = [os.getenv("LLM_PROVIDER", "openai")]
+    for entry in os.getenv("LLM_ROUTES", "").split(";"):
+        _, _, specs = entry.partition("=")
+        for spec in specs.split(","):
+            provider = spec.strip().partition(":")[0]
+            if provider and provider not in providers:
+                providers.append(provider)
+    return providers
+
+
+def preload_sdks(providers: List[str]) -> List[str]:
+    """プロバイダーのSDKを読み込む（起動時に1回だけ。最初のリクエストで読み込まないようにする）
+
+    Returns:
+        読み込んだモジュール名のリスト（未インストールのものは含まない）
+    """
+    loaded = []
+    for provider in providers:
+        module = SDK_MODULES.get(provider)
+        if module is None:
+            continue
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            continue
+        loaded.append(module)
+    return loaded
+
+
+_shared_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    """Get LLM client (FastAPI dependency).
+
+    SDKのクライアント（と接続プール）はリクエストごとに作らず、プロセス内で共有する。
+    LLM_ARCHIVE が有効な場合、呼び出しと応答をアーカイブに記録する。
+    LLM_SCHEDULER が有効な場合、呼び出しは優先度に応じたスケジューラーを通る。
+    """
+    global _shared_client
+    if _shared_client is None:
+        from app.llm.archive import ArchivingLLMClient, archive_enabled, llm_archive
+        from app.llm.scheduler import SchedulingLLMClient, llm_scheduler, scheduler_enabled
+
+        client = LLMClientFactory.create()
+        if archive_enabled():
+            client = ArchivingLLMClient(client, llm_archive)
+        if scheduler_enabled():
+            client = SchedulingLLMClient(client, llm_scheduler)
+        _shared_client = client
+    return _shared_client
+
+
+async def close_llm_client() -> None:
+    """共有クライアントを閉じる（シャットダウン時）"""
+    global _shared_client
+    client, _shared_client = _shared_client, None
+    if client is not None:
+        await client.close()
@@ -0,0 +1,140 @@
+"""LLM call context."""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+
+
+class CallSite:
+    """LLM呼び出し箇所の識別子
+
+    ドット区切りの階層構造を持ち、前方一致でまとめて扱える
+    （例: "risk_evaluation" は3軸すべての評価に一致する）。
+    """
+    RISK_IDENTIFICATION = "risk_identification"
+    SEVERITY = "risk_evaluation.severity"
+    FREQUENCY = "risk_evaluation.frequency"
+    AVOIDABILITY = "risk_evaluation.avoidability"
+    COUNTERMEASURES = "countermeasure_generation"
+    COUNTERMEASURES_FROM_META = "countermeasure_generation.from_meta"
+    META_FREQUENCY = "meta_countermeasure_generation.frequency"
+    META_AVOIDABILITY = "meta_countermeasure_generation.avoidability"
+    META_SEVERITY = "meta_countermeasure_generation.severity"
+
+
+class Priority:
+    """LLM呼び出しの優先度クラス（スケジューラーの待ち行列）
+
+    INTERACTIVE: 画面操作からの呼び出し（待ち行列の先頭に割り込む）
+    BATCH: ポートフォリオ全体の再実行など、利用者が結果を待っていない処理
+    BACKFILL: 過去データの補完など、空いている容量だけを使う処理
+    """
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+    BACKFILL = "backfill"
+
+    ALL = (INTERACTIVE, BATCH, BACKFILL)
+
+
+_call_site: ContextVar[Optional[str]] = ContextVar("llm_call_site", default=None)
+_priority: ContextVar[str] = ContextVar("llm_priority", default=Priority.INTERACTIVE)
+_tenant: ContextVar[Optional[str]] = ContextVar("llm_tenant", default=None)
+_raw_capture: ContextVar[Optional["RawCapture"]] = ContextVar("llm_raw_capture", default=None)
+
+
+@contextmanager
+def call_site(name: str) -> Iterator[None]:
+    """ブロック内のLLM呼び出しに呼び出し箇所を設定する"""
+    token = _call_site.set(name)
+    try:
+        yield
+    finally:
+        _call_site.reset(token)
+
+
+def current_call_site() -> Optional[str]:
+    """現在の呼び出し箇所を取得"""
+    return _call_site.get()
+
+
+def match_call_site(site: Optional[str], candidates) -> Optional[str]:
+    """呼び出し箇所に最も長く前方一致する候補を返す"""
+    if site is None:
+        return None
+    best = None
+    for candidate in candidates:
+        if site == candidate or site.startswith(candidate + "."):
+            if best is None or len(candidate) > len(best):
+                best = candidate
+    return best
+
+
+@contextmanager
+def scheduling(priority: Optional[str] = None, tenant: Optional[str] = None) -> Iterator[None]:
+    """ブロック内のLLM呼び出しに優先度クラスとテナント（クォータの単位）を設定する
+
+    Noneの項目は外側の設定を引き継ぐ。
+    """
+    if priority is not None and priority not in Priority.ALL:
+        raise ValueError(f"Unknown priority: {priority}")
+    tokens = []
+    if priority is not None:
+        tokens.append((_priority, _priority.set(priority)))
+    if tenant is not None:
+        tokens.append((_tenant, _tenant.set(tenant)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def current_priority() -> str:
+    """現在の優先度クラスを取得（既定はINTERACTIVE）"""
+    return _priority.get()
+
+
+def current_tenant() -> Optional[str]:
+    """現在のテナントを取得"""
+    return _tenant.get()
+
+
+@dataclass
+class RawCapture:
+    """呼び出しが受け取った解析前の応答と、プロバイダーが報告したトークン数"""
+    texts: List[str] = field(default_factory=list)
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+
+
+@contextmanager
+def capture_raw_responses() -> Iterator[RawCapture]:
+    """ブロック内のLLM呼び出しが受け取った解析前の応答とトークン数を集める
+
+    クライアントはJSONの解析・スキーマの検証の直前に report_raw_response で
+    応答のテキストを、SDKの応答を受け取るたびに report_usage でトークン数を
+    報告する（検証に失敗した応答も残る）。ブロック内で作成したタスクの呼び出しも集まる。
+    """
+    capture = RawCapture()
+    token = _raw_capture.set(capture)
+    try:
+        yield capture
+    finally:
+        _raw_capture.reset(token)
+
+
+def report_raw_response(text: Optional[str]) -> None:
+    """解析する応答のテキストを報告する（capture_raw_responses の外では何もしない）"""
+    capture = _raw_capture.get()
+    if capture is not None:
+        capture.texts.append(text or "")
+
+
+def report_usage(input_tokens: Optional[int], output_tokens: Optional[int]) -> None:
+    """プロバイダーが報告したトークン数を加算する（capture_raw_responses の外では何もしない）"""
+    capture = _raw_capture.get()
+    if capture is None or input_tokens is None:
+        return
+    capture.input_tokens = (capture.input_tokens or 0) + input_tokens
+    capture.output_tokens = (capture.output_tokens or 0) + (output_tokens or 0)
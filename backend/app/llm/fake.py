@@ -0,0 +1,162 @@
+"""Deterministic fake LLM client for tests and local runs."""
+
+import asyncio
+import json
+import math
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+from app.llm.client import LLMClient
+from app.llm.context import CallSite, current_call_site, match_call_site
+
+
+def _countermeasures_response() -> str:
+    return json.dumps({
+        "countermeasures": [
+            {
+                "strategy_type": "過酷度低減",
+                "description": "異常時に自動で安全側へ停止するフェールセーフ機構を導入する",
+                "priority": 5,
+                "feasibility": "高",
+                "implementation_timeline": "短期(1-3ヶ月)",
+                "expected_effect": "事故発生時の被害を限定できる"
+            },
+            {
+                "strategy_type": "発生頻度低減",
+                "description": "夜間・悪天候時の学習データを追加収集する",
+                "priority": 4,
+                "feasibility": "中",
+                "implementation_timeline": "中期(3-6ヶ月)",
+                "expected_effect": "認識精度の低下を抑制できる"
+            },
+            {
+                "strategy_type": "回避可能性向上",
+                "description": "認識信頼度が低い場合に運転者へ警告する",
+                "priority": 3,
+                "feasibility": "高",
+                "implementation_timeline": "短期(1-3ヶ月)",
+                "expected_effect": "人間による介入の機会を確保できる"
+            }
+        ]
+    }, ensure_ascii=False)
+
+
+def _meta_response() -> str:
+    return json.dumps({
+        "meta_approaches": [
+            {
+                "approach": "AIの外側でガードする設計にする",
+                "example": "ルールベースの安全監視を併用する",
+                "priority": 5,
+                "applicability": "高"
+            },
+            {
+                "approach": "人間による確認プロセスを組み込む",
+                "example": "低信頼度の判断はオペレーターが確認する",
+                "priority": 4,
+                "applicability": "中"
+            }
+        ]
+    }, ensure_ascii=False)
+
+
+def _axis_response(axis: str, score: int) -> str:
+    return json.dumps({
+        f"{axis}_score": score,
+        "rationale": f"{axis}の評価根拠（テスト用の固定応答）"
+    }, ensure_ascii=False)
+
+
+# 呼び出し箇所ごとの固定応答（前方一致で解決される）
+CANNED_RESPONSES: Dict[str, str] = {
+    CallSite.RISK_IDENTIFICATION: json.dumps({
+        "identified_risks": [
+            {
+                "category": "データ",
+                "guideword": "網羅性",
+                "risk_description": "夜間の走行データが不足しており、暗所での認識精度が低下する可能性がある",
+                "affected_area": "歩行者",
+                "confidence": "高"
+            },
+            {
+                "category": "運用",
+                "guideword": "人間の監視",
+                "risk_description": "運転者が自動運転に過度に依存し、介入が遅れる可能性がある",
+                "affected_area": "運転者",
+                "confidence": "中"
+            }
+        ]
+    }, ensure_ascii=False),
+    CallSite.SEVERITY: _axis_response("severity", 5),
+    CallSite.FREQUENCY: _axis_response("frequency", 3),
+    CallSite.AVOIDABILITY: _axis_response("avoidability", 4),
+    CallSite.COUNTERMEASURES: _countermeasures_response(),
+    "meta_countermeasure_generation": _meta_response(),
+}
+
+Response = Union[str, Callable[[str], str]]
+
+
+class FakeLLMClient(LLMClient):
+    """決定的な応答を返すLLMクライアント
+
+    呼び出し箇所に前方一致する応答を返す。応答には文字列のほか、
+    プロンプトを受け取って文字列を返す関数も指定できる。
+    一定の遅延や例外を設定でき、呼び出し履歴を記録する。
+    ストリーミングでは応答を stream_chunks 個の断片に分け、遅延を断片の間に配分する。
+    """
+
+    def __init__(
+        self,
+        responses: Optional[Dict[str, Response]] = None,
+        default: Optional[Response] = None,
+        latency: float = 0.0,
+        error: Optional[Exception] = None,
+        name: str = "fake",
+        stream_chunks: int = 8
+    ):
+        self.responses = dict(CANNED_RESPONSES)
+        if responses:
+            self.responses.update(responses)
+        self.default = default
+        self.latency = latency
+        self.error = error
+        self.name = name
+        self.stream_chunks = stream_chunks
+        self.calls: List[Tuple[Optional[str], str]] = []
+
+    async def call(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None
+    ) -> str:
+        site = current_call_site()
+        self.calls.append((site, prompt))
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error is not None:
+            raise self.error
+        return self._response(site, prompt)
+
+    async def stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        site = current_call_site()
+        self.calls.append((site, prompt))
+
+        if self.error is not None:
+            raise self.error
+        text = self._response(site, prompt)
+        size = max(1, math.ceil(len(text) / self.stream_chunks))
+        for start in range(0, len(text), size):
+            if self.latency:
+                await asyncio.sleep(self.latency / self.stream_chunks)
+            yield text[start:start + size]
+
+    def _response(self, site: Optional[str], prompt: str) -> str:
+        key = match_call_site(site, self.responses)
+        response = self.responses[key] if key is not None else self.default
+        if response is None:
+            raise ValueError(f"No fake response for call site: {site}")
+        return response(prompt) if callable(response) else response
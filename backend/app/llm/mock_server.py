@@ -0,0 +1,346 @@
+"""Deterministic local stand-in for the OpenAI and Anthropic HTTP APIs.
+
+Usage:
+    python -m app.llm.mock_server --port 9000 --latency lognormal:0.8,0.4 \\
+        --error-rate 0.01 --tokens-per-second 60 --seed 42
+
+Point the application at it with:
+    OPENAI_BASE_URL=http://localhost:9000/v1
+    ANTHROPIC_BASE_URL=http://localhost:9000
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.llm.context import CallSite, match_call_site
+from app.llm.fake import CANNED_RESPONSES
+from app.llm.tokens import estimate_tokens, truncate_to_tokens
+
+
+# プロンプト中の定型文からプロンプト種別（呼び出し箇所）を判定する
+PROMPT_MARKERS: List[Tuple[str, str]] = [
+    ("潜在的なリスクを特定してください", CallSite.RISK_IDENTIFICATION),
+    ("過酷度（被害の深刻さ）を1-5", CallSite.SEVERITY),
+    ("発生頻度を1-5", CallSite.FREQUENCY),
+    ("回避可能性を1-5", CallSite.AVOIDABILITY),
+    ("効果的な対策を提案してください", CallSite.COUNTERMEASURES),
+    ("メタ対策を具体的な実装レベルの対策に展開", CallSite.COUNTERMEASURES_FROM_META),
+    ("発生頻度を下げるための抽象的なアプローチ", CallSite.META_FREQUENCY),
+    ("回避可能性を向上させるための抽象的なアプローチ", CallSite.META_AVOIDABILITY),
+    ("過酷度（被害の深刻さ）を低減するための抽象的なアプローチ", CallSite.META_SEVERITY),
+]
+
+
+def classify_prompt(prompt: str) -> Optional[str]:
+    """プロンプト種別を判定"""
+    for marker, site in PROMPT_MARKERS:
+        if marker in prompt:
+            return site
+    return None
+
+
+@dataclass
+class LatencyDistribution:
+    """応答遅延の分布
+
+    kind:
+        fixed: a 秒
+        uniform: a〜b 秒の一様分布
+        lognormal: 中央値 a 秒、σ=b の対数正規分布
+    """
+    kind: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.a
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(self.a), self.b)
+        raise ValueError(f"Unknown latency distribution: {self.kind}")
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        """"lognormal:0.8,0.4" 形式の指定を解析"""
+        kind, _, params = spec.partition(":")
+        values = [float(v) for v in params.split(",") if v]
+        return cls(kind, *values)
+
+
+@dataclass
+class MockServerConfig:
+    """代替サーバーの設定"""
+    latency: LatencyDistribution = field(default_factory=LatencyDistribution)
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    tokens_per_second: float = 0.0  # 0の場合は出力トークン数による遅延なし
+    seed: int = 0
+    # プロンプト種別（CallSite）ごとの応答の上書き
+    responses: Dict[str, str] = field(default_factory=dict)
+    # ストリーミングで1つのイベントに含める文字数
+    stream_chunk_chars: int = 16
+
+
+class MockLLMServer:
+    """OpenAI / Anthropic のHTTP形式を話すローカル代替サーバー
+
+    応答はプロンプト種別ごとの固定応答で、遅延・エラーの発生は
+    シード・プロンプト・同一プロンプトの出現回数から決まるため、
+    同時実行時の到着順に依存せず再現可能である。
+    """
+
+    def __init__(self, config: Optional[MockServerConfig] = None):
+        self.config = config or MockServerConfig()
+        self.responses = dict(CANNED_RESPONSES)
+        self.responses.update(self.config.responses)
+        self.stats: Counter = Counter()
+        self._seen: Counter = Counter()
+        self.app = self._create_app()
+
+    def _rng(self, prompt: str) -> random.Random:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        self._seen[digest] += 1
+        return random.Random(f"{self.config.seed}:{digest}:{self._seen[digest]}")
+
+    async def _complete(
+        self,
+        prompt: str,
+        prefix: str = "",
+        max_tokens: Optional[int] = None,
+        stream: bool = False
+    ) -> Tuple[Optional[str], Optional[int], int, int, bool]:
+        """応答テキスト、エラーステータス、入出力トークン数、上限で途切れたかを返す
+
+        prefix（途切れた応答の続きを求められた場合のこれまでの出力）があれば
+        固定応答のその続きを返し、max_tokensを超える部分は切り詰める。
+        streamの場合は最初の断片までの遅延だけを待つ（出力の遅延は断片ごとに待つ）。
+        """
+        rng = self._rng(prompt)
+        site = classify_prompt(prompt)
+        self.stats[site or "unknown"] += 1
+
+        roll = rng.random()
+        if roll < self.config.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            return None, 429, 0, 0, False
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            self.stats["errors"] += 1
+            return None, 500, 0, 0, False
+
+        key = match_call_site(site, self.responses)
+        text = self.responses[key] if key is not None else "{}"
+        if prefix and text.startswith(prefix):
+            text = text[len(prefix):]
+        truncated = False
+        if max_tokens is not None and estimate_tokens(text) > max_tokens:
+            text = truncate_to_tokens(text, max_tokens)
+            truncated = True
+            self.stats["truncated"] += 1
+        input_tokens = estimate_tokens(prompt + prefix)
+        output_tokens = estimate_tokens(text)
+
+        delay = self.config.latency.sample(rng)
+        if self.config.tokens_per_second > 0 and not stream:
+            delay += output_tokens / self.config.tokens_per_second
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        return text, None, input_tokens, output_tokens, truncated
+
+    async def _pieces(self, text: str) -> AsyncIterator[str]:
+        """応答テキストを断片に分け、出力トークン数に応じた間隔で返す"""
+        size = self.config.stream_chunk_chars
+        for start in range(0, len(text), size):
+            piece = text[start:start + size]
+            if self.config.tokens_per_second > 0:
+                await asyncio.sleep(estimate_tokens(piece) / self.config.tokens_per_second)
+            yield piece
+
+    async def _openai_events(self, model: str, text: str, truncated: bool) -> AsyncIterator[str]:
+        """chat.completion.chunk のServer-Sent Events"""
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        def event(delta: Dict[str, str], finish_reason: Optional[str]) -> str:
+            return "data: " + json.dumps({
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }, ensure_ascii=False) + "\n\n"
+
+        yield event({"role": "assistant", "content": ""}, None)
+        async for piece in self._pieces(text):
+            yield event({"content": piece}, None)
+        yield event({}, "length" if truncated else "stop")
+        yield "data: [DONE]\n\n"
+
+    async def _anthropic_events(
+        self,
+        model: str,
+        text: str,
+        truncated: bool,
+        input_tokens: int,
+        output_tokens: int
+    ) -> AsyncIterator[str]:
+        """Messages APIのストリーミングのServer-Sent Events"""
+
+        def event(name: str, data: Dict) -> str:
+            return f"event: {name}\ndata: {json.dumps({'type': name, **data}, ensure_ascii=False)}\n\n"
+
+        yield event("message_start", {"message": {
+            "id": f"msg_{uuid.uuid4().hex}",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [],
+            "stop_reason": None,
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": 0}
+        }})
+        yield event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+        async for piece in self._pieces(text):
+            yield event("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": piece}})
+        yield event("content_block_stop", {"index": 0})
+        yield event("message_delta", {
+            "delta": {"stop_reason": "max_tokens" if truncated else "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": output_tokens}
+        })
+        yield event("message_stop", {})
+
+    def _create_app(self) -> FastAPI:
+        app = FastAPI(title="Mock LLM Server")
+
+        @app.post("/v1/chat/completions")
+        async def chat_completions(request: Request):
+            body = await request.json()
+            messages = body.get("messages", [])
+            prompt = "\n".join(m["content"] for m in messages if m["role"] == "user")
+            prefix = "".join(m["content"] for m in messages if m["role"] == "assistant")
+            text, status, input_tokens, output_tokens, truncated = await self._complete(
+                prompt, prefix, body.get("max_tokens"), stream=bool(body.get("stream"))
+            )
+            if status is not None:
+                return JSONResponse(status_code=status, content={"error": {
+                    "message": "mock error", "type": "server_error", "code": status
+                }})
+            if body.get("stream"):
+                self.stats["streamed"] += 1
+                return StreamingResponse(
+                    self._openai_events(body.get("model", "mock"), text, truncated),
+                    media_type="text/event-stream"
+                )
+            if (body.get("response_format") or {}).get("type") == "json_schema":
+                # 固定応答は出力形式どおりのJSONのため、そのまま返す
+                self.stats["structured"] += 1
+            # n件の候補を生成する場合は同じ固定応答をn件返す
+            n = body.get("n") or 1
+            if n > 1:
+                self.stats["sampled"] += 1
+            return {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [
+                    {
+                        "index": index,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "length" if truncated else "stop"
+                    }
+                    for index in range(n)
+                ],
+                "usage": {
+                    "prompt_tokens": input_tokens,
+                    "completion_tokens": output_tokens * n,
+                    "total_tokens": input_tokens + output_tokens * n
+                }
+            }
+
+        @app.post("/v1/messages")
+        async def messages(request: Request):
+            body = await request.json()
+            messages = [m for m in body.get("messages", []) if isinstance(m["content"], str)]
+            prompt = "\n".join(m["content"] for m in messages if m["role"] == "user")
+            prefix = "".join(m["content"] for m in messages if m["role"] == "assistant")
+            text, status, input_tokens, output_tokens, truncated = await self._complete(
+                prompt, prefix, body.get("max_tokens"), stream=bool(body.get("stream"))
+            )
+            if status is not None:
+                return JSONResponse(status_code=status, content={
+                    "type": "error",
+                    "error": {"type": "api_error", "message": "mock error"}
+                })
+            if body.get("stream"):
+                self.stats["streamed"] += 1
+                return StreamingResponse(
+                    self._anthropic_events(
+                        body.get("model", "mock"), text, truncated, input_tokens, output_tokens
+                    ),
+                    media_type="text/event-stream"
+                )
+            content = [{"type": "text", "text": text}]
+            stop_reason = "max_tokens" if truncated else "end_turn"
+            tool_choice = body.get("tool_choice") or {}
+            if tool_choice.get("type") == "tool" and not truncated:
+                # ツールの使用が強制された場合は、固定応答のJSONをツールの入力として返す
+                self.stats["structured"] += 1
+                content = [{
+                    "type": "tool_use",
+                    "id": f"toolu_{uuid.uuid4().hex}",
+                    "name": tool_choice["name"],
+                    "input": json.loads(text)
+                }]
+                stop_reason = "tool_use"
+            return {
+                "id": f"msg_{uuid.uuid4().hex}",
+                "type": "message",
+                "role": "assistant",
+                "model": body.get("model", "mock"),
+                "content": content,
+                "stop_reason": stop_reason,
+                "stop_sequence": None,
+                "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens}
+            }
+
+        @app.get("/stats")
+        async def stats():
+            return dict(self.stats)
+
+        return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Mock LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", default="fixed:0",
+                        help="fixed:<s> | uniform:<min>,<max> | lognormal:<median>,<sigma>")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = MockLLMServer(MockServerConfig(
+        latency=LatencyDistribution.parse(args.latency),
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        tokens_per_second=args.tokens_per_second,
+        seed=args.seed
+    ))
+    uvicorn.run(server.app, host=args.host, port=args.port)
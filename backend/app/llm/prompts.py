@@ -49,3 +49,12 @@ class CountermeasurePrompt:
 - コストと時間の制約を意識する
 - 複数のアプローチから総合的に対策を検討する
 """
+
+
+class ContinuationPrompt:
+    """出力が上限で途切れた場合に続きを求めるプロンプト"""
+
+    USER_PROMPT = """出力が途中で途切れました。
+直前の出力の最後の文字の直後から続きを出力してください。
+既に出力した部分は繰り返さず、前置きや説明も付けないでください。
+"""
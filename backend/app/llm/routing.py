@@ -0,0 +1,200 @@
+"""Multi-provider routing LLM client."""
+
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, Type, TypeVar
+from app.llm.client import LLMClient
+from app.llm.context import current_call_site, match_call_site
+from app.llm.structured import T
+
+R = TypeVar("R")
+
+
+class LatencyTracker:
+    """バックエンドの応答時間を記録し、パーセンタイルを推定する"""
+
+    def __init__(self, window: int = 200):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """q（0-1）パーセンタイルの応答時間を返す（サンプルがなければNone）"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+
+def backend_name(backend: LLMClient) -> str:
+    """バックエンドの安定した名前（クライアントの種類と、モデル名またはnameの組）"""
+    label = getattr(backend, "model", None) or getattr(backend, "name", None)
+    return f"{type(backend).__name__}:{label}" if label else type(backend).__name__
+
+
+class RoutingLLMClient(LLMClient):
+    """呼び出し箇所ごとにバックエンドを振り分けるLLMクライアント
+
+    ルートは呼び出し箇所（CallSite）の前方一致で解決する。例えば
+    "risk_evaluation" に安価で高速なモデル、"risk_identification" に
+    高性能なモデルを割り当てられる。
+
+    ルートに複数のバックエンドがある場合はヘッジリクエストを行う。
+    先頭のバックエンドが p95 応答時間以内に応答しなければ次のバックエンドにも
+    同じリクエストを送り、最初に成功した応答を採用して残りはキャンセルする。
+    失敗した場合も待たずに次のバックエンドへ切り替える。
+
+    応答時間は (呼び出し箇所, バックエンド名) ごとに記録する（出力の長さが
+    異なる呼び出し箇所で p95 を共有しない）。キャンセルされた呼び出し
+    （ヘッジで負けた遅い側）は、それまでの経過時間を下限として記録する。
+    記録しないと遅い応答だけが抜け落ち、p95 が下がり続けてヘッジが増えていく。
+    """
+
+    def __init__(
+        self,
+        routes: Dict[str, List[LLMClient]],
+        default: List[LLMClient],
+        hedge: bool = True,
+        hedge_delay: float = 5.0,
+        min_samples: int = 20
+    ):
+        if not default:
+            raise ValueError("At least one default backend is required")
+        self.routes = routes
+        self.default = default
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.min_samples = min_samples
+        self.latency: Dict[Tuple[Optional[str], str], LatencyTracker] = {}
+
+    async def close(self) -> None:
+        # 複数のルートで共有しているバックエンドは1回だけ閉じる
+        backends: Dict[int, LLMClient] = {}
+        for backend in [*self.default, *(b for bs in self.routes.values() for b in bs)]:
+            backends.setdefault(id(backend), backend)
+        for backend in backends.values():
+            await backend.close()
+
+    def backends_for(self, site: Optional[str]) -> List[LLMClient]:
+        """呼び出し箇所に対応するバックエンドを取得"""
+        route = match_call_site(site, self.routes)
+        return self.routes[route] if route is not None else self.default
+
+    def _tracker(self, site: Optional[str], backend: LLMClient) -> LatencyTracker:
+        return self.latency.setdefault((site, backend_name(backend)), LatencyTracker())
+
+    def _hedge_after(self, site: Optional[str], backend: LLMClient) -> float:
+        """ヘッジリクエストを送るまでの待ち時間（p95、サンプル不足時は既定値）"""
+        tracker = self._tracker(site, backend)
+        if len(tracker.samples) < self.min_samples:
+            return self.hedge_delay
+        return tracker.percentile(0.95)
+
+    async def _timed_call(
+        self,
+        site: Optional[str],
+        backend: LLMClient,
+        invoke: Callable[[LLMClient], Awaitable[R]]
+    ) -> R:
+        tracker = self._tracker(site, backend)
+        started = time.monotonic()
+        try:
+            response = await invoke(backend)
+        except asyncio.CancelledError:
+            # 応答時間は少なくとも経過時間以上（打ち切られた観測値を下限として残す）
+            tracker.record(time.monotonic() - started)
+            raise
+        tracker.record(time.monotonic() - started)
+        return response
+
+    async def call(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None
+    ) -> str:
+        return await self._route(
+            lambda backend: backend.call(prompt=prompt, system_prompt=system_prompt)
+        )
+
+    async def call_structured(
+        self,
+        prompt: str,
+        schema: Type[T],
+        system_prompt: Optional[str] = None
+    ) -> T:
+        return await self._route(
+            lambda backend: backend.call_structured(prompt, schema, system_prompt)
+        )
+
+    async def sample_structured(
+        self,
+        prompt: str,
+        schema: Type[T],
+        n: int,
+        system_prompt: Optional[str] = None
+    ) -> List[T]:
+        return await self._route(
+            lambda backend: backend.sample_structured(prompt, schema, n, system_prompt)
+        )
+
+    async def stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """ルートの先頭のバックエンドでストリーミングする
+
+        届いた断片は既に後段で使われているため、ヘッジ・切り替えは行わない。
+        """
+        backend = self.backends_for(current_call_site())[0]
+        async for piece in backend.stream(prompt=prompt, system_prompt=system_prompt):
+            yield piece
+
+    async def _route(self, invoke: Callable[[LLMClient], Awaitable[R]]) -> R:
+        """呼び出し箇所のバックエンドで呼び出す（複数あればヘッジする）"""
+        site = current_call_site()
+        backends = self.backends_for(site)
+
+        if not self.hedge or len(backends) == 1:
+            return await self._timed_call(site, backends[0], invoke)
+
+        pending = set()
+        launched = 0
+        error: Optional[BaseException] = None
+
+        def launch():
+            nonlocal launched
+            pending.add(asyncio.ensure_future(
+                self._timed_call(site, backends[launched], invoke)
+            ))
+            launched += 1
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if launched < len(backends):
+                    timeout = self._hedge_after(site, backends[launched - 1])
+
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+
+                # 応答が遅い、または全て失敗した場合は次のバックエンドへ
+                if launched < len(backends) and (not done or not pending):
+                    launch()
+
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,315 @@
+"""Priority-aware scheduling of LLM calls across workloads."""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple, Type
+from app.llm.client import LLMClient
+from app.llm.context import Priority, current_priority, current_tenant
+from app.llm.routing import LatencyTracker
+from app.llm.structured import T
+
+# BATCH / BACKFILL の間で空き容量を分ける重み（INTERACTIVEは重みによらず先に割り当てる）
+DEFAULT_WEIGHTS: Dict[str, float] = {
+    Priority.BATCH: 4.0,
+    Priority.BACKFILL: 1.0,
+}
+
+# テナントの待ち行列がないことを表す（テナントNoneと区別する）
+_NO_TENANT = object()
+
+
+@dataclass(eq=False)
+class _Waiter:
+    """実行枠を待っている呼び出し"""
+    priority: str
+    tenant: Optional[str]
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class LLMScheduler:
+    """LLM呼び出しの実行枠（プロバイダーのクォータ）を優先度クラスに割り当てる
+
+    同時に実行する呼び出しを max_concurrency に制限し、空いた枠を次の規則で
+    待ち行列の呼び出しに割り当てる。
+
+    - INTERACTIVE は待ち行列にあるBATCH / BACKFILLより先に割り当てる
+      （待っているバッチ処理を追い越す）。さらに reserved_interactive 枠は
+      INTERACTIVE専用とし、バッチ処理が全枠を埋めていても画面操作からの
+      呼び出しは実行中の呼び出しの完了を待たずに始められる。
+    - BATCH と BACKFILL は残りの枠を重みに応じて分け合う（仮想終了時刻による
+      重み付き公平キューイング。待ち行列が空だったクラスは貯めた分を持ち越さない）。
+    - 同じクラスの中ではテナントを巡回して割り当て、tenant_quota を指定すると
+      テナントごとの実行中の呼び出し数をそれ以下に抑える。
+
+    実行枠はプロセス単位（複数ワーカーではワーカーごとの上限になる）。
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        reserved_interactive: int = 4,
+        weights: Optional[Dict[str, float]] = None,
+        tenant_quota: Optional[int] = None
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if not 0 <= reserved_interactive < max_concurrency:
+            raise ValueError("reserved_interactive must be smaller than max_concurrency")
+        self.max_concurrency = max_concurrency
+        self.reserved_interactive = reserved_interactive
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.tenant_quota = tenant_quota
+
+        # クラス → テナント → 待ち行列（テナントは巡回順に並べる）
+        self._queues: Dict[str, "OrderedDict[Optional[str], Deque[_Waiter]]"] = {
+            priority: OrderedDict() for priority in Priority.ALL
+        }
+        self._running: Dict[str, int] = {priority: 0 for priority in Priority.ALL}
+        self._tenant_running: Dict[str, int] = {}
+        self._dispatched: Dict[str, int] = {priority: 0 for priority in Priority.ALL}
+        self._wait: Dict[str, LatencyTracker] = {
+            priority: LatencyTracker(window=1000) for priority in Priority.ALL
+        }
+        # 重み付き公平キューイングの仮想時刻とクラスごとの仮想終了時刻
+        self._virtual_time = 0.0
+        self._finish: Dict[str, float] = {priority: 0.0 for priority in self.weights}
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        priority: Optional[str] = None,
+        tenant: Optional[str] = None
+    ) -> AsyncIterator[None]:
+        """実行枠を確保してブロックを実行する
+
+        Args:
+            priority: 優先度クラス（省略時は現在のコンテキストの優先度）
+            tenant: クォータの単位（省略時は現在のコンテキストのテナント）
+        """
+        priority = priority or current_priority()
+        if priority not in Priority.ALL:
+            raise ValueError(f"Unknown priority: {priority}")
+        waiter = _Waiter(
+            priority=priority,
+            tenant=tenant if tenant is not None else current_tenant(),
+            future=asyncio.get_running_loop().create_future()
+        )
+        if priority in self._finish and not self._queues[priority]:
+            # 待ち行列が空だったクラスは現在の仮想時刻から数え直す（空いていた間の分を持ち越さない）
+            self._finish[priority] = max(self._finish[priority], self._virtual_time)
+        self._queues[priority].setdefault(waiter.tenant, deque()).append(waiter)
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 枠の割り当てとキャンセルが重なった場合は枠を返す
+                self._release(waiter)
+            else:
+                self._remove(waiter)
+            raise
+
+        try:
+            yield
+        finally:
+            self._release(waiter)
+
+    def _remove(self, waiter: _Waiter) -> None:
+        """待ち行列から取り除く（待っている間にキャンセルされた場合）"""
+        queues = self._queues[waiter.priority]
+        queue = queues.get(waiter.tenant)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del queues[waiter.tenant]
+
+    def _release(self, waiter: _Waiter) -> None:
+        self._running[waiter.priority] -= 1
+        if waiter.tenant is not None:
+            self._tenant_running[waiter.tenant] -= 1
+            if not self._tenant_running[waiter.tenant]:
+                del self._tenant_running[waiter.tenant]
+        self._dispatch()
+
+    def _within_quota(self, tenant: Optional[str]) -> bool:
+        return (
+            tenant is None
+            or self.tenant_quota is None
+            or self._tenant_running.get(tenant, 0) < self.tenant_quota
+        )
+
+    def _eligible_tenants(self, priority: str) -> Iterator[Optional[str]]:
+        """待ち行列のあるテナントのうちクォータに余裕があるもの（巡回順）"""
+        return (tenant for tenant in self._queues[priority] if self._within_quota(tenant))
+
+    def _next(self) -> Optional[Tuple[str, Optional[str]]]:
+        """次に枠を割り当てるクラスとテナント"""
+        running = sum(self._running.values())
+        if running >= self.max_concurrency:
+            return None
+        for tenant in self._eligible_tenants(Priority.INTERACTIVE):
+            return Priority.INTERACTIVE, tenant
+
+        # INTERACTIVE専用の枠を残す
+        background = running - self._running[Priority.INTERACTIVE]
+        if background >= self.max_concurrency - self.reserved_interactive:
+            return None
+
+        best, best_finish = None, None
+        for priority, weight in self.weights.items():
+            tenant = next(self._eligible_tenants(priority), _NO_TENANT)
+            if tenant is _NO_TENANT:
+                continue
+            finish = self._finish[priority] + 1 / weight
+            if best_finish is None or finish < best_finish:
+                best, best_finish = (priority, tenant), finish
+        if best is None:
+            return None
+        priority = best[0]
+        self._virtual_time = best_finish - 1 / self.weights[priority]
+        self._finish[priority] = best_finish
+        return best
+
+    def _dispatch(self) -> None:
+        """空いている枠を待ち行列の呼び出しに割り当てる"""
+        while True:
+            selected = self._next()
+            if selected is None:
+                return
+            priority, tenant = selected
+            queues = self._queues[priority]
+            queue = queues[tenant]
+            waiter = queue.popleft()
+            if queue:
+                # 同じクラスの他のテナントを先に回す
+                queues.move_to_end(tenant)
+            else:
+                del queues[tenant]
+
+            if waiter.future.done():
+                # 待っている間にキャンセルされた
+                continue
+            self._running[priority] += 1
+            if tenant is not None:
+                self._tenant_running[tenant] = self._tenant_running.get(tenant, 0) + 1
+            self._dispatched[priority] += 1
+            self._wait[priority].record(time.monotonic() - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+    def queue_depth(self, priority: Optional[str] = None) -> int:
+        """待ち行列の呼び出し数（クラス省略時は全クラスの合計）"""
+        priorities = [priority] if priority is not None else Priority.ALL
+        return sum(len(q) for p in priorities for q in self._queues[p].values())
+
+    def stats(self) -> Dict[str, Any]:
+        """待ち行列の深さ・実行中の呼び出し数・待ち時間（秒）"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "reserved_interactive": self.reserved_interactive,
+            "running": sum(self._running.values()),
+            "queued": self.queue_depth(),
+            "classes": {
+                priority: {
+                    "queued": self.queue_depth(priority),
+                    "running": self._running[priority],
+                    "dispatched": self._dispatched[priority],
+                    "wait_p50": self._wait[priority].percentile(0.5),
+                    "wait_p95": self._wait[priority].percentile(0.95),
+                }
+                for priority in Priority.ALL
+            },
+            "tenants": dict(self._tenant_running),
+        }
+
+
+class SchedulingLLMClient(LLMClient):
+    """スケジューラーの実行枠を確保してからバックエンドを呼び出すLLMクライアント
+
+    優先度クラスとテナントは呼び出し元のコンテキスト（context.scheduling）で指定する。
+    ルーティングクライアントを包む場合、ヘッジリクエストは1つの枠の中で行われる。
+    """
+
+    def __init__(self, backend: LLMClient, scheduler: "LLMScheduler"):
+        self.backend = backend
+        self.scheduler = scheduler
+
+    async def call(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None
+    ) -> str:
+        async with self.scheduler.slot():
+            return await self.backend.call(prompt=prompt, system_prompt=system_prompt)
+
+    async def call_structured(
+        self,
+        prompt: str,
+        schema: Type[T],
+        system_prompt: Optional[str] = None
+    ) -> T:
+        async with self.scheduler.slot():
+            return await self.backend.call_structured(prompt, schema, system_prompt)
+
+    async def sample_structured(
+        self,
+        prompt: str,
+        schema: Type[T],
+        n: int,
+        system_prompt: Optional[str] = None
+    ) -> List[T]:
+        # n件の候補は1つの枠で生成する（nに対応しないバックエンドでは枠の中で並行に呼び出す）
+        async with self.scheduler.slot():
+            return await self.backend.sample_structured(prompt, schema, n, system_prompt)
+
+    async def stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        # 枠はストリームを読み終えるまで確保する
+        async with self.scheduler.slot():
+            async for piece in self.backend.stream(prompt=prompt, system_prompt=system_prompt):
+                yield piece
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+def scheduler_enabled() -> bool:
+    """共有クライアントの呼び出しをスケジューラーに通すか（LLM_SCHEDULER）"""
+    return os.getenv("LLM_SCHEDULER", "true").lower() == "true"
+
+
+def _parse_weights(spec: str) -> Dict[str, float]:
+    """"クラス=重み;..." 形式の重みを解析"""
+    weights = {}
+    for entry in spec.split(";"):
+        if not entry.strip():
+            continue
+        priority, _, value = entry.partition("=")
+        priority = priority.strip()
+        if priority not in DEFAULT_WEIGHTS or not value:
+            raise ValueError(f"Invalid LLM_SCHEDULER_WEIGHTS entry: {entry}")
+        weights[priority] = float(value)
+    return weights
+
+
+def create_scheduler() -> LLMScheduler:
+    """環境変数の設定からスケジューラーを作成"""
+    quota = os.getenv("LLM_SCHEDULER_TENANT_QUOTA")
+    return LLMScheduler(
+        max_concurrency=int(os.getenv("LLM_SCHEDULER_CONCURRENCY", "16")),
+        reserved_interactive=int(os.getenv("LLM_SCHEDULER_RESERVED", "4")),
+        weights=_parse_weights(os.getenv("LLM_SCHEDULER_WEIGHTS", "")),
+        tenant_quota=int(quota) if quota else None
+    )
+
+
+# アプリケーション全体で共有するインスタンス
+llm_scheduler = create_scheduler()
@@ -0,0 +1,158 @@
+"""Structured (schema-constrained) LLM output helpers."""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Type, TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar("T", bound=BaseModel)
+
+
+def extract_json(text: str) -> str:
+    """応答テキストからJSONオブジェクトの部分を取り出す
+
+    マークダウンのコードブロックや、JSONの前後の説明文を取り除く。
+    """
+    json_str = text.strip()
+
+    # コードブロックを除去
+    if json_str.startswith("```json"):
+        json_str = json_str[7:]
+    elif json_str.startswith("```"):
+        json_str = json_str[3:]
+    if json_str.endswith("```"):
+        json_str = json_str[:-3]
+    json_str = json_str.strip()
+
+    # 正規表現でJSONオブジェクトを抽出（最初の { から最後の } まで）
+    match = re.search(r'\{.*\}', json_str, re.DOTALL)
+    if match:
+        json_str = match.group(0)
+    return json_str
+
+
+def parse_structured(text: str, schema: Type[T]) -> T:
+    """テキストの応答を出力スキーマで検証する
+
+    Raises:
+        ValueError: JSONとして解析できない、またはスキーマに合わない場合
+            （json.JSONDecodeError / pydantic.ValidationError はいずれもValueError）
+    """
+    return schema.model_validate(json.loads(extract_json(text)))
+
+
+class JsonArrayStream:
+    """ストリーミングで届くJSONテキストから、指定したキーの配列の要素を取り出す
+
+    要素（オブジェクト）の閉じ括弧が届いた時点で、その要素を解析して返す。
+    応答全体が届く前に、完成した要素から順に後段の処理へ渡すために使う。
+    """
+
+    def __init__(self, key: str):
+        self._array_start = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+        self._buffer = ""
+        # 配列の中を走査した位置（配列の開始前はNone）
+        self._pos: Optional[int] = None
+        self._depth = 0
+        self._item_start = 0
+        self._in_string = False
+        self._escaped = False
+        self.finished = False
+
+    def feed(self, text: str) -> List[Any]:
+        """受け取ったテキストを追加し、新たに完成した要素のリストを返す"""
+        self._buffer += text
+        if self._pos is None:
+            match = self._array_start.search(self._buffer)
+            if match is None:
+                return []
+            self._pos = match.end()
+
+        items = []
+        buffer = self._buffer
+        for i in range(self._pos, len(buffer)):
+            if self.finished:
+                break
+            c = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif c == "\\":
+                    self._escaped = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c in "{[":
+                if self._depth == 0:
+                    self._item_start = i
+                self._depth += 1
+            elif c in "}]":
+                if self._depth == 0:
+                    # 配列の終わり
+                    self.finished = True
+                    continue
+                self._depth -= 1
+                if self._depth == 0:
+                    items.append(json.loads(buffer[self._item_start:i + 1]))
+        self._pos = len(buffer)
+        return items
+
+
+def _inline_refs(node: Any, defs: Dict[str, Any]) -> Any:
+    """$refを定義の内容で置き換える（出力スキーマは再帰しない）"""
+    if isinstance(node, dict):
+        if "$ref" in node:
+            return _inline_refs(defs[node["$ref"].rsplit("/", 1)[-1]], defs)
+        return {k: _inline_refs(v, defs) for k, v in node.items() if k != "$defs"}
+    if isinstance(node, list):
+        return [_inline_refs(v, defs) for v in node]
+    return node
+
+
+def json_schema(schema: Type[BaseModel]) -> Dict[str, Any]:
+    """PydanticモデルのJSON Schema（$refを展開したもの）"""
+    raw = schema.model_json_schema()
+    return _inline_refs(raw, raw.get("$defs", {}))
+
+
+def _strict(node: Any, properties: bool = False) -> Any:
+    """OpenAIのstrictモードの制約に合わせる
+
+    全プロパティを必須にし、追加プロパティを禁止する。既定値は指定できないため
+    取り除く（省略可能な項目はnullを許す型のまま残る）。propertiesの中のキーは
+    プロパティ名のため、defaultという名前のプロパティは取り除かない。
+    """
+    if isinstance(node, dict):
+        if properties:
+            return {k: _strict(v) for k, v in node.items()}
+        node = {k: _strict(v, k == "properties") for k, v in node.items() if k != "default"}
+        if node.get("type") == "object":
+            node["required"] = list(node.get("properties", {}))
+            node["additionalProperties"] = False
+        return node
+    if isinstance(node, list):
+        return [_strict(v) for v in node]
+    return node
+
+
+def response_format(schema: Type[BaseModel]) -> Dict[str, Any]:
+    """OpenAIのresponse_format（json_schema、strict）"""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": schema.__name__,
+            "schema": _strict(json_schema(schema)),
+            "strict": True
+        }
+    }
+
+
+def tool_definition(schema: Type[BaseModel]) -> Dict[str, Any]:
+    """Anthropicのツール定義（入力スキーマが出力形式）"""
+    return {
+        "name": schema.__name__,
+        "description": (schema.__doc__ or schema.__name__).strip(),
+        "input_schema": json_schema(schema)
+    }
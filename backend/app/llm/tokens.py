@@ -0,0 +1,219 @@
+"""Token counting and per-call-site token budgets."""
+
+import math
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from app.llm.context import CallSite, match_call_site
+
+
+# 呼び出し箇所ごとの出力トークン数の上限（期待する出力形式から見積もる）
+# 評価はスコアと3-5文の根拠、対策は3-5件、メタ対策は2-3件。
+# リスク特定は状況が長いとリスクの件数が増えるため大きめに取る
+OUTPUT_BUDGETS: Dict[str, int] = {
+    CallSite.RISK_IDENTIFICATION: 4000,
+    "risk_evaluation": 400,
+    CallSite.COUNTERMEASURES: 1500,
+    "meta_countermeasure_generation": 800,
+}
+DEFAULT_OUTPUT_BUDGET = 2000
+
+# モデル名の前方一致によるコンテキストウィンドウ（入力＋出力のトークン数）
+CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4-32k": 32768,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+    "claude-3": 200000,
+    "claude": 100000,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# 推定誤差（ローカルの概算とプロバイダーの数え方の差）に備えた余裕
+SAFETY_MARGIN = 0.05
+# 出力に最低限確保するトークン数（これを下回る場合はプロンプトが長すぎる）
+MIN_OUTPUT_TOKENS = 256
+
+# 出力が上限で途切れた場合に続きを生成する最大回数
+MAX_CONTINUATIONS = int(os.getenv("LLM_MAX_CONTINUATIONS", "2"))
+
+
+class ContextWindowExceededError(ValueError):
+    """プロンプトがモデルのコンテキストウィンドウに収まらない"""
+
+    def __init__(self, prompt_tokens: int, context_window: int):
+        super().__init__(
+            f"Prompt ({prompt_tokens} tokens) does not fit in the context window "
+            f"({context_window} tokens) with room for the response"
+        )
+        self.prompt_tokens = prompt_tokens
+        self.context_window = context_window
+
+
+class TruncatedResponseError(RuntimeError):
+    """続きの生成を繰り返しても出力が上限で途切れる"""
+
+
+@dataclass
+class TokenBudget:
+    """1回の呼び出しのトークン配分"""
+    prompt_tokens: int
+    max_tokens: int
+    context_window: int
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数を概算（日本語は1文字≒1トークン、英数字は4文字≒1トークン）"""
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return max(1, (len(text) - ascii_chars) + math.ceil(ascii_chars / 4))
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    """tiktokenのエンコーディング（未インストールの場合はNone）"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Claudeなど未知のモデルはcl100k_baseで近似する
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """プロンプトのトークン数を数える
+
+    tiktokenがインストールされていればローカルのトークナイザーで数え、
+    なければ文字種からの概算を使う。
+    """
+    if not text:
+        return 0
+    encoding = _encoding(model or "gpt-4")
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text))
+
+
+def _parse_overrides(spec: str) -> Dict[str, int]:
+    """"呼び出し箇所=トークン数;..." 形式の上書き設定を解析"""
+    overrides = {}
+    for entry in spec.split(";"):
+        if not entry.strip():
+            continue
+        site, _, value = entry.partition("=")
+        if not value:
+            raise ValueError(f"Invalid LLM_MAX_TOKENS entry: {entry}")
+        overrides[site.strip()] = int(value)
+    return overrides
+
+
+def output_budget(site: Optional[str]) -> int:
+    """呼び出し箇所の出力トークン数の上限
+
+    環境変数 LLM_MAX_TOKENS（例: "risk_evaluation=300;risk_identification=6000"）で上書きできる。
+    """
+    budgets = {**OUTPUT_BUDGETS, **_parse_overrides(os.getenv("LLM_MAX_TOKENS", ""))}
+    key = match_call_site(site, budgets)
+    return budgets[key] if key is not None else DEFAULT_OUTPUT_BUDGET
+
+
+def context_window(model: str) -> int:
+    """モデルのコンテキストウィンドウ（最も長く前方一致するモデル名）"""
+    best = None
+    for prefix in CONTEXT_WINDOWS:
+        if model.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return CONTEXT_WINDOWS[best] if best is not None else DEFAULT_CONTEXT_WINDOW
+
+
+def plan_budget(model: str, site: Optional[str], *texts: Optional[str]) -> TokenBudget:
+    """プロンプトを数え、出力に割り当てるmax_tokensを決める
+
+    出力の上限は呼び出し箇所の予算とし、コンテキストウィンドウの残りが
+    それより少なければ残りまで縮める。
+
+    Raises:
+        ContextWindowExceededError: 出力に最低限のトークン数を確保できない場合
+    """
+    prompt_tokens = sum(count_tokens(text, model) for text in texts if text)
+    window = context_window(model)
+    available = int(window * (1 - SAFETY_MARGIN)) - prompt_tokens
+    budget = output_budget(site)
+
+    if available < min(budget, MIN_OUTPUT_TOKENS):
+        raise ContextWindowExceededError(prompt_tokens, window)
+
+    return TokenBudget(
+        prompt_tokens=prompt_tokens,
+        max_tokens=min(budget, available),
+        context_window=window
+    )
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """概算のトークン数が上限に収まるよう、テキストの先頭部分を返す"""
+    tokens = 0.0
+    for i, c in enumerate(text):
+        tokens += 0.25 if ord(c) < 128 else 1
+        if math.ceil(tokens) > max_tokens:
+            return text[:i]
+    return text
+
+
+# 文末（区切り文字は前の文に含める）
+_SENTENCE_END = re.compile(r"(?<=[。．！？!?\n])")
+
+
+def split_into_chunks(
+    text: str,
+    chunk_tokens: int,
+    overlap_tokens: int = 0,
+    model: Optional[str] = None
+) -> List[str]:
+    """テキストをトークン数の上限ごとのチャンクに分割する
+
+    文の途中で切らないよう文単位で詰め、各チャンクの先頭には直前のチャンクの
+    末尾の文をoverlap_tokensまで重ねる（チャンクの境界をまたぐ記述を落とさないため）。
+    上限を超える1文は上限ごとに切る。
+
+    Returns:
+        チャンクのリスト（上限以下のテキストはそのまま1チャンク）
+    """
+    if overlap_tokens >= chunk_tokens:
+        raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+
+    sentences: List[Tuple[str, int]] = []
+    for sentence in _SENTENCE_END.split(text):
+        while sentence:
+            head = sentence
+            if count_tokens(head, model) > chunk_tokens:
+                head = truncate_to_tokens(sentence, chunk_tokens) or sentence[0]
+            sentences.append((head, count_tokens(head, model)))
+            sentence = sentence[len(head):]
+
+    chunks: List[str] = []
+    current: List[Tuple[str, int]] = []
+    tokens = 0
+    for sentence, n in sentences:
+        if current and tokens + n > chunk_tokens:
+            chunks.append("".join(s for s, _ in current))
+            # 末尾の文を重なりとして次のチャンクに引き継ぐ
+            overlap: List[Tuple[str, int]] = []
+            overlap_total = 0
+            for s, m in reversed(current):
+                if overlap_total + m > overlap_tokens or overlap_total + m + n > chunk_tokens:
+                    break
+                overlap.insert(0, (s, m))
+                overlap_total += m
+            current, tokens = overlap, overlap_total
+        current.append((sentence, n))
+        tokens += n
+    if current or not chunks:
+        chunks.append("".join(s for s, _ in current))
+    return chunks
@@ -1,18 +1,48 @@
 """Main FastAPI application."""
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 import os
 from dotenv import load_dotenv
 
-from app.api.routes import situations, risks, evaluations
+from app.api.routes import situations, risks, evaluations, snapshots, search, export
+from app.api.scheduling import SchedulingMiddleware
+from app.startup import warm_up
+from app.llm.client import close_llm_client
+from app.llm.archive import llm_archive
+from app.llm.scheduler import llm_scheduler
+from app.llm.tokens import ContextWindowExceededError
+from app.services.single_flight import single_flight
 
 load_dotenv()
 
+# シャットダウン時に実行中のLLM呼び出し・永続化の完了を待つ最大時間（秒）
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "120"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """起動時にSDKの読み込み・マッパーの構成・キャッシュの準備を済ませてから受け付ける
+
+    終了時は、呼び出し元が切断された後も続いている処理の完了を待ってから
+    LLMクライアントの接続を閉じる。
+    """
+    app.state.warm_up_timings = warm_up()
+    yield
+    await single_flight.drain(SHUTDOWN_DRAIN_TIMEOUT)
+    await close_llm_client()
+
+
 app = FastAPI(
     title="AI Risk Assessment API",
     description="AIリスクアセスメント言語システムAPI",
-    version="1.0.0"
+    version="1.0.0",
+    # 日本語を多く含むレスポンスのJSON変換を高速化
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORSミドルウェアの設定
@@ -26,10 +56,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# LLM呼び出しの優先度クラスとテナント（X-LLM-Priority / X-Tenant-ID）
+app.add_middleware(SchedulingMiddleware)
+
+# 大きなレスポンス（リスク・対策の一覧）の圧縮
+# brotli-asgiがインストールされていればBrotli（非対応のクライアントにはgzip）を使う
+compression_minimum_size = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=compression_minimum_size, gzip_fallback=True)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=compression_minimum_size)
+
 # ルーターの登録
 app.include_router(situations.router, prefix="/api/v1/situations", tags=["situations"])
+app.include_router(snapshots.router, prefix="/api/v1/situations", tags=["snapshots"])
 app.include_router(risks.router, prefix="/api/v1/risks", tags=["risks"])
 app.include_router(evaluations.router, prefix="/api/v1/evaluations", tags=["evaluations"])
+app.include_router(search.router, prefix="/api/v1/search", tags=["search"])
+app.include_router(export.router, prefix="/api/v1/export", tags=["export"])
+
+
+@app.exception_handler(ContextWindowExceededError)
+async def context_window_exceeded_handler(request: Request, exc: ContextWindowExceededError):
+    """プロンプトがモデルのコンテキストウィンドウに収まらない場合は413を返す"""
+    return ORJSONResponse(status_code=413, content={
+        "detail": str(exc),
+        "prompt_tokens": exc.prompt_tokens,
+        "context_window": exc.context_window
+    })
 
 
 @app.get("/")
@@ -46,3 +101,15 @@ async def root():
 async def health_check():
     """ヘルスチェックエンドポイント"""
     return {"status": "healthy"}
+
+
+@app.get("/metrics/llm-scheduler")
+async def llm_scheduler_metrics():
+    """LLM呼び出しの待ち行列の深さ・実行中の呼び出し数・待ち時間（秒）"""
+    return llm_scheduler.stats()
+
+
+@app.get("/metrics/llm-archive")
+async def llm_archive_metrics():
+    """LLM呼び出しのアーカイブの書き出し状況（バッファ・書き出し済み・破棄した件数）"""
+    return llm_archive.stats()
@@ -6,6 +6,8 @@ from app.models.evaluation import RiskEvaluation
 from app.models.countermeasure import Countermeasure
 from app.models.meta_countermeasure import MetaCountermeasure
 from app.models.guideword import Guideword
+from app.models.snapshot import AssessmentSnapshot, SnapshotBlob
+from app.models.flight_lease import FlightLease
 
 __all__ = [
     "RiskSituation",
@@ -14,4 +16,7 @@ __all__ = [
     "Countermeasure",
     "MetaCountermeasure",
     "Guideword",
+    "AssessmentSnapshot",
+    "SnapshotBlob",
+    "FlightLease",
 ]
@@ -33,6 +33,14 @@ class Countermeasure(Base):
     feasibility = Column(String(10))
     implementation_timeline = Column(String(50))
     expected_effect = Column(Text)
+    # 展開元（メタ対策と評価の内容）のハッシュ。内容が変わっていなければ再生成しない
+    source_hash = Column(String(64))
+    # 対策ライブラリから再利用した場合の再利用元の対策
+    source_measure_id = Column(
+        String(36),
+        ForeignKey("countermeasures.measure_id", ondelete="SET NULL"),
+        nullable=True
+    )
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # リレーション
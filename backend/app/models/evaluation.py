@@ -30,6 +30,13 @@ class RiskEvaluation(Base):
     avoidability_rationale = Column(Text)
     risk_level = Column(String(10), nullable=False)
     normalized_score = Column(Float)
+    # 一貫性モード（k件のサンプルを集約した評価）の統計。1回の評価ではNULL
+    sample_count = Column(Integer)
+    severity_variance = Column(Float)
+    frequency_variance = Column(Float)
+    avoidability_variance = Column(Float)
+    # 集約したスコアと一致したサンプルの割合（3軸のうち最も低いもの）
+    agreement = Column(Float)
     evaluated_at = Column(DateTime, default=datetime.utcnow)
 
     # リレーション
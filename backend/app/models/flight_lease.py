@@ -0,0 +1,24 @@
+"""Cross-process single-flight lease model."""
+
+from sqlalchemy import Column, String, LargeBinary, DateTime, Integer
+from app.database.base import Base
+
+
+class FlightLease(Base):
+    """実行中（または結果の受け渡し中）の合流キーのリース
+
+    複数ワーカーのうち、リースを取得したプロセスだけが処理を実行し、
+    他のプロセスは結果が保存されるまで待機する。待機していた全プロセスが
+    結果を受け取った時点で行を削除する。
+    """
+
+    __tablename__ = "flight_leases"
+
+    key = Column(String(255), primary_key=True)
+    lease_id = Column(String(36), nullable=False)
+    # 完了した処理の結果（変換済みのレスポンス）。実行中はNULL
+    result = Column(LargeBinary)
+    # 結果を待っているプロセスの数（受け取るたびに減らし、0になれば削除する）
+    waiters = Column(Integer, nullable=False, default=0)
+    # 実行者・待機中のプロセスが異常終了した場合に、他のプロセスが行を破棄する時刻
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,66 @@
+"""Assessment snapshot models."""
+
+from sqlalchemy import (
+    Column,
+    String,
+    Integer,
+    Boolean,
+    LargeBinary,
+    ForeignKey,
+    DateTime,
+    UniqueConstraint,
+)
+from app.database.base import Base
+import uuid
+from datetime import datetime
+
+
+class SnapshotBlob(Base):
+    """スナップショットのテキストブロブ
+
+    値のJSONテキストをSHA-256で内容アドレス化し、全バージョンで共有する。
+    圧縮して小さくなる場合のみzlibで圧縮して保存する。
+    """
+
+    __tablename__ = "snapshot_blobs"
+
+    blob_hash = Column(String(64), primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    compressed = Column(Boolean, nullable=False, default=False)
+    size = Column(Integer, nullable=False)  # 非圧縮時のバイト数
+
+
+class AssessmentSnapshot(Base):
+    """アセスメントスナップショットモデル
+
+    状況のツリー全体（状況・リスク・評価・対策・メタ対策）を変更不可能な
+    バージョンとして保存する。マニフェストは パス → ブロブのハッシュ の対応で、
+    キーフレームは全体、それ以外は直前のバージョンからの差分のみを持つ
+    （削除されたパスはnull）。
+    """
+
+    __tablename__ = "assessment_snapshots"
+    __table_args__ = (
+        UniqueConstraint("situation_id", "version", name="uq_snapshot_situation_version"),
+    )
+
+    snapshot_id = Column(
+        String(36),
+        primary_key=True,
+        default=lambda: str(uuid.uuid4())
+    )
+    situation_id = Column(
+        String(36),
+        ForeignKey("risk_situations.situation_id"),
+        nullable=False,
+        index=True
+    )
+    version = Column(Integer, nullable=False)
+    label = Column(String(255))
+    is_keyframe = Column(Boolean, nullable=False, default=False)
+    # zlib圧縮したマニフェストのJSON（キーフレームは全体、それ以外は差分）
+    manifest = Column(LargeBinary, nullable=False)
+    # 復元したマニフェスト全体のハッシュ（同一内容の判定用）
+    manifest_hash = Column(String(64), nullable=False)
+    change_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
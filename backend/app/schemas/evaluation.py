@@ -17,6 +17,12 @@ class EvaluationResponse(BaseModel):
     avoidability_rationale: Optional[str] = None
     risk_level: str
     normalized_score: Optional[float] = None
+    # 一貫性モードの統計（1回の評価では省略）
+    sample_count: Optional[int] = None
+    severity_variance: Optional[float] = None
+    frequency_variance: Optional[float] = None
+    avoidability_variance: Optional[float] = None
+    agreement: Optional[float] = None
     evaluated_at: datetime
 
     class Config:
@@ -33,6 +39,7 @@ class CountermeasureResponse(BaseModel):
     feasibility: Optional[str] = None
     implementation_timeline: Optional[str] = None
     expected_effect: Optional[str] = None
+    source_measure_id: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -41,3 +48,17 @@ class CountermeasureResponse(BaseModel):
 class CountermeasuresListResponse(BaseModel):
     """対策リストレスポンススキーマ"""
     countermeasures: List[CountermeasureResponse]
+
+
+class CountermeasureSuggestionResponse(BaseModel):
+    """対策ライブラリからの再利用候補"""
+    source_evaluation_id: str
+    risk_description: str
+    guideword: str
+    similarity: float
+    countermeasures: List[CountermeasureResponse]
+
+
+class CountermeasureSuggestionsListResponse(BaseModel):
+    """再利用候補リストレスポンススキーマ"""
+    suggestions: List[CountermeasureSuggestionResponse]
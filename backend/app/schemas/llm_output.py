@@ -0,0 +1,86 @@
+"""LLM output schemas.
+
+Each model mirrors the "出力形式" section of the corresponding prompt and is
+passed to LLMClient.call_structured.
+"""
+
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class IdentifiedRiskOutput(BaseModel):
+    """特定されたリスク1件"""
+    category: str = Field(description="データ | モデル | 運用")
+    guideword: str = Field(description="該当するガイドワード")
+    risk_description: str = Field(description="このシナリオにおける具体的なリスクの説明")
+    affected_area: Optional[str] = Field(None, description="影響を受ける領域")
+    confidence: Optional[str] = Field(None, description="高 | 中 | 低")
+
+
+class RiskIdentificationOutput(BaseModel):
+    """リスク特定の出力"""
+    identified_risks: List[IdentifiedRiskOutput]
+
+
+class SeverityOutput(BaseModel):
+    """過酷度評価の出力"""
+    severity_score: int = Field(description="1-5の整数")
+    rationale: str = Field(description="評価の根拠（3-5文）")
+
+
+class FrequencyOutput(BaseModel):
+    """発生頻度評価の出力"""
+    frequency_score: int = Field(description="1-5の整数")
+    rationale: str = Field(description="評価の根拠（3-5文）")
+
+
+class AvoidabilityOutput(BaseModel):
+    """回避可能性評価の出力"""
+    avoidability_score: int = Field(description="1-5の整数")
+    rationale: str = Field(description="評価の根拠（3-5文）")
+
+
+class CountermeasureOutput(BaseModel):
+    """対策1件"""
+    strategy_type: str = Field(description="過酷度低減 | 発生頻度低減 | 回避可能性向上")
+    description: str = Field(description="対策の具体的な内容")
+    priority: int = Field(description="1-5（5=高）")
+    feasibility: str = Field(description="高 | 中 | 低")
+    implementation_timeline: str = Field(
+        description="短期(1-3ヶ月) | 中期(3-6ヶ月) | 長期(6ヶ月以上)"
+    )
+    expected_effect: Optional[str] = Field(None, description="期待される効果の説明")
+
+
+class CountermeasuresOutput(BaseModel):
+    """対策導出の出力"""
+    countermeasures: List[CountermeasureOutput]
+
+
+class MetaExpansionOutput(BaseModel):
+    """メタ対策から展開した具体的な対策1件（戦略はメタ対策の対象軸）"""
+    description: str = Field(description="具体的な対策の内容")
+    priority: int = Field(description="1-5（5=高）")
+    feasibility: str = Field(description="高 | 中 | 低")
+    implementation_timeline: str = Field(
+        description="短期(1-3ヶ月) | 中期(3-6ヶ月) | 長期(6ヶ月以上)"
+    )
+    expected_effect: Optional[str] = Field(None, description="期待される効果の説明")
+
+
+class MetaExpansionsOutput(BaseModel):
+    """メタ対策の展開の出力"""
+    countermeasures: List[MetaExpansionOutput]
+
+
+class MetaApproachOutput(BaseModel):
+    """メタ対策1件"""
+    approach: str = Field(description="メタ対策の説明（抽象的なアプローチ）")
+    example: Optional[str] = Field(None, description="具体例")
+    priority: Optional[int] = Field(None, description="1-5（5=高）")
+    applicability: Optional[str] = Field(None, description="高 | 中 | 低")
+
+
+class MetaCountermeasuresOutput(BaseModel):
+    """メタ対策生成の出力"""
+    meta_approaches: List[MetaApproachOutput]
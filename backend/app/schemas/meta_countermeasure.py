@@ -1,7 +1,8 @@
 """Meta countermeasure schemas."""
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List
+from app.schemas.evaluation import CountermeasureResponse
 
 
 class MetaCountermeasureBase(BaseModel):
@@ -25,3 +26,26 @@ class MetaCountermeasureResponse(MetaCountermeasureBase):
 class MetaCountermeasuresListResponse(BaseModel):
     """メタ対策リストのレスポンス"""
     meta_countermeasures: List[MetaCountermeasureResponse]
+
+
+class MetaIntegrationRequest(BaseModel):
+    """複数リスクのメタ対策統合リクエスト"""
+    evaluation_ids: List[str] = Field(..., min_length=1)
+    expand: bool = False  # 代表を具体的対策に展開し、メンバーに複製する
+
+
+class IntegratedMetaCountermeasureResponse(MetaCountermeasureResponse):
+    """統合されたメタ対策（代表）のレスポンススキーマ"""
+    member_meta_ids: List[str]
+    evaluation_ids: List[str]
+    countermeasures: List[CountermeasureResponse] = []
+
+
+class IntegratedMetaCountermeasuresListResponse(BaseModel):
+    """統合メタ対策リストのレスポンス"""
+    integrated_meta_countermeasures: List[IntegratedMetaCountermeasureResponse]
+
+
+class IntegratedMetaExpandRequest(BaseModel):
+    """統合メタ対策の展開リクエスト"""
+    member_meta_ids: List[str] = []
@@ -0,0 +1,27 @@
+"""Search schemas."""
+
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class SearchHitResponse(BaseModel):
+    """検索結果レスポンススキーマ"""
+    kind: str  # "risk" | "evaluation" | "countermeasure" | "meta_countermeasure"
+    id: str
+    field: str
+    text: str
+    risk_id: Optional[str] = None
+    situation_id: Optional[str] = None
+    severity_score: Optional[int] = None
+    frequency_score: Optional[int] = None
+    avoidability_score: Optional[int] = None
+    risk_level: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class SearchResponse(BaseModel):
+    """検索レスポンススキーマ"""
+    query: str
+    hits: List[SearchHitResponse]
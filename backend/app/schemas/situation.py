@@ -1,8 +1,10 @@
 """Situation schemas."""
 
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, Optional, List
 from datetime import datetime
+from app.schemas.risk import RiskResponse
+from app.schemas.evaluation import EvaluationResponse, CountermeasureResponse
 
 
 class SituationCreate(BaseModel):
@@ -25,3 +27,52 @@ class SituationResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class SituationReassessRequest(SituationCreate):
+    """状況の編集と差分リスクアセスメントのリクエストスキーマ"""
+    # 再特定するガイドワード（省略時は全て、指定外のガイドワードのリスクはそのまま保持）
+    guidewords: Optional[List[str]] = None
+    # 新規・変化したリスクを評価するか
+    evaluate: bool = True
+
+
+class RiskChangeResponse(BaseModel):
+    """実質的に変化したリスクレスポンススキーマ"""
+    previous_risk_id: str
+    risk_id: str
+    similarity: float
+
+
+class SituationReassessResponse(BaseModel):
+    """差分リスクアセスメントレスポンススキーマ"""
+    situation: SituationResponse
+    changed_fields: List[str]
+    added_sentences: List[str]
+    removed_sentences: List[str]
+    identified_risks: List[RiskResponse]
+    unchanged_risk_ids: List[str]
+    changed_risks: List[RiskChangeResponse]
+    added_risk_ids: List[str]
+    removed_risk_ids: List[str]
+    evaluations: List[EvaluationResponse]
+
+
+class AutoAssessEvent(BaseModel):
+    """自動アセスメントの進捗イベント（NDJSONの1行）
+
+    stage: risk | evaluation | countermeasures | error | done
+    """
+    stage: str
+    risk: Optional[RiskResponse] = None
+    evaluation: Optional[EvaluationResponse] = None
+    countermeasures: Optional[List[CountermeasureResponse]] = None
+    # 対策導出で選択した主要な戦略
+    strategy: Optional[str] = None
+    # error: 失敗した段階・対象のリスク・内容
+    failed_stage: Optional[str] = None
+    risk_id: Optional[str] = None
+    detail: Optional[str] = None
+    # done: 段階ごとの件数と経過時間（秒）
+    counts: Optional[Dict[str, int]] = None
+    elapsed: Optional[float] = None
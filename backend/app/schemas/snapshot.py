@@ -0,0 +1,56 @@
+"""Assessment snapshot schemas."""
+
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+
+
+class SnapshotCreate(BaseModel):
+    """スナップショット作成スキーマ"""
+    label: Optional[str] = None
+
+
+class SnapshotResponse(BaseModel):
+    """スナップショットレスポンススキーマ"""
+    snapshot_id: str
+    situation_id: str
+    version: int
+    label: Optional[str] = None
+    is_keyframe: bool
+    change_count: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class SnapshotsListResponse(BaseModel):
+    """スナップショットリストレスポンススキーマ"""
+    snapshots: List[SnapshotResponse]
+
+
+class SnapshotDetailResponse(SnapshotResponse):
+    """スナップショット（状況ツリー付き）レスポンススキーマ"""
+    # {"situation": {...}, "risks": {risk_id: {..., "evaluations": {evaluation_id: {...}}}}}
+    tree: Dict[str, Any]
+
+
+class SnapshotChangeResponse(BaseModel):
+    """変化した値のレスポンススキーマ"""
+    path: str
+    change: str  # "added" | "removed" | "changed"
+    before: Any = None
+    after: Any = None
+
+    class Config:
+        from_attributes = True
+
+
+class SnapshotDiffResponse(BaseModel):
+    """スナップショット差分レスポンススキーマ"""
+    from_version: int
+    to_version: int
+    changes: List[SnapshotChangeResponse]
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,176 @@
+"""Pipelined auto-assessment: identification, evaluation and countermeasures."""
+
+import asyncio
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional
+from app.models import RiskSituation, IdentifiedRisk, RiskEvaluation, Countermeasure
+from app.llm.client import LLMClient
+from app.services.risk_identification import RiskIdentificationService
+from app.services.risk_evaluation import RiskEvaluationService
+from app.services.countermeasure_generation import CountermeasureGenerationService
+
+
+class PipelineStage:
+    """パイプラインのイベントの種別"""
+    RISK = "risk"
+    EVALUATION = "evaluation"
+    COUNTERMEASURES = "countermeasures"
+    ERROR = "error"
+    DONE = "done"
+
+
+@dataclass
+class PipelineEvent:
+    """パイプラインの進捗（段階ごとの結果、エラー、完了）"""
+    stage: str
+    risk: Optional[IdentifiedRisk] = None
+    evaluation: Optional[RiskEvaluation] = None
+    countermeasures: List[Countermeasure] = field(default_factory=list)
+    # 対策導出で選択した主要な戦略
+    strategy: Optional[str] = None
+    # ERROR: 失敗した段階と内容
+    failed_stage: Optional[str] = None
+    detail: Optional[str] = None
+    # DONE: 段階ごとの件数と経過時間（秒）
+    counts: Optional[dict] = None
+    elapsed: Optional[float] = None
+
+
+# 段階間の待ち行列の終端
+_DONE = object()
+
+
+class AssessmentPipeline:
+    """リスク特定から対策導出までを段階ごとに並行して進めるパイプライン
+
+    リスク特定の出力をストリーミングで読み、リスクが1件取り出せるたびに評価へ、
+    評価が済むたびに戦略の選択と対策導出へ渡す。全体の所要時間は各段階の合計では
+    なく、最も長いリスク1件分の連鎖（特定の出力開始 → 評価 → 対策導出）に近づく。
+
+    段階の間は容量 queue_size の待ち行列でつなぎ、後段が詰まると前段が待つ
+    （バックプレッシャー）。進捗のイベントも同じ容量の待ち行列で返すため、
+    イベントを読む側が遅い場合もパイプライン全体が待つ。
+
+    IDは各段階で採番するため、後段に渡す前に保存しなくてよい。イベントは前段の
+    結果が後段の結果より先に届くため、呼び出し側は届いた順に保存できる。
+    1件のリスクの評価・対策導出の失敗はERRORイベントとして返し、他のリスクは続ける。
+    """
+
+    def __init__(
+        self,
+        llm_client: LLMClient,
+        evaluation_concurrency: Optional[int] = None,
+        countermeasure_concurrency: Optional[int] = None,
+        queue_size: Optional[int] = None
+    ):
+        self.identification_service = RiskIdentificationService(llm_client)
+        self.evaluation_service = RiskEvaluationService(llm_client)
+        self.countermeasure_service = CountermeasureGenerationService(llm_client)
+        self.evaluation_concurrency = evaluation_concurrency or int(
+            os.getenv("AUTO_ASSESS_EVALUATION_CONCURRENCY", "4")
+        )
+        self.countermeasure_concurrency = countermeasure_concurrency or int(
+            os.getenv("AUTO_ASSESS_COUNTERMEASURE_CONCURRENCY", "4")
+        )
+        self.queue_size = queue_size or int(os.getenv("AUTO_ASSESS_QUEUE_SIZE", "8"))
+
+    async def run(self, situation: RiskSituation) -> AsyncIterator[PipelineEvent]:
+        """パイプラインを実行し、進捗のイベントを発生順に返す
+
+        最後のイベントはDONE。読み出しを途中でやめた場合（クライアントの切断など）は
+        実行中のLLM呼び出しをキャンセルする。
+        """
+        events: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        runner = asyncio.ensure_future(self._run_stages(situation, events))
+        try:
+            while True:
+                event = await events.get()
+                yield event
+                if event.stage == PipelineStage.DONE:
+                    break
+            await runner
+        finally:
+            runner.cancel()
+
+    async def _run_stages(self, situation: RiskSituation, events: asyncio.Queue) -> None:
+        started = time.monotonic()
+        risks: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        evaluations: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        counts = {
+            PipelineStage.RISK: 0,
+            PipelineStage.EVALUATION: 0,
+            PipelineStage.COUNTERMEASURES: 0,
+            PipelineStage.ERROR: 0,
+        }
+
+        async def emit(event: PipelineEvent) -> None:
+            counts[event.stage] += 1
+            await events.put(event)
+
+        async def identify() -> None:
+            try:
+                async for risk in self.identification_service.identify_risks_stream(
+                    situation, queue_size=self.queue_size
+                ):
+                    risk.risk_id = str(uuid.uuid4())
+                    await emit(PipelineEvent(PipelineStage.RISK, risk=risk))
+                    await risks.put(risk)
+            except Exception as e:
+                # 特定できた分は後段で続ける
+                await emit(PipelineEvent(
+                    PipelineStage.ERROR, failed_stage=PipelineStage.RISK, detail=str(e)
+                ))
+            for _ in range(self.evaluation_concurrency):
+                await risks.put(_DONE)
+
+        async def evaluate() -> None:
+            while (risk := await risks.get()) is not _DONE:
+                try:
+                    evaluation = await self.evaluation_service.evaluate_risk(risk)
+                except Exception as e:
+                    await emit(PipelineEvent(
+                        PipelineStage.ERROR, risk=risk,
+                        failed_stage=PipelineStage.EVALUATION, detail=str(e)
+                    ))
+                    continue
+                evaluation.evaluation_id = str(uuid.uuid4())
+                # 対策導出のプロンプトで評価対象のリスクを参照する
+                evaluation.risk = risk
+                await emit(PipelineEvent(PipelineStage.EVALUATION, risk=risk, evaluation=evaluation))
+                await evaluations.put(evaluation)
+
+        async def generate() -> None:
+            service = self.countermeasure_service
+            while (evaluation := await evaluations.get()) is not _DONE:
+                try:
+                    countermeasures = await service.generate_countermeasures(evaluation)
+                except Exception as e:
+                    await emit(PipelineEvent(
+                        PipelineStage.ERROR, risk=evaluation.risk, evaluation=evaluation,
+                        failed_stage=PipelineStage.COUNTERMEASURES, detail=str(e)
+                    ))
+                    continue
+                await emit(PipelineEvent(
+                    PipelineStage.COUNTERMEASURES,
+                    risk=evaluation.risk,
+                    evaluation=evaluation,
+                    countermeasures=countermeasures,
+                    strategy=service._select_strategy(evaluation).value
+                ))
+
+        async def evaluate_all() -> None:
+            await asyncio.gather(*[evaluate() for _ in range(self.evaluation_concurrency)])
+            for _ in range(self.countermeasure_concurrency):
+                await evaluations.put(_DONE)
+
+        await asyncio.gather(
+            identify(),
+            evaluate_all(),
+            *[generate() for _ in range(self.countermeasure_concurrency)]
+        )
+        await events.put(PipelineEvent(
+            PipelineStage.DONE, counts=counts, elapsed=round(time.monotonic() - started, 3)
+        ))
@@ -0,0 +1,222 @@
+"""Batch assessment service."""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Set, Tuple, Union
+from sqlalchemy.orm import Session
+from app.database.persistence import insert_records
+from app.models import IdentifiedRisk, RiskEvaluation, Countermeasure
+from app.llm.client import LLMBatchClient, BatchRequest, BatchJob, BatchResults
+from app.llm.context import CallSite
+from app.llm.prompts import RiskEvaluationPrompt, CountermeasurePrompt
+from app.services.risk_evaluation import (
+    RiskEvaluationService,
+    SeverityScore,
+    FrequencyScore,
+    AvoidabilityScore,
+)
+from app.services.countermeasure_generation import CountermeasureGenerationService
+from app.services.records import RiskRecord, EvaluationRecord, CountermeasureRecord
+
+Risk = Union[IdentifiedRisk, RiskRecord]
+Evaluation = Union[RiskEvaluation, EvaluationRecord]
+
+
+@dataclass
+class BatchAssessmentResult:
+    """一括評価の回収結果（保存はinsert_recordsで行う）"""
+    evaluations: List[EvaluationRecord] = field(default_factory=list)
+    countermeasures: List[CountermeasureRecord] = field(default_factory=list)
+    errors: Dict[str, str] = field(default_factory=dict)
+    # 既に評価済みのリスク・対策生成済みの評価として保存しなかった件数
+    skipped: int = 0
+
+
+class BatchAssessmentService:
+    """一括評価サービス
+
+    リスク評価（3軸）と対策導出のプロンプトをプロバイダーのバッチAPIに
+    まとめて投入し、完了後に結果を評価・対策のレコードへ対応付ける。
+    custom_id は "<種別>-<エンティティID>" の形式とする。
+
+    数万件を扱うため、入力はORMのインスタンスのほかレコード（app.services.records）
+    も受け付け、回収結果はレコードで返す。
+    """
+
+    AXIS_SCORES = {
+        "severity": SeverityScore,
+        "frequency": FrequencyScore,
+        "avoidability": AvoidabilityScore,
+    }
+    AXIS_CALL_SITES = {
+        "severity": CallSite.SEVERITY,
+        "frequency": CallSite.FREQUENCY,
+        "avoidability": CallSite.AVOIDABILITY,
+    }
+    COUNTERMEASURES = "countermeasures"
+
+    def __init__(self, batch_client: LLMBatchClient):
+        self.batch_client = batch_client
+        # プロンプト生成と解析のみを利用するため、LLMクライアントは不要
+        self.evaluation_service = RiskEvaluationService(llm_client=None)
+        self.countermeasure_service = CountermeasureGenerationService(llm_client=None)
+
+    def build_requests(
+        self,
+        risks: Iterable[Risk] = (),
+        evaluations: Iterable[Evaluation] = ()
+    ) -> List[BatchRequest]:
+        """評価・対策導出のバッチリクエストを生成
+
+        Args:
+            risks: 3軸評価を行うリスク
+            evaluations: 対策を導出する評価結果
+
+        Returns:
+            バッチリクエストのリスト
+        """
+        requests = []
+
+        for risk in risks:
+            prompts = {
+                "severity": self.evaluation_service._severity_prompt(risk),
+                "frequency": self.evaluation_service._frequency_prompt(risk),
+                "avoidability": self.evaluation_service._avoidability_prompt(risk),
+            }
+            for axis, prompt in prompts.items():
+                requests.append(BatchRequest(
+                    custom_id=f"{axis}-{risk.risk_id}",
+                    prompt=prompt,
+                    system_prompt=RiskEvaluationPrompt.SYSTEM_PROMPT,
+                    call_site=self.AXIS_CALL_SITES[axis]
+                ))
+
+        for evaluation in evaluations:
+            strategy = self.countermeasure_service._select_strategy(evaluation)
+            requests.append(BatchRequest(
+                custom_id=f"{self.COUNTERMEASURES}-{evaluation.evaluation_id}",
+                prompt=self.countermeasure_service._generate_prompt(evaluation, strategy),
+                system_prompt=CountermeasurePrompt.SYSTEM_PROMPT,
+                call_site=CallSite.COUNTERMEASURES
+            ))
+
+        return requests
+
+    async def submit(
+        self,
+        risks: Iterable[Risk] = (),
+        evaluations: Iterable[Evaluation] = ()
+    ) -> BatchJob:
+        """バッチを投入する"""
+        requests = self.build_requests(risks, evaluations)
+        if not requests:
+            raise ValueError("No requests to submit")
+        return await self.batch_client.submit(requests)
+
+    @staticmethod
+    def split_custom_id(custom_id: str) -> Tuple[str, str]:
+        """custom_idを種別とエンティティIDに分解"""
+        kind, entity_id = custom_id.split("-", 1)
+        return kind, entity_id
+
+    def entity_ids(self, results: BatchResults) -> Tuple[Set[str], Set[str]]:
+        """結果に含まれるリスクIDと評価IDを取得"""
+        risk_ids, evaluation_ids = set(), set()
+        for custom_id in list(results.outputs) + list(results.errors):
+            kind, entity_id = self.split_custom_id(custom_id)
+            if kind == self.COUNTERMEASURES:
+                evaluation_ids.add(entity_id)
+            else:
+                risk_ids.add(entity_id)
+        return risk_ids, evaluation_ids
+
+    async def fetch_results(self, job: BatchJob) -> BatchResults:
+        """完了したバッチの結果を取得"""
+        return await self.batch_client.results(job)
+
+    def map_results(
+        self,
+        results: BatchResults,
+        risks: Iterable[Risk] = (),
+        evaluations: Iterable[Evaluation] = ()
+    ) -> BatchAssessmentResult:
+        """バッチ結果を評価・対策のレコードに対応付ける
+
+        3軸のいずれかが欠けたリスク、解析に失敗した応答は errors に記録し、
+        レコードは生成しない。
+        """
+        assessment = BatchAssessmentResult(errors=dict(results.errors))
+
+        for risk in risks:
+            scores = {}
+            for axis, score_class in self.AXIS_SCORES.items():
+                custom_id = f"{axis}-{risk.risk_id}"
+                if custom_id not in results.outputs:
+                    assessment.errors.setdefault(custom_id, "missing result")
+                    continue
+                try:
+                    data = self.evaluation_service._parse_json_response(
+                        results.outputs[custom_id]
+                    )
+                    scores[axis] = score_class(
+                        score=data[f"{axis}_score"],
+                        rationale=data["rationale"]
+                    )
+                except (ValueError, KeyError) as e:
+                    assessment.errors[custom_id] = f"parse error: {e}"
+
+            if len(scores) == len(self.AXIS_SCORES):
+                assessment.evaluations.append(
+                    self.evaluation_service._build_evaluation(
+                        risk,
+                        scores["severity"],
+                        scores["frequency"],
+                        scores["avoidability"],
+                        factory=EvaluationRecord
+                    )
+                )
+
+        for evaluation in evaluations:
+            custom_id = f"{self.COUNTERMEASURES}-{evaluation.evaluation_id}"
+            if custom_id not in results.outputs:
+                assessment.errors.setdefault(custom_id, "missing result")
+                continue
+            try:
+                countermeasures = self.countermeasure_service._parse_response(
+                    results.outputs[custom_id], evaluation, factory=CountermeasureRecord
+                )
+            except (ValueError, KeyError) as e:
+                assessment.errors[custom_id] = f"parse error: {e}"
+                continue
+            assessment.countermeasures.extend(
+                self.countermeasure_service._prioritize_countermeasures(
+                    countermeasures, evaluation
+                )
+            )
+
+        return assessment
+
+    def save_results(self, db: Session, results: BatchResults) -> BatchAssessmentResult:
+        """バッチ結果を対応付けて保存する（同じ結果を何度回収しても重複しない）
+
+        既に評価のあるリスク、既に対策のある評価の結果は対応付けずに読み飛ばす。
+        コミットは呼び出し側で行う。
+        """
+        risk_ids, evaluation_ids = self.entity_ids(results)
+        risks = RiskRecord.from_rows(db.execute(
+            RiskRecord.select().outerjoin(RiskEvaluation).where(
+                IdentifiedRisk.risk_id.in_(risk_ids),
+                RiskEvaluation.evaluation_id.is_(None)
+            )
+        ))
+        evaluations = EvaluationRecord.from_rows_with_risk(db.execute(
+            EvaluationRecord.select_with_risk().outerjoin(Countermeasure).where(
+                RiskEvaluation.evaluation_id.in_(evaluation_ids),
+                Countermeasure.measure_id.is_(None)
+            ).distinct()
+        ))
+
+        assessment = self.map_results(results, risks, evaluations)
+        assessment.skipped = len(risk_ids) - len(risks) + len(evaluation_ids) - len(evaluations)
+        # 評価・対策はレコードのまま、テーブルごとにまとめてINSERT
+        insert_records(db, [*assessment.evaluations, *assessment.countermeasures])
+        return assessment
@@ -1,12 +1,15 @@
 """Countermeasure generation service."""
 
-import json
-import re
-from typing import List
+import hashlib
+from typing import Any, Callable, List, Sequence, Tuple
 from enum import Enum
 from app.models import RiskEvaluation, Countermeasure, MetaCountermeasure
 from app.llm.client import LLMClient
+from app.llm.context import CallSite, call_site
 from app.llm.prompts import CountermeasurePrompt
+from app.llm.structured import parse_structured
+from app.schemas.llm_output import CountermeasuresOutput, MetaExpansionsOutput
+from app.services.single_flight import make_key
 
 
 class StrategyType(str, Enum):
@@ -45,13 +48,15 @@ class CountermeasureGenerationService:
         prompt = self._generate_prompt(evaluation, primary_strategy)
 
         # LLM呼び出し
-        response = await self.llm_client.call(
-            prompt=prompt,
-            system_prompt=CountermeasurePrompt.SYSTEM_PROMPT
-        )
+        with call_site(CallSite.COUNTERMEASURES):
+            output = await self.llm_client.call_structured(
+                prompt,
+                CountermeasuresOutput,
+                system_prompt=CountermeasurePrompt.SYSTEM_PROMPT
+            )
 
-        # レスポンス解析
-        countermeasures = self._parse_response(response, evaluation)
+        # 対策オブジェクトに変換
+        countermeasures = self._build_countermeasures(output, evaluation)
 
         # 優先順位付け
         prioritized = self._prioritize_countermeasures(
@@ -61,6 +66,57 @@ class CountermeasureGenerationService:
 
         return prioritized
 
+    def coalesce_key(self, evaluation: RiskEvaluation, reuse: bool = False) -> str:
+        """同時リクエスト合流用のキーを生成（対策ライブラリの再利用の有無で分ける）"""
+        prompt = self._generate_prompt(
+            evaluation,
+            self._select_strategy(evaluation)
+        )
+        parts = (prompt, "reuse") if reuse else (prompt,)
+        return make_key(
+            "generate-countermeasures", evaluation.evaluation_id, *parts
+        )
+
+    def meta_coalesce_key(
+        self,
+        meta: MetaCountermeasure,
+        evaluation: RiskEvaluation
+    ) -> str:
+        """メタ対策展開の同時リクエスト合流用のキーを生成"""
+        prompt = self._generate_meta_prompt(meta, evaluation)
+        return make_key("generate-from-meta", meta.meta_id, prompt)
+
+    def meta_source_hash(
+        self,
+        meta: MetaCountermeasure,
+        evaluation: RiskEvaluation
+    ) -> str:
+        """メタ対策展開の入力内容のハッシュ
+
+        展開プロンプトはメタ対策とリスク記述のみから決まるため、
+        プロンプトのハッシュを展開元の内容ハッシュとする。
+        """
+        prompt = self._generate_meta_prompt(meta, evaluation)
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    def is_current_expansion(
+        self,
+        countermeasures: List[Countermeasure],
+        meta: MetaCountermeasure,
+        evaluation: RiskEvaluation,
+        origins: Sequence[Tuple[MetaCountermeasure, RiskEvaluation]] = ()
+    ) -> bool:
+        """既存の展開結果がメタ対策・評価の現在の内容から生成されたものか
+
+        統合メタ対策の代表から複製された展開結果は代表のハッシュを持つため、
+        originsに代表とその評価を渡すと、代表の現在の内容と一致する複製も最新とみなす。
+        """
+        source_hashes = {self.meta_source_hash(meta, evaluation)}
+        source_hashes.update(self.meta_source_hash(m, e) for m, e in origins)
+        return bool(countermeasures) and all(
+            measure.source_hash in source_hashes for measure in countermeasures
+        )
+
     def _select_strategy(self, evaluation: RiskEvaluation) -> StrategyType:
         """主要な対策戦略を選択"""
         severity = evaluation.severity_score
@@ -145,45 +201,36 @@ class CountermeasureGenerationService:
         }
         return descriptions.get(strategy, "")
 
-    def _parse_response(
+    def _build_countermeasures(
         self,
-        response: str,
-        evaluation: RiskEvaluation
+        output: CountermeasuresOutput,
+        evaluation: RiskEvaluation,
+        factory: Callable[..., Any] = Countermeasure
     ) -> List[Countermeasure]:
-        """レスポンスを解析して対策オブジェクトに変換"""
-        json_str = response.strip()
-
-        # コードブロックを除去
-        if json_str.startswith("```json"):
-            json_str = json_str[7:]
-        elif json_str.startswith("```"):
-            json_str = json_str[3:]
-        if json_str.endswith("```"):
-            json_str = json_str[:-3]
-        json_str = json_str.strip()
-
-        # 正規表現でJSONオブジェクトを抽出（最初の { から対応する } まで）
-        # これにより、JSON後の追加テキストを無視できる
-        match = re.search(r'\{.*\}', json_str, re.DOTALL)
-        if match:
-            json_str = match.group(0)
-
-        data = json.loads(json_str)
-
-        countermeasures = []
-        for item in data.get("countermeasures", []):
-            measure = Countermeasure(
+        """検証済みの出力を対策オブジェクト（factoryで作成）に変換"""
+        return [
+            factory(
                 evaluation_id=evaluation.evaluation_id,
-                strategy_type=item["strategy_type"],
-                description=item["description"],
-                priority=item["priority"],
-                feasibility=item["feasibility"],
-                implementation_timeline=item["implementation_timeline"],
-                expected_effect=item.get("expected_effect", "")
+                strategy_type=item.strategy_type,
+                description=item.description,
+                priority=item.priority,
+                feasibility=item.feasibility,
+                implementation_timeline=item.implementation_timeline,
+                expected_effect=item.expected_effect or ""
             )
-            countermeasures.append(measure)
+            for item in output.countermeasures
+        ]
 
-        return countermeasures
+    def _parse_response(
+        self,
+        response: str,
+        evaluation: RiskEvaluation,
+        factory: Callable[..., Any] = Countermeasure
+    ) -> List[Countermeasure]:
+        """テキストのレスポンスを解析して対策オブジェクトに変換（バッチの結果など）"""
+        return self._build_countermeasures(
+            parse_structured(response, CountermeasuresOutput), evaluation, factory
+        )
 
     def _prioritize_countermeasures(
         self,
@@ -223,7 +270,40 @@ class CountermeasureGenerationService:
         Returns:
             具体的な対策のリスト
         """
-        prompt = f"""# タスク
+        prompt = self._generate_meta_prompt(meta, evaluation)
+        source_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+        with call_site(CallSite.COUNTERMEASURES_FROM_META):
+            output = await self.llm_client.call_structured(
+                prompt,
+                MetaExpansionsOutput,
+                system_prompt=CountermeasurePrompt.SYSTEM_PROMPT
+            )
+
+        countermeasures = [
+            Countermeasure(
+                evaluation_id=evaluation.evaluation_id,
+                meta_id=meta.meta_id,  # メタ対策とのリンク
+                strategy_type=meta.target_axis,
+                description=item.description,
+                priority=item.priority,
+                feasibility=item.feasibility,
+                implementation_timeline=item.implementation_timeline,
+                expected_effect=item.expected_effect or "",
+                source_hash=source_hash
+            )
+            for item in output.countermeasures
+        ]
+
+        return countermeasures
+
+    def _generate_meta_prompt(
+        self,
+        meta: MetaCountermeasure,
+        evaluation: RiskEvaluation
+    ) -> str:
+        """メタ対策展開用のプロンプトを生成"""
+        return f"""# タスク
 以下のメタ対策を具体的な実装レベルの対策に展開してください。
 
 # リスク情報
@@ -253,43 +333,3 @@ class CountermeasureGenerationService:
 - 優先順位をつける（1=低、5=高）
 - 実現可能性と効果のバランスを考慮する
 """
-
-        response = await self.llm_client.call(
-            prompt=prompt,
-            system_prompt=CountermeasurePrompt.SYSTEM_PROMPT
-        )
-
-        # レスポンス解析
-        json_str = response.strip()
-
-        # コードブロックを除去
-        if json_str.startswith("```json"):
-            json_str = json_str[7:]
-        elif json_str.startswith("```"):
-            json_str = json_str[3:]
-        if json_str.endswith("```"):
-            json_str = json_str[:-3]
-        json_str = json_str.strip()
-
-        # 正規表現でJSONオブジェクトを抽出
-        match = re.search(r'\{.*\}', json_str, re.DOTALL)
-        if match:
-            json_str = match.group(0)
-
-        data = json.loads(json_str)
-
-        countermeasures = []
-        for item in data.get("countermeasures", []):
-            measure = Countermeasure(
-                evaluation_id=evaluation.evaluation_id,
-                meta_id=meta.meta_id,  # メタ対策とのリンク
-                strategy_type=meta.target_axis,
-                description=item["description"],
-                priority=item["priority"],
-                feasibility=item["feasibility"],
-                implementation_timeline=item["implementation_timeline"],
-                expected_effect=item.get("expected_effect", "")
-            )
-            countermeasures.append(measure)
-
-        return countermeasures
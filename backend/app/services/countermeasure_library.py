@@ -0,0 +1,221 @@
+"""Cross-situation countermeasure reuse library."""
+
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
+from app.models import RiskEvaluation, Countermeasure
+from app.services.similarity import SimilarityIndex
+
+# 総合類似度の重み（リスク記述、ガイドワード、評価スコア）
+TEXT_WEIGHT = 0.6
+GUIDEWORD_WEIGHT = 0.2
+SCORE_WEIGHT = 0.2
+
+# 評価スコア（3軸、1-5）の最大距離
+_MAX_SCORE_DISTANCE = 12
+
+
+@dataclass
+class LibraryEntry:
+    """ライブラリに登録された評価"""
+    evaluation_id: str
+    risk_description: str
+    guideword: str
+    scores: Tuple[int, int, int]
+
+
+@dataclass
+class LibraryMatch:
+    """類似する過去の評価"""
+    entry: LibraryEntry
+    score: float
+    text_score: float
+
+
+def _scores(evaluation: RiskEvaluation) -> Tuple[int, int, int]:
+    return (
+        evaluation.severity_score or 0,
+        evaluation.frequency_score or 0,
+        evaluation.avoidability_score or 0,
+    )
+
+
+class CountermeasureLibrary:
+    """過去の対策を再利用するためのライブラリ
+
+    (リスク記述, ガイドワード, 評価スコア) → 対策 の組をインデックス化し、
+    新しい評価に類似した過去の評価を検索する。リスク記述は文字n-gramの
+    Jaccard係数で比較し、ガイドワードの一致とスコアの近さを加味した
+    総合類似度が閾値以上のものを再利用候補とする。
+
+    LLMで生成された対策（再利用による複製・メタ対策からの展開を除く）を持つ
+    評価のみを登録する。ワーカーごとに保持するため、他のワーカーで生成された
+    対策はrefresh_interval秒ごとにデータベースから取り込み、他のワーカーで
+    削除された評価は再利用元の対策が見つからなかった時点で候補から外す。
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        text_threshold: float = 0.3,
+        refresh_interval: Optional[float] = None
+    ):
+        self.threshold = threshold if threshold is not None else float(
+            os.getenv("COUNTERMEASURE_REUSE_THRESHOLD", "0.85")
+        )
+        self.text_threshold = text_threshold
+        self.refresh_interval = refresh_interval if refresh_interval is not None else float(
+            os.getenv("COUNTERMEASURE_LIBRARY_REFRESH_INTERVAL", "10")
+        )
+        self._index = SimilarityIndex(threshold=text_threshold)
+        self._entries: Dict[str, LibraryEntry] = {}
+        self._synced_until: Optional[datetime] = None
+        self._refreshed_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self, db: Session) -> "CountermeasureLibrary":
+        """データベースから登録済みの対策を読み込む
+
+        初回は全件を読み込み、以降はrefresh_interval秒ごとに、前回までに
+        読み込んだ対策以降に作成された対策の評価を追加する。
+        """
+        now = time.monotonic()
+        if self._refreshed_at is not None and now - self._refreshed_at < self.refresh_interval:
+            return self
+        measures = db.query(Countermeasure).filter(
+            Countermeasure.meta_id.is_(None),
+            Countermeasure.source_measure_id.is_(None)
+        )
+        if self._synced_until is not None:
+            measures = measures.filter(Countermeasure.created_at >= self._synced_until)
+        latest = measures.with_entities(func.max(Countermeasure.created_at)).scalar()
+        if latest is not None:
+            evaluation_ids = measures.with_entities(Countermeasure.evaluation_id).distinct()
+            evaluations = db.query(RiskEvaluation).options(
+                joinedload(RiskEvaluation.risk)
+            ).filter(RiskEvaluation.evaluation_id.in_(evaluation_ids)).all()
+            for evaluation in evaluations:
+                self.add(evaluation)
+            self._synced_until = latest
+        self._refreshed_at = now
+        return self
+
+    def add(self, evaluation: RiskEvaluation) -> None:
+        """対策を生成した評価を登録"""
+        if evaluation.evaluation_id in self._entries or evaluation.risk is None:
+            return
+        entry = LibraryEntry(
+            evaluation_id=evaluation.evaluation_id,
+            risk_description=evaluation.risk.risk_description,
+            guideword=evaluation.risk.guideword,
+            scores=_scores(evaluation),
+        )
+        self._entries[entry.evaluation_id] = entry
+        self._index.add(entry.evaluation_id, entry.risk_description)
+
+    def discard(self, evaluation_ids: List[str]) -> None:
+        """削除された評価を候補から外す"""
+        for evaluation_id in evaluation_ids:
+            self._entries.pop(evaluation_id, None)
+            self._index.remove(evaluation_id)
+
+    def search(
+        self,
+        evaluation: RiskEvaluation,
+        limit: int = 5,
+        threshold: Optional[float] = None
+    ) -> List[LibraryMatch]:
+        """類似する過去の評価を検索
+
+        Args:
+            evaluation: 対策を求める評価結果
+            limit: 返す件数の上限
+            threshold: 総合類似度の下限（省略時はライブラリの閾値）
+
+        Returns:
+            総合類似度の降順の一致リスト
+        """
+        if evaluation.risk is None:
+            return []
+        threshold = self.threshold if threshold is None else threshold
+        scores = _scores(evaluation)
+
+        matches = []
+        for evaluation_id, text_score in self._index.query(evaluation.risk.risk_description):
+            entry = self._entries.get(evaluation_id)
+            if entry is None or evaluation_id == evaluation.evaluation_id:
+                continue
+            distance = sum(abs(a - b) for a, b in zip(scores, entry.scores))
+            score = (
+                TEXT_WEIGHT * text_score
+                + GUIDEWORD_WEIGHT * (entry.guideword == evaluation.risk.guideword)
+                + SCORE_WEIGHT * (1 - distance / _MAX_SCORE_DISTANCE)
+            )
+            if score >= threshold:
+                matches.append(LibraryMatch(entry=entry, score=score, text_score=text_score))
+
+        matches.sort(key=lambda m: m.score, reverse=True)
+        return matches[:limit]
+
+    def best_match(self, evaluation: RiskEvaluation) -> Optional[LibraryMatch]:
+        """再利用する過去の評価（閾値以上で最も類似したもの）"""
+        matches = self.search(evaluation, limit=1)
+        return matches[0] if matches else None
+
+    @staticmethod
+    def source_countermeasures(db: Session, evaluation_id: str) -> List[Countermeasure]:
+        """再利用元の評価の対策（LLMで生成されたもののみ）"""
+        return db.query(Countermeasure).filter(
+            Countermeasure.evaluation_id == evaluation_id,
+            Countermeasure.meta_id.is_(None),
+            Countermeasure.source_measure_id.is_(None)
+        ).order_by(Countermeasure.priority.desc()).all()
+
+    @staticmethod
+    def reused_countermeasures(
+        db: Session,
+        evaluation_id: str,
+        sources: List[Countermeasure]
+    ) -> List[Countermeasure]:
+        """評価に既に複製されている、再利用元の対策の複製
+
+        全ての再利用元の複製が揃っている場合のみ返し、揃っていなければ空リストを返す。
+        """
+        source_ids = {source.measure_id for source in sources}
+        copies = db.query(Countermeasure).filter(
+            Countermeasure.evaluation_id == evaluation_id,
+            Countermeasure.source_measure_id.in_(source_ids)
+        ).order_by(Countermeasure.priority.desc()).all()
+        if {copy.source_measure_id for copy in copies} != source_ids:
+            return []
+        return copies
+
+    @staticmethod
+    def reuse(
+        sources: List[Countermeasure],
+        evaluation: RiskEvaluation
+    ) -> List[Countermeasure]:
+        """過去の対策を評価に複製（再利用元へのリンク付き）"""
+        return [
+            Countermeasure(
+                evaluation_id=evaluation.evaluation_id,
+                source_measure_id=source.measure_id,
+                strategy_type=source.strategy_type,
+                description=source.description,
+                priority=source.priority,
+                feasibility=source.feasibility,
+                implementation_timeline=source.implementation_timeline,
+                expected_effect=source.expected_effect
+            )
+            for source in sources
+        ]
+
+
+# アプリケーション全体で共有するインスタンス
+countermeasure_library = CountermeasureLibrary()
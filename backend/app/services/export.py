@@ -0,0 +1,424 @@
+"""Streaming export of assessments as CSV, JSONL and XLSX."""
+
+import csv
+import io
+import math
+import os
+import re
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+import orjson
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import (
+    RiskSituation,
+    IdentifiedRisk,
+    RiskEvaluation,
+    Countermeasure,
+    MetaCountermeasure,
+)
+
+# サーバーサイドカーソルから一度に取り出す行数（出力もこの行数ごとに送る）
+EXPORT_YIELD_PER = int(os.getenv("EXPORT_YIELD_PER", "1000"))
+
+# (列名, カラム) のリスト
+SITUATION_COLUMNS = [
+    ("situation_id", RiskSituation.situation_id),
+    ("situation_description", RiskSituation.description),
+    ("industry", RiskSituation.industry),
+    ("ai_type", RiskSituation.ai_type),
+    ("deployment_stage", RiskSituation.deployment_stage),
+]
+
+DATASET_COLUMNS = {
+    # 状況・リスク・3軸評価（リスクのない状況、未評価のリスクも含む）
+    "risks": [
+        *SITUATION_COLUMNS,
+        ("risk_id", IdentifiedRisk.risk_id),
+        ("category", IdentifiedRisk.category),
+        ("guideword", IdentifiedRisk.guideword),
+        ("risk_description", IdentifiedRisk.risk_description),
+        ("affected_area", IdentifiedRisk.affected_area),
+        ("confidence_score", IdentifiedRisk.confidence_score),
+        ("evaluation_id", RiskEvaluation.evaluation_id),
+        ("severity_score", RiskEvaluation.severity_score),
+        ("severity_rationale", RiskEvaluation.severity_rationale),
+        ("frequency_score", RiskEvaluation.frequency_score),
+        ("frequency_rationale", RiskEvaluation.frequency_rationale),
+        ("avoidability_score", RiskEvaluation.avoidability_score),
+        ("avoidability_rationale", RiskEvaluation.avoidability_rationale),
+        ("risk_level", RiskEvaluation.risk_level),
+        ("normalized_score", RiskEvaluation.normalized_score),
+        ("evaluated_at", RiskEvaluation.evaluated_at),
+    ],
+    "meta_countermeasures": [
+        ("situation_id", IdentifiedRisk.situation_id),
+        ("risk_id", IdentifiedRisk.risk_id),
+        ("evaluation_id", MetaCountermeasure.evaluation_id),
+        ("meta_id", MetaCountermeasure.meta_id),
+        ("target_axis", MetaCountermeasure.target_axis),
+        ("meta_approach", MetaCountermeasure.meta_approach),
+        ("example", MetaCountermeasure.example),
+        ("priority", MetaCountermeasure.priority),
+        ("applicability", MetaCountermeasure.applicability),
+    ],
+    "countermeasures": [
+        ("situation_id", IdentifiedRisk.situation_id),
+        ("risk_id", IdentifiedRisk.risk_id),
+        ("evaluation_id", Countermeasure.evaluation_id),
+        ("meta_id", Countermeasure.meta_id),
+        ("measure_id", Countermeasure.measure_id),
+        ("strategy_type", Countermeasure.strategy_type),
+        ("description", Countermeasure.description),
+        ("priority", Countermeasure.priority),
+        ("feasibility", Countermeasure.feasibility),
+        ("implementation_timeline", Countermeasure.implementation_timeline),
+        ("expected_effect", Countermeasure.expected_effect),
+        ("source_measure_id", Countermeasure.source_measure_id),
+        ("created_at", Countermeasure.created_at),
+    ],
+}
+
+DATASETS = list(DATASET_COLUMNS)
+
+
+def dataset_query(dataset: str, situation_id: Optional[str] = None):
+    """データセットの行を取得するSELECT文（状況・リスクの順に並べる）"""
+    columns = [column for _, column in DATASET_COLUMNS[dataset]]
+
+    if dataset == "risks":
+        query = select(*columns).select_from(RiskSituation).outerjoin(
+            IdentifiedRisk, IdentifiedRisk.situation_id == RiskSituation.situation_id
+        ).outerjoin(
+            RiskEvaluation, RiskEvaluation.risk_id == IdentifiedRisk.risk_id
+        ).order_by(RiskSituation.created_at, RiskSituation.situation_id, IdentifiedRisk.risk_id)
+        situation_column = RiskSituation.situation_id
+    else:
+        model = MetaCountermeasure if dataset == "meta_countermeasures" else Countermeasure
+        key = model.meta_id if model is MetaCountermeasure else model.measure_id
+        query = select(*columns).select_from(model).outerjoin(
+            RiskEvaluation, RiskEvaluation.evaluation_id == model.evaluation_id
+        ).outerjoin(
+            IdentifiedRisk, IdentifiedRisk.risk_id == RiskEvaluation.risk_id
+        ).order_by(IdentifiedRisk.situation_id, IdentifiedRisk.risk_id, model.priority, key)
+        situation_column = IdentifiedRisk.situation_id
+
+    if situation_id:
+        query = query.where(situation_column == situation_id)
+    return query
+
+
+def iter_batches(
+    db: Session,
+    dataset: str,
+    situation_id: Optional[str] = None,
+    yield_per: int = EXPORT_YIELD_PER
+) -> Iterator[List[Tuple]]:
+    """データセットの行をサーバーサイドカーソルから一定数ずつ取得
+
+    yield_perを指定するとPostgreSQLでは名前付きカーソルで取得するため、
+    全体をメモリに読み込まない。
+    """
+    result = db.execute(
+        dataset_query(dataset, situation_id).execution_options(yield_per=yield_per)
+    )
+    try:
+        for partition in result.partitions():
+            yield [tuple(row) for row in partition]
+    finally:
+        result.close()
+
+
+# 各形式の書き出し
+# writer(sheets) -> Iterator[bytes]
+# sheets: (データセット名, 列名, 行のバッチのイテレータ) のイテレータ
+Sheets = Iterable[Tuple[str, Sequence[str], Iterable[List[Tuple]]]]
+
+
+def _text(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+# 表計算ソフトが数式として解釈する先頭文字（CSVインジェクション）
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_value(value: Any) -> Any:
+    """セルの値（数式として解釈される文字列は先頭に ' を付けて文字列として扱わせる）"""
+    value = _text(value)
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def write_csv(sheets: Sheets) -> Iterator[bytes]:
+    """CSV（Excelで文字化けしないようにBOM付きUTF-8）
+
+    LLMが生成した文字列を含むため、数式として実行されないように無害化する。
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    yield "\ufeff".encode()
+    for _, columns, batches in sheets:
+        writer.writerow(columns)
+        for batch in batches:
+            writer.writerows([[_csv_value(value) for value in row] for row in batch])
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+
+def write_jsonl(sheets: Sheets) -> Iterator[bytes]:
+    """1行1レコードのJSON（どのデータセットの行かを "dataset" に持つ）"""
+    for dataset, columns, batches in sheets:
+        keys = ["dataset", *columns]
+        for batch in batches:
+            yield b"".join(
+                orjson.dumps(dict(zip(keys, (dataset, *row)))) + b"\n" for row in batch
+            )
+
+
+# XMLで使えない制御文字
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+# Excelのセルに入る最大文字数
+XLSX_MAX_CELL_LENGTH = 32767
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}</Types>'
+)
+_XLSX_SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{index}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets></workbook>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{sheets}<Relationship Id="rIdStyles" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/></Relationships>'
+)
+# スタイル0: 標準、スタイル1: 見出し（太字）
+_XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '</styleSheet>'
+)
+_XLSX_SHEET_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    '</sheetView></sheetViews><sheetData>'
+)
+_XLSX_SHEET_FOOTER = '</sheetData></worksheet>'
+
+
+def _xlsx_cell(value: Any, style: int = 0) -> str:
+    if value is None:
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, float) and not math.isfinite(value):
+        # NaN・無限大は数値のセルに書けない（Excelが修復を求める）ため空のセルにする
+        return "<c/>"
+    if isinstance(value, (int, float)):
+        return f"<c><v>{value!r}</v></c>"
+    text = _INVALID_XML_CHARS.sub("", str(_text(value)))[:XLSX_MAX_CELL_LENGTH]
+    style_attr = f' s="{style}"' if style else ""
+    return f'<c t="inlineStr"{style_attr}><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _xlsx_row(values: Sequence[Any], style: int = 0) -> str:
+    return "<row>" + "".join(_xlsx_cell(value, style) for value in values) + "</row>"
+
+
+class _ChunkSink(io.RawIOBase):
+    """ZIPの書き出し先（書き込まれたバイト列を取り出して送る）
+
+    シークできないため、zipfileはデータディスクリプタ付きでエントリを書き出す。
+    """
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def write_xlsx(sheets: Sheets) -> Iterator[bytes]:
+    """XLSX（データセットごとのシート）
+
+    共有文字列表を使わずインライン文字列でセルを書くため、行をシートのXMLに
+    書いたそばからZIPに圧縮して送れる。
+    """
+    sink = _ChunkSink()
+    names: List[str] = []
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for dataset, columns, batches in sheets:
+            names.append(dataset)
+            path = f"xl/worksheets/sheet{len(names)}.xml"
+            with archive.open(path, "w", force_zip64=True) as entry:
+                entry.write((_XLSX_SHEET_HEADER + _xlsx_row(columns, style=1)).encode())
+                for batch in batches:
+                    entry.write("".join(_xlsx_row(row) for row in batch).encode())
+                    yield sink.take()
+                entry.write(_XLSX_SHEET_FOOTER.encode())
+
+        indexes = range(1, len(names) + 1)
+        archive.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES.format(sheets="".join(
+            _XLSX_SHEET_CONTENT_TYPE.format(index=i) for i in indexes
+        )))
+        archive.writestr("_rels/.rels", _XLSX_ROOT_RELS)
+        archive.writestr("xl/workbook.xml", _XLSX_WORKBOOK.format(sheets="".join(
+            f'<sheet name="{escape(name[:31])}" sheetId="{i}" r:id="rId{i}"/>'
+            for i, name in zip(indexes, names)
+        )))
+        archive.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS.format(sheets="".join(
+            f'<Relationship Id="rId{i}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{i}.xml"/>'
+            for i in indexes
+        )))
+        archive.writestr("xl/styles.xml", _XLSX_STYLES)
+    yield sink.take()
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    """出力形式"""
+    media_type: str
+    extension: str
+    writer: Callable[[Sheets], Iterator[bytes]]
+    # 1つのファイルに複数のデータセットを書き出せるか
+    multiple_datasets: bool = True
+
+
+FORMATS: Dict[str, ExportFormat] = {
+    "csv": ExportFormat("text/csv; charset=utf-8", "csv", write_csv, multiple_datasets=False),
+    "jsonl": ExportFormat("application/x-ndjson", "jsonl", write_jsonl),
+    "xlsx": ExportFormat(
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx", write_xlsx
+    ),
+}
+
+
+class ExportService:
+    """アセスメント全体をストリームで書き出すサービス
+
+    行はサーバーサイドカーソルから一定数ずつ取得し、ジェネレーターで
+    各形式に変換して送るため、出力全体をメモリに保持しない。
+
+    Args:
+        session_factory: 書き出しの間だけ使うセッションを作成する関数
+        yield_per: 一度に取得・送信する行数
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], yield_per: int = EXPORT_YIELD_PER):
+        self.session_factory = session_factory
+        self.yield_per = yield_per
+
+    def stream(
+        self,
+        format: str,
+        datasets: Optional[List[str]] = None,
+        situation_id: Optional[str] = None
+    ) -> Iterator[bytes]:
+        """書き出したバイト列を順に返す
+
+        Args:
+            format: 出力形式（"csv" | "jsonl" | "xlsx"）
+            datasets: 書き出すデータセット（省略時は全て）
+            situation_id: 指定した状況のみ書き出す
+
+        Returns:
+            出力のバイト列のイテレータ（最初のバッチを取得した時点で送り始められる）
+        """
+        export_format = FORMATS[format]
+        datasets = self.resolve_datasets(format, datasets)
+
+        db = self.session_factory()
+        try:
+            sheets = (
+                (
+                    dataset,
+                    [name for name, _ in DATASET_COLUMNS[dataset]],
+                    iter_batches(db, dataset, situation_id, self.yield_per),
+                )
+                for dataset in datasets
+            )
+            for chunk in export_format.writer(sheets):
+                if chunk:
+                    yield chunk
+        finally:
+            db.close()
+
+    @staticmethod
+    def resolve_datasets(format: str, datasets: Optional[List[str]] = None) -> List[str]:
+        """書き出すデータセットを決める（CSVは1つのみ、省略時は "risks"）
+
+        Raises:
+            ValueError: 未知のデータセット、またはCSVで複数のデータセットを指定した場合
+        """
+        unknown = [dataset for dataset in datasets or [] if dataset not in DATASET_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown datasets: {unknown}")
+        if FORMATS[format].multiple_datasets:
+            return list(datasets or DATASETS)
+        if datasets and len(datasets) > 1:
+            raise ValueError(f"{format} export supports a single dataset")
+        return list(datasets or DATASETS[:1])
+
+    @staticmethod
+    def filename(format: str, situation_id: Optional[str] = None) -> str:
+        """ダウンロード時のファイル名"""
+        scope = situation_id or "all"
+        return f"assessment-{scope}-{datetime.utcnow():%Y%m%d}.{FORMATS[format].extension}"
@@ -1,10 +1,11 @@
 """Meta countermeasure generation service."""
 
-import json
-import re
-from typing import List, Dict
+from typing import List
 from app.models import RiskEvaluation, MetaCountermeasure
 from app.llm.client import LLMClient
+from app.llm.context import CallSite, call_site
+from app.schemas.llm_output import MetaCountermeasuresOutput
+from app.services.single_flight import make_key
 
 
 class MetaCountermeasureGenerationService:
@@ -54,6 +55,21 @@ class MetaCountermeasureGenerationService:
 
         return meta_countermeasures
 
+    def coalesce_key(self, evaluation: RiskEvaluation) -> str:
+        """同時リクエスト合流用のキーを生成
+
+        各軸のプロンプトは評価結果とリスク記述のみから決まるため、
+        それらをハッシュ対象とする。
+        """
+        return make_key(
+            "generate-meta-countermeasures",
+            evaluation.evaluation_id,
+            evaluation.risk.risk_description if evaluation.risk else "",
+            f"{evaluation.frequency_score}", evaluation.frequency_rationale or "",
+            f"{evaluation.avoidability_score}", evaluation.avoidability_rationale or "",
+            f"{evaluation.severity_score}", evaluation.severity_rationale or ""
+        )
+
     async def _generate_frequency_reduction_metas(
         self,
         evaluation: RiskEvaluation
@@ -94,26 +110,14 @@ class MetaCountermeasureGenerationService:
 - 実現可能性を考慮する
 """
 
-        response = await self.llm_client.call(
-            prompt=prompt,
-            system_prompt="あなたはAIリスク対策の専門家です。システマティックなアプローチでリスクを低減する方法を提案してください。"
-        )
-
-        data = self._parse_json_response(response)
-
-        metas = []
-        for item in data.get("meta_approaches", []):
-            meta = MetaCountermeasure(
-                evaluation_id=evaluation.evaluation_id,
-                target_axis="頻度低減",
-                meta_approach=item["approach"],
-                example=item.get("example", ""),
-                priority=item.get("priority", 3),
-                applicability=item.get("applicability", "中")
+        with call_site(CallSite.META_FREQUENCY):
+            output = await self.llm_client.call_structured(
+                prompt,
+                MetaCountermeasuresOutput,
+                system_prompt="あなたはAIリスク対策の専門家です。システマティックなアプローチでリスクを低減する方法を提案してください。"
             )
-            metas.append(meta)
 
-        return metas
+        return self._build_metas(output, evaluation, "頻度低減")
 
     async def _generate_avoidability_improvement_metas(
         self,
@@ -155,26 +159,14 @@ class MetaCountermeasureGenerationService:
 - 実現可能性を考慮する
 """
 
-        response = await self.llm_client.call(
-            prompt=prompt,
-            system_prompt="あなたはAIリスク対策の専門家です。システマティックなアプローチでリスクを低減する方法を提案してください。"
-        )
-
-        data = self._parse_json_response(response)
-
-        metas = []
-        for item in data.get("meta_approaches", []):
-            meta = MetaCountermeasure(
-                evaluation_id=evaluation.evaluation_id,
-                target_axis="回避可能性向上",
-                meta_approach=item["approach"],
-                example=item.get("example", ""),
-                priority=item.get("priority", 3),
-                applicability=item.get("applicability", "中")
+        with call_site(CallSite.META_AVOIDABILITY):
+            output = await self.llm_client.call_structured(
+                prompt,
+                MetaCountermeasuresOutput,
+                system_prompt="あなたはAIリスク対策の専門家です。システマティックなアプローチでリスクを低減する方法を提案してください。"
             )
-            metas.append(meta)
 
-        return metas
+        return self._build_metas(output, evaluation, "回避可能性向上")
 
     async def _generate_severity_reduction_metas(
         self,
@@ -216,43 +208,30 @@ class MetaCountermeasureGenerationService:
 - 実現可能性を考慮する
 """
 
-        response = await self.llm_client.call(
-            prompt=prompt,
-            system_prompt="あなたはAIリスク対策の専門家です。システマティックなアプローチでリスクを低減する方法を提案してください。"
-        )
+        with call_site(CallSite.META_SEVERITY):
+            output = await self.llm_client.call_structured(
+                prompt,
+                MetaCountermeasuresOutput,
+                system_prompt="あなたはAIリスク対策の専門家です。システマティックなアプローチでリスクを低減する方法を提案してください。"
+            )
 
-        data = self._parse_json_response(response)
+        return self._build_metas(output, evaluation, "過酷度低減")
 
-        metas = []
-        for item in data.get("meta_approaches", []):
-            meta = MetaCountermeasure(
+    def _build_metas(
+        self,
+        output: MetaCountermeasuresOutput,
+        evaluation: RiskEvaluation,
+        target_axis: str
+    ) -> List[MetaCountermeasure]:
+        """検証済みの出力をメタ対策オブジェクトに変換"""
+        return [
+            MetaCountermeasure(
                 evaluation_id=evaluation.evaluation_id,
-                target_axis="過酷度低減",
-                meta_approach=item["approach"],
-                example=item.get("example", ""),
-                priority=item.get("priority", 3),
-                applicability=item.get("applicability", "中")
+                target_axis=target_axis,
+                meta_approach=item.approach,
+                example=item.example or "",
+                priority=item.priority if item.priority is not None else 3,
+                applicability=item.applicability or "中"
             )
-            metas.append(meta)
-
-        return metas
-
-    def _parse_json_response(self, response: str) -> Dict:
-        """JSONレスポンスをパース"""
-        json_str = response.strip()
-
-        # コードブロックを除去
-        if json_str.startswith("```json"):
-            json_str = json_str[7:]
-        elif json_str.startswith("```"):
-            json_str = json_str[3:]
-        if json_str.endswith("```"):
-            json_str = json_str[:-3]
-        json_str = json_str.strip()
-
-        # 正規表現でJSONオブジェクトを抽出
-        match = re.search(r'\{.*\}', json_str, re.DOTALL)
-        if match:
-            json_str = match.group(0)
-
-        return json.loads(json_str)
+            for item in output.meta_approaches
+        ]
@@ -0,0 +1,208 @@
+"""Cross-risk meta countermeasure integration service."""
+
+import asyncio
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+from app.models import RiskEvaluation, MetaCountermeasure, Countermeasure
+from app.llm.client import LLMClient
+from app.services.meta_countermeasure_generation import MetaCountermeasureGenerationService
+from app.services.countermeasure_generation import CountermeasureGenerationService
+from app.services.similarity import SimilarityIndex
+from app.services.single_flight import make_key
+
+AXES = ["頻度低減", "回避可能性向上", "過酷度低減"]
+
+
+@dataclass
+class MetaCluster:
+    """類似したメタ対策のまとまり"""
+    representative: MetaCountermeasure
+    members: List[MetaCountermeasure] = field(default_factory=list)
+    # 展開時に置き換えられた古い対策（呼び出し側で削除する）
+    replaced: List[Countermeasure] = field(default_factory=list)
+
+    @property
+    def target_axis(self) -> str:
+        return self.representative.target_axis
+
+    @property
+    def evaluation_ids(self) -> List[str]:
+        """メンバーの評価ID（重複なし、出現順）"""
+        return list(dict.fromkeys(m.evaluation_id for m in self.members))
+
+
+class MetaIntegrationService:
+    """複数リスクのメタ対策統合サービス
+
+    複数の評価結果のメタ対策を並行して生成し、軸ごとに類似アプローチを
+    クラスタリングして代表を選ぶ。具体的対策への展開は代表について1回だけ行い、
+    結果を他のメンバーに複製する。
+    """
+
+    def __init__(
+        self,
+        llm_client: LLMClient,
+        threshold: Optional[float] = None,
+        concurrency: Optional[int] = None
+    ):
+        self.llm_client = llm_client
+        self.meta_service = MetaCountermeasureGenerationService(llm_client)
+        self.countermeasure_service = CountermeasureGenerationService(llm_client)
+        self.threshold = threshold if threshold is not None else float(
+            os.getenv("META_SIMILARITY_THRESHOLD", "0.5")
+        )
+        self.concurrency = concurrency or int(os.getenv("META_INTEGRATION_CONCURRENCY", "8"))
+
+    def coalesce_key(self, evaluations: Sequence[RiskEvaluation], expand: bool) -> str:
+        """同時リクエスト合流用のキーを生成"""
+        evaluation_ids = sorted(e.evaluation_id for e in evaluations)
+        return make_key(
+            "integrate-meta-countermeasures",
+            ",".join(evaluation_ids),
+            f"expand={expand}",
+            *[self.meta_service.coalesce_key(e) for e in evaluations]
+        )
+
+    def expand_coalesce_key(self, cluster: MetaCluster, evaluation: RiskEvaluation) -> str:
+        """クラスタ展開の合流用キーを生成"""
+        return make_key(
+            "expand-integrated",
+            cluster.representative.meta_id,
+            self.countermeasure_service.meta_coalesce_key(cluster.representative, evaluation),
+            *sorted(m.meta_id for m in cluster.members)
+        )
+
+    async def generate_missing(
+        self,
+        evaluations: Sequence[RiskEvaluation]
+    ) -> List[MetaCountermeasure]:
+        """メタ対策が未生成の評価について並行して生成
+
+        生成済みの評価は再生成しない。同時実行数はconcurrencyで制限する。
+
+        Args:
+            evaluations: リスク評価結果のリスト
+
+        Returns:
+            新たに生成されたメタ対策のリスト（評価の順序を保つ）
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def generate(evaluation: RiskEvaluation) -> List[MetaCountermeasure]:
+            async with semaphore:
+                return await self.meta_service.generate_meta_countermeasures(evaluation)
+
+        targets = [e for e in evaluations if not e.meta_countermeasures]
+        results = await asyncio.gather(*[generate(e) for e in targets])
+        return [meta for metas in results for meta in metas]
+
+    def cluster(self, metas: Sequence[MetaCountermeasure]) -> List[MetaCluster]:
+        """軸ごとに類似したメタ対策をクラスタリング
+
+        優先度の高い順に走査し、既存の代表と閾値以上類似していれば
+        最も類似した代表のクラスタに加え、そうでなければ新たな代表とする。
+
+        Args:
+            metas: メタ対策のリスト
+
+        Returns:
+            クラスタのリスト（軸の順、軸内は代表の優先度の降順）
+        """
+        clusters: List[MetaCluster] = []
+        by_axis: Dict[str, List[MetaCountermeasure]] = {}
+        for meta in metas:
+            by_axis.setdefault(meta.target_axis, []).append(meta)
+
+        axes = AXES + [axis for axis in by_axis if axis not in AXES]
+        for axis in axes:
+            axis_metas = sorted(
+                by_axis.get(axis, []),
+                key=lambda m: m.priority or 0,
+                reverse=True
+            )
+            index = SimilarityIndex(threshold=self.threshold)
+            axis_clusters: List[MetaCluster] = []
+            for meta in axis_metas:
+                matches = index.query(meta.meta_approach)
+                if matches:
+                    axis_clusters[matches[0][0]].members.append(meta)
+                else:
+                    index.add(len(axis_clusters), meta.meta_approach)
+                    axis_clusters.append(MetaCluster(representative=meta, members=[meta]))
+            clusters.extend(axis_clusters)
+
+        return clusters
+
+    async def expand(
+        self,
+        cluster: MetaCluster,
+        evaluations: Dict[str, RiskEvaluation]
+    ) -> List[Countermeasure]:
+        """代表のメタ対策を1回だけ展開し、他のメンバーに複製する
+
+        代表の展開結果が現在の内容から生成されたものであれば再生成せず、
+        既存の対策を元に複製のみ行う。展開済みのメンバーには複製しないが、
+        古い代表の展開結果から複製されたものは置き換える。
+        置き換えられた対策はcluster.replacedに格納される。
+
+        Args:
+            cluster: メタ対策のクラスタ
+            evaluations: 評価IDから評価結果への対応
+
+        Returns:
+            新たに作成された対策のリスト
+        """
+        representative = cluster.representative
+        evaluation = evaluations[representative.evaluation_id]
+        created: List[Countermeasure] = []
+
+        source = list(representative.countermeasures)
+        if not self.countermeasure_service.is_current_expansion(source, representative, evaluation):
+            cluster.replaced.extend(source)
+            source = await self.countermeasure_service.generate_from_meta_countermeasure(
+                representative,
+                evaluation
+            )
+            created.extend(source)
+
+        replaced_hashes = {measure.source_hash for measure in cluster.replaced}
+        for member in cluster.members:
+            if member is representative:
+                continue
+            if member.countermeasures:
+                if not replaced_hashes or any(
+                    measure.source_hash not in replaced_hashes
+                    for measure in member.countermeasures
+                ):
+                    continue
+                cluster.replaced.extend(member.countermeasures)
+            for measure in source:
+                created.append(Countermeasure(
+                    evaluation_id=member.evaluation_id,
+                    meta_id=member.meta_id,
+                    strategy_type=measure.strategy_type,
+                    description=measure.description,
+                    priority=measure.priority,
+                    feasibility=measure.feasibility,
+                    implementation_timeline=measure.implementation_timeline,
+                    expected_effect=measure.expected_effect,
+                    source_hash=measure.source_hash
+                ))
+
+        return created
+
+    async def expand_all(
+        self,
+        clusters: Sequence[MetaCluster],
+        evaluations: Dict[str, RiskEvaluation]
+    ) -> List[Countermeasure]:
+        """全クラスタを並行して展開"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def expand(cluster: MetaCluster) -> List[Countermeasure]:
+            async with semaphore:
+                return await self.expand(cluster, evaluations)
+
+        results = await asyncio.gather(*[expand(c) for c in clusters])
+        return [measure for measures in results for measure in measures]
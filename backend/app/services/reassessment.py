@@ -0,0 +1,254 @@
+"""Incremental re-assessment of an edited situation."""
+
+import asyncio
+import difflib
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+from app.models import (
+    RiskSituation,
+    IdentifiedRisk,
+    RiskEvaluation,
+    Countermeasure,
+    MetaCountermeasure,
+)
+from app.llm.client import LLMClient
+from app.services.risk_identification import RiskIdentificationService
+from app.services.risk_evaluation import RiskEvaluationService
+from app.services.similarity import SimilarityIndex, normalize
+from app.services.single_flight import make_key
+
+# 差分を取る状況の項目
+SITUATION_FIELDS = ("description", "industry", "ai_type", "deployment_stage")
+
+_SENTENCE_END = re.compile(r"(?<=[。．！？!?])|\n")
+
+
+def split_sentences(text: str) -> List[str]:
+    """文単位に分割（空の文は除く）"""
+    return [s.strip() for s in _SENTENCE_END.split(text or "") if s.strip()]
+
+
+@dataclass
+class SituationDiff:
+    """保存済みの状況と更新内容の差分"""
+    changed_fields: List[str] = field(default_factory=list)
+    added_sentences: List[str] = field(default_factory=list)
+    removed_sentences: List[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.changed_fields)
+
+
+@dataclass
+class RiskChange:
+    """実質的に変化したリスク（旧リスクと新たに特定されたリスクの対応）"""
+    previous: IdentifiedRisk
+    risk: IdentifiedRisk
+    similarity: float
+
+
+@dataclass
+class ReassessmentPlan:
+    """再特定したリスクと既存リスクの対応付けの結果"""
+    unchanged: List[IdentifiedRisk] = field(default_factory=list)
+    changed: List[RiskChange] = field(default_factory=list)
+    added: List[IdentifiedRisk] = field(default_factory=list)
+    removed: List[IdentifiedRisk] = field(default_factory=list)
+
+    @property
+    def new_risks(self) -> List[IdentifiedRisk]:
+        """保存・評価が必要なリスク（変化したものと新規のもの）"""
+        return [change.risk for change in self.changed] + self.added
+
+    @property
+    def obsolete_risks(self) -> List[IdentifiedRisk]:
+        """削除する既存リスク（置き換えられたものと該当しなくなったもの）"""
+        return [change.previous for change in self.changed] + self.removed
+
+
+class ReassessmentService:
+    """状況の編集に対する差分リスクアセスメントサービス
+
+    更新された状況でリスクを再特定し、既存のリスクと記述の類似度で対応付ける。
+    変化していないリスクは評価結果・対策ごと保持し、新規または実質的に
+    変化したリスクのみLLMで評価する。状況に変更がなければLLMは呼ばない。
+    """
+
+    def __init__(
+        self,
+        llm_client: LLMClient,
+        match_threshold: Optional[float] = None,
+        unchanged_threshold: Optional[float] = None,
+        concurrency: Optional[int] = None
+    ):
+        self.llm_client = llm_client
+        self.identification_service = RiskIdentificationService(llm_client)
+        self.evaluation_service = RiskEvaluationService(llm_client)
+        self.match_threshold = match_threshold if match_threshold is not None else float(
+            os.getenv("REASSESS_MATCH_THRESHOLD", "0.5")
+        )
+        self.unchanged_threshold = unchanged_threshold if unchanged_threshold is not None else float(
+            os.getenv("REASSESS_UNCHANGED_THRESHOLD", "0.8")
+        )
+        self.concurrency = concurrency or int(os.getenv("REASSESS_CONCURRENCY", "8"))
+
+    def diff(self, situation: RiskSituation, changes: Any) -> SituationDiff:
+        """保存済みの状況と更新内容の差分を取る
+
+        Args:
+            situation: 保存済みのリスク状況
+            changes: 更新内容（SITUATION_FIELDSの属性を持つ）
+
+        Returns:
+            変更された項目と、説明の追加・削除された文
+        """
+        result = SituationDiff()
+        for name in SITUATION_FIELDS:
+            if (getattr(situation, name) or None) != (getattr(changes, name) or None):
+                result.changed_fields.append(name)
+
+        if "description" in result.changed_fields:
+            before = split_sentences(situation.description)
+            after = split_sentences(changes.description)
+            matcher = difflib.SequenceMatcher(a=before, b=after, autojunk=False)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                if tag in ("replace", "delete"):
+                    result.removed_sentences.extend(before[i1:i2])
+                if tag in ("replace", "insert"):
+                    result.added_sentences.extend(after[j1:j2])
+        return result
+
+    def coalesce_key(
+        self,
+        situation: RiskSituation,
+        changes: Any,
+        selected_guidewords: Optional[List[str]] = None,
+        evaluate: bool = True
+    ) -> str:
+        """同時リクエスト合流用のキーを生成"""
+        return make_key(
+            "reassess",
+            situation.situation_id,
+            *[str(getattr(changes, name) or "") for name in SITUATION_FIELDS],
+            ",".join(sorted(selected_guidewords)) if selected_guidewords is not None else "*",
+            f"evaluate={evaluate}"
+        )
+
+    def scope(
+        self,
+        risks: Sequence[IdentifiedRisk],
+        selected_guidewords: Optional[List[str]] = None
+    ) -> List[IdentifiedRisk]:
+        """再特定の対象となる既存リスク（ガイドワード指定時はそのガイドワードのみ）"""
+        if selected_guidewords is None:
+            return list(risks)
+        return [r for r in risks if r.guideword in selected_guidewords]
+
+    async def identify(
+        self,
+        situation: RiskSituation,
+        selected_guidewords: Optional[List[str]] = None
+    ) -> List[IdentifiedRisk]:
+        """更新後の状況でリスクを再特定"""
+        return await self.identification_service.identify_risks(situation, selected_guidewords)
+
+    def match(
+        self,
+        existing: Sequence[IdentifiedRisk],
+        identified: Sequence[IdentifiedRisk]
+    ) -> ReassessmentPlan:
+        """再特定したリスクを既存のリスクに対応付ける
+
+        記述の文字bigramのJaccard係数が閾値以上の組を類似度の高い順に
+        1対1で対応付ける。ガイドワードが同じで類似度がunchanged_threshold以上
+        （または正規化した記述が一致）なら変化なし、それ以外は実質的な変化とする。
+
+        Args:
+            existing: 既存のリスク
+            identified: 再特定したリスク（未保存）
+
+        Returns:
+            対応付けの結果
+        """
+        index = SimilarityIndex(threshold=self.match_threshold)
+        for i, risk in enumerate(existing):
+            index.add(i, risk.risk_description)
+
+        candidates = []
+        for j, risk in enumerate(identified):
+            for i, score in index.query(risk.risk_description):
+                candidates.append((score, j, i))
+        candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+
+        plan = ReassessmentPlan()
+        matched_existing = set()
+        matched_identified = set()
+        for score, j, i in candidates:
+            if i in matched_existing or j in matched_identified:
+                continue
+            matched_existing.add(i)
+            matched_identified.add(j)
+            previous, risk = existing[i], identified[j]
+            same_text = normalize(previous.risk_description) == normalize(risk.risk_description)
+            if previous.guideword == risk.guideword and (same_text or score >= self.unchanged_threshold):
+                plan.unchanged.append(previous)
+            else:
+                plan.changed.append(RiskChange(previous=previous, risk=risk, similarity=score))
+
+        plan.added = [r for j, r in enumerate(identified) if j not in matched_identified]
+        plan.removed = [r for i, r in enumerate(existing) if i not in matched_existing]
+        return plan
+
+    async def evaluate(self, risks: Sequence[Any]) -> List[RiskEvaluation]:
+        """リスクを並行して評価（同時実行数はconcurrencyで制限）
+
+        Args:
+            risks: 保存済みのリスク（ORMインスタンスまたはRETURNINGの行）
+
+        Returns:
+            評価結果のリスト（リスクの順序を保つ）
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def evaluate(risk: Any) -> RiskEvaluation:
+            async with semaphore:
+                return await self.evaluation_service.evaluate_risk(risk)
+
+        return list(await asyncio.gather(*[evaluate(r) for r in risks]))
+
+    @staticmethod
+    def delete_risks(db: Session, risk_ids: Sequence[str]) -> List[str]:
+        """リスクを評価結果・メタ対策・対策ごと削除
+
+        コミットは呼び出し側で行う。
+
+        Returns:
+            削除された評価ID
+        """
+        if not risk_ids:
+            return []
+        evaluation_ids = [
+            evaluation_id for evaluation_id, in db.query(RiskEvaluation.evaluation_id).filter(
+                RiskEvaluation.risk_id.in_(risk_ids)
+            )
+        ]
+        if evaluation_ids:
+            # 他の評価に再利用された対策は再利用元へのリンクを外す
+            measure_ids = select(Countermeasure.measure_id).where(
+                Countermeasure.evaluation_id.in_(evaluation_ids)
+            )
+            db.execute(
+                update(Countermeasure)
+                .where(Countermeasure.source_measure_id.in_(measure_ids))
+                .values(source_measure_id=None)
+            )
+            db.execute(delete(Countermeasure).where(Countermeasure.evaluation_id.in_(evaluation_ids)))
+            db.execute(delete(MetaCountermeasure).where(MetaCountermeasure.evaluation_id.in_(evaluation_ids)))
+            db.execute(delete(RiskEvaluation).where(RiskEvaluation.evaluation_id.in_(evaluation_ids)))
+        db.execute(delete(IdentifiedRisk).where(IdentifiedRisk.risk_id.in_(risk_ids)))
+        return evaluation_ids
@@ -0,0 +1,130 @@
+"""Lightweight records for batch pipelines.
+
+Batch runs handle tens of thousands of risks and evaluations. ORM instances
+carry instance state, identity-map entries and a per-object __dict__, so the
+batch services work on these __slots__ records instead. Records are loaded
+with column-only SELECTs and saved with insert_records; ORM instances are
+never created.
+"""
+
+import uuid
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from typing import Any, ClassVar, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.sql import Select
+
+from app.models import IdentifiedRisk, RiskEvaluation, Countermeasure
+
+
+def _new_id() -> str:
+    return str(uuid.uuid4())
+
+
+# レコードのクラス → 列に対応する属性名
+_column_names: Dict[type, Tuple[str, ...]] = {}
+
+
+@dataclass(slots=True)
+class _Record:
+    """列と同名の属性を持つレコードの基底クラス"""
+
+    # 対応するモデル（保存先のテーブル）
+    MODEL: ClassVar[Any] = None
+
+    @classmethod
+    def column_names(cls) -> Tuple[str, ...]:
+        """モデルの列に対応する属性名（フィールドの定義順）"""
+        names = _column_names.get(cls)
+        if names is None:
+            columns = cls.MODEL.__table__.c
+            names = _column_names[cls] = tuple(f.name for f in fields(cls) if f.name in columns)
+        return names
+
+    @classmethod
+    def select(cls) -> Select:
+        """レコードの列のみを取得するSELECT（ORMのインスタンスを作らない）"""
+        return select(*(getattr(cls.MODEL, name) for name in cls.column_names()))
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Any]) -> List["_Record"]:
+        """select() の結果の行からレコードを作成"""
+        return [cls(*row) for row in rows]
+
+    def values(self) -> Dict[str, Any]:
+        """INSERTのパラメーター"""
+        return {name: getattr(self, name) for name in self.column_names()}
+
+    def to_model(self) -> Any:
+        """モデルのインスタンスに変換（セッションに渡す必要がある場合のみ）"""
+        return self.MODEL(**self.values())
+
+
+@dataclass(slots=True)
+class RiskRecord(_Record):
+    """特定されたリスク"""
+    MODEL: ClassVar[Any] = IdentifiedRisk
+
+    risk_id: str
+    situation_id: str
+    category: str
+    guideword: str
+    risk_description: str
+    affected_area: Optional[str] = None
+    confidence_score: Optional[float] = None
+
+
+@dataclass(slots=True)
+class EvaluationRecord(_Record):
+    """リスク評価（対策導出のプロンプト用に評価対象のリスクを持てる）"""
+    MODEL: ClassVar[Any] = RiskEvaluation
+
+    risk_id: str
+    severity_score: int
+    frequency_score: int
+    avoidability_score: int
+    risk_level: str
+    severity_rationale: Optional[str] = None
+    frequency_rationale: Optional[str] = None
+    avoidability_rationale: Optional[str] = None
+    normalized_score: Optional[float] = None
+    sample_count: Optional[int] = None
+    severity_variance: Optional[float] = None
+    frequency_variance: Optional[float] = None
+    avoidability_variance: Optional[float] = None
+    agreement: Optional[float] = None
+    evaluation_id: str = field(default_factory=_new_id)
+    evaluated_at: datetime = field(default_factory=datetime.utcnow)
+    risk: Optional[RiskRecord] = None
+
+    @classmethod
+    def select_with_risk(cls) -> Select:
+        """評価の列と評価対象のリスクの列を取得するSELECT"""
+        return cls.select().add_columns(
+            *(getattr(IdentifiedRisk, name) for name in RiskRecord.column_names())
+        ).join(IdentifiedRisk, RiskEvaluation.risk_id == IdentifiedRisk.risk_id)
+
+    @classmethod
+    def from_rows_with_risk(cls, rows: Iterable[Any]) -> List["EvaluationRecord"]:
+        """select_with_risk() の結果の行からレコードを作成"""
+        n = len(cls.column_names())
+        return [cls(*row[:n], risk=RiskRecord(*row[n:])) for row in rows]
+
+
+@dataclass(slots=True)
+class CountermeasureRecord(_Record):
+    """対策"""
+    MODEL: ClassVar[Any] = Countermeasure
+
+    evaluation_id: str
+    strategy_type: str
+    description: str
+    priority: Optional[int] = None
+    feasibility: Optional[str] = None
+    implementation_timeline: Optional[str] = None
+    expected_effect: Optional[str] = None
+    meta_id: Optional[str] = None
+    source_hash: Optional[str] = None
+    measure_id: str = field(default_factory=_new_id)
+    created_at: datetime = field(default_factory=datetime.utcnow)
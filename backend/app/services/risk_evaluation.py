@@ -1,40 +1,97 @@
 """Risk evaluation service."""
 
 import json
-import re
-from typing import Dict
-from pydantic import BaseModel
+import os
+import statistics
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel, Field
 from app.models import IdentifiedRisk, RiskEvaluation
 from app.llm.client import LLMClient
+from app.llm.context import CallSite, call_site
 from app.llm.prompts import RiskEvaluationPrompt
+from app.llm.structured import T, extract_json
+from app.schemas.llm_output import SeverityOutput, FrequencyOutput, AvoidabilityOutput
+from app.services.single_flight import make_key
 
 
 class SeverityScore(BaseModel):
     """過酷度スコア"""
     score: int
     rationale: str
+    # 一貫性モードで集約したサンプルのスコア（1回の評価では空）
+    samples: List[int] = Field(default_factory=list)
 
 
 class FrequencyScore(BaseModel):
     """発生頻度スコア"""
     score: int
     rationale: str
+    samples: List[int] = Field(default_factory=list)
 
 
 class AvoidabilityScore(BaseModel):
     """回避可能性スコア"""
     score: int
     rationale: str
+    samples: List[int] = Field(default_factory=list)
+
+
+class Aggregation:
+    """一貫性モードでサンプルのスコアを1つにまとめる方法"""
+    MEDIAN = "median"
+    MAJORITY = "majority"
+
+    ALL = (MEDIAN, MAJORITY)
+
+
+# 一貫性モードのサンプル数の上限（1リクエストあたりの費用を抑える）
+MAX_SAMPLES = 9
+
+
+def aggregate_scores(scores: List[int], method: str = Aggregation.MEDIAN) -> int:
+    """サンプルのスコアを1つにまとめる
+
+    MEDIANは中央値、MAJORITYは最頻値。偶数件の中央値や最頻値の同数は高い方を選ぶ
+    （3軸ともスコアが高いほどリスクが高く、リスクを低く見積もらないようにする）。
+    """
+    if method == Aggregation.MAJORITY:
+        counts = Counter(scores)
+        top = max(counts.values())
+        return max(score for score, count in counts.items() if count == top)
+    return statistics.median_high(scores)
+
+
+def score_agreement(scores: List[int], score: int) -> float:
+    """集約したスコアと一致したサンプルの割合"""
+    return scores.count(score) / len(scores)
 
 
 class RiskEvaluationService:
     """リスク評価サービス
 
     過酷度・発生頻度・回避可能性の3軸でリスクを評価する。
+
+    samples を2以上にすると一貫性モードになり、軸ごとにk件の評価を並行して
+    生成し（nに対応するプロバイダーでは1回のリクエスト）、aggregation の方法で
+    スコアを集約する。根拠は集約したスコアと同じスコアのサンプルのものを使い、
+    スコアの分散と一致率を評価結果に残す。評価を何度もやり直す代わりに、
+    k倍の決まった費用で安定したスコアを得るためのもの。
     """
 
-    def __init__(self, llm_client: LLMClient):
+    def __init__(
+        self,
+        llm_client: LLMClient,
+        samples: Optional[int] = None,
+        aggregation: Optional[str] = None
+    ):
         self.llm_client = llm_client
+        self.samples = samples or int(os.getenv("EVALUATION_SAMPLES", "1"))
+        self.aggregation = aggregation or os.getenv("EVALUATION_AGGREGATION", Aggregation.MEDIAN)
+        if not 1 <= self.samples <= MAX_SAMPLES:
+            raise ValueError(f"samples must be between 1 and {MAX_SAMPLES}")
+        if self.aggregation not in Aggregation.ALL:
+            raise ValueError(f"Unknown aggregation: {self.aggregation}")
 
     async def evaluate_risk(
         self,
@@ -53,6 +110,21 @@ class RiskEvaluationService:
         frequency = await self._evaluate_frequency(risk)
         avoidability = await self._evaluate_avoidability(risk)
 
+        return self._build_evaluation(risk, severity, frequency, avoidability)
+
+    def _build_evaluation(
+        self,
+        risk: IdentifiedRisk,
+        severity: SeverityScore,
+        frequency: FrequencyScore,
+        avoidability: AvoidabilityScore,
+        factory: Callable[..., Any] = RiskEvaluation
+    ) -> Any:
+        """3軸のスコアから評価結果を組み立てる
+
+        factoryにEvaluationRecordを渡すと、ORMのインスタンスの代わりに
+        レコードを返す（一括評価用）。
+        """
         # リスクレベルを計算
         risk_level = self._calculate_risk_level(
             severity.score,
@@ -67,7 +139,7 @@ class RiskEvaluationService:
             avoidability.score
         )
 
-        return RiskEvaluation(
+        return factory(
             risk_id=risk.risk_id,
             severity_score=severity.score,
             severity_rationale=severity.rationale,
@@ -76,15 +148,71 @@ class RiskEvaluationService:
             avoidability_score=avoidability.score,
             avoidability_rationale=avoidability.rationale,
             risk_level=risk_level,
-            normalized_score=normalized_score
+            normalized_score=normalized_score,
+            **self._consistency_stats(severity, frequency, avoidability)
         )
 
-    async def _evaluate_severity(
+    def _consistency_stats(self, *axes: Any) -> Dict[str, Any]:
+        """一貫性モードの統計（サンプル数・軸ごとの分散・一致率）
+
+        サンプルを集約していない評価では空（列はNULLのまま）。
+        """
+        if not all(len(axis.samples) > 1 for axis in axes):
+            return {}
+        severity, frequency, avoidability = axes
+        return {
+            "sample_count": len(severity.samples),
+            "severity_variance": statistics.pvariance(severity.samples),
+            "frequency_variance": statistics.pvariance(frequency.samples),
+            "avoidability_variance": statistics.pvariance(avoidability.samples),
+            "agreement": min(score_agreement(axis.samples, axis.score) for axis in axes),
+        }
+
+    async def _sample(
         self,
-        risk: IdentifiedRisk
-    ) -> SeverityScore:
-        """過酷度を評価"""
-        prompt = f"""# タスク
+        prompt: str,
+        schema: Type[T],
+        field: str
+    ) -> Tuple[int, str, List[int]]:
+        """評価の出力を生成し、(スコア, 根拠, サンプルのスコア) を返す
+
+        一貫性モードではk件のサンプルを集約する。1回の評価ではサンプルは空。
+        """
+        if self.samples == 1:
+            output = await self.llm_client.call_structured(
+                prompt,
+                schema,
+                system_prompt=RiskEvaluationPrompt.SYSTEM_PROMPT
+            )
+            return getattr(output, field), output.rationale, []
+
+        outputs = await self.llm_client.sample_structured(
+            prompt,
+            schema,
+            self.samples,
+            system_prompt=RiskEvaluationPrompt.SYSTEM_PROMPT
+        )
+        scores = [getattr(output, field) for output in outputs]
+        score = aggregate_scores(scores, self.aggregation)
+        rationale = next(o.rationale for o in outputs if getattr(o, field) == score)
+        return score, rationale, scores
+
+    def coalesce_key(self, risk: IdentifiedRisk) -> str:
+        """同時リクエスト合流用のキーを生成"""
+        # 一貫性モードの評価は1回の評価と合流させない
+        mode = [] if self.samples == 1 else [f"{self.aggregation}:{self.samples}"]
+        return make_key(
+            "evaluate",
+            risk.risk_id,
+            self._severity_prompt(risk),
+            self._frequency_prompt(risk),
+            self._avoidability_prompt(risk),
+            *mode
+        )
+
+    def _severity_prompt(self, risk: IdentifiedRisk) -> str:
+        """過酷度評価のプロンプトを生成"""
+        return f"""# タスク
 以下のリスクについて、過酷度（被害の深刻さ）を1-5のスケールで評価してください。
 
 # リスク情報
@@ -109,24 +237,25 @@ class RiskEvaluationService:
 - 影響を受ける人数と被害の深刻度を総合的に判断する
 """
 
-        response = await self.llm_client.call(
-            prompt=prompt,
-            system_prompt=RiskEvaluationPrompt.SYSTEM_PROMPT
-        )
+    async def _evaluate_severity(
+        self,
+        risk: IdentifiedRisk
+    ) -> SeverityScore:
+        """過酷度を評価"""
+        prompt = self._severity_prompt(risk)
 
-        data = self._parse_json_response(response)
+        with call_site(CallSite.SEVERITY):
+            score, rationale, samples = await self._sample(prompt, SeverityOutput, "severity_score")
 
         return SeverityScore(
-            score=data["severity_score"],
-            rationale=data["rationale"]
+            score=score,
+            rationale=rationale,
+            samples=samples
         )
 
-    async def _evaluate_frequency(
-        self,
-        risk: IdentifiedRisk
-    ) -> FrequencyScore:
-        """発生頻度を評価"""
-        prompt = f"""# タスク
+    def _frequency_prompt(self, risk: IdentifiedRisk) -> str:
+        """発生頻度評価のプロンプトを生成"""
+        return f"""# タスク
 以下のリスクについて、発生頻度を1-5のスケールで評価してください。
 
 # リスク情報
@@ -151,24 +280,25 @@ class RiskEvaluationService:
 - 継続的な運用期間での累積確率を推定する
 """
 
-        response = await self.llm_client.call(
-            prompt=prompt,
-            system_prompt=RiskEvaluationPrompt.SYSTEM_PROMPT
-        )
+    async def _evaluate_frequency(
+        self,
+        risk: IdentifiedRisk
+    ) -> FrequencyScore:
+        """発生頻度を評価"""
+        prompt = self._frequency_prompt(risk)
 
-        data = self._parse_json_response(response)
+        with call_site(CallSite.FREQUENCY):
+            score, rationale, samples = await self._sample(prompt, FrequencyOutput, "frequency_score")
 
         return FrequencyScore(
-            score=data["frequency_score"],
-            rationale=data["rationale"]
+            score=score,
+            rationale=rationale,
+            samples=samples
         )
 
-    async def _evaluate_avoidability(
-        self,
-        risk: IdentifiedRisk
-    ) -> AvoidabilityScore:
-        """回避可能性を評価"""
-        prompt = f"""# タスク
+    def _avoidability_prompt(self, risk: IdentifiedRisk) -> str:
+        """回避可能性評価のプロンプトを生成"""
+        return f"""# タスク
 以下のリスクについて、回避可能性を1-5のスケールで評価してください。
 
 # リスク情報
@@ -193,38 +323,25 @@ class RiskEvaluationService:
 - 人的・技術的な対応能力が十分か
 """
 
-        response = await self.llm_client.call(
-            prompt=prompt,
-            system_prompt=RiskEvaluationPrompt.SYSTEM_PROMPT
-        )
+    async def _evaluate_avoidability(
+        self,
+        risk: IdentifiedRisk
+    ) -> AvoidabilityScore:
+        """回避可能性を評価"""
+        prompt = self._avoidability_prompt(risk)
 
-        data = self._parse_json_response(response)
+        with call_site(CallSite.AVOIDABILITY):
+            score, rationale, samples = await self._sample(prompt, AvoidabilityOutput, "avoidability_score")
 
         return AvoidabilityScore(
-            score=data["avoidability_score"],
-            rationale=data["rationale"]
+            score=score,
+            rationale=rationale,
+            samples=samples
         )
 
     def _parse_json_response(self, response: str) -> Dict:
-        """JSONレスポンスをパース"""
-        json_str = response.strip()
-
-        # コードブロックを除去
-        if json_str.startswith("```json"):
-            json_str = json_str[7:]
-        elif json_str.startswith("```"):
-            json_str = json_str[3:]
-        if json_str.endswith("```"):
-            json_str = json_str[:-3]
-        json_str = json_str.strip()
-
-        # 正規表現でJSONオブジェクトを抽出（最初の { から対応する } まで）
-        # これにより、JSON後の追加テキストを無視できる
-        match = re.search(r'\{.*\}', json_str, re.DOTALL)
-        if match:
-            json_str = match.group(0)
-
-        return json.loads(json_str)
+        """JSONレスポンスをパース（バッチの結果などテキストの応答用）"""
+        return json.loads(extract_json(response))
 
     def _calculate_risk_level(
         self,
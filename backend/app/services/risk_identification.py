@@ -1,66 +1,113 @@
 """Risk identification service."""
 
-from typing import List, Optional
-import json
-import re
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from functools import lru_cache
+import asyncio
+import math
+import os
 from app.models import RiskSituation, IdentifiedRisk, Guideword
 from app.llm.client import LLMClient
+from app.llm.context import CallSite, call_site
 from app.llm.prompts import RiskIdentificationPrompt
+from app.llm.structured import JsonArrayStream, parse_structured
+from app.llm.tokens import count_tokens, split_into_chunks
+from app.schemas.llm_output import RiskIdentificationOutput, IdentifiedRiskOutput
+from app.services.similarity import SimilarityIndex
+from app.services.single_flight import make_key
+
+
+# ガイドワードマスタ
+GUIDEWORD_DATA = [
+    # データカテゴリ
+    {"category": "データ", "name": "網羅性",
+     "description": "学習データが対象領域を十分にカバーしていない"},
+    {"category": "データ", "name": "分布シフト",
+     "description": "学習時と運用時でデータ分布が異なる"},
+    {"category": "データ", "name": "差別と偏見",
+     "description": "データに社会的バイアスが含まれる"},
+    {"category": "データ", "name": "著作権",
+     "description": "学習データに著作権上の問題がある"},
+    {"category": "データ", "name": "センシティブ",
+     "description": "個人情報や機密情報が含まれる"},
+    # モデルカテゴリ
+    {"category": "モデル", "name": "配慮の欠如",
+     "description": "安全性や倫理への配慮が不足"},
+    {"category": "モデル", "name": "例外処理",
+     "description": "想定外入力への対応が不十分"},
+    {"category": "モデル", "name": "無傾向データ",
+     "description": "ノイズや無関係なデータへの過学習"},
+    {"category": "モデル", "name": "公平性",
+     "description": "特定グループに不公平な結果"},
+    # 運用カテゴリ
+    {"category": "運用", "name": "誤使用",
+     "description": "想定外の用途での使用"},
+    {"category": "運用", "name": "人間の監視",
+     "description": "人間による監督が不十分"},
+    {"category": "運用", "name": "社会的評価の低下",
+     "description": "サービスへの信頼喪失"},
+    {"category": "運用", "name": "基本権侵害",
+     "description": "人権やプライバシーの侵害"},
+]
+
+
+@lru_cache(maxsize=1)
+def load_guidewords() -> Tuple[Guideword, ...]:
+    """ガイドワードマスタをロード（プロセス内で1回だけ作成して共有する）"""
+    return tuple(
+        Guideword(
+            guideword_id=f"gw-{i:02d}",
+            category=gw["category"],
+            name=gw["name"],
+            description=gw["description"]
+        )
+        for i, gw in enumerate(GUIDEWORD_DATA, 1)
+    )
+
+
+@lru_cache(maxsize=256)
+def guideword_section(guidewords: Tuple[Tuple[str, str, str], ...]) -> str:
+    """プロンプトのガイドワード部分（(カテゴリ, 名前, 説明) の組ごとにキャッシュ）"""
+    # カテゴリごとにガイドワードを整理
+    categories: Dict[str, List[Tuple[str, str]]] = {}
+    for category, name, description in guidewords:
+        categories.setdefault(category, []).append((name, description))
+
+    section = ""
+    for category, gws in categories.items():
+        section += f"\n## {category}カテゴリ\n"
+        for name, description in gws:
+            section += f"- {name}: {description}\n"
+    return section
 
 
 class RiskIdentificationService:
     """リスク特定サービス
 
     ガイドワードに基づいてリスクを体系的に特定する。
+
+    状況の説明がchunk_tokensを超える場合はmap-reduceで特定する。説明を
+    重なりのあるチャンクに分割して並行して特定し、チャンクごとのリスクを
+    類似度で統合する。
     """
 
-    def __init__(self, llm_client: LLMClient):
+    def __init__(
+        self,
+        llm_client: LLMClient,
+        chunk_tokens: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        merge_threshold: Optional[float] = None
+    ):
         self.llm_client = llm_client
-        self.guidewords = self._load_guidewords()
-
-    def _load_guidewords(self) -> List[Guideword]:
-        """ガイドワードマスタをロード"""
-        guidewords_data = [
-            # データカテゴリ
-            {"category": "データ", "name": "網羅性",
-             "description": "学習データが対象領域を十分にカバーしていない"},
-            {"category": "データ", "name": "分布シフト",
-             "description": "学習時と運用時でデータ分布が異なる"},
-            {"category": "データ", "name": "差別と偏見",
-             "description": "データに社会的バイアスが含まれる"},
-            {"category": "データ", "name": "著作権",
-             "description": "学習データに著作権上の問題がある"},
-            {"category": "データ", "name": "センシティブ",
-             "description": "個人情報や機密情報が含まれる"},
-            # モデルカテゴリ
-            {"category": "モデル", "name": "配慮の欠如",
-             "description": "安全性や倫理への配慮が不足"},
-            {"category": "モデル", "name": "例外処理",
-             "description": "想定外入力への対応が不十分"},
-            {"category": "モデル", "name": "無傾向データ",
-             "description": "ノイズや無関係なデータへの過学習"},
-            {"category": "モデル", "name": "公平性",
-             "description": "特定グループに不公平な結果"},
-            # 運用カテゴリ
-            {"category": "運用", "name": "誤使用",
-             "description": "想定外の用途での使用"},
-            {"category": "運用", "name": "人間の監視",
-             "description": "人間による監督が不十分"},
-            {"category": "運用", "name": "社会的評価の低下",
-             "description": "サービスへの信頼喪失"},
-            {"category": "運用", "name": "基本権侵害",
-             "description": "人権やプライバシーの侵害"},
-        ]
-
-        return [
-            Guideword(
-                guideword_id=f"gw-{i:02d}",
-                category=gw["category"],
-                name=gw["name"],
-                description=gw["description"]
-            )
-            for i, gw in enumerate(guidewords_data, 1)
-        ]
+        self.guidewords = list(load_guidewords())
+        self.chunk_tokens = chunk_tokens or int(os.getenv("IDENTIFICATION_CHUNK_TOKENS", "2000"))
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else int(
+            os.getenv("IDENTIFICATION_CHUNK_OVERLAP", "200")
+        )
+        self.concurrency = concurrency or int(os.getenv("IDENTIFICATION_CONCURRENCY", "4"))
+        self.merge_threshold = merge_threshold if merge_threshold is not None else float(
+            os.getenv("IDENTIFICATION_MERGE_THRESHOLD", "0.5")
+        )
 
     async def identify_risks(
         self,
@@ -79,17 +126,23 @@ class RiskIdentificationService:
         # 使用するガイドワードを決定
         guidewords = self._filter_guidewords(selected_guidewords)
 
+        chunks = self.split_description(situation.description)
+        if len(chunks) > 1:
+            return await self._identify_chunked(situation, guidewords, chunks)
+
         # プロンプト生成
         prompt = self._generate_prompt(situation, guidewords)
 
-        # LLM呼び出し
-        response = await self.llm_client.call(
-            prompt=prompt,
-            system_prompt=RiskIdentificationPrompt.SYSTEM_PROMPT
-        )
+        # LLM呼び出し（出力形式のスキーマで検証済みの応答を受け取る）
+        with call_site(CallSite.RISK_IDENTIFICATION):
+            output = await self.llm_client.call_structured(
+                prompt,
+                RiskIdentificationOutput,
+                system_prompt=RiskIdentificationPrompt.SYSTEM_PROMPT
+            )
 
-        # レスポンス解析
-        risks = self._parse_response(response, situation)
+        # リスクオブジェクトに変換
+        risks = self._build_risks(output, situation)
 
         # 重複除去
         deduplicated_risks = self._deduplicate_risks(risks)
@@ -99,6 +152,190 @@ class RiskIdentificationService:
 
         return prioritized_risks
 
+    async def identify_risks_stream(
+        self,
+        situation: RiskSituation,
+        selected_guidewords: Optional[List[str]] = None,
+        queue_size: int = 8
+    ) -> AsyncIterator[IdentifiedRisk]:
+        """リスクを特定し、LLMの出力から1件取り出せるたびに返す
+
+        応答全体を待たずに後段（評価・対策導出）を始めるために使う。
+        長い説明はチャンクごとに並行してストリーミングし、先に届いたリスクから返す。
+        既に返したリスクは後から変更できないため、チャンク間で類似するリスクは
+        最初の1件だけを返し、信頼度の引き上げ（_merge_risks）は行わない。
+        スキーマに合わない要素は読み飛ばす。優先順位付けは行わず、特定された順に返す。
+
+        取り出したリスクは容量 queue_size の待ち行列で受け渡し、呼び出し側が
+        読まない間はストリームの読み込みも止める（未読のリスクを溜め込まない）。
+        """
+        guidewords = self._filter_guidewords(selected_guidewords)
+        chunks = self.split_description(situation.description)
+        if len(chunks) == 1:
+            prompts = [self._generate_prompt(situation, guidewords)]
+        else:
+            prompts = [
+                self._generate_prompt(situation, guidewords, description=chunk, part=(i + 1, len(chunks)))
+                for i, chunk in enumerate(chunks)
+            ]
+
+        seen_descriptions = set()
+        indexes: Dict[str, SimilarityIndex] = {}
+
+        def is_new(risk: IdentifiedRisk) -> bool:
+            if risk.risk_description in seen_descriptions:
+                return False
+            seen_descriptions.add(risk.risk_description)
+            if len(prompts) == 1:
+                return True
+            index = indexes.setdefault(
+                risk.guideword, SimilarityIndex(threshold=self.merge_threshold)
+            )
+            if index.query(risk.risk_description):
+                return False
+            index.add(len(seen_descriptions), risk.risk_description)
+            return True
+
+        # プロンプト（チャンク）ごとのストリームをタスクで並行して読み、届いた順に返す
+        # （呼び出し箇所のコンテキストをこのジェネレーターの呼び出し側に持ち込まない）
+        queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def produce(prompt: str) -> None:
+            parser = JsonArrayStream("identified_risks")
+            async with semaphore:
+                with call_site(CallSite.RISK_IDENTIFICATION):
+                    async for piece in self.llm_client.stream(
+                        prompt,
+                        system_prompt=RiskIdentificationPrompt.SYSTEM_PROMPT
+                    ):
+                        for item in parser.feed(piece):
+                            try:
+                                output = IdentifiedRiskOutput.model_validate(item)
+                            except ValueError:
+                                continue
+                            await queue.put(output)
+
+        async def produce_all() -> None:
+            try:
+                await asyncio.gather(*[produce(p) for p in prompts])
+            finally:
+                await queue.put(None)
+
+        producer = asyncio.ensure_future(produce_all())
+        try:
+            while (output := await queue.get()) is not None:
+                [risk] = self._build_risks(
+                    RiskIdentificationOutput(identified_risks=[output]), situation
+                )
+                if is_new(risk):
+                    yield risk
+            # ストリームの失敗を呼び出し側に伝える
+            await producer
+        finally:
+            producer.cancel()
+
+    def split_description(self, description: Optional[str]) -> List[str]:
+        """状況の説明をチャンクに分割（chunk_tokens以下なら1チャンク）"""
+        description = description or ""
+        if count_tokens(description) <= self.chunk_tokens:
+            return [description]
+        return split_into_chunks(description, self.chunk_tokens, self.chunk_overlap)
+
+    async def _identify_chunked(
+        self,
+        situation: RiskSituation,
+        guidewords: List[Guideword],
+        chunks: List[str]
+    ) -> List[IdentifiedRisk]:
+        """チャンクごとに並行してリスクを特定し、統合する（map-reduce）"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def identify(index: int, chunk: str) -> List[IdentifiedRisk]:
+            prompt = self._generate_prompt(
+                situation, guidewords, description=chunk, part=(index + 1, len(chunks))
+            )
+            async with semaphore:
+                with call_site(CallSite.RISK_IDENTIFICATION):
+                    output = await self.llm_client.call_structured(
+                        prompt,
+                        RiskIdentificationOutput,
+                        system_prompt=RiskIdentificationPrompt.SYSTEM_PROMPT
+                    )
+            return self._deduplicate_risks(self._build_risks(output, situation))
+
+        partials = await asyncio.gather(*[identify(i, c) for i, c in enumerate(chunks)])
+        return self._prioritize_risks(self._merge_risks(partials))
+
+    def _merge_risks(
+        self,
+        partials: List[List[IdentifiedRisk]]
+    ) -> List[IdentifiedRisk]:
+        """チャンクごとに特定されたリスクを統合
+
+        同じガイドワードで記述が類似するリスクを1件にまとめ、記述は信頼度の
+        最も高いものを採用する。複数のチャンクで特定されたリスクは根拠が
+        重なるとみなし、信頼度を 1 - Π(1 - 各信頼度) に引き上げる。
+        ただし、隣接するチャンクは重なり（chunk_overlap）の部分で同じ記述を
+        読んでいるため、続けて特定された分は1つの根拠として最大値を採る。
+
+        Args:
+            partials: チャンクごとのリスクのリスト（チャンクの順）
+
+        Returns:
+            統合されたリスクのリスト（最初に特定された順）
+        """
+        merged: List[IdentifiedRisk] = []
+        # 統合したリスクごとの、チャンク番号 → そのチャンクでの最大の信頼度
+        hits: List[Dict[int, float]] = []
+        indexes: Dict[str, SimilarityIndex] = {}
+
+        for chunk, risks in enumerate(partials):
+            for risk in risks:
+                index = indexes.setdefault(
+                    risk.guideword, SimilarityIndex(threshold=self.merge_threshold)
+                )
+                matches = index.query(risk.risk_description)
+                if not matches:
+                    index.add(len(merged), risk.risk_description)
+                    merged.append(risk)
+                    hits.append({chunk: risk.confidence_score})
+                    continue
+                position = matches[0][0]
+                hits[position][chunk] = max(hits[position].get(chunk, 0.0), risk.confidence_score)
+                if risk.confidence_score > merged[position].confidence_score:
+                    merged[position] = risk
+
+        for risk, chunk_scores in zip(merged, hits):
+            evidence = self._independent_evidence(chunk_scores)
+            risk.confidence_score = round(1 - math.prod(1 - score for score in evidence), 2)
+        return merged
+
+    def _independent_evidence(self, chunk_scores: Dict[int, float]) -> List[float]:
+        """チャンクごとの信頼度を、独立した根拠ごとの信頼度にまとめる
+
+        重なりのあるチャンク分割では、連続するチャンクでの検出を1つの根拠（最大値）とする。
+        """
+        evidence: List[float] = []
+        previous = None
+        for chunk in sorted(chunk_scores):
+            if evidence and self.chunk_overlap and chunk == previous + 1:
+                evidence[-1] = max(evidence[-1], chunk_scores[chunk])
+            else:
+                evidence.append(chunk_scores[chunk])
+            previous = chunk
+        return evidence
+
+    def coalesce_key(
+        self,
+        situation: RiskSituation,
+        selected_guidewords: Optional[List[str]] = None
+    ) -> str:
+        """同時リクエスト合流用のキーを生成"""
+        guidewords = self._filter_guidewords(selected_guidewords)
+        prompt = self._generate_prompt(situation, guidewords)
+        return make_key("identify-risks", situation.situation_id, prompt)
+
     def _filter_guidewords(
         self,
         selected: Optional[List[str]]
@@ -111,15 +348,30 @@ class RiskIdentificationService:
     def _generate_prompt(
         self,
         situation: RiskSituation,
-        guidewords: List[Guideword]
+        guidewords: List[Guideword],
+        description: Optional[str] = None,
+        part: Optional[Tuple[int, int]] = None
     ) -> str:
-        """プロンプトを生成"""
+        """プロンプトを生成
+
+        Args:
+            situation: リスク状況
+            guidewords: 使用するガイドワード
+            description: 状況の説明の代わりに使うチャンク
+            part: チャンクの番号と総数
+        """
+        if part is not None:
+            heading = f"状況（長い説明の一部: {part[0]}/{part[1]}）"
+            note = "\nこの部分に書かれている内容から読み取れるリスクのみを挙げてください。\n"
+        else:
+            heading, note = "状況", ""
+
         prompt = f"""# タスク
 以下のAIシステムに関する状況から、潜在的なリスクを特定してください。
 
-# 状況
-{situation.description}
-
+# {heading}
+{situation.description if description is None else description}
+{note}
 # コンテキスト
 - 業界: {situation.industry or '不明'}
 - AIの種類: {situation.ai_type or '不明'}
@@ -129,17 +381,9 @@ class RiskIdentificationService:
 以下のガイドワードのそれぞれについて、該当するリスクがあるかを検討してください:
 
 """
-        # カテゴリごとにガイドワードを整理
-        categories = {}
-        for gw in guidewords:
-            if gw.category not in categories:
-                categories[gw.category] = []
-            categories[gw.category].append(gw)
-
-        for category, gws in categories.items():
-            prompt += f"\n## {category}カテゴリ\n"
-            for gw in gws:
-                prompt += f"- {gw.name}: {gw.description}\n"
+        prompt += guideword_section(tuple(
+            (gw.category, gw.name, gw.description) for gw in guidewords
+        ))
 
         prompt += """
 # 出力形式
@@ -165,51 +409,35 @@ class RiskIdentificationService:
 """
         return prompt
 
+    def _build_risks(
+        self,
+        output: RiskIdentificationOutput,
+        situation: RiskSituation
+    ) -> List[IdentifiedRisk]:
+        """検証済みの出力をリスクオブジェクトに変換"""
+        return [
+            IdentifiedRisk(
+                situation_id=situation.situation_id,
+                category=item.category,
+                guideword=item.guideword,
+                risk_description=item.risk_description,
+                affected_area=item.affected_area or "",
+                confidence_score=self._confidence_to_score(item.confidence or "中")
+            )
+            for item in output.identified_risks
+        ]
+
     def _parse_response(
         self,
         response: str,
         situation: RiskSituation
     ) -> List[IdentifiedRisk]:
-        """LLMレスポンスを解析してリスクオブジェクトに変換"""
+        """テキストのLLMレスポンスを解析してリスクオブジェクトに変換"""
         try:
-            # JSON抽出（マークダウンのコードブロックを除去）
-            json_str = response.strip()
-
-            # コードブロックを除去
-            if json_str.startswith("```json"):
-                json_str = json_str[7:]
-            elif json_str.startswith("```"):
-                json_str = json_str[3:]
-            if json_str.endswith("```"):
-                json_str = json_str[:-3]
-            json_str = json_str.strip()
-
-            # 正規表現でJSONオブジェクトを抽出（最初の { から対応する } まで）
-            # これにより、JSON後の追加テキストを無視できる
-            match = re.search(r'\{.*\}', json_str, re.DOTALL)
-            if match:
-                json_str = match.group(0)
-
-            data = json.loads(json_str)
-
-            risks = []
-            for item in data.get("identified_risks", []):
-                risk = IdentifiedRisk(
-                    situation_id=situation.situation_id,
-                    category=item["category"],
-                    guideword=item["guideword"],
-                    risk_description=item["risk_description"],
-                    affected_area=item.get("affected_area", ""),
-                    confidence_score=self._confidence_to_score(
-                        item.get("confidence", "中")
-                    )
-                )
-                risks.append(risk)
-
-            return risks
-
-        except json.JSONDecodeError as e:
+            output = parse_structured(response, RiskIdentificationOutput)
+        except ValueError as e:
             raise ValueError(f"LLMレスポンスのJSON解析に失敗: {e}")
+        return self._build_risks(output, situation)
 
     def _confidence_to_score(self, confidence: str) -> float:
         """信頼度テキストをスコアに変換"""
@@ -0,0 +1,431 @@
+"""Full-text search over risks, rationales and countermeasures."""
+
+import os
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import or_, text
+from sqlalchemy.orm import Session
+from app.database.persistence import on_committed_inserts
+from app.models import IdentifiedRisk, RiskEvaluation, Countermeasure, MetaCountermeasure
+from app.services.similarity import normalize
+
+# 検索対象の種別 → (モデル, 主キー, 検索対象の項目)
+SEARCH_FIELDS: Dict[str, Tuple[Any, str, Tuple[str, ...]]] = {
+    "risk": (IdentifiedRisk, "risk_id", ("risk_description", "affected_area")),
+    "evaluation": (
+        RiskEvaluation, "evaluation_id",
+        ("severity_rationale", "frequency_rationale", "avoidability_rationale")
+    ),
+    "countermeasure": (Countermeasure, "measure_id", ("description", "expected_effect")),
+    "meta_countermeasure": (MetaCountermeasure, "meta_id", ("meta_approach",)),
+}
+
+KINDS = list(SEARCH_FIELDS)
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+_TABLE_KINDS = {model.__tablename__: kind for kind, (model, _, _) in SEARCH_FIELDS.items()}
+
+# 候補をデータベースで検証する1回あたりの件数
+_BATCH_SIZE = 200
+
+
+@dataclass
+class SearchFilters:
+    """検索結果の絞り込み条件（評価スコアは対象のリスクの評価で判定）"""
+    kinds: Optional[List[str]] = None
+    situation_id: Optional[str] = None
+    min_severity: Optional[int] = None
+    min_frequency: Optional[int] = None
+    min_avoidability: Optional[int] = None
+    risk_level: Optional[str] = None
+
+
+@dataclass
+class SearchHit:
+    """検索結果"""
+    kind: str
+    id: str
+    field: str
+    text: str
+    risk_id: Optional[str] = None
+    situation_id: Optional[str] = None
+    severity_score: Optional[int] = None
+    frequency_score: Optional[int] = None
+    avoidability_score: Optional[int] = None
+    risk_level: Optional[str] = None
+
+
+def bigrams(normalized: str) -> List[str]:
+    """正規化済みテキストの文字bigram（重複なし）"""
+    return list(dict.fromkeys(normalized[i:i + 2] for i in range(len(normalized) - 1)))
+
+
+def _contains(posting: array, doc: int) -> bool:
+    i = bisect_left(posting, doc)
+    return i < len(posting) and posting[i] == doc
+
+
+class BigramSearchIndex:
+    """文字bigramの転置インデックス
+
+    日本語は単語区切りがないため、正規化したテキストの文字bigramを
+    トークンとする。1行（検索対象の項目をまとめたもの）を1文書とし、
+    文書番号の昇順のポスティングリスト（array）を持つ。最も短いポスティング
+    リストを新しい順にチャンク単位で走査し、配列に持つ種別・評価スコアで
+    絞り込んでから、残りのbigramを二分探索で確認する。
+    bigramの共起は部分文字列の一致を保証しないため、候補は呼び出し側で検証する。
+
+    保存された行はコミット時に追加される（on_committed_inserts）。
+    削除された行は候補の検証時に除外される。
+    """
+
+    _CHUNK = 4096
+
+    def __init__(self):
+        self._postings: Dict[str, array] = {}
+        # 文書番号 → 種別コード・行のID・リスク番号（不明は-1）
+        self._doc_kind = bytearray()
+        self._doc_ids: List[str] = []
+        self._doc_risk = array("i")
+        # リスク番号 → リスクID・状況ID・評価スコア（未評価は0）・リスクレベル
+        self._risk_numbers: Dict[str, int] = {}
+        self._risk_ids: List[str] = []
+        self._risk_situation: List[Optional[str]] = []
+        self._severity = bytearray()
+        self._frequency = bytearray()
+        self._avoidability = bytearray()
+        self._risk_level: List[Optional[str]] = []
+        self._evaluation_risk: Dict[str, int] = {}
+        self._loaded = False
+
+    def __len__(self) -> int:
+        return len(self._doc_ids)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self, db: Session, batch_size: int = 10000) -> "BigramSearchIndex":
+        """データベースの全ての行を登録（初回のみ）
+
+        リスク → 評価 → 対策・メタ対策 の順に読み込み、対策からリスクを辿れるようにする。
+        """
+        if self._loaded:
+            return self
+        for kind, (model, _, fields) in SEARCH_FIELDS.items():
+            columns = self._columns(kind)
+            query = db.query(*[getattr(model, c) for c in columns]).execution_options(
+                yield_per=batch_size
+            )
+            for row in query:
+                self.add(kind, row)
+        self._loaded = True
+        return self
+
+    @staticmethod
+    def _columns(kind: str) -> List[str]:
+        _, primary_key, fields = SEARCH_FIELDS[kind]
+        columns = [primary_key, *fields]
+        if kind == "risk":
+            columns.append("situation_id")
+        elif kind == "evaluation":
+            columns += ["risk_id", "severity_score", "frequency_score", "avoidability_score", "risk_level"]
+        else:
+            columns.append("evaluation_id")
+        return columns
+
+    def add_rows(self, inserted: Dict[str, List[Any]]) -> None:
+        """コミットされた行を登録（読み込み前は何もしない）"""
+        if not self._loaded:
+            return
+        for table_name in ("identified_risks", "risk_evaluations", "countermeasures", "meta_countermeasures"):
+            for row in inserted.get(table_name, []):
+                self.add(_TABLE_KINDS[table_name], row)
+
+    def _risk_number(self, risk_id: str) -> int:
+        number = self._risk_numbers.get(risk_id)
+        if number is None:
+            number = self._risk_numbers[risk_id] = len(self._risk_ids)
+            self._risk_ids.append(risk_id)
+            self._risk_situation.append(None)
+            self._severity.append(0)
+            self._frequency.append(0)
+            self._avoidability.append(0)
+            self._risk_level.append(None)
+        return number
+
+    def add(self, kind: str, row: Any) -> None:
+        """行を1文書として登録"""
+        _, primary_key, fields = SEARCH_FIELDS[kind]
+        if kind == "risk":
+            risk = self._risk_number(row.risk_id)
+            self._risk_situation[risk] = row.situation_id
+        elif kind == "evaluation":
+            risk = self._evaluation_risk[row.evaluation_id] = self._risk_number(row.risk_id)
+            self._severity[risk] = row.severity_score or 0
+            self._frequency[risk] = row.frequency_score or 0
+            self._avoidability[risk] = row.avoidability_score or 0
+            self._risk_level[risk] = row.risk_level
+        else:
+            risk = self._evaluation_risk.get(row.evaluation_id, -1)
+
+        doc = len(self._doc_ids)
+        self._doc_kind.append(KIND_CODES[kind])
+        self._doc_ids.append(getattr(row, primary_key))
+        self._doc_risk.append(risk)
+        tokens = set()
+        for name in fields:
+            tokens.update(bigrams(normalize(getattr(row, name))))
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = array("I")
+            posting.append(doc)
+
+    def risk_info(self, risk: int) -> Dict[str, Any]:
+        """リスク番号のリスクID・状況ID・評価スコア"""
+        if risk < 0:
+            return {}
+        return {
+            "risk_id": self._risk_ids[risk],
+            "situation_id": self._risk_situation[risk],
+            "severity_score": self._severity[risk] or None,
+            "frequency_score": self._frequency[risk] or None,
+            "avoidability_score": self._avoidability[risk] or None,
+            "risk_level": self._risk_level[risk],
+        }
+
+    def _predicate(self, filters: SearchFilters) -> Optional[Callable[[int], bool]]:
+        """絞り込み条件を文書番号の判定関数に変換（条件がなければNone）"""
+        checks: List[Callable[[int], bool]] = []
+        doc_risk = self._doc_risk
+        if filters.kinds:
+            codes = {KIND_CODES[k] for k in filters.kinds}
+            doc_kind = self._doc_kind
+            checks.append(lambda d: doc_kind[d] in codes)
+        if filters.situation_id:
+            situations, situation_id = self._risk_situation, filters.situation_id
+            checks.append(lambda d: doc_risk[d] >= 0 and situations[doc_risk[d]] == situation_id)
+        for minimum, scores in (
+            (filters.min_severity, self._severity),
+            (filters.min_frequency, self._frequency),
+            (filters.min_avoidability, self._avoidability),
+        ):
+            if minimum is not None:
+                checks.append(
+                    lambda d, m=minimum, s=scores: doc_risk[d] >= 0 and s[doc_risk[d]] >= m
+                )
+        if filters.risk_level is not None:
+            levels, level = self._risk_level, filters.risk_level
+            checks.append(lambda d: doc_risk[d] >= 0 and levels[doc_risk[d]] == level)
+
+        if not checks:
+            return None
+        if len(checks) == 1:
+            return checks[0]
+        return lambda d: all(check(d) for check in checks)
+
+    def candidates(
+        self,
+        query: str,
+        filters: Optional[SearchFilters] = None
+    ) -> Iterator[Tuple[str, str, int]]:
+        """クエリのbigramを全て含み、絞り込み条件を満たす文書（新しい順）
+
+        Args:
+            query: 検索語
+            filters: 絞り込み条件
+
+        Yields:
+            (種別, 行のID, リスク番号)
+        """
+        normalized = normalize(query)
+        if not normalized:
+            return
+        if len(normalized) == 1:
+            # 1文字の検索語はその文字を含むbigramのポスティングの和集合
+            docs = set()
+            for token, posting in self._postings.items():
+                if normalized in token:
+                    docs.update(posting)
+            postings = [array("I", sorted(docs))]
+        else:
+            postings = [self._postings.get(token) for token in bigrams(normalized)]
+            if any(p is None for p in postings):
+                return
+            postings.sort(key=len)
+
+        accept = self._predicate(filters or SearchFilters())
+        shortest, rest = postings[0], postings[1:]
+        kinds, ids, risks = KINDS, self._doc_ids, self._doc_risk
+        for end in range(len(shortest), 0, -self._CHUNK):
+            chunk = shortest[max(0, end - self._CHUNK):end][::-1]
+            if accept is not None:
+                chunk = [d for d in chunk if accept(d)]
+            for doc in chunk:
+                if all(_contains(posting, doc) for posting in rest):
+                    yield kinds[self._doc_kind[doc]], ids[doc], risks[doc]
+
+
+class SearchService:
+    """全文検索サービス
+
+    既定ではプロセス内の文字bigram転置インデックスで候補を絞り込み、
+    候補の行をデータベースから読み込んで部分文字列の一致を検証する。
+    SEARCH_BACKEND=database の場合はデータベースのILIKEで検索する
+    （PostgreSQLではpg_trgmのGINインデックスが使われる。create_postgres_indexesを参照）。
+    """
+
+    def __init__(self, index: Optional[BigramSearchIndex] = None, backend: Optional[str] = None):
+        self.index = index if index is not None else search_index
+        self.backend = backend or os.getenv("SEARCH_BACKEND", "memory")
+
+    def search(
+        self,
+        db: Session,
+        query: str,
+        filters: Optional[SearchFilters] = None,
+        limit: int = 50
+    ) -> List[SearchHit]:
+        """検索語を含むリスク・評価根拠・対策・メタ対策を検索
+
+        Args:
+            db: データベースセッション
+            query: 検索語
+            filters: 種別・状況・評価スコアによる絞り込み条件
+            limit: 返す件数の上限
+
+        Returns:
+            検索結果のリスト
+        """
+        filters = filters or SearchFilters()
+        if self.backend == "database":
+            return self._search_database(db, query, filters, limit)
+        return self._search_index(db, query, filters, limit)
+
+    def _search_index(
+        self,
+        db: Session,
+        query: str,
+        filters: SearchFilters,
+        limit: int
+    ) -> List[SearchHit]:
+        normalized = normalize(query)
+        index = self.index.load(db)
+        hits: List[SearchHit] = []
+        batch: List[Tuple[str, str, int]] = []
+
+        def verify(batch: Sequence[Tuple[str, str, int]]) -> None:
+            by_kind: Dict[str, List[str]] = {}
+            for kind, row_id, _ in batch:
+                by_kind.setdefault(kind, []).append(row_id)
+            rows = {}
+            for kind, row_ids in by_kind.items():
+                model, primary_key, fields = SEARCH_FIELDS[kind]
+                key = getattr(model, primary_key)
+                for row in db.query(key, *[getattr(model, f) for f in fields]).filter(key.in_(row_ids)):
+                    rows[(kind, row[0])] = row
+            for kind, row_id, risk in batch:
+                row = rows.get((kind, row_id))
+                if row is None or len(hits) >= limit:
+                    continue
+                _, _, fields = SEARCH_FIELDS[kind]
+                for name, value in zip(fields, row[1:]):
+                    if value and normalized in normalize(value):
+                        hits.append(SearchHit(
+                            kind=kind, id=row_id, field=name, text=value, **index.risk_info(risk)
+                        ))
+                        break
+
+        for candidate in index.candidates(query, filters):
+            batch.append(candidate)
+            if len(batch) >= max(limit - len(hits), _BATCH_SIZE):
+                verify(batch)
+                batch = []
+                if len(hits) >= limit:
+                    break
+        if batch and len(hits) < limit:
+            verify(batch)
+        return hits
+
+    def _search_database(
+        self,
+        db: Session,
+        query: str,
+        filters: SearchFilters,
+        limit: int
+    ) -> List[SearchHit]:
+        pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        needle = query.lower()
+        hits: List[SearchHit] = []
+        for kind, (model, primary_key, fields) in SEARCH_FIELDS.items():
+            if filters.kinds and kind not in filters.kinds:
+                continue
+            q = db.query(
+                getattr(model, primary_key),
+                *[getattr(model, f) for f in fields],
+                IdentifiedRisk.risk_id,
+                IdentifiedRisk.situation_id,
+                RiskEvaluation.severity_score,
+                RiskEvaluation.frequency_score,
+                RiskEvaluation.avoidability_score,
+                RiskEvaluation.risk_level,
+            )
+            if kind == "risk":
+                q = q.outerjoin(RiskEvaluation, RiskEvaluation.risk_id == IdentifiedRisk.risk_id)
+            elif kind == "evaluation":
+                q = q.join(IdentifiedRisk, IdentifiedRisk.risk_id == RiskEvaluation.risk_id)
+            else:
+                q = q.join(RiskEvaluation, RiskEvaluation.evaluation_id == model.evaluation_id).join(
+                    IdentifiedRisk, IdentifiedRisk.risk_id == RiskEvaluation.risk_id
+                )
+            q = q.filter(or_(*[getattr(model, f).ilike(pattern, escape="\\") for f in fields]))
+            if filters.situation_id:
+                q = q.filter(IdentifiedRisk.situation_id == filters.situation_id)
+            if filters.min_severity is not None:
+                q = q.filter(RiskEvaluation.severity_score >= filters.min_severity)
+            if filters.min_frequency is not None:
+                q = q.filter(RiskEvaluation.frequency_score >= filters.min_frequency)
+            if filters.min_avoidability is not None:
+                q = q.filter(RiskEvaluation.avoidability_score >= filters.min_avoidability)
+            if filters.risk_level is not None:
+                q = q.filter(RiskEvaluation.risk_level == filters.risk_level)
+
+            for row in q.limit(limit - len(hits)):
+                values = row[1:1 + len(fields)]
+                name, value = next(
+                    ((n, v) for n, v in zip(fields, values) if v and needle in v.lower()),
+                    (fields[0], values[0])
+                )
+                risk_id, situation_id, severity, frequency, avoidability, risk_level = row[1 + len(fields):]
+                hits.append(SearchHit(
+                    kind=kind, id=row[0], field=name, text=value,
+                    risk_id=risk_id, situation_id=situation_id,
+                    severity_score=severity, frequency_score=frequency,
+                    avoidability_score=avoidability, risk_level=risk_level,
+                ))
+            if len(hits) >= limit:
+                break
+        return hits
+
+
+def create_postgres_indexes(connection: Any) -> None:
+    """PostgreSQLに検索対象の項目のpg_trgm GINインデックスを作成
+
+    SEARCH_BACKEND=database の場合のILIKE検索で使われる
+    （日本語のトライグラムにはC以外のロケールのデータベースが必要）。
+    """
+    connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for model, _, fields in SEARCH_FIELDS.values():
+        table = model.__tablename__
+        for name in fields:
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_{name}_trgm "
+                f"ON {table} USING gin ({name} gin_trgm_ops)"
+            ))
+
+
+# アプリケーション全体で共有するインスタンス
+search_index = BigramSearchIndex()
+on_committed_inserts(search_index.add_rows)
@@ -0,0 +1,176 @@
+"""Local text similarity index (character n-grams + MinHash LSH)."""
+
+import hashlib
+import re
+import unicodedata
+from typing import Dict, FrozenSet, Hashable, List, Optional, Sequence, Tuple
+
+# 比較時に無視する文字（空白・句読点・括弧類）
+_IGNORED = re.compile(r"[\s、。，．,.・:：;；!！?？「」『』（）()\[\]【】\"']")
+
+_MAX_HASH = (1 << 64) - 1
+
+
+def normalize(text: str) -> str:
+    """比較用に正規化（NFKC、小文字化、空白・句読点の除去）"""
+    return _IGNORED.sub("", unicodedata.normalize("NFKC", text or "").lower())
+
+
+def shingles(text: str, n: int = 2) -> FrozenSet[str]:
+    """文字n-gramの集合を生成
+
+    日本語は単語区切りがないため、形態素解析ではなく文字n-gramで比較する。
+    n文字未満の短い文字列はそれ自体を1要素とする。
+    """
+    normalized = normalize(text)
+    if len(normalized) < n:
+        return frozenset([normalized]) if normalized else frozenset()
+    return frozenset(normalized[i:i + n] for i in range(len(normalized) - n + 1))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Jaccard係数"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """n-gram集合のMinHashシグネチャを計算する
+
+    各要素を一度だけハッシュし、num_perm個の (a*x + b) mod p 変換で
+    疑似的な置換を作る。シード固定のためプロセス間で結果が一致する。
+    """
+
+    _PRIME = (1 << 61) - 1
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        self.num_perm = num_perm
+        params = []
+        for i in range(num_perm):
+            digest = hashlib.blake2b(f"{seed}:{i}".encode(), digest_size=16).digest()
+            a = int.from_bytes(digest[:8], "big") % (self._PRIME - 1) + 1
+            b = int.from_bytes(digest[8:], "big") % self._PRIME
+            params.append((a, b))
+        self._params = params
+
+    @staticmethod
+    def _hash(token: str) -> int:
+        return int.from_bytes(
+            hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+
+    def signature(self, tokens: FrozenSet[str]) -> Tuple[int, ...]:
+        """MinHashシグネチャ"""
+        if not tokens:
+            return tuple([_MAX_HASH] * self.num_perm)
+        hashes = [self._hash(t) for t in tokens]
+        prime = self._PRIME
+        return tuple(
+            min((a * h + b) % prime for h in hashes)
+            for a, b in self._params
+        )
+
+    @staticmethod
+    def estimate(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+        """シグネチャの一致率からJaccard係数を推定"""
+        matches = sum(1 for x, y in zip(sig_a, sig_b) if x == y)
+        return matches / len(sig_a) if sig_a else 0.0
+
+
+class SimilarityIndex:
+    """近似重複テキストを検索するインデックス
+
+    MinHashシグネチャをバンドに分割したLSHで候補を絞り込み、
+    候補のみn-gram集合の正確なJaccard係数で検証する。
+    登録件数がexact_below未満の間は取りこぼしのない全件比較を行う。
+
+    Args:
+        threshold: 類似とみなすJaccard係数の下限
+        n: n-gramの文字数
+        num_perm: MinHashの置換数
+        bands: LSHのバンド数（num_permの約数）
+        exact_below: 全件比較を行う登録件数の上限
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.5,
+        n: int = 2,
+        num_perm: int = 64,
+        bands: int = 32,
+        exact_below: int = 256
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.n = n
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.exact_below = exact_below
+        self._hasher = MinHasher(num_perm)
+        self._shingles: Dict[Hashable, FrozenSet[str]] = {}
+        self._order: Dict[Hashable, int] = {}
+        self._buckets: List[Dict[Tuple[int, ...], List[Hashable]]] = [
+            {} for _ in range(bands)
+        ]
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._shingles
+
+    def _band_keys(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            start = band * self.rows
+            yield band, signature[start:start + self.rows]
+
+    def add(self, key: Hashable, text: str) -> None:
+        """テキストを登録"""
+        tokens = shingles(text, self.n)
+        self._shingles[key] = tokens
+        self._order.setdefault(key, len(self._order))
+        for band, band_key in self._band_keys(self._hasher.signature(tokens)):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def remove(self, key: Hashable) -> None:
+        """登録済みのテキストを削除（未登録なら何もしない）"""
+        tokens = self._shingles.pop(key, None)
+        if tokens is None:
+            return
+        self._order.pop(key, None)
+        for band, band_key in self._band_keys(self._hasher.signature(tokens)):
+            bucket = self._buckets[band].get(band_key)
+            if bucket is None:
+                continue
+            bucket.remove(key)
+            if not bucket:
+                del self._buckets[band][band_key]
+
+    def query(
+        self,
+        text: str,
+        threshold: Optional[float] = None
+    ) -> List[Tuple[Hashable, float]]:
+        """類似する登録済みテキストを検索
+
+        Returns:
+            (キー, Jaccard係数) のリスト（類似度の降順、同率は登録順）
+        """
+        threshold = self.threshold if threshold is None else threshold
+        tokens = shingles(text, self.n)
+        if len(self._shingles) < self.exact_below:
+            candidates = set(self._shingles)
+        else:
+            candidates = set()
+            for band, band_key in self._band_keys(self._hasher.signature(tokens)):
+                candidates.update(self._buckets[band].get(band_key, ()))
+
+        matches = []
+        for key in candidates:
+            score = jaccard(tokens, self._shingles[key])
+            if score >= threshold:
+                matches.append((key, score))
+        matches.sort(key=lambda m: (-m[1], self._order[m[0]]))
+        return matches
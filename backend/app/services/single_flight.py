@@ -0,0 +1,268 @@
+"""Single-flight request coalescing service."""
+
+import asyncio
+import hashlib
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+from sqlalchemy.orm import Session
+from app.database.persistence import insert_ignore
+from app.models import FlightLease
+
+T = TypeVar("T")
+
+
+def make_key(operation: str, entity_id: str, *parts: str) -> str:
+    """合流キーを生成
+
+    Args:
+        operation: 操作名（例: "identify-risks"）
+        entity_id: 対象エンティティのID
+        parts: プロンプトなど、結果を決定する入力
+
+    Returns:
+        エンティティIDとプロンプトハッシュからなるキー
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return f"{operation}:{entity_id}:{digest.hexdigest()}"
+
+
+class SingleFlight:
+    """同一キーの同時実行を1回に合流させる
+
+    実行中の処理と同じキーで呼び出された場合は新たに処理を開始せず、
+    実行中の処理の結果（または例外）を共有する。
+    処理はタスクとして実行されるため、最初の呼び出し元がキャンセルされても
+    後続の呼び出し元は結果を受け取れる。
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """キーに対応する処理を実行し、結果を返す
+
+        Args:
+            key: 合流キー
+            fn: 実行する処理（LLM呼び出しと永続化を含む）
+
+        Returns:
+            処理結果（同時呼び出し間で共有される）
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: str) -> bool:
+        """キーに対応する処理が実行中かどうか"""
+        return key in self._in_flight
+
+    async def drain(self, timeout: Optional[float] = None) -> int:
+        """実行中の処理の完了を待つ（シャットダウン時）
+
+        呼び出し元が切断されても処理は続くため、LLM呼び出しと永続化を
+        途中で打ち切らないようにプロセスの終了前に待機する。
+
+        Args:
+            timeout: 待機する最大時間（秒）
+
+        Returns:
+            時間内に完了しなかった処理の数
+        """
+        tasks = list(self._in_flight.values())
+        if not tasks:
+            return 0
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        return len(pending)
+
+
+class SharedSingleFlight(SingleFlight):
+    """複数のワーカープロセス間でも同一キーの同時実行を1回に合流させる
+
+    プロセス内の合流に加えて、データベースのリース（flight_leases）を
+    取得したプロセスだけが処理を実行する。他のプロセスは待機者として登録し、
+    リースの結果が保存されるまでポーリングして待ち、保存された結果を共有する。
+    結果はプロセス間で受け渡すため、処理は変換済みのレスポンス（bytes）を返す。
+    処理が失敗した場合はリースを解放し、待機中のプロセスの1つが実行し直す。
+
+    プロセス内の合流と同じく、結果は処理の完了時に待っていた呼び出し元にだけ
+    渡す。最後の待機者が受け取った時点でリースを削除し、完了後の呼び出しは
+    処理を実行し直す（結果をキャッシュしない）。
+
+    リースの読み書きは同期のセッションで行うため、イベントループを止めないよう
+    スレッドで実行する。待機中のポーリング間隔は poll_interval から倍々に
+    max_poll_interval まで延ばす（長い処理の待機でデータベースを叩き続けない）。
+
+    Args:
+        session_factory: リースの読み書きに使うセッションを作成する関数
+        lease_ttl: 実行者・待機者が異常終了した場合に他のプロセスが引き継ぐまでの時間（秒）
+        poll_interval: 待機中のプロセスがリースを確認する最初の間隔（秒）
+        max_poll_interval: ポーリング間隔の上限（秒）
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        lease_ttl: Optional[float] = None,
+        poll_interval: float = 0.1,
+        max_poll_interval: Optional[float] = None
+    ):
+        super().__init__()
+        self.session_factory = session_factory
+        self.lease_ttl = timedelta(seconds=lease_ttl if lease_ttl is not None else float(
+            os.getenv("SINGLE_FLIGHT_LEASE_TTL", "300")
+        ))
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval if max_poll_interval is not None else float(
+            os.getenv("SINGLE_FLIGHT_MAX_POLL_INTERVAL", "2.0")
+        )
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        return await super().do(key, lambda: self._run_shared(key, fn))
+
+    async def _run_shared(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        # 待機者として登録したリース（登録していなければNone）
+        waiting: Optional[str] = None
+        interval = self.poll_interval
+        while True:
+            if waiting is None:
+                lease_id, waiting = await asyncio.to_thread(self._acquire, key)
+                if lease_id is not None:
+                    try:
+                        result = await fn()
+                    except BaseException:
+                        await asyncio.to_thread(self._release, key, lease_id)
+                        raise
+                    await asyncio.to_thread(self._complete, key, lease_id, result)
+                    return result
+            else:
+                found, result = await asyncio.to_thread(self._collect, key, waiting)
+                if result is not None:
+                    return result
+                if not found:
+                    # 実行者が失敗した、または共有できない結果だった。実行し直す
+                    waiting = None
+                    interval = self.poll_interval
+                    continue
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, self.max_poll_interval)
+
+    def _acquire(self, key: str) -> Tuple[Optional[str], Optional[str]]:
+        """リースの取得、または実行中のリースへの待機者の登録を試みる
+
+        Returns:
+            (取得したリースID, 待機者として登録したリースID)。
+            どちらもNoneなら結果の受け渡し中のため、しばらく待って再試行する
+        """
+        now = datetime.utcnow()
+        lease_id = str(uuid.uuid4())
+        with self.session_factory() as db:
+            # 期限切れ（実行者・待機者の異常終了）のリースは引き継ぐ
+            db.query(FlightLease).filter(
+                FlightLease.key == key,
+                FlightLease.expires_at < now
+            ).delete(synchronize_session=False)
+            insert_ignore(db, FlightLease, [{
+                "key": key,
+                "lease_id": lease_id,
+                "result": None,
+                "waiters": 0,
+                "expires_at": now + self.lease_ttl,
+            }])
+            db.commit()
+            current = db.query(FlightLease.lease_id).filter(FlightLease.key == key).first()
+            if current is None:
+                return None, None
+            if current.lease_id == lease_id:
+                return lease_id, None
+            # 実行中のリースにだけ登録する（完了済みの結果は登録済みの待機者のもの）
+            registered = db.query(FlightLease).filter(
+                FlightLease.key == key,
+                FlightLease.lease_id == current.lease_id,
+                FlightLease.result.is_(None)
+            ).update({"waiters": FlightLease.waiters + 1}, synchronize_session=False)
+            db.commit()
+        return None, current.lease_id if registered else None
+
+    def _collect(self, key: str, lease_id: str) -> Tuple[bool, Optional[bytes]]:
+        """登録したリースの結果を確認し、あれば受け取る
+
+        Returns:
+            (リースが存在するか, 結果)。最後の待機者が受け取った時点でリースを削除する
+        """
+        with self.session_factory() as db:
+            query = db.query(FlightLease).filter(
+                FlightLease.key == key,
+                FlightLease.lease_id == lease_id
+            )
+            lease = db.query(FlightLease.result, FlightLease.expires_at).filter(
+                FlightLease.key == key,
+                FlightLease.lease_id == lease_id
+            ).first()
+            if lease is None:
+                return False, None
+            if lease.result is None:
+                if lease.expires_at >= datetime.utcnow():
+                    return True, None
+                # 実行者が異常終了した。リースを破棄して実行し直す
+                query.delete(synchronize_session=False)
+                db.commit()
+                return False, None
+            query.update({"waiters": FlightLease.waiters - 1}, synchronize_session=False)
+            query.filter(FlightLease.waiters <= 0).delete(synchronize_session=False)
+            db.commit()
+        return True, lease.result
+
+    def _complete(self, key: str, lease_id: str, result: T) -> None:
+        """結果を保存して待機中のプロセスと共有する（待機者がいなければリースを削除）"""
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            lease = db.query(FlightLease).filter(
+                FlightLease.key == key,
+                FlightLease.lease_id == lease_id
+            )
+            # 待機者がいなければ削除する。削除後に登録しようとしたプロセスは実行し直す
+            unshared = lease.filter(FlightLease.waiters == 0).delete(synchronize_session=False)
+            if not unshared:
+                if isinstance(result, bytes):
+                    # 待機者が異常終了しても行が残り続けないよう、期限を延ばしておく
+                    lease.update(
+                        {"result": result, "expires_at": now + self.lease_ttl},
+                        synchronize_session=False
+                    )
+                else:
+                    # 共有できない結果は他のプロセスで実行し直してもらう
+                    lease.delete(synchronize_session=False)
+            db.commit()
+
+    def _release(self, key: str, lease_id: str) -> None:
+        """失敗した処理のリースを解放する"""
+        with self.session_factory() as db:
+            db.query(FlightLease).filter(
+                FlightLease.key == key,
+                FlightLease.lease_id == lease_id
+            ).delete(synchronize_session=False)
+            db.commit()
+
+
+def create_single_flight() -> SingleFlight:
+    """SINGLE_FLIGHT_BACKEND に応じたインスタンスを作成
+
+    memory: プロセス内のみで合流（単一ワーカー）
+    database: データベースのリースでワーカープロセス間でも合流
+    """
+    if os.getenv("SINGLE_FLIGHT_BACKEND", "memory") == "database":
+        from app.database.base import SessionLocal
+        return SharedSingleFlight(SessionLocal)
+    return SingleFlight()
+
+
+# アプリケーション全体で共有するインスタンス
+single_flight = create_single_flight()
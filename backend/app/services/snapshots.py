@@ -0,0 +1,340 @@
+"""Versioned assessment snapshots with content-addressed delta storage."""
+
+import hashlib
+import json
+import os
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.database.persistence import insert_returning, insert_ignore
+from app.models import (
+    RiskSituation,
+    IdentifiedRisk,
+    RiskEvaluation,
+    Countermeasure,
+    MetaCountermeasure,
+    AssessmentSnapshot,
+    SnapshotBlob,
+)
+
+# スナップショットに含める項目（IDと親への外部キーはパスで表す）
+SITUATION_FIELDS = ("description", "industry", "ai_type", "deployment_stage")
+RISK_FIELDS = ("category", "guideword", "risk_description", "affected_area", "confidence_score")
+EVALUATION_FIELDS = (
+    "severity_score", "severity_rationale",
+    "frequency_score", "frequency_rationale",
+    "avoidability_score", "avoidability_rationale",
+    "risk_level", "normalized_score", "evaluated_at",
+)
+COUNTERMEASURE_FIELDS = (
+    "meta_id", "strategy_type", "description", "priority", "feasibility",
+    "implementation_timeline", "expected_effect", "source_measure_id", "created_at",
+)
+META_FIELDS = ("target_axis", "meta_approach", "example", "priority", "applicability")
+
+# IN句1回あたりのキー数
+_CHUNK_SIZE = 500
+
+
+def encode_value(value: Any) -> str:
+    """値をブロブに格納するJSONテキストに変換"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return json.dumps(value, ensure_ascii=False)
+
+
+def content_hash(text: str) -> str:
+    """テキストの内容アドレス（SHA-256）"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def pack_manifest(manifest: Dict[str, Optional[str]]) -> bytes:
+    """マニフェストをzlib圧縮したJSONに変換（パスの重複が多く、よく圧縮される）"""
+    return zlib.compress(json.dumps(manifest, sort_keys=True, separators=(",", ":")).encode())
+
+
+def unpack_manifest(data: bytes) -> Dict[str, Optional[str]]:
+    return json.loads(zlib.decompress(data))
+
+
+def nest(values: Dict[str, Any]) -> Dict[str, Any]:
+    """パス（/区切り）→ 値 の対応を入れ子の辞書に変換"""
+    tree: Dict[str, Any] = {}
+    for path, value in values.items():
+        *parents, name = path.split("/")
+        node = tree
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[name] = value
+    return tree
+
+
+def _chunks(items: List[Any]) -> Iterable[List[Any]]:
+    for i in range(0, len(items), _CHUNK_SIZE):
+        yield items[i:i + _CHUNK_SIZE]
+
+
+@dataclass
+class SnapshotChange:
+    """2つのバージョン間で変化した値"""
+    path: str
+    change: str  # "added" | "removed" | "changed"
+    before: Any = None
+    after: Any = None
+
+
+@dataclass
+class SnapshotDiff:
+    """2つのバージョンの差分"""
+    from_version: int
+    to_version: int
+    changes: List[SnapshotChange] = field(default_factory=list)
+
+
+class SnapshotService:
+    """アセスメントスナップショットサービス
+
+    状況のツリーを パス → 値 に平坦化し、値のJSONテキストを内容アドレス化した
+    ブロブとして全バージョンで共有する。各バージョンのマニフェストは直前の
+    バージョンからの差分のみを保存し、復元の遡りを抑えるため
+    keyframe_interval版ごとに全体を保存する。
+
+    バージョンは変更されないため、復元したマニフェストはプロセス内でキャッシュする。
+    """
+
+    def __init__(self, keyframe_interval: Optional[int] = None, cache_size: int = 256):
+        self.keyframe_interval = keyframe_interval or int(
+            os.getenv("SNAPSHOT_KEYFRAME_INTERVAL", "10")
+        )
+        self.cache_size = cache_size
+        self._manifests: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+
+    def collect(self, db: Session, situation: RiskSituation) -> Dict[str, Any]:
+        """状況のツリーを パス → 値 に平坦化（種別ごとに1回のクエリ）"""
+        values: Dict[str, Any] = {}
+        for name in SITUATION_FIELDS:
+            values[f"situation/{name}"] = getattr(situation, name)
+
+        risks = db.query(IdentifiedRisk).filter(
+            IdentifiedRisk.situation_id == situation.situation_id
+        ).all()
+        risk_paths = {}
+        for risk in risks:
+            risk_paths[risk.risk_id] = path = f"risks/{risk.risk_id}"
+            for name in RISK_FIELDS:
+                values[f"{path}/{name}"] = getattr(risk, name)
+
+        evaluations = db.query(RiskEvaluation).filter(
+            RiskEvaluation.risk_id.in_(list(risk_paths))
+        ).all() if risk_paths else []
+        evaluation_paths = {}
+        for evaluation in evaluations:
+            path = f"{risk_paths[evaluation.risk_id]}/evaluations/{evaluation.evaluation_id}"
+            evaluation_paths[evaluation.evaluation_id] = path
+            for name in EVALUATION_FIELDS:
+                values[f"{path}/{name}"] = getattr(evaluation, name)
+
+        if evaluation_paths:
+            evaluation_ids = list(evaluation_paths)
+            for measure in db.query(Countermeasure).filter(
+                Countermeasure.evaluation_id.in_(evaluation_ids)
+            ):
+                path = f"{evaluation_paths[measure.evaluation_id]}/countermeasures/{measure.measure_id}"
+                for name in COUNTERMEASURE_FIELDS:
+                    values[f"{path}/{name}"] = getattr(measure, name)
+            for meta in db.query(MetaCountermeasure).filter(
+                MetaCountermeasure.evaluation_id.in_(evaluation_ids)
+            ):
+                path = f"{evaluation_paths[meta.evaluation_id]}/meta_countermeasures/{meta.meta_id}"
+                for name in META_FIELDS:
+                    values[f"{path}/{name}"] = getattr(meta, name)
+
+        return values
+
+    def latest(self, db: Session, situation_id: str) -> Optional[AssessmentSnapshot]:
+        """最新のスナップショット"""
+        return db.query(AssessmentSnapshot).filter(
+            AssessmentSnapshot.situation_id == situation_id
+        ).order_by(AssessmentSnapshot.version.desc()).first()
+
+    def get(self, db: Session, situation_id: str, version: int) -> Optional[AssessmentSnapshot]:
+        """バージョン番号でスナップショットを取得"""
+        return db.query(AssessmentSnapshot).filter(
+            AssessmentSnapshot.situation_id == situation_id,
+            AssessmentSnapshot.version == version
+        ).first()
+
+    def create(
+        self,
+        db: Session,
+        situation: RiskSituation,
+        label: Optional[str] = None
+    ) -> Any:
+        """状況のツリーを新しいバージョンとして保存
+
+        未保存の値のみブロブとして追加し、直前のバージョンからの差分を
+        マニフェストとして保存する。コミットは呼び出し側で行う。
+
+        Args:
+            db: データベースセッション
+            situation: リスク状況
+            label: バージョンのラベル（レビュー名など）
+
+        Returns:
+            保存されたスナップショットの行
+        """
+        manifest: Dict[str, str] = {}
+        blobs: Dict[str, str] = {}
+        for path, value in self.collect(db, situation).items():
+            text = encode_value(value)
+            manifest[path] = blob_hash = content_hash(text)
+            blobs[blob_hash] = text
+        self._store_blobs(db, blobs)
+
+        previous = self.latest(db, situation.situation_id)
+        version = previous.version + 1 if previous else 1
+        is_keyframe = previous is None or (version - 1) % self.keyframe_interval == 0
+        before = self.manifest(db, previous) if previous else {}
+        delta: Dict[str, Optional[str]] = {
+            path: blob_hash for path, blob_hash in manifest.items() if before.get(path) != blob_hash
+        }
+        delta.update({path: None for path in before if path not in manifest})
+
+        snapshot = AssessmentSnapshot(
+            situation_id=situation.situation_id,
+            version=version,
+            label=label,
+            is_keyframe=is_keyframe,
+            manifest=pack_manifest(manifest if is_keyframe else delta),
+            manifest_hash=content_hash(json.dumps(manifest, sort_keys=True)),
+            change_count=len(delta),
+        )
+        [row] = insert_returning(db, [snapshot])
+        self._remember(row.snapshot_id, manifest)
+        return row
+
+    def manifest(self, db: Session, snapshot: Any) -> Dict[str, str]:
+        """バージョンのマニフェスト全体を復元
+
+        直近のキーフレームから対象バージョンまでの差分を1回のクエリで取得して順に適用する。
+        """
+        cached = self._manifests.get(snapshot.snapshot_id)
+        if cached is not None:
+            self._manifests.move_to_end(snapshot.snapshot_id)
+            return cached
+
+        keyframe_version = db.query(func.max(AssessmentSnapshot.version)).filter(
+            AssessmentSnapshot.situation_id == snapshot.situation_id,
+            AssessmentSnapshot.is_keyframe.is_(True),
+            AssessmentSnapshot.version <= snapshot.version
+        ).scalar()
+        chain = db.query(
+            AssessmentSnapshot.manifest, AssessmentSnapshot.is_keyframe
+        ).filter(
+            AssessmentSnapshot.situation_id == snapshot.situation_id,
+            AssessmentSnapshot.version >= keyframe_version,
+            AssessmentSnapshot.version <= snapshot.version
+        ).order_by(AssessmentSnapshot.version).all()
+
+        manifest: Dict[str, str] = {}
+        for data, is_keyframe in chain:
+            if is_keyframe:
+                manifest = {}
+            for path, blob_hash in unpack_manifest(data).items():
+                if blob_hash is None:
+                    manifest.pop(path, None)
+                else:
+                    manifest[path] = blob_hash
+
+        self._remember(snapshot.snapshot_id, manifest)
+        return manifest
+
+    def load(self, db: Session, snapshot: Any) -> Dict[str, Any]:
+        """バージョンの状況ツリーを復元
+
+        Returns:
+            {"situation": {...}, "risks": {risk_id: {..., "evaluations": {...}}}}
+        """
+        manifest = self.manifest(db, snapshot)
+        blobs = self._load_blobs(db, set(manifest.values()))
+        tree = nest({path: blobs[blob_hash] for path, blob_hash in manifest.items()})
+        tree.setdefault("risks", {})
+        return tree
+
+    def diff(self, db: Session, before: Any, after: Any) -> SnapshotDiff:
+        """2つのバージョンの差分
+
+        マニフェストのハッシュを比較し、変化した値のブロブのみ読み込む。
+        """
+        result = SnapshotDiff(from_version=before.version, to_version=after.version)
+        if before.manifest_hash == after.manifest_hash:
+            return result
+
+        old = self.manifest(db, before)
+        new = self.manifest(db, after)
+        paths = sorted(
+            path for path in old.keys() | new.keys() if old.get(path) != new.get(path)
+        )
+        blobs = self._load_blobs(
+            db, {h for path in paths for h in (old.get(path), new.get(path)) if h is not None}
+        )
+        for path in paths:
+            if path not in old:
+                change = SnapshotChange(path, "added", after=blobs[new[path]])
+            elif path not in new:
+                change = SnapshotChange(path, "removed", before=blobs[old[path]])
+            else:
+                change = SnapshotChange(path, "changed", blobs[old[path]], blobs[new[path]])
+            result.changes.append(change)
+        return result
+
+    def _remember(self, snapshot_id: str, manifest: Dict[str, str]) -> None:
+        self._manifests[snapshot_id] = manifest
+        self._manifests.move_to_end(snapshot_id)
+        while len(self._manifests) > self.cache_size:
+            self._manifests.popitem(last=False)
+
+    @staticmethod
+    def _store_blobs(db: Session, blobs: Dict[str, str]) -> None:
+        """未保存のブロブを追加（圧縮して小さくなる場合のみ圧縮）"""
+        hashes = list(blobs)
+        existing = set()
+        for chunk in _chunks(hashes):
+            existing.update(h for h, in db.query(SnapshotBlob.blob_hash).filter(
+                SnapshotBlob.blob_hash.in_(chunk)
+            ))
+
+        params = []
+        for blob_hash in hashes:
+            if blob_hash in existing:
+                continue
+            raw = blobs[blob_hash].encode("utf-8")
+            packed = zlib.compress(raw)
+            compressed = len(packed) < len(raw)
+            params.append({
+                "blob_hash": blob_hash,
+                "data": packed if compressed else raw,
+                "compressed": compressed,
+                "size": len(raw),
+            })
+        insert_ignore(db, SnapshotBlob, params)
+
+    @staticmethod
+    def _load_blobs(db: Session, hashes: Iterable[str]) -> Dict[str, Any]:
+        """ブロブを読み込んで値に戻す"""
+        values = {}
+        for chunk in _chunks(list(hashes)):
+            for blob_hash, data, compressed in db.query(
+                SnapshotBlob.blob_hash, SnapshotBlob.data, SnapshotBlob.compressed
+            ).filter(SnapshotBlob.blob_hash.in_(chunk)):
+                raw = zlib.decompress(data) if compressed else data
+                values[blob_hash] = json.loads(raw.decode("utf-8"))
+        return values
+
+
+# アプリケーション全体で共有するインスタンス（復元したマニフェストのキャッシュを共有）
+snapshot_service = SnapshotService()
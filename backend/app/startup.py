@@ -0,0 +1,53 @@
+"""Application warm-up run once before serving requests."""
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from sqlalchemy.orm import configure_mappers
+
+from app.llm.client import configured_providers, preload_sdks, get_llm_client
+from app.services.risk_identification import load_guidewords, guideword_section
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _timed(timings: Dict[str, float], step: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[step] = time.perf_counter() - started
+
+
+def warm_up() -> Dict[str, float]:
+    """最初のリクエストで発生していた初期化をまとめて行う
+
+    起動直後のリクエストがSDKの読み込みやマッパーの構成で遅くならないよう、
+    lifespanの開始時（リクエストの受け付け前）に呼び出す。
+
+    Returns:
+        段階ごとの所要時間（秒）
+    """
+    timings: Dict[str, float] = {}
+
+    with _timed(timings, "sdk_import"):
+        preload_sdks(configured_providers())
+
+    with _timed(timings, "mappers"):
+        configure_mappers()
+
+    with _timed(timings, "prompt_cache"):
+        guidewords = load_guidewords()
+        guideword_section(tuple((gw.category, gw.name, gw.description) for gw in guidewords))
+
+    with _timed(timings, "llm_client"):
+        try:
+            get_llm_client()
+        except (ValueError, ImportError) as e:
+            # APIキー未設定など。リクエスト時に改めて作成を試みる
+            logger.warning("LLM client warm-up skipped: %s", e)
+
+    return timings
@@ -0,0 +1,87 @@
+"""Fixtures for service hot-path micro-benchmarks.
+
+Benchmarks are disabled by default (each runs once as a plain test).
+Record a baseline and compare against it with:
+
+    pytest app/tests/bench --benchmark-enable --benchmark-autosave
+    pytest app/tests/bench --benchmark-enable --benchmark-compare \\
+        --benchmark-compare-fail=mean:10%
+"""
+
+import pytest
+from app.models import RiskSituation, IdentifiedRisk, RiskEvaluation, Countermeasure
+from app.tests.bench.data import risk_item, countermeasure_item
+
+
+@pytest.fixture
+def situation_factory():
+    """n文からなる記述を持つリスク状況を生成"""
+    def make(n: int) -> RiskSituation:
+        return RiskSituation(
+            situation_id="bench-situation",
+            description="".join(
+                f"夜間、白線がかすれた横断歩道で歩行者を検知できなかった（{i}）。"
+                for i in range(n)
+            ),
+            industry="自動車",
+            ai_type="自動運転",
+        )
+    return make
+
+
+@pytest.fixture
+def risks_factory():
+    """n件の特定済みリスクを生成"""
+    def make(n: int):
+        risks = []
+        for i in range(n):
+            item = risk_item(i)
+            risks.append(IdentifiedRisk(
+                risk_id=f"risk-{i}",
+                situation_id="bench-situation",
+                category=item["category"],
+                guideword=item["guideword"],
+                risk_description=item["risk_description"],
+                affected_area=item["affected_area"],
+                confidence_score=[0.9, 0.7, 0.5][i % 3],
+            ))
+        return risks
+    return make
+
+
+@pytest.fixture
+def evaluation():
+    """対策導出の入力となる評価結果"""
+    risk = IdentifiedRisk(
+        risk_id="risk-0",
+        situation_id="bench-situation",
+        risk_description=risk_item(0)["risk_description"],
+    )
+    return RiskEvaluation(
+        evaluation_id="bench-evaluation",
+        risk_id=risk.risk_id,
+        risk=risk,
+        severity_score=5,
+        severity_rationale="死亡事故につながる可能性がある。" * 5,
+        frequency_score=3,
+        frequency_rationale="夜間走行は一定の割合で発生する。" * 5,
+        avoidability_score=4,
+        avoidability_rationale="運転者の介入は間に合わない場合が多い。" * 5,
+        risk_level="高",
+        normalized_score=2.4,
+    )
+
+
+@pytest.fixture
+def countermeasures_factory():
+    """n件の対策を生成"""
+    def make(n: int):
+        return [
+            Countermeasure(
+                measure_id=f"measure-{i}",
+                evaluation_id="bench-evaluation",
+                **countermeasure_item(i)
+            )
+            for i in range(n)
+        ]
+    return make
@@ -0,0 +1,66 @@
+"""Synthetic inputs for service hot-path micro-benchmarks."""
+
+import json
+
+SIZES = [10, 100, 1000, 10000]
+
+GUIDEWORDS = [
+    ("データ", "網羅性"), ("データ", "分布シフト"), ("モデル", "例外処理"),
+    ("モデル", "公平性"), ("運用", "人間の監視"), ("運用", "誤使用"),
+]
+LEVELS = ["高", "中", "低"]
+
+
+def risk_item(i: int) -> dict:
+    """i番目のリスク（10件に1件は直前の区切りの記述と重複する）"""
+    category, guideword = GUIDEWORDS[i % len(GUIDEWORDS)]
+    case = i - 9 if i % 10 == 9 else i
+    return {
+        "category": category,
+        "guideword": guideword,
+        "risk_description": f"夜間の走行データが不足し、暗所での認識精度が低下する可能性がある（事例{case}）",
+        "affected_area": "歩行者",
+        "confidence": LEVELS[i % 3],
+    }
+
+
+def countermeasure_item(i: int) -> dict:
+    """i番目の対策"""
+    return {
+        "strategy_type": ["過酷度低減", "発生頻度低減", "回避可能性向上"][i % 3],
+        "description": f"認識信頼度が低い場合に運転者へ警告する仕組みを導入する（案{i}）",
+        "priority": i % 5 + 1,
+        "feasibility": LEVELS[i % 3],
+        "implementation_timeline": "短期(1-3ヶ月)",
+        "expected_effect": "人間による介入の機会を確保できる",
+    }
+
+
+def identification_response(n: int) -> str:
+    """n件のリスクを含むLLM応答（コードブロックと後続の文章付き）"""
+    body = json.dumps(
+        {"identified_risks": [risk_item(i) for i in range(n)]},
+        ensure_ascii=False,
+        indent=2,
+    )
+    return f"```json\n{body}\n```\n以上が特定されたリスクです。"
+
+
+def countermeasure_response(n: int) -> str:
+    """n件の対策を含むLLM応答"""
+    body = json.dumps(
+        {"countermeasures": [countermeasure_item(i) for i in range(n)]},
+        ensure_ascii=False,
+        indent=2,
+    )
+    return f"```json\n{body}\n```"
+
+
+def axis_response(n: int) -> str:
+    """n文の根拠を含む評価軸のLLM応答"""
+    body = json.dumps(
+        {"severity_score": 4, "rationale": "死亡事故につながる可能性がある。" * n},
+        ensure_ascii=False,
+        indent=2,
+    )
+    return f"```json\n{body}\n```"
@@ -0,0 +1,106 @@
+"""Peak memory of a batch collect step: ORM instances vs. records.
+
+Each mode runs in a fresh interpreter against the same SQLite file, loads
+every risk and builds an evaluation for each, and reports the growth of the
+peak RSS (VmHWM, reset through /proc/self/clear_refs after the imports) over
+the RSS before loading. The number of risks can be changed with
+MEMORY_BENCH_RISKS (default 50000).
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine, insert
+
+from app.database.base import Base
+from app.models import RiskSituation, IdentifiedRisk
+from app.tests.bench.data import risk_item
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+RISKS = int(os.getenv("MEMORY_BENCH_RISKS", "50000"))
+
+COLLECT_SCRIPT = """
+import json, re, sys
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.models import IdentifiedRisk
+from app.services.records import RiskRecord, EvaluationRecord
+from app.services.risk_evaluation import RiskEvaluationService, SeverityScore, FrequencyScore, AvoidabilityScore
+
+mode, url = sys.argv[1], sys.argv[2]
+service = RiskEvaluationService(llm_client=None)
+scores = (SeverityScore(score=4, rationale="重傷につながる可能性がある。" * 4),
+          FrequencyScore(score=3, rationale="夜間の走行で時々発生する。" * 4),
+          AvoidabilityScore(score=4, rationale="運転者の介入が間に合わない。" * 4))
+session = Session(create_engine(url))
+
+def status_kb(field):
+    with open("/proc/self/status") as f:
+        return int(re.search(field + r":\\s+(\\d+)", f.read()).group(1))
+
+# ピークRSS（VmHWM）を現在のRSSに戻してから計測する
+with open("/proc/self/clear_refs", "w") as f:
+    f.write("5")
+before = status_kb("VmRSS")
+if mode == "orm":
+    risks = session.query(IdentifiedRisk).all()
+    evaluations = [service._build_evaluation(r, *scores) for r in risks]
+else:
+    risks = RiskRecord.from_rows(session.execute(RiskRecord.select()))
+    evaluations = [service._build_evaluation(r, *scores, factory=EvaluationRecord) for r in risks]
+peak = status_kb("VmHWM")
+print(json.dumps({"risks": len(risks), "evaluations": len(evaluations), "peak_growth_kb": peak - before}))
+"""
+
+
+@pytest.fixture(scope="module")
+def database_url(tmp_path_factory):
+    """RISKS件のリスクを保存したSQLiteファイル"""
+    path = tmp_path_factory.mktemp("memory") / "bench.db"
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(RiskSituation), [{"situation_id": "bench-situation", "description": "状況"}])
+        conn.execute(insert(IdentifiedRisk), [
+            {
+                "risk_id": f"risk-{i}",
+                "situation_id": "bench-situation",
+                "category": item["category"],
+                "guideword": item["guideword"],
+                "risk_description": item["risk_description"],
+                "affected_area": item["affected_area"],
+                "confidence_score": 0.7,
+            }
+            for i, item in enumerate(risk_item(i) for i in range(RISKS))
+        ])
+    engine.dispose()
+    return url
+
+
+def collect(mode: str, url: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", COLLECT_SCRIPT, mode, url],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "SQL_ECHO": "false"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/clear_refs"), reason="requires /proc")
+def test_records_use_less_peak_memory_than_orm(database_url):
+    """レコードで読み込み・評価を組み立てた場合のピークRSSがORMより小さいこと"""
+    orm = collect("orm", database_url)
+    records = collect("records", database_url)
+    print(f"\n{RISKS} risks: ORM +{orm['peak_growth_kb'] / 1024:.1f} MiB, "
+          f"records +{records['peak_growth_kb'] / 1024:.1f} MiB")
+
+    assert orm["evaluations"] == records["evaluations"] == RISKS
+    assert records["peak_growth_kb"] < orm["peak_growth_kb"] * 0.6
@@ -0,0 +1,59 @@
+"""Micro-benchmarks for the bigram search index."""
+
+from itertools import islice
+from types import SimpleNamespace
+import pytest
+from app.services.search import BigramSearchIndex, SearchFilters
+from app.tests.bench.data import SIZES, risk_item
+
+
+def build_index(n: int) -> BigramSearchIndex:
+    index = BigramSearchIndex()
+    for i in range(n):
+        item = risk_item(i)
+        index.add("risk", SimpleNamespace(
+            risk_id=f"risk-{i}",
+            situation_id=f"situation-{i % 100}",
+            risk_description=item["risk_description"],
+            affected_area=item["affected_area"],
+        ))
+        index.add("evaluation", SimpleNamespace(
+            evaluation_id=f"evaluation-{i}",
+            risk_id=f"risk-{i}",
+            severity_score=i % 5 + 1,
+            frequency_score=3,
+            avoidability_score=2,
+            risk_level="高",
+            severity_rationale="死亡事故につながる可能性がある。",
+            frequency_rationale=None,
+            avoidability_rationale=None,
+        ))
+    return index
+
+
+@pytest.mark.benchmark(group="search_index")
+@pytest.mark.parametrize("n", SIZES)
+def test_search_common_term_with_score_filter(benchmark, n):
+    """頻出語を評価スコアで絞り込み、先頭50件の候補を取得"""
+    index = build_index(n)
+    filters = SearchFilters(min_severity=5)
+
+    def search():
+        return list(islice(index.candidates("認識精度", filters), 50))
+
+    assert len(benchmark(search)) == min(50, n // 5)
+
+
+@pytest.mark.benchmark(group="search_index")
+@pytest.mark.parametrize("n", SIZES)
+def test_search_rare_term(benchmark, n):
+    """出現の少ない語の候補を取得"""
+    index = build_index(n)
+
+    query = f"事例{n - 3}"
+
+    def search():
+        return list(islice(index.candidates(query, None), 50))
+
+    # bigramの共起による候補（検証前）を含むため、先頭のみ確認する
+    assert benchmark(search)[0][1] == f"risk-{n - 3}"
@@ -0,0 +1,108 @@
+"""Micro-benchmarks for ORM object construction and response serialization."""
+
+import pytest
+from app.models import IdentifiedRisk, Countermeasure
+from app.schemas.risk import RiskResponse, RisksListResponse
+from app.schemas.evaluation import CountermeasureResponse, CountermeasuresListResponse
+from app.api.responses import risks_response, countermeasures_response
+from app.tests.bench.data import SIZES, risk_item, countermeasure_item
+
+
+@pytest.mark.benchmark(group="orm_construction")
+@pytest.mark.parametrize("n", SIZES)
+def test_construct_identified_risks(benchmark, n):
+    """n件のIdentifiedRiskを生成"""
+    items = [risk_item(i) for i in range(n)]
+
+    def construct():
+        return [
+            IdentifiedRisk(
+                situation_id="bench-situation",
+                category=item["category"],
+                guideword=item["guideword"],
+                risk_description=item["risk_description"],
+                affected_area=item["affected_area"],
+                confidence_score=0.7,
+            )
+            for item in items
+        ]
+
+    assert len(benchmark(construct)) == n
+
+
+@pytest.mark.benchmark(group="orm_construction")
+@pytest.mark.parametrize("n", SIZES)
+def test_construct_countermeasures(benchmark, n):
+    """n件のCountermeasureを生成"""
+    items = [countermeasure_item(i) for i in range(n)]
+
+    def construct():
+        return [
+            Countermeasure(evaluation_id="bench-evaluation", **item)
+            for item in items
+        ]
+
+    assert len(benchmark(construct)) == n
+
+
+@pytest.mark.benchmark(group="serialization")
+@pytest.mark.parametrize("n", SIZES)
+def test_serialize_risks_response(benchmark, risks_factory, n):
+    """n件のリスクからレスポンスを組み立ててJSONに変換"""
+    risks = risks_factory(n)
+
+    def serialize():
+        return RisksListResponse(identified_risks=[
+            RiskResponse(
+                risk_id=risk.risk_id,
+                situation_id=risk.situation_id,
+                category=risk.category,
+                guideword=risk.guideword,
+                risk_description=risk.risk_description,
+                affected_area=risk.affected_area,
+                confidence_score=risk.confidence_score
+            )
+            for risk in risks
+        ]).model_dump_json()
+
+    assert benchmark(serialize).startswith('{"identified_risks"')
+
+
+@pytest.mark.benchmark(group="serialization")
+@pytest.mark.parametrize("n", SIZES)
+def test_serialize_countermeasures_response(benchmark, countermeasures_factory, n):
+    """n件の対策からレスポンスを組み立ててJSONに変換"""
+    measures = countermeasures_factory(n)
+
+    def serialize():
+        return CountermeasuresListResponse(countermeasures=[
+            CountermeasureResponse(
+                measure_id=measure.measure_id,
+                evaluation_id=measure.evaluation_id,
+                strategy_type=measure.strategy_type,
+                description=measure.description,
+                priority=measure.priority,
+                feasibility=measure.feasibility,
+                implementation_timeline=measure.implementation_timeline,
+                expected_effect=measure.expected_effect
+            )
+            for measure in measures
+        ]).model_dump_json()
+
+    assert benchmark(serialize).startswith('{"countermeasures"')
+
+
+@pytest.mark.benchmark(group="serialization")
+@pytest.mark.parametrize("n", SIZES)
+def test_render_risks_response(benchmark, risks_factory, n):
+    """n件のリスクを事前構築したTypeAdapterで1回の検証でJSONに変換"""
+    risks = risks_factory(n)
+    assert benchmark(risks_response.render, risks).startswith(b'{"identified_risks"')
+
+
+@pytest.mark.benchmark(group="serialization")
+@pytest.mark.parametrize("n", SIZES)
+def test_render_countermeasures_response(benchmark, countermeasures_factory, n):
+    """n件の対策を事前構築したTypeAdapterで1回の検証でJSONに変換"""
+    measures = countermeasures_factory(n)
+    assert benchmark(countermeasures_response.render, measures).startswith(b'{"countermeasures"')
@@ -0,0 +1,96 @@
+"""Micro-benchmarks for service prompt generation, parsing and ranking."""
+
+import pytest
+from app.services.risk_identification import RiskIdentificationService
+from app.services.risk_evaluation import RiskEvaluationService
+from app.services.countermeasure_generation import CountermeasureGenerationService
+from app.tests.bench.data import (
+    SIZES,
+    identification_response,
+    countermeasure_response,
+    axis_response,
+)
+
+
+@pytest.fixture
+def identification():
+    return RiskIdentificationService(llm_client=None)
+
+
+@pytest.fixture
+def countermeasure():
+    return CountermeasureGenerationService(llm_client=None)
+
+
+@pytest.mark.benchmark(group="generate_prompt")
+@pytest.mark.parametrize("n", SIZES)
+def test_identification_generate_prompt(benchmark, identification, situation_factory, n):
+    """n文の状況記述からリスク特定プロンプトを生成"""
+    situation = situation_factory(n)
+    prompt = benchmark(identification._generate_prompt, situation, identification.guidewords)
+    assert situation.description in prompt
+
+
+@pytest.mark.benchmark(group="generate_prompt")
+@pytest.mark.parametrize("n", SIZES)
+def test_countermeasure_generate_prompt(benchmark, countermeasure, evaluation, n):
+    """n文の評価根拠から対策導出プロンプトを生成"""
+    evaluation.severity_rationale = "死亡事故につながる可能性がある。" * n
+    strategy = countermeasure._select_strategy(evaluation)
+    prompt = benchmark(countermeasure._generate_prompt, evaluation, strategy)
+    assert evaluation.severity_rationale in prompt
+
+
+@pytest.mark.benchmark(group="parse_response")
+@pytest.mark.parametrize("n", SIZES)
+def test_identification_parse_response(benchmark, identification, situation_factory, n):
+    """n件のリスクを含む応答を解析"""
+    response = identification_response(n)
+    situation = situation_factory(1)
+    risks = benchmark(identification._parse_response, response, situation)
+    assert len(risks) == n
+
+
+@pytest.mark.benchmark(group="parse_response")
+@pytest.mark.parametrize("n", SIZES)
+def test_countermeasure_parse_response(benchmark, countermeasure, evaluation, n):
+    """n件の対策を含む応答を解析"""
+    response = countermeasure_response(n)
+    measures = benchmark(countermeasure._parse_response, response, evaluation)
+    assert len(measures) == n
+
+
+@pytest.mark.benchmark(group="parse_json_response")
+@pytest.mark.parametrize("n", SIZES)
+def test_evaluation_parse_json_response(benchmark, n):
+    """n文の根拠を含む評価軸の応答を解析"""
+    service = RiskEvaluationService(llm_client=None)
+    data = benchmark(service._parse_json_response, axis_response(n))
+    assert data["severity_score"] == 4
+
+
+@pytest.mark.benchmark(group="deduplicate_risks")
+@pytest.mark.parametrize("n", SIZES)
+def test_deduplicate_risks(benchmark, identification, risks_factory, n):
+    """n件のリスクの重複除去"""
+    risks = risks_factory(n)
+    unique = benchmark(identification._deduplicate_risks, risks)
+    assert len(unique) == n - n // 10
+
+
+@pytest.mark.benchmark(group="prioritize")
+@pytest.mark.parametrize("n", SIZES)
+def test_prioritize_risks(benchmark, identification, risks_factory, n):
+    """n件のリスクの優先順位付け"""
+    risks = risks_factory(n)
+    ranked = benchmark(identification._prioritize_risks, risks)
+    assert ranked[0].confidence_score == 0.9
+
+
+@pytest.mark.benchmark(group="prioritize")
+@pytest.mark.parametrize("n", SIZES)
+def test_prioritize_countermeasures(benchmark, countermeasure, countermeasures_factory, evaluation, n):
+    """n件の対策の優先順位付け（リスクレベル高: 優先度と実現可能性）"""
+    measures = countermeasures_factory(n)
+    ranked = benchmark(countermeasure._prioritize_countermeasures, measures, evaluation)
+    assert ranked[0].priority == 5
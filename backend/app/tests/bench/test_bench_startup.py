@@ -0,0 +1,91 @@
+"""Cold-start budget for the API process.
+
+Each test starts a fresh interpreter, so module caches from the test session
+do not hide import costs. Budgets can be tightened per environment with
+COLD_START_IMPORT_BUDGET_MS / COLD_START_READY_BUDGET_MS.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+IMPORT_BUDGET_MS = float(os.getenv("COLD_START_IMPORT_BUDGET_MS", "3000"))
+READY_BUDGET_MS = float(os.getenv("COLD_START_READY_BUDGET_MS", "5000"))
+
+READY_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+sdk_before_warm_up = [m for m in ("openai", "anthropic") if m in sys.modules]
+
+from app.llm.client import get_llm_client
+async def main():
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        print(json.dumps({
+            "import_ms": (imported - started) * 1000,
+            "ready_ms": (ready - started) * 1000,
+            "sdk_before_warm_up": sdk_before_warm_up,
+            "sdk_after_warm_up": [m for m in ("openai", "anthropic") if m in sys.modules],
+            "shared_client": get_llm_client() is get_llm_client(),
+            "timings": app.state.warm_up_timings,
+        }))
+
+import asyncio
+asyncio.run(main())
+"""
+
+
+def run_python(*args: str, env=None) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **(env or {})},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def import_times(stderr: str) -> dict:
+    """-X importtime の出力からモジュールごとの累積時間（ミリ秒）を取得"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        times[module.strip()] = int(cumulative) / 1000
+    return times
+
+
+def test_import_stays_within_budget_without_provider_sdks():
+    """アプリのインポートが予算内で、プロバイダーSDKを読み込まないこと"""
+    result = run_python("-X", "importtime", "-c", "import app.main")
+    times = import_times(result.stderr)
+
+    assert times["app.main"] < IMPORT_BUDGET_MS
+    assert "openai" not in times and "anthropic" not in times
+
+
+@pytest.mark.parametrize("provider,sdk", [("openai", "openai"), ("claude", "anthropic")])
+def test_warm_up_loads_sdk_before_serving(provider, sdk):
+    """lifespanの開始時にSDK・クライアントが準備され、予算内で受け付け可能になること"""
+    result = run_python("-c", READY_SCRIPT, env={
+        "LLM_PROVIDER": provider,
+        "OPENAI_API_KEY": "test",
+        "ANTHROPIC_API_KEY": "test",
+        "LLM_ROUTES": "",
+    })
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert report["sdk_before_warm_up"] == []
+    assert sdk in report["sdk_after_warm_up"]
+    assert report["shared_client"]
+    assert set(report["timings"]) == {"sdk_import", "mappers", "prompt_cache", "llm_client"}
+    assert report["ready_ms"] < READY_BUDGET_MS
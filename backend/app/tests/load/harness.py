@@ -0,0 +1,430 @@
+"""End-to-end load-test harness.
+
+Drives the API through identify -> evaluate -> countermeasures at a fixed
+concurrency and reports throughput and p50/p95/p99 latency per step.
+
+Usage:
+    # In-process app + mock LLM server (no network, no API cost)
+    python -m app.tests.load.harness --flows 200 --concurrency 20 \\
+        --latency lognormal:0.8,0.4 --tokens-per-second 60
+
+    # Against a running deployment (pointed at the mock server)
+    python -m app.tests.load.harness --base-url http://localhost:8000
+
+    # Multi-worker scaling: starts the mock server and the production server
+    # (gunicorn, or uvicorn --workers) with 1, 2 and 4 workers
+    python -m app.tests.load.harness --workers 1,2,4 --flows 200 --concurrency 40
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.llm.mock_server import MockLLMServer, MockServerConfig, LatencyDistribution
+
+API_PREFIX = "/api/v1"
+
+SITUATION = {
+    "description": "自動運転の実験中。夜間、白線がかすれた横断歩道で、歩行者に接触する死亡事故が発生。",
+    "industry": "自動車",
+    "ai_type": "自動運転",
+    "deployment_stage": "実証実験"
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近接順位法によるパーセンタイル（q: 0-100）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+@dataclass
+class LoadTestReport:
+    """負荷試験の結果"""
+    flows: int = 0
+    failed_flows: int = 0
+    duration: float = 0.0
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    @property
+    def requests(self) -> int:
+        return sum(len(v) for v in self.latencies.values())
+
+    @property
+    def throughput(self) -> float:
+        """完了したフロー数/秒"""
+        return (self.flows - self.failed_flows) / self.duration if self.duration else 0.0
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """ステップごとの件数とp50/p95/p99（秒）"""
+        return {
+            step: {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+            }
+            for step, values in self.latencies.items()
+        }
+
+    def format(self) -> str:
+        lines = [
+            f"flows: {self.flows} (failed: {self.failed_flows})",
+            f"requests: {self.requests}",
+            f"duration: {self.duration:.2f}s",
+            f"throughput: {self.throughput:.2f} flows/s, "
+            f"{self.requests / self.duration if self.duration else 0:.2f} req/s",
+            f"{'step':<18}{'count':>7}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}",
+        ]
+        for step, stats in self.summary().items():
+            lines.append(
+                f"{step:<18}{stats['count']:>7}"
+                f"{stats['p50'] * 1000:>10.1f}{stats['p95'] * 1000:>10.1f}{stats['p99'] * 1000:>10.1f}"
+            )
+        for step, count in self.errors.items():
+            lines.append(f"errors[{step}]: {count}")
+        return "\n".join(lines)
+
+
+async def _request(
+    client: httpx.AsyncClient,
+    report: LoadTestReport,
+    step: str,
+    method: str,
+    url: str,
+    **kwargs
+) -> Optional[dict]:
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError:
+        report.errors[step] += 1
+        return None
+    report.latencies[step].append(time.perf_counter() - started)
+    if response.status_code >= 400:
+        report.errors[step] += 1
+        return None
+    return response.json()
+
+
+async def run_flow(
+    client: httpx.AsyncClient,
+    report: LoadTestReport,
+    reuse: bool = False
+) -> bool:
+    """状況作成 → リスク特定 → 評価 → 対策導出 の1フローを実行
+
+    同じ状況を繰り返すため、既定では対策ライブラリからの再利用を無効にして
+    毎回LLMで対策を導出する。
+    """
+    situation = await _request(
+        client, report, "create_situation", "POST", f"{API_PREFIX}/situations", json=SITUATION
+    )
+    if situation is None:
+        return False
+
+    risks = await _request(
+        client, report, "identify_risks", "POST",
+        f"{API_PREFIX}/situations/{situation['situation_id']}/identify-risks"
+    )
+    if risks is None:
+        return False
+
+    async def assess(risk: dict) -> bool:
+        evaluation = await _request(
+            client, report, "evaluate", "POST", f"{API_PREFIX}/risks/{risk['risk_id']}/evaluate"
+        )
+        if evaluation is None:
+            return False
+        measures = await _request(
+            client, report, "countermeasures", "POST",
+            f"{API_PREFIX}/evaluations/{evaluation['evaluation_id']}/generate-countermeasures",
+            params={"reuse": str(reuse).lower()}
+        )
+        return measures is not None
+
+    results = await asyncio.gather(*[assess(r) for r in risks["identified_risks"]])
+    return all(results)
+
+
+async def run_load_test(
+    client: httpx.AsyncClient,
+    flows: int,
+    concurrency: int,
+    reuse: bool = False
+) -> LoadTestReport:
+    """指定した同時実行数でフローを実行し、結果を集計する"""
+    report = LoadTestReport(flows=flows)
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(flows):
+        queue.put_nowait(i)
+
+    async def worker():
+        while True:
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if not await run_flow(client, report, reuse):
+                report.failed_flows += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    report.duration = time.perf_counter() - started
+    return report
+
+
+@asynccontextmanager
+async def in_process_client(
+    mock_config: Optional[MockServerConfig] = None,
+    provider: str = "openai"
+) -> AsyncIterator[httpx.AsyncClient]:
+    """一時SQLiteデータベースと代替LLMサーバーを使うアプリのクライアント
+
+    LLMクライアントは実際のSDKを使い、HTTP経由で代替サーバーに接続する。
+    """
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import NullPool
+    from app.main import app
+    from app.database.base import Base, get_db
+    from app.llm.client import OpenAIClient, ClaudeClient, get_llm_client
+
+    tmpdir = tempfile.TemporaryDirectory()
+    engine = create_engine(
+        f"sqlite:///{os.path.join(tmpdir.name, 'load.db')}",
+        connect_args={"check_same_thread": False},
+        # セッションはLLM呼び出しの間も接続を保持するため、プール上限で詰まらないようにする
+        poolclass=NullPool
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_wal(dbapi_connection, _):
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+    Base.metadata.create_all(bind=engine)
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = TestSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    mock = MockLLMServer(mock_config)
+    llm_http = httpx.AsyncClient(transport=httpx.ASGITransport(app=mock.app), timeout=600)
+    if provider == "claude":
+        llm_client = ClaudeClient("mock", base_url="http://mock-llm", http_client=llm_http)
+    else:
+        llm_client = OpenAIClient("mock", base_url="http://mock-llm/v1", http_client=llm_http)
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_llm_client] = lambda: llm_client
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://app",
+            timeout=600
+        ) as client:
+            client.mock_server = mock
+            yield client
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        app.dependency_overrides.pop(get_llm_client, None)
+        await llm_http.aclose()
+        engine.dispose()
+        tmpdir.cleanup()
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_until_healthy(
+    url: str,
+    process: subprocess.Popen,
+    log_path: str,
+    timeout: float = 60
+) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                with open(log_path, encoding="utf-8", errors="replace") as f:
+                    log = f.read()[-2000:]
+                raise RuntimeError(f"Server exited with code {process.returncode}:\n{log}")
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise TimeoutError(f"Server did not start: {url}")
+
+
+@asynccontextmanager
+async def server_processes(
+    workers: int,
+    latency: str = "fixed:0",
+    tokens_per_second: float = 0.0
+) -> AsyncIterator[str]:
+    """代替LLMサーバーと、指定したワーカー数の本番構成のAPIサーバーを別プロセスで起動
+
+    ワーカー間で共有する状態（同時リクエストの合流・検索）はデータベースを使う。
+    gunicornがインストールされていなければ uvicorn --workers で起動する。
+
+    Returns:
+        APIサーバーのベースURL
+    """
+    from sqlalchemy import create_engine, text
+    from app.database.base import Base
+    import app.models  # noqa: F401  テーブル定義を登録する
+
+    tmpdir = tempfile.TemporaryDirectory()
+    database_url = f"sqlite:///{os.path.join(tmpdir.name, 'scaling.db')}"
+    engine = create_engine(database_url)
+    with engine.connect() as connection:
+        connection.execute(text("PRAGMA journal_mode=WAL"))
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    mock_port, app_port = _free_port(), _free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "LLM_PROVIDER": "openai",
+        "LLM_ROUTES": "",
+        "OPENAI_API_KEY": "mock",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{mock_port}/v1",
+        "SINGLE_FLIGHT_BACKEND": "database",
+        "SEARCH_BACKEND": "database",
+        "SQL_ECHO": "false",
+        "PORT": str(app_port),
+        "WEB_CONCURRENCY": str(workers),
+        "LOG_LEVEL": "warning",
+    }
+    if importlib.util.find_spec("gunicorn"):
+        server_command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"]
+    else:
+        server_command = [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--port", str(app_port), "--workers", str(workers), "--log-level", "warning",
+        ]
+
+    mock_log, server_log = (os.path.join(tmpdir.name, f"{name}.log") for name in ("mock", "server"))
+    processes: List[subprocess.Popen] = []
+    try:
+        with open(mock_log, "wb") as log:
+            processes.append(subprocess.Popen(
+                [
+                    sys.executable, "-m", "app.llm.mock_server", "--port", str(mock_port),
+                    "--latency", latency, "--tokens-per-second", str(tokens_per_second),
+                ],
+                # uvicorn.run は WEB_CONCURRENCY を読むため、代替サーバーには渡さない
+                cwd=BACKEND_DIR, env={k: v for k, v in env.items() if k != "WEB_CONCURRENCY"},
+                stdout=log, stderr=subprocess.STDOUT
+            ))
+        with open(server_log, "wb") as log:
+            processes.append(subprocess.Popen(
+                server_command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+            ))
+        mock, server = processes
+
+        await _wait_until_healthy(f"http://127.0.0.1:{mock_port}/docs", mock, mock_log)
+        base_url = f"http://127.0.0.1:{app_port}"
+        await _wait_until_healthy(f"{base_url}/health", server, server_log)
+        yield base_url
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        tmpdir.cleanup()
+
+
+async def run_scaling_test(
+    worker_counts: List[int],
+    flows: int,
+    concurrency: int,
+    latency: str = "fixed:0",
+    tokens_per_second: float = 0.0
+) -> List[Tuple[int, LoadTestReport]]:
+    """ワーカー数ごとに本番構成のサーバーを起動して負荷試験を行う"""
+    results = []
+    for workers in worker_counts:
+        async with server_processes(workers, latency, tokens_per_second) as base_url:
+            async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+                results.append((workers, await run_load_test(client, flows, concurrency)))
+    return results
+
+
+def format_scaling(results: List[Tuple[int, LoadTestReport]]) -> str:
+    """ワーカー数ごとのスループットと、1ワーカーに対するスケーリング効率"""
+    base = results[0][1].throughput / results[0][0] if results and results[0][1].throughput else 0.0
+    lines = [f"{'workers':>8}{'flows/s':>10}{'failed':>8}{'efficiency':>12}"]
+    for workers, report in results:
+        efficiency = report.throughput / (base * workers) if base else 0.0
+        lines.append(f"{workers:>8}{report.throughput:>10.2f}{report.failed_flows:>8}{efficiency:>12.0%}")
+    return "\n".join(lines)
+
+
+async def main(args: argparse.Namespace) -> None:
+    if args.workers:
+        results = await run_scaling_test(
+            [int(n) for n in args.workers.split(",")],
+            args.flows, args.concurrency, args.latency, args.tokens_per_second
+        )
+        print(format_scaling(results))
+        return
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=600) as client:
+            report = await run_load_test(client, args.flows, args.concurrency, args.reuse)
+    else:
+        config = MockServerConfig(
+            latency=LatencyDistribution.parse(args.latency),
+            error_rate=args.error_rate,
+            tokens_per_second=args.tokens_per_second,
+            seed=args.seed
+        )
+        async with in_process_client(config, args.provider) as client:
+            report = await run_load_test(client, args.flows, args.concurrency, args.reuse)
+    print(report.format())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end load test")
+    parser.add_argument("--base-url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--workers", help="Comma-separated worker counts for a multi-process scaling run")
+    parser.add_argument("--flows", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--provider", choices=["openai", "claude"], default="openai")
+    parser.add_argument("--latency", default="lognormal:0.8,0.4")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reuse", action="store_true", help="Allow countermeasure reuse from the library")
+    asyncio.run(main(parser.parse_args()))
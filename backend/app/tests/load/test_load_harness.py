@@ -0,0 +1,110 @@
+"""Smoke tests for the mock LLM server and load-test harness."""
+
+import httpx
+import pytest
+from app.llm.client import OpenAIClient, ClaudeClient
+from app.llm.context import CallSite
+from app.llm.mock_server import (
+    MockLLMServer,
+    MockServerConfig,
+    LatencyDistribution,
+    classify_prompt,
+)
+from app.services.risk_evaluation import RiskEvaluationService
+from app.models import IdentifiedRisk
+from app.tests.load.harness import (
+    in_process_client,
+    run_load_test,
+    run_scaling_test,
+    format_scaling,
+    percentile,
+)
+
+
+def mock_clients(server: MockLLMServer):
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app))
+    return [
+        OpenAIClient("mock", base_url="http://mock/v1", http_client=http),
+        ClaudeClient("mock", base_url="http://mock", http_client=http),
+    ]
+
+
+def test_prompt_types_are_classified():
+    """サービスのプロンプトが種別ごとに判定されること"""
+    service = RiskEvaluationService(llm_client=None)
+    risk = IdentifiedRisk(risk_description="リスク")
+
+    assert classify_prompt(service._severity_prompt(risk)) == CallSite.SEVERITY
+    assert classify_prompt(service._frequency_prompt(risk)) == CallSite.FREQUENCY
+    assert classify_prompt(service._avoidability_prompt(risk)) == CallSite.AVOIDABILITY
+
+
+@pytest.mark.asyncio
+async def test_sdk_clients_receive_canned_responses():
+    """OpenAI / Anthropic の両SDKが代替サーバーから固定応答を受け取ること"""
+    server = MockLLMServer()
+    risk = IdentifiedRisk(risk_id="risk-001", risk_description="リスク")
+
+    for client in mock_clients(server):
+        evaluation = await RiskEvaluationService(client).evaluate_risk(risk)
+        assert evaluation.severity_score == 5
+        assert evaluation.frequency_score == 3
+
+    assert server.stats[CallSite.SEVERITY] == 2
+
+
+@pytest.mark.asyncio
+async def test_error_rate_produces_errors():
+    """エラー率1.0の場合、全てのリクエストがエラーになること"""
+    server = MockLLMServer(MockServerConfig(error_rate=1.0))
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app))
+
+    response = await http.post("http://mock/v1/messages", json={
+        "model": "mock", "max_tokens": 10,
+        "messages": [{"role": "user", "content": "発生頻度を1-5"}]
+    })
+
+    assert response.status_code == 500
+
+
+def test_latency_distribution_is_deterministic():
+    """同じシードで同じ遅延が得られること"""
+    import random
+
+    dist = LatencyDistribution.parse("lognormal:0.8,0.4")
+    assert dist.sample(random.Random(1)) == dist.sample(random.Random(1))
+    assert LatencyDistribution.parse("uniform:0.1,0.2").sample(random.Random(1)) <= 0.2
+
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+
+
+@pytest.mark.asyncio
+async def test_end_to_end_load_run():
+    """アプリ全体をフロー単位で実行し、統計が集計されること"""
+    config = MockServerConfig(latency=LatencyDistribution("fixed", 0.001))
+
+    async with in_process_client(config) as client:
+        report = await run_load_test(client, flows=4, concurrency=2)
+
+    assert report.failed_flows == 0
+    assert not report.errors
+    assert report.summary()["identify_risks"]["count"] == 4
+    # 固定応答はリスク2件のため、評価と対策導出はフローごとに2回
+    assert report.summary()["evaluate"]["count"] == 8
+    assert report.summary()["countermeasures"]["count"] == 8
+    assert report.throughput > 0
+
+
+@pytest.mark.asyncio
+async def test_multi_worker_server_completes_flows():
+    """複数ワーカーの本番構成で、共有した状態を使ってフローが完了すること"""
+    [(workers, report)] = await run_scaling_test([2], flows=4, concurrency=4)
+
+    assert workers == 2
+    assert report.failed_flows == 0
+    assert report.errors == {}
+    assert "efficiency" in format_scaling([(workers, report)])
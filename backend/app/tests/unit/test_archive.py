@@ -0,0 +1,188 @@
+"""Unit tests for the LLM interaction archive and replay."""
+
+import asyncio
+import json
+
+import httpx
+
+import pytest
+from app.llm.archive import (
+    ArchiveReader,
+    ArchiveRecord,
+    ArchiveWriter,
+    ArchivingLLMClient,
+    Outcome,
+    ReplayLLMClient,
+    ReplayMissError,
+    reparse,
+    summarize,
+)
+from app.llm.client import OpenAIClient, ClaudeClient
+from app.llm.context import CallSite, call_site
+from app.llm.fake import FakeLLMClient
+from app.llm.mock_server import MockLLMServer, MockServerConfig
+from app.models import IdentifiedRisk
+from app.schemas.llm_output import FrequencyOutput, SeverityOutput
+from app.services.risk_evaluation import RiskEvaluationService
+
+
+def record(i: int, site: str = CallSite.SEVERITY) -> ArchiveRecord:
+    return ArchiveRecord(
+        ts=0.0, method="call", call_site=site, prompt_hash=f"hash-{i}", prompt=f"prompt-{i}" * 50,
+        system_prompt=None, response=f"response-{i}", outcome=Outcome.OK, latency=0.01 * i,
+        input_tokens=10, output_tokens=5
+    )
+
+
+def risk() -> IdentifiedRisk:
+    return IdentifiedRisk(risk_id="risk-001", risk_description="夜間に歩行者を見落とす")
+
+
+@pytest.mark.asyncio
+async def test_records_are_flushed_into_rotated_segments(tmp_path):
+    """バッファの記録がまとめて書き出され、上限を超えるとセグメントが切り替わること"""
+    writer = ArchiveWriter(str(tmp_path), segment_bytes=400, flush_interval=0.01)
+    for i in range(30):
+        writer.append(record(i))
+        if i % 10 == 9:
+            # 書き出しは呼び出し側を待たせず、次の周期でまとめて行われる
+            assert writer.written == i - 9
+            await asyncio.sleep(0.05)
+    await writer.close()
+
+    reader = ArchiveReader(str(tmp_path))
+    assert len(reader.segments()) == writer.segments_created == 3
+    assert all(path.endswith(".jsonl.gz") for path in reader.segments())
+    assert [r.prompt_hash for r in reader.records()] == [f"hash-{i}" for i in range(30)]
+    assert writer.stats()["written"] == 30
+
+
+@pytest.mark.asyncio
+async def test_reader_skips_partially_written_tail(tmp_path):
+    """書き出しの途中で止まった末尾を読み飛ばし、それまでの記録を返すこと"""
+    writer = ArchiveWriter(str(tmp_path))
+    writer.append(record(0))
+    writer.append(record(1, site=CallSite.FREQUENCY))
+    await writer.close()
+    [segment] = ArchiveReader(str(tmp_path)).segments()
+    with open(segment, "ab") as f:
+        f.write(b"\x1f\x8b\x08\x00partial")
+
+    reader = ArchiveReader(str(tmp_path))
+    assert [r.prompt_hash for r in reader.records()] == ["hash-0", "hash-1"]
+    assert [r.prompt_hash for r in reader.records(call_site="risk_evaluation.frequency")] == ["hash-1"]
+
+
+def test_buffer_limit_drops_records(tmp_path):
+    writer = ArchiveWriter(str(tmp_path), max_buffer=2)
+    for i in range(5):
+        writer.append(record(i))
+    assert writer.stats()["buffered"] == 2
+    assert writer.dropped == 3
+
+
+@pytest.mark.asyncio
+async def test_archived_run_replays_through_services(tmp_path):
+    """記録した評価をLLMを呼び出さずに再生し、同じ評価結果が得られること"""
+    def severity(prompt: str) -> str:
+        return "not json" if "壊れた" in prompt else json.dumps(
+            {"severity_score": 2, "rationale": "軽微"}, ensure_ascii=False
+        )
+
+    backend = FakeLLMClient(responses={CallSite.SEVERITY: severity}, latency=0.01)
+    writer = ArchiveWriter(str(tmp_path))
+    client = ArchivingLLMClient(backend, writer)
+    original = await RiskEvaluationService(client).evaluate_risk(risk())
+    with pytest.raises(ValueError):
+        await RiskEvaluationService(client).evaluate_risk(
+            IdentifiedRisk(risk_id="risk-002", risk_description="壊れた応答")
+        )
+    await client.close()
+
+    records = list(ArchiveReader(str(tmp_path)).records())
+    assert [(r.call_site, r.outcome) for r in records] == [
+        (CallSite.SEVERITY, Outcome.OK),
+        (CallSite.FREQUENCY, Outcome.OK),
+        (CallSite.AVOIDABILITY, Outcome.OK),
+        (CallSite.SEVERITY, Outcome.PARSE_ERROR),
+    ]
+    assert records[0].schema == "SeverityOutput" and records[0].latency >= 0.01
+    assert records[0].input_tokens > 0 and records[0].output_tokens > 0
+    assert summarize(records)[CallSite.SEVERITY]["outcomes"] == {Outcome.OK: 1, Outcome.PARSE_ERROR: 1}
+    assert reparse(records[0]) == Outcome.OK
+    # 解析に失敗した応答もそのまま残る
+    assert records[3].response == "not json"
+    assert reparse(records[3]) == Outcome.PARSE_ERROR
+
+    replay = ReplayLLMClient.from_directory(str(tmp_path))
+    replayed = await RiskEvaluationService(replay).evaluate_risk(risk())
+    assert (replayed.severity_score, replayed.frequency_score, replayed.avoidability_score) == (
+        original.severity_score, original.frequency_score, original.avoidability_score
+    )
+    assert replayed.severity_rationale == "軽微"
+    with pytest.raises(ValueError):
+        await RiskEvaluationService(replay).evaluate_risk(
+            IdentifiedRisk(risk_id="risk-002", risk_description="壊れた応答")
+        )
+
+    # プロンプトが変わると照合できない
+    with pytest.raises(ReplayMissError):
+        with call_site(CallSite.SEVERITY):
+            await replay.call_structured("新しい版のプロンプト", SeverityOutput)
+
+    # 呼び出し箇所で照合すれば、新しい版のプロンプトに記録した応答を流せる
+    by_site = ReplayLLMClient.from_directory(str(tmp_path), match="call_site")
+    with call_site(CallSite.SEVERITY):
+        assert (await by_site.call_structured("新しい版のプロンプト", SeverityOutput)).severity_score == 2
+
+
+@pytest.mark.asyncio
+async def test_streams_and_samples_are_archived(tmp_path):
+    """ストリーミングは連結した応答を、サンプリングはサンプルの配列を記録すること"""
+    writer = ArchiveWriter(str(tmp_path))
+    client = ArchivingLLMClient(FakeLLMClient(), writer)
+    with call_site(CallSite.RISK_IDENTIFICATION):
+        streamed = "".join([piece async for piece in client.stream("リスクを特定")])
+    with call_site(CallSite.SEVERITY):
+        await client.sample_structured("過酷度", SeverityOutput, 3)
+    await client.close()
+
+    stream_record, sample_record = ArchiveReader(str(tmp_path)).records()
+    assert stream_record.method == "stream" and stream_record.response == streamed
+    assert sample_record.n == 3 and len(sample_record.texts()) == 3
+
+    replay = ReplayLLMClient([sample_record])
+    with call_site(CallSite.SEVERITY):
+        samples = await replay.sample_structured("過酷度", SeverityOutput, 3)
+    assert [s.severity_score for s in samples] == [5, 5, 5]
+
+
+@pytest.mark.asyncio
+async def test_sdk_clients_archive_raw_responses_and_usage(tmp_path):
+    """両SDKで、スキーマの検証に失敗した応答のテキストとプロバイダーのトークン数を記録すること"""
+    server = MockLLMServer(MockServerConfig(responses={
+        CallSite.SEVERITY: json.dumps({"severity_score": "高い", "rationale": "根拠"}, ensure_ascii=False),
+    }))
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app))
+    writer = ArchiveWriter(str(tmp_path))
+    backends = [
+        OpenAIClient("mock", base_url="http://mock/v1", http_client=http),
+        ClaudeClient("mock", base_url="http://mock", http_client=http),
+    ]
+    for backend in backends:
+        client = ArchivingLLMClient(backend, writer)
+        with call_site(CallSite.SEVERITY):
+            with pytest.raises(ValueError):
+                await client.call_structured("過酷度（被害の深刻さ）を1-5で評価", SeverityOutput)
+        with call_site(CallSite.FREQUENCY):
+            await client.sample_structured("発生頻度を1-5で評価", FrequencyOutput, 2)
+    await writer.close()
+
+    records = list(ArchiveReader(str(tmp_path)).records())
+    failed = [r for r in records if r.outcome == Outcome.PARSE_ERROR]
+    assert len(failed) == 2
+    assert all(json.loads(r.response)["severity_score"] == "高い" for r in failed)
+    assert all(not r.tokens_estimated and r.input_tokens > 0 for r in records)
+    samples = [r for r in records if r.method == "sample_structured"]
+    assert [len(r.texts()) for r in samples] == [2, 2]
+    assert reparse(samples[0]) == Outcome.OK
@@ -0,0 +1,200 @@
+"""Unit tests for the pipelined auto-assessment."""
+
+import asyncio
+import json
+import time
+
+import pytest
+from app.llm.context import CallSite
+from app.llm.fake import FakeLLMClient
+from app.llm.mock_server import MockServerConfig, LatencyDistribution
+from app.llm.routing import RoutingLLMClient
+from app.models import RiskSituation
+from app.services.assessment_pipeline import AssessmentPipeline, PipelineStage
+from app.services.countermeasure_generation import CountermeasureGenerationService
+from app.services.risk_evaluation import RiskEvaluationService
+from app.services.risk_identification import RiskIdentificationService
+from app.tests.load.harness import in_process_client
+
+RISKS = 10
+
+
+def identification_response(n: int) -> str:
+    return json.dumps({
+        "identified_risks": [
+            {
+                "category": "データ",
+                "guideword": "網羅性",
+                "risk_description": f"リスク{i}: 夜間の走行データが不足しており認識精度が低下する",
+                "affected_area": "歩行者",
+                "confidence": "中"
+            }
+            for i in range(n)
+        ]
+    }, ensure_ascii=False)
+
+
+def staged_client(identification_seconds: float, call_seconds: float) -> RoutingLLMClient:
+    """リスク特定の出力が identification_seconds かけて届き、他の呼び出しは call_seconds かかるクライアント"""
+    identification = FakeLLMClient(
+        responses={CallSite.RISK_IDENTIFICATION: identification_response(RISKS)},
+        latency=identification_seconds,
+        stream_chunks=RISKS
+    )
+    return RoutingLLMClient(
+        routes={CallSite.RISK_IDENTIFICATION: [identification]},
+        default=[FakeLLMClient(latency=call_seconds)],
+        hedge=False
+    )
+
+
+def situation() -> RiskSituation:
+    return RiskSituation(situation_id="situation-1", description="自動運転システムの歩行者検知")
+
+
+async def collect(pipeline: AssessmentPipeline):
+    return [event async for event in pipeline.run(situation())]
+
+
+@pytest.mark.asyncio
+async def test_risk_stream_applies_backpressure():
+    """呼び出し側が読まない間はLLMのストリームの読み込みも止まること"""
+    client = FakeLLMClient(
+        responses={CallSite.RISK_IDENTIFICATION: identification_response(RISKS)},
+        stream_chunks=RISKS * 4
+    )
+    pieces = 0
+    stream = client.stream
+
+    async def counting_stream(*args, **kwargs):
+        nonlocal pieces
+        async for piece in stream(*args, **kwargs):
+            pieces += 1
+            yield piece
+
+    client.stream = counting_stream
+    risks = RiskIdentificationService(client).identify_risks_stream(situation(), queue_size=2)
+
+    first = await risks.__anext__()
+    await asyncio.sleep(0.05)
+    read_while_paused = pieces
+
+    rest = [risk async for risk in risks]
+    assert len([first, *rest]) == RISKS
+    assert read_while_paused < pieces / 2
+
+
+@pytest.mark.asyncio
+async def test_each_risk_flows_through_all_stages_in_order():
+    """リスクごとに 特定 → 評価 → 対策 の順でイベントが届き、最後にdoneが届くこと"""
+    pipeline = AssessmentPipeline(staged_client(0.05, 0.0), queue_size=2)
+    events = await collect(pipeline)
+
+    assert events[-1].stage == PipelineStage.DONE
+    assert events[-1].counts == {"risk": RISKS, "evaluation": RISKS, "countermeasures": RISKS, "error": 0}
+
+    seen = {}
+    for position, event in enumerate(events[:-1]):
+        seen.setdefault(event.risk.risk_id, []).append((position, event.stage))
+    assert len(seen) == RISKS
+    for stages in seen.values():
+        assert [stage for _, stage in stages] == [
+            PipelineStage.RISK, PipelineStage.EVALUATION, PipelineStage.COUNTERMEASURES
+        ]
+
+    done = [e for e in events if e.stage == PipelineStage.COUNTERMEASURES]
+    assert all(e.countermeasures[0].evaluation_id == e.evaluation.evaluation_id for e in done)
+    assert all(e.evaluation.risk_id == e.risk.risk_id for e in done)
+    # 過酷度5のため過酷度低減を優先する
+    assert {e.strategy for e in done} == {"過酷度低減"}
+
+
+@pytest.mark.asyncio
+async def test_evaluation_starts_before_identification_finishes():
+    """特定の出力が続いている間に評価が始まり、全体の時間が段階の合計より短くなること"""
+    client = staged_client(identification_seconds=0.5, call_seconds=0.05)
+
+    # 従来の流れ: 特定の完了を待ってから評価し、評価の完了を待ってから対策を導出する
+    started = time.monotonic()
+    semaphore = asyncio.Semaphore(2)
+
+    async def limited(coro):
+        async with semaphore:
+            return await coro
+
+    risks = await RiskIdentificationService(client).identify_risks(situation())
+    evaluations = await asyncio.gather(*[
+        limited(RiskEvaluationService(client).evaluate_risk(r)) for r in risks
+    ])
+    for evaluation, risk in zip(evaluations, risks):
+        evaluation.risk = risk
+    await asyncio.gather(*[
+        limited(CountermeasureGenerationService(client).generate_countermeasures(e)) for e in evaluations
+    ])
+    sequential = time.monotonic() - started
+
+    pipeline = AssessmentPipeline(client, evaluation_concurrency=2, countermeasure_concurrency=2)
+    started = time.monotonic()
+    first_evaluation = None
+    last_risk = None
+    async for event in pipeline.run(situation()):
+        if event.stage == PipelineStage.EVALUATION and first_evaluation is None:
+            first_evaluation = time.monotonic() - started
+        if event.stage == PipelineStage.RISK:
+            last_risk = time.monotonic() - started
+    pipelined = time.monotonic() - started
+
+    assert first_evaluation < last_risk
+    assert pipelined < sequential * 0.75
+
+
+@pytest.mark.asyncio
+async def test_failed_evaluation_does_not_stop_other_risks():
+    """1件の評価が失敗してもerrorイベントを返し、他のリスクの処理を続けること"""
+    def severity(prompt: str) -> str:
+        if "リスク3:" in prompt:
+            return "not json"
+        return json.dumps({"severity_score": 2, "rationale": "軽微"}, ensure_ascii=False)
+
+    client = FakeLLMClient(responses={
+        CallSite.RISK_IDENTIFICATION: identification_response(RISKS),
+        CallSite.SEVERITY: severity,
+    })
+    events = await collect(AssessmentPipeline(client))
+
+    errors = [e for e in events if e.stage == PipelineStage.ERROR]
+    assert len(errors) == 1
+    assert errors[0].failed_stage == PipelineStage.EVALUATION
+    assert errors[0].risk.risk_description.startswith("リスク3:")
+    assert events[-1].counts["countermeasures"] == RISKS - 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("provider", ["openai", "claude"])
+async def test_auto_assess_endpoint_streams_and_persists(provider):
+    """エンドポイントがNDJSONで進捗を返し、結果を保存すること（SDKのストリーミング経由）"""
+    config = MockServerConfig(
+        latency=LatencyDistribution("fixed", 0.01),
+        responses={CallSite.RISK_IDENTIFICATION: identification_response(3)}
+    )
+    async with in_process_client(config, provider=provider) as client:
+        created = await client.post("/api/v1/situations", json={"description": "自動運転"})
+        situation_id = created.json()["situation_id"]
+
+        response = await client.post(f"/api/v1/situations/{situation_id}/auto-assess")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+
+        assert lines[-1]["stage"] == "done"
+        assert lines[-1]["counts"]["countermeasures"] == 3
+        assert client.mock_server.stats["streamed"] == 1
+
+        risks = await client.get(f"/api/v1/situations/{situation_id}/risks")
+        assert len(risks.json()["identified_risks"]) == 3
+        evaluation_id = next(line for line in lines if line["stage"] == "evaluation")["evaluation"]["evaluation_id"]
+        countermeasures = await client.get(f"/api/v1/evaluations/{evaluation_id}/countermeasures")
+        assert len(countermeasures.json()["countermeasures"]) == 3
+
+        missing = await client.post("/api/v1/situations/unknown/auto-assess")
+        assert missing.status_code == 404
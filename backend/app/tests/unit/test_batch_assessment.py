@@ -0,0 +1,220 @@
+"""Unit tests for batch assessment."""
+
+import json
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database.base import Base
+from app.llm.client import OpenAIBatchClient, ClaudeBatchClient, BatchStatus, BatchResults
+from app.services.batch_assessment import BatchAssessmentService
+from app.models import RiskSituation, IdentifiedRisk, RiskEvaluation, Countermeasure
+
+
+def canned_response(custom_id: str) -> str:
+    """custom_idに応じた応答テキストを返す"""
+    kind = custom_id.split("-", 1)[0]
+    if kind == "countermeasures":
+        return json.dumps({
+            "countermeasures": [
+                {
+                    "strategy_type": "過酷度低減",
+                    "description": "緊急停止機能を導入する",
+                    "priority": 5,
+                    "feasibility": "高",
+                    "implementation_timeline": "短期(1-3ヶ月)",
+                    "expected_effect": "被害を限定できる"
+                }
+            ]
+        }, ensure_ascii=False)
+    return json.dumps({f"{kind}_score": 4, "rationale": "根拠"}, ensure_ascii=False)
+
+
+class StandInBatchServer:
+    """OpenAI Batch / Anthropic Message Batches を模したローカルサーバー
+
+    投入されたバッチは最初の状態取得では処理中、2回目以降は完了となる。
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.batches = {}
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+
+        # OpenAI
+        if request.method == "POST" and path == "/v1/files":
+            file_id = f"file-{len(self.files)}"
+            body = request.content.decode("utf-8")
+            self.files[file_id] = body[body.index("{"):body.rindex("}") + 1]
+            return httpx.Response(200, json={"id": file_id})
+        if request.method == "POST" and path == "/v1/batches":
+            payload = json.loads(request.content)
+            lines = self.files[payload["input_file_id"]].splitlines()
+            batch_id = f"batch-{len(self.batches)}"
+            self.batches[batch_id] = {"lines": [json.loads(line) for line in lines], "polls": 0}
+            return httpx.Response(200, json=self._openai_batch(batch_id))
+        if path.startswith("/v1/batches/"):
+            batch_id = path.rsplit("/", 1)[1]
+            self.batches[batch_id]["polls"] += 1
+            return httpx.Response(200, json=self._openai_batch(batch_id))
+        if path.startswith("/v1/files/") and path.endswith("/content"):
+            batch_id = path.split("/")[3].replace("output-", "")
+            content = "\n".join(json.dumps({
+                "custom_id": line["custom_id"],
+                "response": {"status_code": 200, "body": {"choices": [
+                    {"message": {"content": canned_response(line["custom_id"])}}
+                ]}},
+                "error": None
+            }, ensure_ascii=False) for line in self.batches[batch_id]["lines"])
+            return httpx.Response(200, text=content)
+
+        # Anthropic
+        if request.method == "POST" and path == "/v1/messages/batches":
+            payload = json.loads(request.content)
+            batch_id = f"msgbatch-{len(self.batches)}"
+            self.batches[batch_id] = {"lines": payload["requests"], "polls": 0}
+            return httpx.Response(200, json=self._claude_batch(batch_id))
+        if path.endswith("/results"):
+            batch_id = path.split("/")[4]
+            content = "\n".join(json.dumps({
+                "custom_id": line["custom_id"],
+                "result": {"type": "succeeded", "message": {"content": [
+                    {"type": "text", "text": canned_response(line["custom_id"])}
+                ]}}
+            }, ensure_ascii=False) for line in self.batches[batch_id]["lines"])
+            return httpx.Response(200, text=content)
+        if path.startswith("/v1/messages/batches/"):
+            batch_id = path.rsplit("/", 1)[1]
+            self.batches[batch_id]["polls"] += 1
+            return httpx.Response(200, json=self._claude_batch(batch_id))
+
+        return httpx.Response(404)
+
+    def _openai_batch(self, batch_id: str) -> dict:
+        batch = self.batches[batch_id]
+        done = batch["polls"] >= 2
+        return {
+            "id": batch_id,
+            "status": "completed" if done else "in_progress",
+            "output_file_id": f"output-{batch_id}" if done else None,
+            "request_counts": {"total": len(batch["lines"])}
+        }
+
+    def _claude_batch(self, batch_id: str) -> dict:
+        batch = self.batches[batch_id]
+        done = batch["polls"] >= 2
+        return {
+            "id": batch_id,
+            "processing_status": "ended" if done else "in_progress",
+            "results_url": f"https://stand-in/v1/messages/batches/{batch_id}/results" if done else None,
+            "request_counts": {"processing": 0 if done else len(batch["lines"]),
+                               "succeeded": len(batch["lines"]) if done else 0}
+        }
+
+
+@pytest.fixture
+def server():
+    return StandInBatchServer()
+
+
+@pytest.fixture
+def risk():
+    return IdentifiedRisk(
+        risk_id="risk-001",
+        situation_id="test-001",
+        category="データ",
+        guideword="網羅性",
+        risk_description="夜間の走行データが不足している"
+    )
+
+
+@pytest.fixture
+def evaluation(risk):
+    return RiskEvaluation(
+        evaluation_id="eval-001",
+        risk_id=risk.risk_id,
+        risk=risk,
+        severity_score=5,
+        frequency_score=3,
+        avoidability_score=4,
+        risk_level="高"
+    )
+
+
+@pytest.mark.parametrize("client_class", [OpenAIBatchClient, ClaudeBatchClient])
+@pytest.mark.asyncio
+async def test_batch_lifecycle_maps_results_to_rows(client_class, server, risk, evaluation):
+    """投入から回収までの結果が評価・対策レコードに対応付けられること"""
+    client = client_class(
+        api_key="test",
+        base_url="https://stand-in/v1" if client_class is OpenAIBatchClient else "https://stand-in",
+        transport=httpx.MockTransport(server.handler)
+    )
+    service = BatchAssessmentService(client)
+
+    job = await service.submit([risk], [evaluation])
+    assert job.status == BatchStatus.IN_PROGRESS
+    assert job.request_count == 4
+
+    job = await client.wait(job.batch_id, poll_interval=0)
+    assert job.status == BatchStatus.COMPLETED
+
+    results = await service.fetch_results(job)
+    assert service.entity_ids(results) == ({"risk-001"}, {"eval-001"})
+
+    assessment = service.map_results(results, [risk], [evaluation])
+    assert not assessment.errors
+    assert len(assessment.evaluations) == 1
+    assert assessment.evaluations[0].risk_id == "risk-001"
+    assert assessment.evaluations[0].severity_score == 4
+    assert assessment.evaluations[0].risk_level == "中"
+    assert len(assessment.countermeasures) == 1
+    assert assessment.countermeasures[0].evaluation_id == "eval-001"
+    await client.close()
+
+
+def test_missing_axis_is_reported_as_error(risk):
+    """3軸の一部が欠けたリスクは評価を生成せずエラーとすること"""
+    service = BatchAssessmentService(batch_client=None)
+    results = BatchResults(outputs={
+        "severity-risk-001": canned_response("severity-risk-001"),
+        "frequency-risk-001": "JSONではない応答",
+    })
+
+    assessment = service.map_results(results, [risk])
+
+    assert assessment.evaluations == []
+    assert "frequency-risk-001" in assessment.errors
+    assert "avoidability-risk-001" in assessment.errors
+
+
+def test_collecting_twice_does_not_duplicate_rows(risk, evaluation):
+    """同じバッチ結果を2回保存しても評価・対策の行が増えないこと"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    other = IdentifiedRisk(
+        risk_id="risk-002", situation_id="test-001", category="データ",
+        guideword="網羅性", risk_description="雨天の走行データが不足している"
+    )
+    evaluation.risk = other
+    db.add_all([RiskSituation(situation_id="test-001", description="状況"), risk, other, evaluation])
+    db.commit()
+
+    service = BatchAssessmentService(batch_client=None)
+    custom_ids = [f"{axis}-risk-001" for axis in service.AXIS_SCORES] + ["countermeasures-eval-001"]
+    results = BatchResults(outputs={custom_id: canned_response(custom_id) for custom_id in custom_ids})
+
+    first = service.save_results(db, results)
+    db.commit()
+    assert (len(first.evaluations), len(first.countermeasures), first.skipped) == (1, 1, 0)
+
+    second = service.save_results(db, results)
+    db.commit()
+    assert (second.evaluations, second.countermeasures, second.skipped) == ([], [], 2)
+    assert db.query(RiskEvaluation).count() == 2
+    assert db.query(Countermeasure).count() == 1
+    db.close()
+    engine.dispose()
@@ -0,0 +1,81 @@
+"""Unit tests for ETag / conditional GET handling."""
+
+from datetime import datetime
+import pytest
+from starlette.requests import Request
+from app.api.caching import make_etag, is_not_modified
+from app.tests.load.harness import in_process_client
+
+
+def make_request(if_none_match: str = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+def test_etag_depends_on_versions():
+    """バージョン情報が変われば異なる弱いETagになること"""
+    etag = make_etag("situation", "situation-1", datetime(2024, 1, 1))
+
+    assert etag.startswith('W/"') and etag.endswith('"')
+    assert etag == make_etag("situation", "situation-1", datetime(2024, 1, 1))
+    assert etag != make_etag("situation", "situation-1", datetime(2024, 1, 2))
+    assert make_etag("risks", "a", "b") != make_etag("risks", "ab")
+
+
+def test_if_none_match():
+    """If-None-Matchの一覧・弱いETag・*に一致すること"""
+    etag = make_etag("risks", "situation-1")
+
+    assert not is_not_modified(make_request(), etag)
+    assert not is_not_modified(make_request('"other"'), etag)
+    assert is_not_modified(make_request(f'"other", {etag}'), etag)
+    assert is_not_modified(make_request(etag), etag)
+    # 弱い比較のため、W/ を付けない（強い）タグとも一致する
+    assert is_not_modified(make_request(etag[2:]), etag)
+    assert is_not_modified(make_request("*"), etag)
+
+
+@pytest.mark.asyncio
+async def test_conditional_get_returns_304_until_data_changes():
+    """同じETagなら304を返し、対策が再生成されると新しいETagになること"""
+    async with in_process_client() as client:
+        response = await client.post("/api/v1/situations", json={"description": "状況" * 50})
+        situation_id = response.json()["situation_id"]
+        await client.post(f"/api/v1/situations/{situation_id}/identify-risks")
+
+        url = f"/api/v1/situations/{situation_id}/risks"
+        first = await client.get(url)
+        etag = first.headers["etag"]
+        assert first.headers["cache-control"] == "private, no-cache"
+
+        second = await client.get(url, headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.content == b""
+        assert second.headers["etag"] == etag
+
+        risk_id = first.json()["identified_risks"][0]["risk_id"]
+        evaluation = (await client.post(f"/api/v1/risks/{risk_id}/evaluate")).json()
+        url = f"/api/v1/evaluations/{evaluation['evaluation_id']}/countermeasures"
+        empty = await client.get(url)
+        await client.post(f"/api/v1/evaluations/{evaluation['evaluation_id']}/generate-countermeasures")
+
+        changed = await client.get(url, headers={"If-None-Match": empty.headers["etag"]})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != empty.headers["etag"]
+        assert changed.json()["countermeasures"]
+
+
+@pytest.mark.asyncio
+async def test_large_responses_are_compressed():
+    """最小サイズを超えるレスポンスが圧縮されること"""
+    async with in_process_client() as client:
+        response = await client.post("/api/v1/situations", json={"description": "状況" * 1000})
+        situation_id = response.json()["situation_id"]
+
+        response = await client.get(
+            f"/api/v1/situations/{situation_id}",
+            headers={"Accept-Encoding": "gzip"}
+        )
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json()["description"] == "状況" * 1000
@@ -0,0 +1,110 @@
+"""Unit tests for the self-consistency evaluation mode."""
+
+import itertools
+import json
+
+import httpx
+import pytest
+from app.llm.client import OpenAIClient, ClaudeClient
+from app.llm.context import CallSite
+from app.llm.fake import FakeLLMClient
+from app.llm.mock_server import MockLLMServer
+from app.models import IdentifiedRisk
+from app.services.risk_evaluation import Aggregation, RiskEvaluationService, aggregate_scores
+from app.tests.load.harness import in_process_client
+
+
+def risk() -> IdentifiedRisk:
+    return IdentifiedRisk(risk_id="risk-001", risk_description="夜間に歩行者を見落とす")
+
+
+def cycling(axis: str, scores):
+    """呼び出しのたびにscoresを順に返す応答"""
+    cycle = itertools.cycle(scores)
+
+    def respond(prompt: str) -> str:
+        score = next(cycle)
+        return json.dumps({f"{axis}_score": score, "rationale": f"根拠{score}"}, ensure_ascii=False)
+    return respond
+
+
+def test_aggregate_scores():
+    """中央値・最頻値で集約し、偶数件や同数の場合は高い方を選ぶこと"""
+    assert aggregate_scores([2, 5, 3]) == 3
+    assert aggregate_scores([2, 3, 4, 5]) == 4
+    assert aggregate_scores([1, 1, 5], Aggregation.MAJORITY) == 1
+    assert aggregate_scores([2, 4, 2, 4], Aggregation.MAJORITY) == 4
+
+
+@pytest.mark.asyncio
+async def test_samples_are_aggregated_and_variance_is_stored():
+    """軸ごとにk件のサンプルを集約し、分散と一致率を評価結果に残すこと"""
+    client = FakeLLMClient(responses={
+        CallSite.SEVERITY: cycling("severity", [4, 5, 4]),
+        CallSite.FREQUENCY: cycling("frequency", [1, 3, 2]),
+    })
+    evaluation = await RiskEvaluationService(client, samples=3).evaluate_risk(risk())
+
+    assert len(client.calls) == 9
+    assert (evaluation.severity_score, evaluation.frequency_score, evaluation.avoidability_score) == (4, 2, 4)
+    assert evaluation.severity_rationale == "根拠4"
+    assert evaluation.frequency_rationale == "根拠2"
+    assert evaluation.sample_count == 3
+    assert evaluation.severity_variance == pytest.approx(2 / 9)
+    assert evaluation.frequency_variance == pytest.approx(2 / 3)
+    assert evaluation.avoidability_variance == 0
+    # 発生頻度は3件中1件のみ一致
+    assert evaluation.agreement == pytest.approx(1 / 3)
+
+    single = await RiskEvaluationService(FakeLLMClient()).evaluate_risk(risk())
+    assert single.sample_count is None and single.agreement is None
+
+
+@pytest.mark.asyncio
+async def test_openai_samples_in_one_request():
+    """OpenAIはn指定の1リクエスト、Anthropicはk件の並行呼び出しでサンプルを生成すること"""
+    server = MockLLMServer()
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app))
+    openai_client = OpenAIClient("mock", base_url="http://mock/v1", http_client=http)
+    claude_client = ClaudeClient("mock", base_url="http://mock", http_client=http)
+
+    evaluation = await RiskEvaluationService(openai_client, samples=3).evaluate_risk(risk())
+    assert evaluation.sample_count == 3 and evaluation.agreement == 1.0
+    assert server.stats["sampled"] == 3
+    assert server.stats[CallSite.SEVERITY] == 1
+
+    evaluation = await RiskEvaluationService(claude_client, samples=3).evaluate_risk(risk())
+    assert evaluation.sample_count == 3
+    assert server.stats["sampled"] == 3
+    assert server.stats[CallSite.SEVERITY] == 4
+
+
+def test_invalid_settings_are_rejected():
+    with pytest.raises(ValueError):
+        RiskEvaluationService(FakeLLMClient(), samples=20)
+    with pytest.raises(ValueError):
+        RiskEvaluationService(FakeLLMClient(), aggregation="mean")
+
+
+@pytest.mark.asyncio
+async def test_evaluate_endpoint_accepts_samples():
+    """評価APIで samples を指定すると一貫性モードの統計が保存・返却されること"""
+    async with in_process_client() as client:
+        created = await client.post("/api/v1/situations", json={"description": "自動運転"})
+        situation_id = created.json()["situation_id"]
+        identified = await client.post(f"/api/v1/situations/{situation_id}/identify-risks", json={})
+        risk_id = identified.json()["identified_risks"][0]["risk_id"]
+
+        invalid = await client.post(f"/api/v1/risks/{risk_id}/evaluate", params={"samples": 20})
+        assert invalid.status_code == 422
+
+        response = await client.post(
+            f"/api/v1/risks/{risk_id}/evaluate",
+            params={"samples": 3, "aggregation": "majority"}
+        )
+        assert response.status_code == 200
+        assert response.json()["sample_count"] == 3
+        assert response.json()["agreement"] == 1.0
+
+        stored = await client.get(f"/api/v1/risks/{risk_id}/evaluation")
+        assert stored.json()["severity_variance"] == 0.0
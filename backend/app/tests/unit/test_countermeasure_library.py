@@ -0,0 +1,197 @@
+"""Unit tests for the cross-situation countermeasure reuse library."""
+
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database.base import Base
+from app.database.persistence import insert_returning
+from app.models import RiskSituation, IdentifiedRisk, RiskEvaluation, Countermeasure
+from app.services.countermeasure_library import CountermeasureLibrary
+from app.tests.load.harness import in_process_client
+
+
+def make_evaluation(
+    evaluation_id: str,
+    description: str,
+    guideword: str = "網羅性",
+    scores=(5, 3, 4)
+) -> RiskEvaluation:
+    risk = IdentifiedRisk(
+        risk_id=f"risk-{evaluation_id}",
+        guideword=guideword,
+        risk_description=description
+    )
+    return RiskEvaluation(
+        evaluation_id=evaluation_id,
+        risk_id=risk.risk_id,
+        risk=risk,
+        severity_score=scores[0],
+        frequency_score=scores[1],
+        avoidability_score=scores[2],
+        risk_level="高",
+    )
+
+
+def make_library() -> CountermeasureLibrary:
+    library = CountermeasureLibrary(threshold=0.8)
+    library.add(make_evaluation("past-1", "夜間の走行データが不足しており、暗所での認識精度が低下する可能性がある"))
+    library.add(make_evaluation("past-2", "操作者がAIの判断に過度に依存し、異常に気付かない", guideword="依存"))
+    return library
+
+
+def test_paraphrased_risk_with_similar_scores_matches():
+    """言い換えられたリスクで、ガイドワードとスコアが近ければ一致すること"""
+    library = make_library()
+    evaluation = make_evaluation(
+        "new", "夜間の走行データが不足しているため、暗所での認識精度が低下する可能性がある", scores=(5, 3, 3)
+    )
+
+    match = library.best_match(evaluation)
+
+    assert match is not None
+    assert match.entry.evaluation_id == "past-1"
+    assert 0.8 <= match.score < 1.0
+
+
+def test_guideword_and_scores_affect_similarity():
+    """同じ記述でもガイドワードやスコアが異なれば類似度が下がること"""
+    library = make_library()
+    description = "夜間の走行データが不足しており、暗所での認識精度が低下する可能性がある"
+
+    same = library.search(make_evaluation("a", description), threshold=0.0)[0]
+    other_guideword = library.search(make_evaluation("b", description, guideword="偏り"), threshold=0.0)[0]
+    other_scores = library.search(make_evaluation("c", description, scores=(1, 1, 1)), threshold=0.0)[0]
+
+    assert same.score == 1.0
+    assert other_guideword.score < same.score
+    assert other_scores.score < same.score
+    assert library.best_match(make_evaluation("d", description, guideword="偏り", scores=(1, 1, 1))) is None
+
+
+def test_evaluation_does_not_match_itself():
+    """登録済みの評価自身は候補にならないこと"""
+    library = make_library()
+    evaluation = make_evaluation("past-1", "夜間の走行データが不足しており、暗所での認識精度が低下する可能性がある")
+
+    assert library.best_match(evaluation) is None
+
+
+def test_discard_removes_evaluation_from_index():
+    """削除された評価が類似度インデックスからも外れ、再登録できること"""
+    library = make_library()
+    description = "夜間の走行データが不足しており、暗所での認識精度が低下する可能性がある"
+
+    library.discard(["past-1"])
+
+    assert len(library) == 1
+    assert library._index.query(description) == []
+
+    library.add(make_evaluation("past-1", description))
+    assert library.best_match(make_evaluation("new", description)).entry.evaluation_id == "past-1"
+
+
+def test_load_picks_up_countermeasures_saved_elsewhere():
+    """他のワーカーで保存された対策の評価を、次の読み込みで取り込むこと"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    library = CountermeasureLibrary(threshold=0.8, refresh_interval=0)
+
+    def save(i: int, description: str):
+        insert_returning(db, [
+            IdentifiedRisk(
+                risk_id=f"risk-{i}", situation_id="situation-1", category="データ",
+                guideword="網羅性", risk_description=description
+            ),
+            RiskEvaluation(
+                evaluation_id=f"evaluation-{i}", risk_id=f"risk-{i}", severity_score=5,
+                frequency_score=3, avoidability_score=4, risk_level="高"
+            ),
+            Countermeasure(evaluation_id=f"evaluation-{i}", strategy_type="過酷度低減", description="対策"),
+        ])
+        db.commit()
+
+    try:
+        insert_returning(db, [RiskSituation(situation_id="situation-1", description="自動運転")])
+        save(1, "夜間の走行データが不足しており、暗所での認識精度が低下する可能性がある")
+        assert len(library.load(db)) == 1
+
+        save(2, "操作者がAIの判断に過度に依存し、異常に気付かない")
+        assert len(library.load(db)) == 2
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_reuse_links_to_source_measure():
+    """再利用した対策が再利用元の対策にリンクされること"""
+    evaluation = make_evaluation("new", "リスク")
+    source = Countermeasure(
+        measure_id="measure-1",
+        evaluation_id="past-1",
+        strategy_type="過酷度低減",
+        description="フェールセーフ機構を導入する",
+        priority=5
+    )
+
+    [copy] = CountermeasureLibrary.reuse([source], evaluation)
+
+    assert copy.evaluation_id == "new"
+    assert copy.source_measure_id == "measure-1"
+    assert copy.description == source.description
+
+
+@pytest.mark.asyncio
+async def test_repeated_reuse_returns_existing_copies(monkeypatch):
+    """同じ評価への再利用を繰り返しても、複製済みの対策を返して行を増やさないこと"""
+    monkeypatch.setattr(
+        "app.api.routes.evaluations.countermeasure_library", CountermeasureLibrary(threshold=0.8)
+    )
+    async with in_process_client() as client:
+        evaluation_ids = []
+        for _ in range(2):
+            created = await client.post("/api/v1/situations", json={"description": "自動運転"})
+            situation_id = created.json()["situation_id"]
+            identified = await client.post(f"/api/v1/situations/{situation_id}/identify-risks", json={})
+            risk_id = identified.json()["identified_risks"][0]["risk_id"]
+            evaluation = await client.post(f"/api/v1/risks/{risk_id}/evaluate")
+            evaluation_ids.append(evaluation.json()["evaluation_id"])
+        source_id, target_id = evaluation_ids
+
+        url = "/api/v1/evaluations/{}/generate-countermeasures"
+        sources = (await client.post(url.format(source_id))).json()["countermeasures"]
+        reuse = {"reuse": "true"}
+        responses = await asyncio.gather(*[client.post(url.format(target_id), params=reuse) for _ in range(3)])
+        again = await client.post(url.format(target_id), params=reuse)
+
+        copies = [r.json()["countermeasures"] for r in [*responses, again]]
+        assert all(c == copies[0] for c in copies)
+        assert len(copies[0]) == len(sources)
+        assert {c["source_measure_id"] for c in copies[0]} == {c["measure_id"] for c in sources}
+        stored = await client.get(f"/api/v1/evaluations/{target_id}/countermeasures")
+        assert len(stored.json()["countermeasures"]) == len(sources)
+
+
+@pytest.mark.asyncio
+async def test_reuse_is_opt_in(monkeypatch):
+    """reuseを指定しなければ、類似した過去の評価があっても対策を生成すること"""
+    monkeypatch.delenv("COUNTERMEASURE_REUSE", raising=False)
+    monkeypatch.setattr(
+        "app.api.routes.evaluations.countermeasure_library", CountermeasureLibrary(threshold=0.8)
+    )
+    async with in_process_client() as client:
+        created = await client.post("/api/v1/situations", json={"description": "自動運転"})
+        situation_id = created.json()["situation_id"]
+        identified = await client.post(f"/api/v1/situations/{situation_id}/identify-risks", json={})
+        risk_id = identified.json()["identified_risks"][0]["risk_id"]
+        evaluation_ids = [
+            (await client.post(f"/api/v1/risks/{risk_id}/evaluate")).json()["evaluation_id"]
+            for _ in range(2)
+        ]
+
+        url = "/api/v1/evaluations/{}/generate-countermeasures"
+        for evaluation_id in evaluation_ids:
+            response = await client.post(url.format(evaluation_id))
+            assert all(c["source_measure_id"] is None for c in response.json()["countermeasures"])
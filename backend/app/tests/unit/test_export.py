@@ -0,0 +1,166 @@
+"""Unit tests for streaming export."""
+
+import csv
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+
+import orjson
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database.base import Base
+from app.models import (
+    RiskSituation,
+    IdentifiedRisk,
+    RiskEvaluation,
+    Countermeasure,
+    MetaCountermeasure,
+)
+from app.api.routes.export import content_disposition
+from app.services.export import ExportService, write_csv, write_xlsx
+from app.tests.load.harness import in_process_client
+
+NS = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    session.add_all([
+        RiskSituation(situation_id="situation-1", description="自動運転車の歩行者検知"),
+        RiskSituation(situation_id="situation-2", description="リスク未特定の状況"),
+        *[
+            IdentifiedRisk(
+                risk_id=f"risk-{i}", situation_id="situation-1", category="データ",
+                guideword="網羅性", risk_description=f"リスク{i}, \"引用\"\n改行"
+            )
+            for i in range(5)
+        ],
+        RiskEvaluation(
+            evaluation_id="evaluation-0", risk_id="risk-0",
+            severity_score=5, severity_rationale="人身事故<重大>\x01",
+            frequency_score=3, avoidability_score=4, risk_level="高"
+        ),
+        MetaCountermeasure(
+            meta_id="meta-1", evaluation_id="evaluation-0",
+            target_axis="過酷度低減", meta_approach="外部でガードする"
+        ),
+        Countermeasure(
+            measure_id="measure-1", evaluation_id="evaluation-0", meta_id="meta-1",
+            strategy_type="過酷度低減", description="夜間は速度を制限する", priority=1
+        ),
+    ])
+    session.commit()
+    session.close()
+    yield Session
+    engine.dispose()
+
+
+def export(session_factory, format, datasets=None, situation_id=None, yield_per=1000):
+    service = ExportService(session_factory, yield_per=yield_per)
+    datasets = ExportService.resolve_datasets(format, datasets)
+    return list(service.stream(format, datasets, situation_id))
+
+
+def test_csv_rows_are_streamed_in_batches(session_factory):
+    """CSVはバッチごとに送られ、リスクのない状況や未評価のリスクも含むこと"""
+    chunks = export(session_factory, "csv", yield_per=2)
+
+    assert len(chunks) > 3
+    assert chunks[0] == "\ufeff".encode()
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode("utf-8-sig"))))
+    assert [(r["situation_id"], r["risk_id"]) for r in rows] == [
+        *[("situation-1", f"risk-{i}") for i in range(5)],
+        ("situation-2", ""),
+    ]
+    assert rows[0]["severity_score"] == "5"
+    assert rows[1]["risk_description"] == "リスク1, \"引用\"\n改行"
+
+
+def test_csv_formulas_are_neutralized():
+    """数式として解釈される文字列の先頭に ' を付け、数値はそのまま書くこと"""
+    values = ['=HYPERLINK("http://example.com")', "+1", "-1", "@SUM(A1)", "通常の文", -1]
+    data = b"".join(write_csv([("risks", ["value"], [[(v,) for v in values]])]))
+
+    rows = list(csv.reader(io.StringIO(data.decode("utf-8-sig"))))
+    assert [r[0] for r in rows[1:]] == [
+        '\'=HYPERLINK("http://example.com")', "'+1", "'-1", "'@SUM(A1)", "通常の文", "-1"
+    ]
+
+
+def test_jsonl_contains_all_datasets(session_factory):
+    """JSONLは全データセットの行を1行1レコードで含むこと"""
+    lines = b"".join(export(session_factory, "jsonl", situation_id="situation-1")).splitlines()
+    records = [orjson.loads(line) for line in lines]
+
+    assert [r["dataset"] for r in records] == ["risks"] * 5 + ["meta_countermeasures", "countermeasures"]
+    measure = records[-1]
+    assert (measure["situation_id"], measure["risk_id"], measure["meta_id"]) == (
+        "situation-1", "risk-0", "meta-1"
+    )
+
+
+def test_xlsx_workbook_has_sheet_per_dataset(session_factory):
+    """XLSXはデータセットごとのシートを持ち、文字列が正しくエスケープされること"""
+    workbook = zipfile.ZipFile(io.BytesIO(b"".join(export(session_factory, "xlsx"))))
+
+    sheets = ET.fromstring(workbook.read("xl/workbook.xml")).findall("x:sheets/x:sheet", NS)
+    assert [s.get("name") for s in sheets] == ["risks", "meta_countermeasures", "countermeasures"]
+
+    rows = ET.fromstring(workbook.read("xl/worksheets/sheet1.xml")).findall("x:sheetData/x:row", NS)
+    header = [c.findtext("x:is/x:t", namespaces=NS) for c in rows[0]]
+    first = dict(zip(header, rows[1]))
+    assert len(rows) == 7
+    assert first["severity_score"].findtext("x:v", namespaces=NS) == "5"
+    assert first["severity_rationale"].findtext("x:is/x:t", namespaces=NS) == "人身事故<重大>"
+
+
+def test_xlsx_non_finite_floats_are_empty_cells():
+    """NaN・無限大は空のセルとして書くこと"""
+    batches = [[(0.5, float("nan"), float("inf"), float("-inf"))]]
+    workbook = zipfile.ZipFile(io.BytesIO(b"".join(write_xlsx([("risks", ["a", "b", "c", "d"], batches)]))))
+
+    rows = ET.fromstring(workbook.read("xl/worksheets/sheet1.xml")).findall("x:sheetData/x:row", NS)
+    assert [c.findtext("x:v", namespaces=NS) for c in rows[1]] == ["0.5", None, None, None]
+
+
+def test_content_disposition_encodes_non_ascii_filename():
+    """ASCII以外のファイル名はfilename*で符号化し、filenameには代替の名前を入れること"""
+    header = content_disposition('assessment-状況"1.csv')
+
+    assert header == (
+        "attachment; filename=\"assessment-___1.csv\"; "
+        "filename*=UTF-8''assessment-%E7%8A%B6%E6%B3%81%221.csv"
+    )
+
+
+def test_resolve_datasets():
+    """CSVは1つのデータセットのみ書き出せること"""
+    assert ExportService.resolve_datasets("xlsx") == ["risks", "meta_countermeasures", "countermeasures"]
+    assert ExportService.resolve_datasets("csv", ["countermeasures"]) == ["countermeasures"]
+    with pytest.raises(ValueError):
+        ExportService.resolve_datasets("csv", ["risks", "countermeasures"])
+    with pytest.raises(ValueError):
+        ExportService.resolve_datasets("jsonl", ["unknown"])
+
+
+@pytest.mark.asyncio
+async def test_export_endpoint():
+    """書き出しAPIがチャンク転送で添付ファイルを返すこと"""
+    async with in_process_client() as client:
+        situation = (await client.post("/api/v1/situations", json={"description": "状況"})).json()
+        await client.post(f"/api/v1/situations/{situation['situation_id']}/identify-risks")
+
+        response = await client.get("/api/v1/export", params={"format": "csv"})
+        assert "content-length" not in response.headers
+        assert response.headers["content-disposition"].startswith('attachment; filename="assessment-all-')
+        assert len(response.content.decode("utf-8-sig").splitlines()) == 3
+
+        invalid = await client.get(
+            "/api/v1/export", params={"format": "csv", "datasets": ["risks", "countermeasures"]}
+        )
+        assert invalid.status_code == 422
@@ -0,0 +1,183 @@
+"""Unit tests for cross-risk meta countermeasure integration."""
+
+import pytest
+from app.llm.context import CallSite
+from app.llm.fake import FakeLLMClient
+from app.models import IdentifiedRisk, RiskEvaluation, MetaCountermeasure, Countermeasure
+from app.services.countermeasure_generation import CountermeasureGenerationService
+from app.services.meta_integration import MetaIntegrationService, MetaCluster
+from app.services.similarity import SimilarityIndex, shingles, jaccard
+from app.tests.load.harness import in_process_client
+
+
+def make_evaluation(i: int) -> RiskEvaluation:
+    risk = IdentifiedRisk(risk_id=f"risk-{i}", risk_description=f"夜間の認識精度低下（事例{i}）")
+    return RiskEvaluation(
+        evaluation_id=f"evaluation-{i}",
+        risk_id=risk.risk_id,
+        risk=risk,
+        severity_score=5,
+        frequency_score=3,
+        avoidability_score=4,
+        risk_level="高",
+    )
+
+
+def make_meta(meta_id: str, approach: str, priority: int = 3, axis: str = "回避可能性向上") -> MetaCountermeasure:
+    return MetaCountermeasure(
+        meta_id=meta_id,
+        evaluation_id=f"evaluation-{meta_id}",
+        target_axis=axis,
+        meta_approach=approach,
+        priority=priority,
+    )
+
+
+def test_similarity_ignores_punctuation_and_width():
+    """句読点・全角半角の違いが類似度に影響しないこと"""
+    assert jaccard(shingles("ＡＩの外側で、ガードする。"), shingles("AIの外側でガードする")) == 1.0
+
+
+def test_similarity_index_lsh_finds_near_duplicates():
+    """LSHによる候補絞り込みでも近似重複が見つかること"""
+    index = SimilarityIndex(threshold=0.5, exact_below=0)
+    index.add("guard", "AIの外側でガードする設計にする")
+    index.add("human", "人間による確認プロセスを組み込む")
+
+    matches = index.query("人間の確認プロセスを組み込む")
+
+    assert [key for key, _ in matches] == ["human"]
+    assert index.query("学習データを追加収集する") == []
+
+
+def test_cluster_merges_near_duplicates_per_axis():
+    """軸ごとに近似重複が統合され、優先度の高いものが代表になること"""
+    service = MetaIntegrationService(llm_client=None, threshold=0.5)
+    metas = [
+        make_meta("a", "人間による確認プロセスを組み込む", priority=3),
+        make_meta("b", "人間の確認プロセスを組み込む", priority=5),
+        make_meta("c", "AIの外側でガードする設計にする", priority=4),
+        make_meta("d", "人間による確認プロセスを組み込む", priority=4, axis="過酷度低減"),
+    ]
+
+    clusters = service.cluster(metas)
+
+    assert [(c.target_axis, c.representative.meta_id, [m.meta_id for m in c.members]) for c in clusters] == [
+        ("回避可能性向上", "b", ["b", "a"]),
+        ("回避可能性向上", "c", ["c"]),
+        ("過酷度低減", "d", ["d"]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_generate_cluster_and_expand_once():
+    """メタ対策を並行生成し、共有アプローチは1回だけ展開されること"""
+    llm = FakeLLMClient()
+    service = MetaIntegrationService(llm, threshold=0.5)
+    evaluations = [make_evaluation(i) for i in range(3)]
+
+    metas = await service.generate_missing(evaluations)
+    for i, meta in enumerate(metas):
+        meta.meta_id = f"meta-{i}"
+    clusters = service.cluster(metas)
+
+    # 3評価 × 3軸 × 2アプローチが、軸ごとの2アプローチに統合される
+    assert len(metas) == 18
+    assert len(clusters) == 6
+    assert all(len(c.evaluation_ids) == 3 for c in clusters)
+
+    measures = await service.expand_all(clusters, {e.evaluation_id: e for e in evaluations})
+
+    from_meta_calls = [site for site, _ in llm.calls if site == CallSite.COUNTERMEASURES_FROM_META]
+    assert len(from_meta_calls) == 6
+    # 代表の3件に加え、他の2メンバーに複製される
+    assert len(measures) == 6 * 3 * 3
+    member_ids = {m.meta_id for c in clusters for m in c.members}
+    assert {m.meta_id for m in measures} == member_ids
+
+
+def test_expansion_hash_tracks_meta_and_evaluation_content():
+    """展開元の内容が変わると既存の展開結果が古いと判定されること"""
+    service = CountermeasureGenerationService(llm_client=None)
+    evaluation = make_evaluation(0)
+    meta = make_meta("a", "人間による確認プロセスを組み込む")
+    measure = Countermeasure(source_hash=service.meta_source_hash(meta, evaluation))
+
+    assert service.is_current_expansion([measure], meta, evaluation)
+    assert not service.is_current_expansion([], meta, evaluation)
+
+    meta.example = "低信頼度の判断はオペレーターが確認する"
+    assert not service.is_current_expansion([measure], meta, evaluation)
+
+
+@pytest.mark.asyncio
+async def test_expand_reuses_current_expansion():
+    """代表が展開済みで内容が変わっていなければLLMを呼ばずに複製すること"""
+    llm = FakeLLMClient()
+    service = MetaIntegrationService(llm)
+    evaluation = make_evaluation(0)
+    representative = make_meta("a", "人間による確認プロセスを組み込む")
+    representative.evaluation_id = evaluation.evaluation_id
+    member = make_meta("b", "人間の確認プロセスを組み込む")
+    representative.countermeasures = await service.countermeasure_service.generate_from_meta_countermeasure(
+        representative, evaluation
+    )
+    llm.calls.clear()
+
+    cluster = MetaCluster(representative=representative, members=[representative, member])
+    created = await service.expand(cluster, {evaluation.evaluation_id: evaluation})
+
+    assert llm.calls == []
+    assert cluster.replaced == []
+    assert [m.meta_id for m in created] == ["b"] * 3
+
+
+@pytest.mark.asyncio
+async def test_expand_replaces_stale_expansion_and_its_copies():
+    """代表の内容が変わった場合は再生成し、古い展開結果と複製を置き換えること"""
+    llm = FakeLLMClient()
+    service = MetaIntegrationService(llm)
+    evaluation = make_evaluation(0)
+    representative = make_meta("a", "人間による確認プロセスを組み込む")
+    representative.evaluation_id = evaluation.evaluation_id
+    member = make_meta("b", "人間の確認プロセスを組み込む")
+    old = Countermeasure(meta_id="a", description="古い対策", source_hash="old")
+    copied = Countermeasure(meta_id="b", description="古い対策", source_hash="old")
+    representative.countermeasures = [old]
+    member.countermeasures = [copied]
+
+    cluster = MetaCluster(representative=representative, members=[representative, member])
+    created = await service.expand(cluster, {evaluation.evaluation_id: evaluation})
+
+    assert len(llm.calls) == 1
+    assert cluster.replaced == [old, copied]
+    assert sorted(m.meta_id for m in created) == ["a"] * 3 + ["b"] * 3
+
+
+@pytest.mark.asyncio
+async def test_member_copies_are_current_for_per_member_expansion():
+    """統合展開で複製されたメンバーの対策は、メンバー単位の展開でも再生成されないこと"""
+    async with in_process_client() as client:
+        created = await client.post("/api/v1/situations", json={"description": "自動運転"})
+        situation_id = created.json()["situation_id"]
+        identified = await client.post(f"/api/v1/situations/{situation_id}/identify-risks", json={})
+        evaluation_ids = []
+        for risk in identified.json()["identified_risks"][:2]:
+            evaluation = await client.post(f"/api/v1/risks/{risk['risk_id']}/evaluate")
+            evaluation_ids.append(evaluation.json()["evaluation_id"])
+
+        integrated = await client.post(
+            "/api/v1/evaluations/meta/integrate",
+            json={"evaluation_ids": evaluation_ids, "expand": True}
+        )
+        cluster = next(c for c in integrated.json()["integrated_meta_countermeasures"] if len(c["member_meta_ids"]) > 1)
+        member_id = next(mid for mid in cluster["member_meta_ids"] if mid != cluster["meta_id"])
+        expansions = client.mock_server.stats[CallSite.COUNTERMEASURES_FROM_META]
+
+        response = await client.post(f"/api/v1/evaluations/meta/{member_id}/generate-countermeasures")
+
+        assert response.status_code == 200
+        assert client.mock_server.stats[CallSite.COUNTERMEASURES_FROM_META] == expansions
+        assert [m["description"] for m in response.json()["countermeasures"]] == [
+            m["description"] for m in cluster["countermeasures"]
+        ]
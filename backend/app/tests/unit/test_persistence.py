@@ -0,0 +1,129 @@
+"""Unit tests for bulk INSERT ... RETURNING persistence."""
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.database.base import Base
+from app.database.persistence import insert_returning, insert_records, delete_all
+from app.models import RiskSituation, IdentifiedRisk, Countermeasure, RiskEvaluation
+from app.schemas.risk import RiskResponse
+from app.services.records import RiskRecord, EvaluationRecord
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.statements = statements
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def make_risks(n: int):
+    return [
+        IdentifiedRisk(
+            situation_id="situation-1",
+            category="データ",
+            guideword="網羅性",
+            risk_description=f"リスク{i}",
+            confidence_score=0.5
+        )
+        for i in range(n)
+    ]
+
+
+def test_one_insert_per_entity_type_in_input_order(db):
+    """種別ごとに1回のINSERTで保存され、入力順に行が返ること"""
+    situation = RiskSituation(situation_id="situation-1", description="状況")
+    risks = make_risks(50)
+    db.statements.clear()
+
+    rows = insert_returning(db, [situation, *risks])
+    db.commit()
+
+    inserts = [s for s in db.statements if s.startswith("INSERT")]
+    assert len(inserts) == 2
+    assert "RETURNING" in inserts[1]
+    assert rows[0].situation_id == "situation-1"
+    # Python側のデフォルト（UUID・日時）が適用されている
+    assert rows[0].created_at is not None
+    assert [row.risk_description for row in rows[1:]] == [f"リスク{i}" for i in range(50)]
+    assert len({row.risk_id for row in rows[1:]}) == 50
+    assert db.query(IdentifiedRisk).count() == 50
+
+
+def test_rows_build_response_dtos(db):
+    """返された行からレスポンスを作成できること"""
+    [row] = insert_returning(db, make_risks(1))
+
+    response = RiskResponse.model_validate(row)
+
+    assert response.risk_id == row.risk_id
+    assert response.risk_description == "リスク0"
+
+
+def test_fallback_without_returning(db, monkeypatch):
+    """RETURNING非対応の場合は挿入した値を返すこと"""
+    dialect = db.get_bind().dialect
+    monkeypatch.setattr(dialect, "insert_executemany_returning_sort_by_parameter_order", False)
+
+    rows = insert_returning(db, make_risks(3))
+    db.commit()
+
+    assert [row.risk_description for row in rows] == ["リスク0", "リスク1", "リスク2"]
+    assert {r.risk_id for r in db.query(IdentifiedRisk)} == {row.risk_id for row in rows}
+
+
+def test_delete_all(db):
+    """主キーで一括削除されること"""
+    evaluation = RiskEvaluation(
+        evaluation_id="evaluation-1", risk_id="risk-1",
+        severity_score=3, frequency_score=3, avoidability_score=3, risk_level="中"
+    )
+    insert_returning(db, [evaluation])
+    insert_returning(db, [
+        Countermeasure(evaluation_id="evaluation-1", strategy_type="過酷度低減", description=f"対策{i}")
+        for i in range(3)
+    ])
+    db.commit()
+
+    measures = db.query(Countermeasure).all()
+    delete_all(db, measures[:2])
+    db.commit()
+
+    assert [m.description for m in db.query(Countermeasure)] == [measures[2].description]
+
+
+def test_insert_records_and_load_with_column_selects(db):
+    """レコードがチャンクごとのINSERTで保存され、列のみのSELECTで読み戻せること"""
+    db.add(RiskSituation(situation_id="situation-1", description="状況"))
+    db.commit()
+    risks = [
+        RiskRecord(f"risk-{i}", "situation-1", "データ", "網羅性", f"リスク{i}", confidence_score=0.5)
+        for i in range(5)
+    ]
+    evaluations = [
+        EvaluationRecord(risk.risk_id, 4, 3, 2, "高", normalized_score=0.6)
+        for risk in risks
+    ]
+    db.statements.clear()
+
+    insert_records(db, [*risks, *evaluations], chunk_size=2)
+    db.commit()
+
+    # テーブルごとに ceil(5 / 2) = 3回
+    assert len([s for s in db.statements if s.startswith("INSERT")]) == 6
+    assert RiskRecord.from_rows(db.execute(RiskRecord.select())) == risks
+
+    loaded = EvaluationRecord.from_rows_with_risk(db.execute(EvaluationRecord.select_with_risk()))
+    assert {e.evaluation_id for e in loaded} == {e.evaluation_id for e in evaluations}
+    assert all(e.risk.risk_id == e.risk_id for e in loaded)
+    assert db.query(RiskEvaluation).first().normalized_score == 0.6
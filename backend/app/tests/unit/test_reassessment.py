@@ -0,0 +1,124 @@
+"""Unit tests for incremental re-assessment."""
+
+import json
+import pytest
+from app.llm.context import CallSite
+from app.models import RiskSituation, IdentifiedRisk
+from app.schemas.situation import SituationCreate
+from app.services.reassessment import ReassessmentService
+from app.tests.load.harness import in_process_client
+
+NIGHT = "夜間の走行データが不足しており、暗所での認識精度が低下する可能性がある"
+RELIANCE = "運転者が自動運転に過度に依存し、介入が遅れる可能性がある"
+
+
+def make_risk(description: str, guideword: str = "網羅性", risk_id: str = None) -> IdentifiedRisk:
+    return IdentifiedRisk(
+        risk_id=risk_id,
+        situation_id="situation-1",
+        category="データ",
+        guideword=guideword,
+        risk_description=description
+    )
+
+
+def identification_response(*risks) -> str:
+    return json.dumps({
+        "identified_risks": [
+            {"category": "データ", "guideword": guideword, "risk_description": description, "confidence": "高"}
+            for guideword, description in risks
+        ]
+    }, ensure_ascii=False)
+
+
+def test_diff_reports_changed_fields_and_sentences():
+    """変更された項目と、説明の追加・削除された文が得られること"""
+    service = ReassessmentService(llm_client=None)
+    situation = RiskSituation(description="自動運転車に搭載する。夜間も走行する。", industry="自動車")
+
+    same = service.diff(situation, SituationCreate(description="自動運転車に搭載する。夜間も走行する。", industry="自動車"))
+    diff = service.diff(situation, SituationCreate(description="自動運転車に搭載する。雨天時も走行する。", industry="自動車", ai_type="画像認識"))
+
+    assert not same.changed
+    assert diff.changed_fields == ["description", "ai_type"]
+    assert diff.removed_sentences == ["夜間も走行する。"]
+    assert diff.added_sentences == ["雨天時も走行する。"]
+
+
+def test_match_classifies_unchanged_changed_added_removed():
+    """既存リスクとの対応付けで変化なし・変化・新規・削除に分類されること"""
+    service = ReassessmentService(llm_client=None, match_threshold=0.5, unchanged_threshold=0.8)
+    night = make_risk(NIGHT, risk_id="risk-night")
+    reliance = make_risk(RELIANCE, guideword="人間の監視", risk_id="risk-reliance")
+    bias = make_risk("学習データに地域的な偏りがある", guideword="差別と偏見", risk_id="risk-bias")
+
+    plan = service.match([night, reliance, bias], [
+        make_risk(NIGHT.replace("、", "。")),
+        make_risk("運転者が自動運転に依存し、緊急時の介入が大きく遅れる可能性がある", guideword="人間の監視"),
+        make_risk("雨天時のセンサー性能が低下する可能性がある"),
+    ])
+
+    assert plan.unchanged == [night]
+    assert [c.previous for c in plan.changed] == [reliance]
+    assert [r.risk_description for r in plan.added] == ["雨天時のセンサー性能が低下する可能性がある"]
+    assert plan.removed == [bias]
+    assert len(plan.new_risks) == 2
+    assert plan.obsolete_risks == [reliance, bias]
+
+
+def test_match_treats_guideword_change_as_material():
+    """同じ記述でもガイドワードが変わればLLMで再評価する対象になること"""
+    service = ReassessmentService(llm_client=None)
+    previous = make_risk(NIGHT, risk_id="risk-night")
+
+    plan = service.match([previous], [make_risk(NIGHT, guideword="分布シフト")])
+
+    assert plan.unchanged == []
+    assert plan.changed[0].previous is previous
+
+
+@pytest.mark.asyncio
+async def test_reassess_calls_llm_only_for_changed_risks():
+    """変化したリスクのみ評価し、変化のないリスクの評価と対策は保持されること"""
+    async with in_process_client() as client:
+        server = client.mock_server
+        situation = (await client.post("/api/v1/situations", json={"description": "自動運転車に搭載する。"})).json()
+        url = f"/api/v1/situations/{situation['situation_id']}"
+        risks = (await client.post(f"{url}/identify-risks")).json()["identified_risks"]
+        evaluations = {}
+        for risk in risks:
+            evaluation = (await client.post(f"/api/v1/risks/{risk['risk_id']}/evaluate")).json()
+            evaluations[risk["risk_id"]] = evaluation["evaluation_id"]
+            await client.post(f"/api/v1/evaluations/{evaluation['evaluation_id']}/generate-countermeasures")
+        night_id = next(r["risk_id"] for r in risks if r["risk_description"] == NIGHT)
+
+        # 変更がなければLLMを呼ばない
+        before = dict(server.stats)
+        response = await client.post(f"{url}/reassess", json={"description": "自動運転車に搭載する。"})
+        assert response.status_code == 200
+        assert response.json()["changed_fields"] == []
+        assert dict(server.stats) == before
+
+        # 夜間のリスクは変化なし、依存のリスクは該当しなくなり、新たなリスクが1件特定される
+        server.responses[CallSite.RISK_IDENTIFICATION] = identification_response(
+            ("網羅性", NIGHT), ("分布シフト", "雨天時のセンサー性能が低下する可能性がある")
+        )
+        response = await client.post(f"{url}/reassess", json={"description": "自動運転車に搭載する。雨天時も走行する。"})
+        result = response.json()
+
+        assert result["changed_fields"] == ["description"]
+        assert result["added_sentences"] == ["雨天時も走行する。"]
+        assert result["unchanged_risk_ids"] == [night_id]
+        assert len(result["added_risk_ids"]) == 1
+        assert len(result["removed_risk_ids"]) == 1
+        assert [e["risk_id"] for e in result["evaluations"]] == result["added_risk_ids"]
+        assert {r["risk_id"] for r in result["identified_risks"]} == {night_id, *result["added_risk_ids"]}
+        assert server.stats[CallSite.RISK_IDENTIFICATION] - before[CallSite.RISK_IDENTIFICATION] == 1
+        assert server.stats[CallSite.SEVERITY] - before[CallSite.SEVERITY] == 1
+
+        kept = (await client.get(f"/api/v1/risks/{night_id}/evaluation")).json()
+        assert kept["evaluation_id"] == evaluations[night_id]
+        measures = (await client.get(f"/api/v1/evaluations/{kept['evaluation_id']}/countermeasures")).json()
+        assert measures["countermeasures"]
+        removed = await client.get(f"/api/v1/risks/{result['removed_risk_ids'][0]}/evaluation")
+        assert removed.status_code == 404
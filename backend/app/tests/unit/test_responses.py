@@ -0,0 +1,57 @@
+"""Unit tests for the list response fast path."""
+
+import json
+from app.api.responses import risks_response, countermeasures_response, model_response
+from app.models import IdentifiedRisk, RiskEvaluation
+from app.schemas.risk import RisksListResponse, RiskResponse
+from app.schemas.evaluation import EvaluationResponse
+
+
+def make_risks(n: int):
+    return [
+        IdentifiedRisk(
+            risk_id=f"risk-{i}",
+            situation_id="situation-1",
+            category="データ",
+            guideword="網羅性",
+            risk_description=f"夜間の認識精度が低下する（事例{i}）",
+            confidence_score=0.7
+        )
+        for i in range(n)
+    ]
+
+
+def test_render_matches_list_schema():
+    """ORMインスタンスから変換したJSONがリストスキーマと一致すること"""
+    risks = make_risks(3)
+
+    body = risks_response.render(risks)
+
+    expected = RisksListResponse(
+        identified_risks=[RiskResponse.model_validate(r) for r in risks]
+    ).model_dump_json()
+    assert body == expected.encode()
+    # 日本語はエスケープせずUTF-8のまま出力される
+    assert "夜間".encode() in body
+
+
+def test_list_response_headers():
+    response = countermeasures_response([])
+
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == {"countermeasures": []}
+
+
+def test_model_response_from_orm_instance():
+    from datetime import datetime
+
+    evaluation = RiskEvaluation(
+        evaluation_id="evaluation-1", risk_id="risk-1",
+        severity_score=5, frequency_score=3, avoidability_score=4,
+        risk_level="高", evaluated_at=datetime(2024, 1, 1)
+    )
+
+    response = model_response(EvaluationResponse, evaluation, status_code=201)
+
+    assert response.status_code == 201
+    assert json.loads(response.body)["evaluation_id"] == "evaluation-1"
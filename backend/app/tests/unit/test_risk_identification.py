@@ -101,3 +101,99 @@ def test_deduplicate_removes_duplicates(service):
     deduplicated = service._deduplicate_risks(risks)
 
     assert len(deduplicated) == 2
+
+
+class ChunkAwareLLMClient(LLMClient):
+    """チャンクに含まれる語に応じてリスクを返すモックLLMクライアント"""
+
+    def __init__(self):
+        self.prompts = []
+        self.active = 0
+        self.max_active = 0
+
+    async def call(self, prompt: str, system_prompt: str = None) -> str:
+        import asyncio
+        import json
+
+        self.prompts.append(prompt)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+
+        risks = []
+        if "夜間" in prompt:
+            risks.append({"category": "データ", "guideword": "網羅性",
+                          "risk_description": "夜間の走行データが不足し、暗所で歩行者を認識できない可能性がある",
+                          "confidence": "中"})
+        if "監視員" in prompt:
+            risks.append({"category": "運用", "guideword": "人間の監視",
+                          "risk_description": "監視員が介入できず事故を防げない可能性がある",
+                          "confidence": "高"})
+        return json.dumps({"identified_risks": risks}, ensure_ascii=False)
+
+
+@pytest.mark.asyncio
+async def test_long_description_is_identified_per_chunk():
+    """長い説明はチャンクごとに並行して特定され、類似リスクが統合されること"""
+    description = (
+        "夜間の走行データが不足している。" + "車両は市街地を走行する。" * 40
+        + "夜間は暗所での認識が難しい。" + "車両は市街地を走行する。" * 40
+        + "監視員は遠隔で複数台を担当している。"
+    )
+    client = ChunkAwareLLMClient()
+    service = RiskIdentificationService(client, chunk_tokens=200, chunk_overlap=20, concurrency=2)
+    situation = RiskSituation(situation_id="test-002", description=description)
+
+    risks = await service.identify_risks(situation)
+
+    assert len(client.prompts) == len(service.split_description(description)) > 2
+    assert client.max_active == 2
+    assert all("長い説明の一部" in p for p in client.prompts)
+    assert [r.guideword for r in risks] == ["網羅性", "人間の監視"]
+    # 2つのチャンクで特定された「中」（0.7）のリスクは信頼度が引き上げられる
+    assert risks[0].confidence_score == 0.91
+    assert risks[1].confidence_score == 0.9
+
+
+def test_short_description_is_not_chunked(service, sample_situation):
+    """短い説明は分割せず、従来どおりのプロンプトで特定すること"""
+    assert service.split_description(sample_situation.description) == [sample_situation.description]
+    prompt = service._generate_prompt(sample_situation, service.guidewords)
+    assert f"# 状況\n{sample_situation.description}\n\n# コンテキスト" in prompt
+
+
+def test_merge_risks_keeps_distinct_guidewords(service):
+    """同じ記述でもガイドワードが異なるリスクは統合しないこと"""
+    from app.models import IdentifiedRisk
+
+    def risk(guideword, description, confidence):
+        return IdentifiedRisk(category="運用", guideword=guideword,
+                              risk_description=description, confidence_score=confidence)
+
+    merged = service._merge_risks([
+        [risk("誤使用", "想定外の用途で使われる可能性がある", 0.5)],
+        [],
+        [risk("誤使用", "想定外の用途で使われる可能性がある。", 0.9),
+         risk("基本権侵害", "想定外の用途で使われる可能性がある", 0.7)],
+    ])
+
+    assert [(r.guideword, r.confidence_score) for r in merged] == [("誤使用", 0.95), ("基本権侵害", 0.7)]
+
+
+def test_merge_risks_counts_overlapping_chunks_once():
+    """重なりを共有する隣接チャンクでの検出は1つの根拠として数えること"""
+    from app.models import IdentifiedRisk
+
+    def risk(confidence):
+        return IdentifiedRisk(category="運用", guideword="誤使用",
+                              risk_description="想定外の用途で使われる可能性がある",
+                              confidence_score=confidence)
+
+    overlapping = RiskIdentificationService(MockLLMClient(), chunk_overlap=20)
+    assert overlapping._merge_risks([[risk(0.5)], [risk(0.7)], [risk(0.5)]])[0].confidence_score == 0.7
+    assert overlapping._merge_risks([[risk(0.5)], [risk(0.7)], [], [risk(0.5)]])[0].confidence_score == 0.85
+
+    # 重なりのない分割では隣接していても別々の根拠
+    disjoint = RiskIdentificationService(MockLLMClient(), chunk_overlap=0)
+    assert disjoint._merge_risks([[risk(0.5)], [risk(0.7)]])[0].confidence_score == 0.85
@@ -0,0 +1,115 @@
+"""Unit tests for multi-provider routing and hedged requests."""
+
+import asyncio
+
+import pytest
+from app.llm.context import CallSite, call_site
+from app.llm.fake import FakeLLMClient
+from app.llm.routing import RoutingLLMClient
+from app.llm.client import LLMClientFactory
+from app.services.risk_evaluation import RiskEvaluationService
+from app.models import IdentifiedRisk
+
+
+@pytest.mark.asyncio
+async def test_routes_by_call_site_prefix():
+    """呼び出し箇所の前方一致でバックエンドが選択されること"""
+    strong = FakeLLMClient(default="strong", name="strong")
+    fast = FakeLLMClient(default="fast", name="fast")
+    client = RoutingLLMClient(
+        routes={"risk_evaluation": [fast]},
+        default=[strong]
+    )
+
+    risk = IdentifiedRisk(risk_id="risk-001", risk_description="リスク")
+    evaluation = await RiskEvaluationService(client).evaluate_risk(risk)
+
+    assert evaluation.severity_score == 5
+    assert [site for site, _ in fast.calls] == [
+        CallSite.SEVERITY, CallSite.FREQUENCY, CallSite.AVOIDABILITY
+    ]
+    assert strong.calls == []
+
+    with call_site(CallSite.RISK_IDENTIFICATION):
+        await client.call("prompt")
+    assert len(strong.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_uses_faster_backend():
+    """先頭のバックエンドが遅い場合にヘッジ先の応答が採用されること"""
+    slow = FakeLLMClient(default="slow", latency=1.0)
+    fast = FakeLLMClient(default="fast", latency=0.01)
+    client = RoutingLLMClient(
+        routes={},
+        default=[slow, fast],
+        hedge_delay=0.02
+    )
+
+    assert await client.call("prompt") == "fast"
+    assert len(slow.calls) == 1
+    assert len(fast.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_when_primary_is_fast():
+    """先頭のバックエンドがヘッジ待ち時間内に応答すればヘッジしないこと"""
+    primary = FakeLLMClient(default="primary")
+    secondary = FakeLLMClient(default="secondary")
+    client = RoutingLLMClient(routes={}, default=[primary, secondary], hedge_delay=0.5)
+
+    assert await client.call("prompt") == "primary"
+    assert secondary.calls == []
+
+
+@pytest.mark.asyncio
+async def test_failover_on_error():
+    """先頭のバックエンドが失敗した場合に即座に次へ切り替えること"""
+    broken = FakeLLMClient(error=RuntimeError("503"))
+    backup = FakeLLMClient(default="backup")
+    client = RoutingLLMClient(routes={}, default=[broken, backup], hedge_delay=10.0)
+
+    assert await client.call("prompt") == "backup"
+
+
+@pytest.mark.asyncio
+async def test_hedge_delay_follows_p95_latency():
+    """十分なサンプルがある場合、ヘッジ待ち時間がp95に従うこと"""
+    primary = FakeLLMClient(default="primary")
+    client = RoutingLLMClient(routes={}, default=[primary], min_samples=5)
+    tracker = client._tracker(CallSite.SEVERITY, primary)
+    for seconds in [0.1, 0.2, 0.3, 0.4, 1.0]:
+        tracker.record(seconds)
+
+    assert client._hedge_after(CallSite.SEVERITY, primary) == 1.0
+    # 呼び出し箇所ごとに別のp95を持つ
+    assert client._hedge_after(CallSite.RISK_IDENTIFICATION, primary) == client.hedge_delay
+
+
+@pytest.mark.asyncio
+async def test_cancelled_hedge_loser_is_recorded():
+    """ヘッジで負けてキャンセルされた呼び出しも経過時間を下限として記録されること"""
+    slow = FakeLLMClient(responses={CallSite.SEVERITY: "slow"}, latency=1.0, name="slow")
+    fast = FakeLLMClient(responses={CallSite.SEVERITY: "fast"}, latency=0.01, name="fast")
+    client = RoutingLLMClient(routes={}, default=[slow, fast], hedge_delay=0.05)
+
+    with call_site(CallSite.SEVERITY):
+        assert await client.call("prompt") == "fast"
+    await asyncio.sleep(0)
+
+    [censored] = client._tracker(CallSite.SEVERITY, slow).samples
+    assert 0.05 <= censored < 1.0
+    assert len(client._tracker(CallSite.SEVERITY, fast).samples) == 1
+
+
+def test_factory_builds_routes_from_env(monkeypatch):
+    """LLM_ROUTES からルーティングクライアントが生成されること"""
+    monkeypatch.setenv("LLM_PROVIDER", "fake")
+    monkeypatch.setenv("LLM_ROUTES", "risk_evaluation=fake,fake:other;risk_identification=fake")
+
+    client = LLMClientFactory.create()
+
+    assert isinstance(client, RoutingLLMClient)
+    assert len(client.backends_for(CallSite.SEVERITY)) == 2
+    assert len(client.backends_for(CallSite.RISK_IDENTIFICATION)) == 1
+    assert client.backends_for(CallSite.COUNTERMEASURES) == client.default
@@ -0,0 +1,199 @@
+"""Unit tests for the priority-aware LLM scheduler."""
+
+import asyncio
+import time
+import httpx
+import pytest
+from fastapi import FastAPI
+from app.api.scheduling import SchedulingMiddleware
+from app.llm.context import Priority, scheduling, current_priority, current_tenant
+from app.llm.fake import FakeLLMClient
+from app.llm.scheduler import LLMScheduler, SchedulingLLMClient
+
+
+async def run(scheduler: LLMScheduler, order: list, name: str, release: asyncio.Event = None, **kwargs):
+    async with scheduler.slot(**kwargs):
+        order.append(name)
+        if release is not None:
+            await release.wait()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_interactive_overtakes_queued_batch_work():
+    """待ち行列のバッチ処理より画面操作の呼び出しが先に割り当てられること"""
+    scheduler = LLMScheduler(max_concurrency=1, reserved_interactive=0)
+    order = []
+    release = asyncio.Event()
+    blocker = asyncio.ensure_future(run(scheduler, order, "running", release, priority=Priority.BATCH))
+    await settle()
+    tasks = [
+        asyncio.ensure_future(run(scheduler, order, f"batch-{i}", priority=Priority.BATCH))
+        for i in range(3)
+    ]
+    await settle()
+    tasks.append(asyncio.ensure_future(run(scheduler, order, "interactive", priority=Priority.INTERACTIVE)))
+    await settle()
+    assert scheduler.queue_depth(Priority.BATCH) == 3
+
+    release.set()
+    await asyncio.gather(blocker, *tasks)
+
+    assert order == ["running", "interactive", "batch-0", "batch-1", "batch-2"]
+
+
+@pytest.mark.asyncio
+async def test_reserved_slots_are_kept_for_interactive_calls():
+    """バッチ処理が使える枠を使い切っても、専用枠で画面操作の呼び出しが始まること"""
+    scheduler = LLMScheduler(max_concurrency=3, reserved_interactive=1)
+    order = []
+    release = asyncio.Event()
+    tasks = [
+        asyncio.ensure_future(run(scheduler, order, f"batch-{i}", release, priority=Priority.BATCH))
+        for i in range(3)
+    ]
+    await settle()
+    assert order == ["batch-0", "batch-1"]
+    assert scheduler.queue_depth(Priority.BATCH) == 1
+
+    tasks.append(asyncio.ensure_future(run(scheduler, order, "interactive", release)))
+    await settle()
+    assert order[-1] == "interactive"
+
+    release.set()
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_batch_and_backfill_share_capacity_by_weight():
+    """BATCHとBACKFILLが重み（4:1）に応じて枠を分け合うこと"""
+    scheduler = LLMScheduler(max_concurrency=1, reserved_interactive=0)
+    order = []
+    release = asyncio.Event()
+    blocker = asyncio.ensure_future(run(scheduler, order, "running", release, priority=Priority.BATCH))
+    await settle()
+    tasks = [
+        asyncio.ensure_future(run(scheduler, order, priority, priority=priority))
+        for priority in [Priority.BACKFILL] * 50 + [Priority.BATCH] * 50
+    ]
+    await settle()
+
+    release.set()
+    await asyncio.gather(blocker, *tasks)
+
+    first = order[1:51]
+    assert first.count(Priority.BATCH) == 40
+    assert first.count(Priority.BACKFILL) == 10
+
+
+@pytest.mark.asyncio
+async def test_tenants_are_served_round_robin_within_quota():
+    """同じクラスの中でテナントを巡回し、テナントごとの同時実行数を抑えること"""
+    scheduler = LLMScheduler(max_concurrency=3, reserved_interactive=0, tenant_quota=1)
+    order = []
+    release = asyncio.Event()
+    tasks = [
+        asyncio.ensure_future(run(scheduler, order, f"{tenant}-{i}", release, tenant=tenant))
+        for tenant, i in [("a", 0), ("a", 1), ("a", 2), ("b", 0)]
+    ]
+    await settle()
+
+    # 枠は3つ空いているが、テナントaは1件まで
+    assert order == ["a-0", "b-0"]
+    assert scheduler.stats()["tenants"] == {"a": 1, "b": 1}
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert order == ["a-0", "b-0", "a-1", "a-2"]
+    assert scheduler.stats()["tenants"] == {}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiters_leave_the_queue():
+    """待っている間にキャンセルされた呼び出しが待ち行列から取り除かれ、枠を使わないこと"""
+    scheduler = LLMScheduler(max_concurrency=1, reserved_interactive=0)
+    order = []
+    release = asyncio.Event()
+    blocker = asyncio.ensure_future(run(scheduler, order, "running", release))
+    await settle()
+    cancelled = asyncio.ensure_future(run(scheduler, order, "cancelled"))
+    waiting = asyncio.ensure_future(run(scheduler, order, "waiting"))
+    await settle()
+
+    cancelled.cancel()
+    await settle()
+    assert scheduler.queue_depth() == 1
+
+    release.set()
+    await asyncio.gather(blocker, waiting)
+    assert order == ["running", "waiting"]
+    assert scheduler.stats()["running"] == 0
+
+
+@pytest.mark.asyncio
+async def test_interactive_latency_stays_flat_during_large_batch():
+    """1万件のバッチ呼び出しが待っている間も、画面操作の呼び出しはほぼ待たないこと"""
+    backend = FakeLLMClient(default="ok", latency=0.02)
+    scheduler = LLMScheduler(max_concurrency=8, reserved_interactive=2)
+    client = SchedulingLLMClient(backend, scheduler)
+
+    async def batch_call(i: int):
+        with scheduling(priority=Priority.BATCH, tenant="portfolio"):
+            return await client.call(f"batch-{i}")
+
+    batch = [asyncio.ensure_future(batch_call(i)) for i in range(10000)]
+    await asyncio.sleep(0.05)
+
+    latencies = []
+    for i in range(10):
+        started = time.monotonic()
+        assert await client.call(f"interactive-{i}") == "ok"
+        latencies.append(time.monotonic() - started)
+
+    stats = scheduler.stats()
+    assert stats["classes"][Priority.BATCH]["queued"] > 9000
+    assert stats["classes"][Priority.BATCH]["running"] == 6
+    # バックエンドの応答時間（0.02秒）に近く、バッチの待ち行列の長さに依存しない
+    assert max(latencies) < 0.1
+    assert stats["classes"][Priority.INTERACTIVE]["wait_p95"] < 0.01
+
+    for task in batch:
+        task.cancel()
+    await asyncio.gather(*batch, return_exceptions=True)
+    assert scheduler.queue_depth() == 0
+    assert scheduler.stats()["running"] == 0
+
+
+@pytest.mark.asyncio
+async def test_request_headers_set_priority_and_tenant():
+    """X-LLM-Priority / X-Tenant-ID がLLM呼び出しのコンテキストに設定されること"""
+    app = FastAPI()
+
+    @app.get("/context")
+    async def context():
+        return {"priority": current_priority(), "tenant": current_tenant()}
+
+    transport = httpx.ASGITransport(app=SchedulingMiddleware(app, trusted_networks="127.0.0.0/8"))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        default = await http.get("/context")
+        batch = await http.get("/context", headers={"X-LLM-Priority": "batch", "X-Tenant-ID": "acme"})
+        invalid = await http.get("/context", headers={"X-LLM-Priority": "urgent"})
+
+    assert default.json() == {"priority": Priority.INTERACTIVE, "tenant": None}
+    assert batch.json() == {"priority": Priority.BATCH, "tenant": "acme"}
+    assert invalid.status_code == 400
+
+    # 信頼できない接続元のヘッダーは無視して既定値で扱う
+    transport = httpx.ASGITransport(
+        app=SchedulingMiddleware(app, trusted_networks="10.0.0.0/8"), client=("203.0.113.5", 4000)
+    )
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        spoofed = await http.get("/context", headers={"X-LLM-Priority": "backfill", "X-Tenant-ID": "acme"})
+        ignored = await http.get("/context", headers={"X-LLM-Priority": "urgent"})
+
+    assert spoofed.json() == {"priority": Priority.INTERACTIVE, "tenant": None}
+    assert ignored.status_code == 200
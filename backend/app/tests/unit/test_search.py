@@ -0,0 +1,135 @@
+"""Unit tests for full-text search."""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database.base import Base
+from app.database.persistence import insert_returning
+from app.models import RiskSituation, IdentifiedRisk, RiskEvaluation, Countermeasure
+from app.services.search import BigramSearchIndex, SearchService, SearchFilters, search_index
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    insert_returning(session, [
+        RiskSituation(situation_id="situation-1", description="入退室管理"),
+        IdentifiedRisk(
+            risk_id="risk-1", situation_id="situation-1", category="データ", guideword="差別と偏見",
+            risk_description="顔認識の精度が肌の色によって異なる可能性がある"
+        ),
+        IdentifiedRisk(
+            risk_id="risk-2", situation_id="situation-1", category="運用", guideword="人間の監視",
+            risk_description="警備員が認識結果を確認せずに入室を許可する可能性がある",
+            affected_area="顔認識の誤りによる不正入室"
+        ),
+        RiskEvaluation(
+            evaluation_id="evaluation-1", risk_id="risk-1", severity_score=4,
+            severity_rationale="誤認識により正当な利用者が入室できない",
+            frequency_score=3, avoidability_score=2, risk_level="高"
+        ),
+        RiskEvaluation(
+            evaluation_id="evaluation-2", risk_id="risk-2", severity_score=2,
+            frequency_score=2, avoidability_score=2, risk_level="低"
+        ),
+    ])
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def search(db, query, index=None, **filters):
+    service = SearchService(index=index or BigramSearchIndex(), backend="memory")
+    return service.search(db, query, SearchFilters(**filters))
+
+
+def test_finds_substring_across_fields(db):
+    """記述・影響領域・根拠の部分文字列で検索できること"""
+    hits = search(db, "顔認識")
+
+    assert {(h.kind, h.id, h.field) for h in hits} == {
+        ("risk", "risk-1", "risk_description"),
+        ("risk", "risk-2", "affected_area"),
+    }
+    assert [h.id for h in search(db, "誤認識")] == ["evaluation-1"]
+    # 正規化（全角・半角、句読点）を無視して一致する
+    assert [h.id for h in search(db, "肌の色に、よって")] == ["risk-1"]
+
+
+def test_score_filters_and_kinds(db):
+    """評価スコア・種別の条件で絞り込めること"""
+    hits = search(db, "顔認識", min_severity=4)
+
+    assert [(h.id, h.severity_score, h.risk_level) for h in hits] == [("risk-1", 4, "高")]
+    assert search(db, "顔認識", risk_level="中") == []
+    assert search(db, "顔認識", kinds=["evaluation"]) == []
+    assert len(search(db, "顔認識", situation_id="situation-1")) == 2
+
+
+def test_bigram_cooccurrence_is_verified(db):
+    """bigramが全て含まれても連続していなければ一致しないこと"""
+    assert search(db, "認識結果") != []
+    assert search(db, "認識の色") == []
+    assert [h.id for h in search(db, "肌")] == ["risk-1"]
+
+
+@pytest.fixture
+def shared_index():
+    """コミット時に更新される共有インデックス（テスト後に未読み込みの状態に戻す）"""
+    search_index.__init__()
+    yield search_index
+    search_index.__init__()
+
+
+def test_index_is_updated_on_commit(db, shared_index):
+    """コミットされた行のみインデックスに追加されること"""
+    index = shared_index.load(db)
+
+    insert_returning(db, [Countermeasure(
+        measure_id="measure-1", evaluation_id="evaluation-1",
+        strategy_type="過酷度低減", description="顔認識に失敗した場合は暗証番号で入室できるようにする"
+    )])
+    db.rollback()
+    assert len(index) == 4
+
+    insert_returning(db, [Countermeasure(
+        measure_id="measure-2", evaluation_id="evaluation-1",
+        strategy_type="過酷度低減", description="顔認識に失敗した場合は暗証番号で入室できるようにする"
+    )])
+    db.commit()
+
+    hits = search(db, "暗証番号", index=index)
+    assert [(h.kind, h.id, h.risk_id, h.severity_score) for h in hits] == [
+        ("countermeasure", "measure-2", "risk-1", 4)
+    ]
+
+
+def test_database_backend(db):
+    """データベース検索でも同じ条件で検索できること"""
+    service = SearchService(index=BigramSearchIndex(), backend="database")
+
+    hits = service.search(db, "顔認識", SearchFilters(min_severity=4))
+
+    assert [(h.kind, h.id, h.field, h.severity_score) for h in hits] == [
+        ("risk", "risk-1", "risk_description", 4)
+    ]
+    assert service.search(db, "100%", SearchFilters()) == []
+
+
+@pytest.mark.asyncio
+async def test_search_endpoint(shared_index):
+    """保存されたリスクが検索APIで見つかること"""
+    from app.tests.load.harness import in_process_client
+
+    async with in_process_client() as client:
+        situation = (await client.post("/api/v1/situations", json={"description": "状況"})).json()
+        await client.get("/api/v1/search", params={"q": "夜間"})
+        await client.post(f"/api/v1/situations/{situation['situation_id']}/identify-risks")
+
+        response = await client.get("/api/v1/search", params={"q": "暗所での認識", "kinds": ["risk"]})
+        assert [hit["field"] for hit in response.json()["hits"]] == ["risk_description"]
+        invalid = await client.get("/api/v1/search", params={"q": "夜間", "kinds": ["unknown"]})
+        assert invalid.status_code == 422
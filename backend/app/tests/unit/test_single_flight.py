@@ -0,0 +1,244 @@
+"""Unit tests for single-flight request coalescing."""
+
+import asyncio
+import time
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database.base import Base
+from app.services.single_flight import SingleFlight, SharedSingleFlight, make_key
+from app.services.risk_evaluation import RiskEvaluationService
+from app.models import IdentifiedRisk, FlightLease
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    """同一キーの同時呼び出しが1回の実行に合流すること"""
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return ["result"]
+
+    results = await asyncio.gather(
+        *[flight.do("key", work) for _ in range(5)]
+    )
+
+    assert calls == 1
+    assert all(r == ["result"] for r in results)
+    assert not flight.in_flight("key")
+
+
+@pytest.mark.asyncio
+async def test_sequential_calls_execute_again():
+    """完了後の呼び出しは新たに実行されること"""
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await flight.do("key", work) == 1
+    assert await flight.do("key", work) == 2
+
+
+@pytest.mark.asyncio
+async def test_exception_is_shared_with_followers():
+    """例外が合流した全ての呼び出し元に伝播すること"""
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("LLM error")
+
+    results = await asyncio.gather(
+        flight.do("key", work),
+        flight.do("key", work),
+        return_exceptions=True
+    )
+
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_leader_cancellation_does_not_cancel_followers():
+    """最初の呼び出し元がキャンセルされても後続が結果を受け取れること"""
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    leader = asyncio.ensure_future(flight.do("key", work))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.do("key", work))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "done"
+
+
+def test_key_depends_on_entity_and_prompt():
+    """キーがエンティティIDとプロンプトで区別されること"""
+    assert make_key("op", "id-1", "prompt") == make_key("op", "id-1", "prompt")
+    assert make_key("op", "id-1", "prompt") != make_key("op", "id-2", "prompt")
+    assert make_key("op", "id-1", "prompt") != make_key("op", "id-1", "other")
+
+
+def test_evaluation_key_changes_with_risk_description():
+    """リスク記述が変わると評価の合流キーが変わること"""
+    service = RiskEvaluationService(llm_client=None)
+    risk = IdentifiedRisk(risk_id="risk-001", risk_description="リスクA")
+    key = service.coalesce_key(risk)
+
+    risk.risk_description = "リスクB"
+
+    assert service.coalesce_key(risk) != key
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_for_detached_work():
+    """呼び出し元がキャンセルされた処理の完了をシャットダウン時に待てること"""
+    flight = SingleFlight()
+    finished = []
+
+    async def work():
+        await asyncio.sleep(0.05)
+        finished.append(True)
+        return b"done"
+
+    caller = asyncio.ensure_future(flight.do("key", work))
+    await asyncio.sleep(0)
+    caller.cancel()
+
+    assert await flight.drain(timeout=1) == 0
+    assert finished == [True]
+    assert await flight.drain(timeout=1) == 0
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'flight.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_shared_flight_coalesces_across_processes(session_factory):
+    """リースを共有する別々のインスタンス（ワーカー）間で1回の実行に合流すること"""
+    workers = [SharedSingleFlight(session_factory, poll_interval=0.01) for _ in range(3)]
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return b'{"result":1}'
+
+    results = await asyncio.gather(*[w.do("key", work) for w in workers for _ in range(2)])
+
+    assert calls == 1
+    assert results == [b'{"result":1}'] * 6
+
+
+@pytest.mark.asyncio
+async def test_shared_flight_failure_releases_lease(session_factory):
+    """実行者が失敗した場合、待機中のワーカーが実行し直すこと"""
+    leader, follower = [SharedSingleFlight(session_factory, poll_interval=0.01) for _ in range(2)]
+
+    async def fail():
+        await asyncio.sleep(0.03)
+        raise RuntimeError("LLM error")
+
+    async def succeed():
+        return b"ok"
+
+    leading = asyncio.ensure_future(leader.do("key", fail))
+    await asyncio.sleep(0.01)
+    following = asyncio.ensure_future(follower.do("key", succeed))
+
+    with pytest.raises(RuntimeError):
+        await leading
+    assert await following == b"ok"
+
+
+@pytest.mark.asyncio
+async def test_shared_flight_expired_lease_is_taken_over(session_factory):
+    """期限切れのリース（実行者の異常終了）は他のワーカーが引き継ぐこと"""
+    crashed = SharedSingleFlight(session_factory, lease_ttl=0)
+    crashed._acquire("key")
+    flight = SharedSingleFlight(session_factory)
+
+    async def work():
+        return b"recovered"
+
+    assert await flight.do("key", work) == b"recovered"
+    assert await flight.do("key", work) == b"recovered"
+
+
+@pytest.mark.asyncio
+async def test_shared_flight_waiter_of_crashed_leader_takes_over(session_factory):
+    """待機中に実行者のリースが期限切れになった場合、待機者が実行し直すこと"""
+    crashed = SharedSingleFlight(session_factory, lease_ttl=0.05)
+    crashed._acquire("key")
+    follower = SharedSingleFlight(session_factory, poll_interval=0.01)
+
+    async def work():
+        return b"recovered"
+
+    assert await asyncio.wait_for(follower.do("key", work), timeout=1) == b"recovered"
+
+
+@pytest.mark.asyncio
+async def test_shared_flight_does_not_cache_results(session_factory):
+    """待機していたワーカーに結果を渡した後はリースを削除し、次の呼び出しで実行し直すこと"""
+    leader, follower = [SharedSingleFlight(session_factory, poll_interval=0.01) for _ in range(2)]
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return f"result-{calls}".encode()
+
+    results = await asyncio.gather(leader.do("key", work), follower.do("key", work))
+    assert results == [b"result-1", b"result-1"]
+    with session_factory() as db:
+        assert db.query(FlightLease).count() == 0
+
+    assert await follower.do("key", work) == b"result-2"
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_shared_flight_does_not_block_event_loop(session_factory):
+    """リースの読み書きの間もイベントループが他のタスクを処理できること"""
+    def slow_session():
+        time.sleep(0.05)
+        return session_factory()
+
+    flight = SharedSingleFlight(slow_session)
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+    async def work():
+        return b"ok"
+
+    ticker = asyncio.ensure_future(tick())
+    assert await flight.do("key", work) == b"ok"
+    ticker.cancel()
+    # 2回のセッション（取得・完了）で0.1秒かかる間もタスクが進む
+    assert ticks >= 5
@@ -0,0 +1,145 @@
+"""Unit tests for versioned assessment snapshots."""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database.base import Base
+from app.models import (
+    RiskSituation,
+    IdentifiedRisk,
+    RiskEvaluation,
+    Countermeasure,
+    AssessmentSnapshot,
+    SnapshotBlob,
+)
+from app.services.snapshots import SnapshotService
+from app.tests.load.harness import in_process_client
+
+RATIONALE = "夜間の歩行者認識に失敗した場合、重大な人身事故につながるおそれがある。" * 40
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    situation = RiskSituation(situation_id="situation-1", description="自動運転車の歩行者検知", industry="自動車")
+    risk = IdentifiedRisk(
+        risk_id="risk-1", situation_id="situation-1", category="データ",
+        guideword="網羅性", risk_description="夜間の走行データが不足している可能性がある"
+    )
+    evaluation = RiskEvaluation(
+        evaluation_id="evaluation-1", risk_id="risk-1",
+        severity_score=5, severity_rationale=RATIONALE,
+        frequency_score=3, avoidability_score=4, risk_level="高"
+    )
+    session.add_all([situation, risk, evaluation])
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def situation(db) -> RiskSituation:
+    return db.query(RiskSituation).one()
+
+
+def test_restores_situation_tree(db):
+    """保存したバージョンから状況ツリー全体が復元できること"""
+    service = SnapshotService()
+    snapshot = service.create(db, situation(db), "初回レビュー")
+    db.commit()
+
+    tree = SnapshotService().load(db, snapshot)
+
+    assert snapshot.version == 1 and snapshot.is_keyframe
+    assert tree["situation"]["industry"] == "自動車"
+    evaluation = tree["risks"]["risk-1"]["evaluations"]["evaluation-1"]
+    assert evaluation["severity_score"] == 5
+    assert evaluation["severity_rationale"] == RATIONALE
+
+
+def test_consecutive_versions_store_deltas_and_share_blobs(db):
+    """変更のない値はブロブを共有し、差分のみ保存されること"""
+    service = SnapshotService()
+    service.create(db, situation(db))
+    blobs = db.query(SnapshotBlob).count()
+    [rationale_blob] = [b for b in db.query(SnapshotBlob) if b.size > len(RATIONALE)]
+    assert rationale_blob.compressed and len(rationale_blob.data) < rationale_blob.size // 10
+
+    db.add(Countermeasure(
+        measure_id="measure-1", evaluation_id="evaluation-1",
+        strategy_type="過酷度低減", description="夜間は速度を制限する"
+    ))
+    db.commit()
+    second = service.create(db, situation(db))
+    db.commit()
+
+    assert not second.is_keyframe
+    # 追加された対策の項目のみが差分になる
+    assert second.change_count == 9
+    assert db.query(SnapshotBlob).count() < blobs + 9
+    assert db.query(SnapshotBlob).filter(SnapshotBlob.size > len(RATIONALE)).count() == 1
+
+
+def test_keyframes_bound_reconstruction(db):
+    """キーフレームの間隔ごとに全体が保存され、どのバージョンも復元できること"""
+    service = SnapshotService(keyframe_interval=3)
+    descriptions = [f"説明{i}" for i in range(7)]
+    for description in descriptions:
+        situation(db).description = description
+        db.commit()
+        service.create(db, situation(db))
+        db.commit()
+
+    snapshots = db.query(AssessmentSnapshot).order_by(AssessmentSnapshot.version).all()
+
+    assert [s.is_keyframe for s in snapshots] == [True, False, False, True, False, False, True]
+    fresh = SnapshotService(keyframe_interval=3)
+    assert [fresh.load(db, s)["situation"]["description"] for s in snapshots] == descriptions
+
+
+def test_diff_reports_only_changed_values(db):
+    """2つのバージョンの差分が変化した値のみであること"""
+    service = SnapshotService()
+    first = service.create(db, situation(db))
+    situation(db).description = "自動運転車の歩行者・自転車検知"
+    db.query(RiskEvaluation).one().severity_score = 4
+    db.commit()
+    service.create(db, situation(db))
+    third = service.create(db, situation(db))
+    db.commit()
+
+    diff = SnapshotService().diff(db, first, third)
+
+    assert [(c.path, c.change, c.before, c.after) for c in diff.changes] == [
+        ("risks/risk-1/evaluations/evaluation-1/severity_score", "changed", 5, 4),
+        ("situation/description", "changed", "自動運転車の歩行者検知", "自動運転車の歩行者・自転車検知"),
+    ]
+    assert third.change_count == 0
+    assert service.diff(db, third, third).changes == []
+
+
+@pytest.mark.asyncio
+async def test_snapshot_endpoints():
+    """スナップショットの作成・一覧・取得・差分のAPI"""
+    async with in_process_client() as client:
+        created = (await client.post("/api/v1/situations", json={"description": "状況"})).json()
+        url = f"/api/v1/situations/{created['situation_id']}"
+        first = await client.post(f"{url}/snapshots", json={"label": "初回"})
+        assert first.status_code == 201
+        await client.post(f"{url}/identify-risks")
+        await client.post(f"{url}/snapshots", json={})
+
+        listed = (await client.get(f"{url}/snapshots")).json()["snapshots"]
+        assert [(s["version"], s["label"]) for s in listed] == [(1, "初回"), (2, None)]
+
+        detail = await client.get(f"{url}/snapshots/2")
+        assert len(detail.json()["tree"]["risks"]) == 2
+        assert "immutable" in detail.headers["cache-control"]
+        again = await client.get(f"{url}/snapshots/2", headers={"If-None-Match": detail.headers["etag"]})
+        assert again.status_code == 304
+
+        diff = (await client.get(f"{url}/snapshots/1/diff/2")).json()
+        assert {c["change"] for c in diff["changes"]} == {"added"}
+        assert (await client.get(f"{url}/snapshots/3")).status_code == 404
@@ -0,0 +1,219 @@
+"""Unit tests for structured LLM output."""
+
+import json
+
+import anthropic
+import httpx
+import openai
+import pytest
+from pydantic import BaseModel
+from app.llm.client import OpenAIClient, ClaudeClient, RefusalError
+from app.llm.context import CallSite, call_site
+from app.llm.fake import FakeLLMClient
+from app.llm.mock_server import MockLLMServer
+from app.llm.routing import RoutingLLMClient
+from app.llm.structured import JsonArrayStream, parse_structured, response_format, tool_definition
+from app.models import IdentifiedRisk
+from app.schemas.llm_output import RiskIdentificationOutput, SeverityOutput
+from app.services.risk_evaluation import RiskEvaluationService
+
+
+def mock_clients(server: MockLLMServer):
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app))
+    return [
+        OpenAIClient("mock", base_url="http://mock/v1", http_client=http),
+        ClaudeClient("mock", base_url="http://mock", http_client=http),
+    ]
+
+
+def test_openai_schema_is_strict():
+    """OpenAIのスキーマは全項目が必須で、追加プロパティを許さず、$refを含まないこと"""
+    schema = response_format(RiskIdentificationOutput)["json_schema"]["schema"]
+    item = schema["properties"]["identified_risks"]["items"]
+
+    assert schema["additionalProperties"] is False
+    assert set(item["required"]) == {
+        "category", "guideword", "risk_description", "affected_area", "confidence"
+    }
+    assert item["additionalProperties"] is False
+    assert "$ref" not in json.dumps(schema) and '"default"' not in json.dumps(schema)
+    assert tool_definition(SeverityOutput)["input_schema"]["required"] == ["severity_score", "rationale"]
+
+
+def test_openai_schema_keeps_property_named_default():
+    """defaultという名前のプロパティは既定値と区別して残すこと"""
+    class Option(BaseModel):
+        default: bool = False
+        label: str = "なし"
+
+    schema = response_format(Option)["json_schema"]["schema"]
+
+    assert set(schema["properties"]) == {"default", "label"}
+    assert schema["required"] == ["default", "label"]
+    assert "default" not in schema["properties"]["default"]
+    assert "default" not in schema["properties"]["label"]
+
+
+def test_parse_structured_text():
+    """テキストの応答はコードブロックや前後の説明を除いて検証されること"""
+    text = '```json\n{"severity_score": 4, "rationale": "根拠"}\n```\n以上です。'
+    assert parse_structured(text, SeverityOutput).severity_score == 4
+
+    with pytest.raises(ValueError):
+        parse_structured('{"severity_score": "高い"}', SeverityOutput)
+
+
+def test_array_items_are_returned_as_they_complete():
+    """ストリーミングされるJSONから、配列の要素が閉じた時点で1件ずつ取り出せること"""
+    text = "```json\n" + json.dumps({
+        "identified_risks": [
+            {"risk_description": "括弧 } や \"引用符\" を含む説明", "tags": ["a", "b"]},
+            {"risk_description": "2件目", "detail": {"nested": [1, {"x": "]"}]}},
+        ],
+        "other": [{"ignored": True}]
+    }, ensure_ascii=False) + "\n```"
+    stream = JsonArrayStream("identified_risks")
+
+    received = []
+    for i, c in enumerate(text):
+        for item in stream.feed(c):
+            received.append((i, item))
+
+    assert [item["risk_description"] for _, item in received] == [
+        "括弧 } や \"引用符\" を含む説明", "2件目"
+    ]
+    # 1件目は2件目が届く前に返される
+    assert received[0][0] < text.index("2件目")
+    assert received[1][1]["detail"] == {"nested": [1, {"x": "]"}]}
+    assert stream.finished
+
+
+@pytest.mark.asyncio
+async def test_sdk_clients_stream_from_mock_server():
+    """OpenAI / Anthropic の両SDKでストリーミングの断片を受け取れること"""
+    server = MockLLMServer()
+    for client in mock_clients(server):
+        with call_site(CallSite.SEVERITY):
+            pieces = [p async for p in client.stream("過酷度（被害の深刻さ）を1-5で評価")]
+        assert len(pieces) > 1
+        assert parse_structured("".join(pieces), SeverityOutput).severity_score == 5
+    assert server.stats["streamed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_services_use_native_structured_output():
+    """両SDKでプロバイダーの構造化出力を使って評価されること"""
+    server = MockLLMServer()
+    risk = IdentifiedRisk(risk_id="risk-001", risk_description="リスク")
+
+    for client in mock_clients(server):
+        evaluation = await RiskEvaluationService(client).evaluate_risk(risk)
+        assert (evaluation.severity_score, evaluation.frequency_score) == (5, 3)
+
+    assert server.stats["structured"] == 6
+
+
+@pytest.mark.asyncio
+async def test_text_fallback_when_disabled_or_truncated(monkeypatch):
+    """構造化出力が無効、または出力が途切れた場合はテキストの応答から解析すること"""
+    server = MockLLMServer()
+    openai_client, claude_client = mock_clients(server)
+    openai_client.structured_output = False
+
+    with call_site(CallSite.SEVERITY):
+        assert (await openai_client.call_structured("過酷度（被害の深刻さ）を1-5", SeverityOutput)).severity_score == 5
+    assert server.stats["structured"] == 0
+
+    monkeypatch.setenv("LLM_MAX_TOKENS", "risk_identification=60")
+    with call_site(CallSite.RISK_IDENTIFICATION):
+        output = await claude_client.call_structured("潜在的なリスクを特定してください", RiskIdentificationOutput)
+    assert len(output.identified_risks) == 2
+    assert server.stats["truncated"] >= 2
+
+
+@pytest.mark.asyncio
+async def test_unsupported_model_falls_back_to_text():
+    """json_schemaに対応していないモデルはテキストの呼び出しに切り替えること"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        if "response_format" in body:
+            return httpx.Response(400, json={"error": {
+                "message": "response_format json_schema is not supported", "type": "invalid_request_error"
+            }})
+        return httpx.Response(200, json={
+            "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {
+                "role": "assistant", "content": '{"severity_score": 2, "rationale": "根拠"}'
+            }}]
+        })
+
+    http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client = OpenAIClient("mock", base_url="http://mock/v1", http_client=http)
+    client.client = client.client.with_options(max_retries=0)
+
+    for _ in range(2):
+        assert (await client.call_structured("prompt", SeverityOutput)).severity_score == 2
+
+    assert client.structured_output is False
+    assert ["response_format" in r for r in requests] == [True, False, False]
+
+
+@pytest.mark.asyncio
+async def test_other_bad_requests_are_raised():
+    """構造化出力に関係しない400エラーはテキストに切り替えずに送出すること"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/messages"):
+            return httpx.Response(400, json={"type": "error", "error": {
+                "type": "invalid_request_error", "message": "prompt is too long"
+            }})
+        return httpx.Response(400, json={"error": {
+            "message": "This model's maximum context length is 8192 tokens", "type": "invalid_request_error"
+        }})
+
+    http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    openai_client = OpenAIClient("mock", base_url="http://mock/v1", http_client=http)
+    claude_client = ClaudeClient("mock", base_url="http://mock", http_client=http)
+    with pytest.raises(openai.BadRequestError):
+        await openai_client.call_structured("prompt", SeverityOutput)
+    with pytest.raises(openai.BadRequestError):
+        await openai_client.sample_structured("prompt", SeverityOutput, 3)
+    with pytest.raises(anthropic.BadRequestError):
+        await claude_client.call_structured("prompt", SeverityOutput)
+    assert openai_client.structured_output and claude_client.structured_output
+
+
+@pytest.mark.asyncio
+async def test_refusal_is_reported():
+    """拒否・内容のない応答は解析せずにRefusalErrorとすること"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        message = {"role": "assistant", "content": None, "refusal": "お手伝いできません"}
+        return httpx.Response(200, json={
+            "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [
+                {"index": i, "finish_reason": "stop", "message": message} for i in range(body.get("n", 1))
+            ]
+        })
+
+    http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client = OpenAIClient("mock", base_url="http://mock/v1", http_client=http)
+
+    with pytest.raises(RefusalError, match="お手伝いできません"):
+        await client.call_structured("prompt", SeverityOutput)
+    with pytest.raises(RefusalError):
+        await client.sample_structured("prompt", SeverityOutput, 2)
+
+
+@pytest.mark.asyncio
+async def test_routing_client_routes_structured_calls():
+    """ルーティングクライアントは構造化出力の呼び出しも呼び出し箇所で振り分けること"""
+    evaluation = FakeLLMClient(name="evaluation")
+    default = FakeLLMClient(default='{"severity_score": 1, "rationale": "既定"}', responses={})
+    client = RoutingLLMClient(routes={"risk_evaluation": [evaluation]}, default=[default])
+
+    with call_site(CallSite.SEVERITY):
+        assert (await client.call_structured("prompt", SeverityOutput)).severity_score == 5
+    assert len(evaluation.calls) == 1 and not default.calls
@@ -0,0 +1,127 @@
+"""Unit tests for token budgets."""
+
+import json
+
+import httpx
+import pytest
+from app.llm.client import OpenAIClient, ClaudeClient, OpenAIBatchClient, BatchRequest
+from app.llm.context import CallSite, call_site
+from app.llm.fake import CANNED_RESPONSES
+from app.llm.mock_server import MockLLMServer
+from app.llm.tokens import (
+    ContextWindowExceededError,
+    TruncatedResponseError,
+    context_window,
+    estimate_tokens,
+    output_budget,
+    plan_budget,
+    truncate_to_tokens,
+)
+from app.models import RiskSituation
+from app.services.risk_identification import RiskIdentificationService
+from app.tests.load.harness import in_process_client
+
+
+def mock_clients(server: MockLLMServer, model: str = "gpt-4"):
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app))
+    return [
+        OpenAIClient("mock", model=model, base_url="http://mock/v1", http_client=http),
+        ClaudeClient("mock", model="claude-3-opus-20240229", base_url="http://mock", http_client=http),
+    ]
+
+
+def test_output_budget_by_call_site(monkeypatch):
+    """呼び出し箇所の前方一致で予算が決まり、環境変数で上書きできること"""
+    assert output_budget(CallSite.SEVERITY) == 400
+    assert output_budget(CallSite.COUNTERMEASURES_FROM_META) == 1500
+    assert output_budget(CallSite.RISK_IDENTIFICATION) > output_budget(CallSite.COUNTERMEASURES)
+    assert output_budget(None) == 2000
+
+    monkeypatch.setenv("LLM_MAX_TOKENS", "risk_evaluation.severity=200")
+    assert output_budget(CallSite.SEVERITY) == 200
+    assert output_budget(CallSite.FREQUENCY) == 400
+
+
+def test_plan_budget_shrinks_to_context_window():
+    """ウィンドウの残りが予算より少なければmax_tokensを縮め、収まらなければ拒否すること"""
+    assert context_window("gpt-4-0613") == 8192
+    assert context_window("gpt-4-turbo-preview") == 128000
+    assert context_window("claude-3-haiku-20240307") == 200000
+
+    short = plan_budget("gpt-4", CallSite.RISK_IDENTIFICATION, "状況")
+    assert short.max_tokens == 4000
+
+    long = plan_budget("gpt-4", CallSite.RISK_IDENTIFICATION, "状" * 6000)
+    assert long.prompt_tokens == 6000
+    assert 256 <= long.max_tokens < 4000
+
+    with pytest.raises(ContextWindowExceededError):
+        plan_budget("gpt-4", CallSite.RISK_IDENTIFICATION, "状" * 8000)
+    assert plan_budget("gpt-4-turbo", CallSite.RISK_IDENTIFICATION, "状" * 8000).max_tokens == 4000
+
+
+def test_truncate_to_tokens():
+    text = "リスクを特定する abcdefgh"
+    assert truncate_to_tokens(text, 100) == text
+    assert estimate_tokens(truncate_to_tokens(text, 5)) <= 5
+    assert text.startswith(truncate_to_tokens(text, 5))
+
+
+@pytest.mark.asyncio
+async def test_truncated_response_is_continued(monkeypatch):
+    """上限で途切れた応答は続きを生成して連結されること（両SDK）"""
+    monkeypatch.setenv("LLM_MAX_TOKENS", "risk_identification=60")
+    server = MockLLMServer()
+    expected = CANNED_RESPONSES[CallSite.RISK_IDENTIFICATION]
+
+    for client in mock_clients(server):
+        with call_site(CallSite.RISK_IDENTIFICATION):
+            text = await client.call("潜在的なリスクを特定してください", "system")
+        assert text == expected
+
+    assert server.stats["truncated"] >= 2
+    assert len(json.loads(text)["identified_risks"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_continuations(monkeypatch):
+    """続きの生成を繰り返しても途切れる場合はエラーになること"""
+    monkeypatch.setenv("LLM_MAX_TOKENS", "risk_identification=10")
+    server = MockLLMServer()
+
+    for client in mock_clients(server):
+        with pytest.raises(TruncatedResponseError):
+            with call_site(CallSite.RISK_IDENTIFICATION):
+                await client.call("潜在的なリスクを特定してください")
+
+
+@pytest.mark.asyncio
+async def test_oversized_prompt_is_rejected_before_calling():
+    """コンテキストウィンドウを超えるプロンプトはAPIを呼ばずに拒否されること"""
+    server = MockLLMServer()
+    # チャンク分割しない設定で、説明全体を1回の呼び出しに含める
+    service = RiskIdentificationService(mock_clients(server)[0], chunk_tokens=100000)
+
+    with pytest.raises(ContextWindowExceededError):
+        await service.identify_risks(RiskSituation(situation_id="s-1", description="状況" * 5000))
+    assert server.stats[CallSite.RISK_IDENTIFICATION] == 0
+
+
+@pytest.mark.asyncio
+async def test_oversized_situation_returns_413(monkeypatch):
+    """コンテキストウィンドウを超える状況のリスク特定は413を返すこと"""
+    monkeypatch.setenv("IDENTIFICATION_CHUNK_TOKENS", "100000")
+    async with in_process_client() as client:
+        situation = (await client.post("/api/v1/situations", json={"description": "状況" * 5000})).json()
+        response = await client.post(f"/api/v1/situations/{situation['situation_id']}/identify-risks")
+
+    assert response.status_code == 413
+    assert response.json()["context_window"] == 8192
+
+
+def test_batch_requests_use_call_site_budget():
+    """バッチのリクエストも呼び出し箇所ごとのmax_tokensで生成されること"""
+    client = OpenAIBatchClient("key")
+    line = client._build_line(BatchRequest("severity-1", "評価", call_site=CallSite.SEVERITY))
+
+    assert line["body"]["max_tokens"] == 400
@@ -0,0 +1,97 @@
+"""Submit and collect offline batch assessments.
+
+Usage:
+    python batch_assess.py submit
+    python batch_assess.py collect <batch_id> [--wait]
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+
+# Add the parent directory to the path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.database.base import SessionLocal
+from app.models import RiskEvaluation, Countermeasure
+from app.llm.client import LLMClientFactory, BatchStatus
+from app.llm.context import Priority, scheduling
+from app.services.batch_assessment import BatchAssessmentService
+from app.services.records import RiskRecord, EvaluationRecord
+
+
+async def submit():
+    """未評価のリスクと対策未生成の評価をバッチに投入"""
+    db = SessionLocal()
+    service = BatchAssessmentService(LLMClientFactory.create_batch())
+    try:
+        # ORMのインスタンスではなく、列のみを取得したレコードとして読み込む
+        risks = RiskRecord.from_rows(db.execute(
+            RiskRecord.select().outerjoin(RiskEvaluation).where(
+                RiskEvaluation.evaluation_id.is_(None)
+            )
+        ))
+        evaluations = EvaluationRecord.from_rows_with_risk(db.execute(
+            EvaluationRecord.select_with_risk().outerjoin(Countermeasure).where(
+                Countermeasure.measure_id.is_(None)
+            ).distinct()
+        ))
+
+        print(f"Submitting {len(risks)} risks and {len(evaluations)} evaluations...")
+        job = await service.submit(risks, evaluations)
+        print(f"Batch submitted: {job.batch_id} ({job.request_count} requests)")
+    finally:
+        await service.batch_client.close()
+        db.close()
+
+
+async def collect(batch_id: str, wait: bool):
+    """完了したバッチの結果をデータベースに保存"""
+    db = SessionLocal()
+    service = BatchAssessmentService(LLMClientFactory.create_batch())
+    try:
+        if wait:
+            job = await service.batch_client.wait(batch_id)
+        else:
+            job = await service.batch_client.retrieve(batch_id)
+
+        if job.status == BatchStatus.IN_PROGRESS:
+            print(f"Batch {batch_id} is still in progress")
+            return
+        if job.status == BatchStatus.FAILED:
+            print(f"Batch {batch_id} failed")
+            return
+
+        results = await service.fetch_results(job)
+        assessment = service.save_results(db, results)
+        db.commit()
+
+        print(f"Saved {len(assessment.evaluations)} evaluations "
+              f"and {len(assessment.countermeasures)} countermeasures")
+        if assessment.skipped:
+            print(f"Skipped {assessment.skipped} risks/evaluations that were already assessed")
+        if assessment.errors:
+            print(f"{len(assessment.errors)} requests failed:")
+            for custom_id, reason in assessment.errors.items():
+                print(f"  {custom_id}: {reason}")
+    finally:
+        await service.batch_client.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline batch assessment")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("submit")
+    collect_parser = subparsers.add_parser("collect")
+    collect_parser.add_argument("batch_id")
+    collect_parser.add_argument("--wait", action="store_true")
+    args = parser.parse_args()
+
+    # 利用者が結果を待っていない補完処理のため、画面操作の呼び出しより後に回す
+    with scheduling(priority=Priority.BACKFILL):
+        if args.command == "submit":
+            asyncio.run(submit())
+        else:
+            asyncio.run(collect(args.batch_id, args.wait))
@@ -0,0 +1,51 @@
+"""Export the assessment portfolio as CSV, JSONL or XLSX.
+
+Usage:
+    python export_assessment.py xlsx -o assessment.xlsx
+    python export_assessment.py csv --dataset countermeasures > countermeasures.csv
+    python export_assessment.py jsonl --situation-id <situation_id>
+"""
+
+import argparse
+import sys
+import os
+
+# Add the parent directory to the path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.database.base import SessionLocal
+from app.services.export import ExportService, DATASETS, FORMATS
+
+
+def export(format: str, datasets, situation_id, output) -> int:
+    """書き出したバイト列を順にファイル（または標準出力）へ書き込む"""
+    service = ExportService(SessionLocal)
+    written = 0
+    for chunk in service.stream(format, datasets, situation_id):
+        output.write(chunk)
+        written += len(chunk)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export assessments")
+    parser.add_argument("format", choices=list(FORMATS))
+    parser.add_argument(
+        "--dataset", dest="datasets", action="append", choices=DATASETS,
+        help="datasets to export (default: all; csv: risks)"
+    )
+    parser.add_argument("--situation-id")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    args = parser.parse_args()
+
+    try:
+        datasets = ExportService.resolve_datasets(args.format, args.datasets)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.output:
+        with open(args.output, "wb") as f:
+            size = export(args.format, datasets, args.situation_id, f)
+        print(f"Exported {size} bytes to {args.output}", file=sys.stderr)
+    else:
+        export(args.format, datasets, args.situation_id, sys.stdout.buffer)
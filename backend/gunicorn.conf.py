@@ -0,0 +1,53 @@
+"""Gunicorn settings for the production server.
+
+Usage:
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Each worker is a separate process with its own event loop, connection pool
+and in-memory caches. State that must be shared between workers lives in the
+database (see SINGLE_FLIGHT_BACKEND / SEARCH_BACKEND in .env.example).
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# LLM呼び出しの待ち時間が大半のI/Oバウンドな処理のため、CPU数のワーカーで足りる
+# （空文字列で渡された場合も既定値を使う）
+workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+
+# アプリをマスターで1回だけ読み込み、フォークしたワーカーで共有する
+# （起動が速くなり、メモリもコピーオンライトで共有される）
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# 終了シグナルを受けてから実行中のリクエスト・LLM呼び出しの完了を待つ時間（秒）
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "120"))
+# 応答のないワーカーを再起動するまでの時間（秒）。LLM呼び出しより長くする
+timeout = int(os.getenv("WORKER_TIMEOUT", "180"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    """ワーカーの起動前に、マスターでSDKの読み込みとマッパーの構成を済ませる"""
+    if not preload_app:
+        return
+    from sqlalchemy.orm import configure_mappers
+    from app.llm.client import configured_providers, preload_sdks
+
+    preload_sdks(configured_providers())
+    configure_mappers()
+
+
+def post_fork(server, worker):
+    """マスターで作成された接続をワーカーで使わないよう、接続プールを作り直す"""
+    if not preload_app:
+        return
+    from app.database.base import engine
+
+    engine.dispose(close=False)
@@ -13,11 +13,46 @@ from app.models.evaluation import RiskEvaluation
 from app.models.countermeasure import Countermeasure
 from app.models.meta_countermeasure import MetaCountermeasure
 from app.models.guideword import Guideword
+from app.models.snapshot import AssessmentSnapshot, SnapshotBlob
+from app.models.flight_lease import FlightLease
+
+def add_missing_columns():
+    """Add columns introduced after the tables were first created."""
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                print(f"Adding column {table.name}.{column.name}...")
+                connection.execute(text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                ))
+
+
+def create_search_indexes():
+    """Create pg_trgm indexes for full-text search (PostgreSQL only)."""
+    if engine.dialect.name != "postgresql":
+        return
+    from app.services.search import create_postgres_indexes
+
+    print("Creating search indexes...")
+    with engine.begin() as connection:
+        create_postgres_indexes(connection)
+
 
 def init_database():
     """Create all database tables."""
     print("Creating database tables...")
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    create_search_indexes()
     print("Database tables created successfully!")
 
     # Initialize guidewords
@@ -0,0 +1,66 @@
+"""Inspect the LLM interaction archive offline.
+
+Usage:
+    python llm_archive.py summary [--call-site risk_evaluation]
+    python llm_archive.py reparse [--call-site risk_identification] [--schema RiskIdentificationOutput]
+
+Replaying archived responses through the services is done by running the
+application (or tests) with LLM_PROVIDER=replay.
+"""
+
+import argparse
+import json
+import sys
+import os
+
+# Add the parent directory to the path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.llm.archive import ArchiveReader, Outcome, archive_directory, reparse, summarize
+from app.schemas import llm_output
+
+
+def print_summary(reader: ArchiveReader, call_site) -> None:
+    """呼び出し箇所ごとの件数・結果・トークン数・遅延を表示"""
+    summary = summarize(reader.records(call_site=call_site))
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+def print_reparse(reader: ArchiveReader, call_site, schema) -> int:
+    """記録した応答を現在の出力スキーマで検証し直し、結果が変わった記録を表示
+
+    Returns:
+        検証に失敗した記録の数
+    """
+    counts = {Outcome.OK: 0, Outcome.PARSE_ERROR: 0, "skipped": 0}
+    for record in reader.records(call_site=call_site):
+        outcome = reparse(record, schema)
+        if outcome is None:
+            counts["skipped"] += 1
+            continue
+        counts[outcome] += 1
+        if outcome != record.outcome:
+            print(f"{record.call_site} {record.prompt_hash[:12]}: {record.outcome} -> {outcome}")
+    print(json.dumps(counts), file=sys.stderr)
+    return counts[Outcome.PARSE_ERROR]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the LLM archive")
+    parser.add_argument("command", choices=["summary", "reparse"])
+    parser.add_argument("--dir", default=archive_directory(), help="archive directory")
+    parser.add_argument("--call-site", help="filter by call site (prefix)")
+    parser.add_argument("--schema", help="output schema for reparse (default: the archived one)")
+    args = parser.parse_args()
+
+    schema = None
+    if args.schema:
+        schema = getattr(llm_output, args.schema, None)
+        if schema is None:
+            parser.error(f"Unknown schema: {args.schema}")
+
+    reader = ArchiveReader(args.dir)
+    if args.command == "summary":
+        print_summary(reader, args.call_site)
+    else:
+        sys.exit(1 if print_reparse(reader, args.call_site, schema) else 0)
@@ -4,7 +4,13 @@
 
 import { useState } from 'react';
 import { useRiskAssessment } from '@/hooks/useRiskAssessment';
-import type { IdentifiedRisk, RiskEvaluation, MetaCountermeasure, Countermeasure } from '@/types';
+import type {
+  IdentifiedRisk,
+  RiskEvaluation,
+  MetaCountermeasure,
+  IntegratedMetaCountermeasure,
+  Countermeasure,
+} from '@/types';
 
 interface MultiRiskEvaluationViewProps {
   risks: IdentifiedRisk[];
@@ -26,10 +32,10 @@ export const MultiRiskEvaluationView: React.FC<MultiRiskEvaluationViewProps> = (
   onIntegratedMetasGenerated,
   onCountermeasuresGenerated,
 }) => {
-  const { evaluateRisk, generateMetaCountermeasures, generateCountermeasuresFromMeta, isLoading } = useRiskAssessment();
+  const { evaluateRisk, integrateMetaCountermeasures, expandIntegratedMeta, isLoading } = useRiskAssessment();
   const [progress, setProgress] = useState<Map<string, EvaluationProgress>>(new Map());
   const [evaluations, setEvaluations] = useState<RiskEvaluation[]>([]);
-  const [metaCountermeasures, setMetaCountermeasures] = useState<MetaCountermeasure[]>([]);
+  const [metaCountermeasures, setMetaCountermeasures] = useState<IntegratedMetaCountermeasure[]>([]);
   const [expandedMetaIds, setExpandedMetaIds] = useState<Set<string>>(new Set());
   const [generatedCountermeasures, setGeneratedCountermeasures] = useState<Map<string, Countermeasure[]>>(new Map());
   const [evaluationStarted, setEvaluationStarted] = useState(false);
@@ -83,66 +89,19 @@ export const MultiRiskEvaluationView: React.FC<MultiRiskEvaluationViewProps> = (
   };
 
   const handleGenerateIntegratedMetas = async () => {
-    const allMetas: MetaCountermeasure[] = [];
-
-    // 各評価結果からメタ対策を生成
-    for (const evaluation of evaluations) {
-      try {
-        const metas = await generateMetaCountermeasures(evaluation.evaluation_id);
-        allMetas.push(...metas);
-      } catch (err) {
-        console.error('メタ対策生成に失敗しました:', err);
-      }
+    // メタ対策の並行生成と類似アプローチの統合はサーバー側で行う
+    try {
+      const integrated = await integrateMetaCountermeasures(
+        evaluations.map(evaluation => evaluation.evaluation_id)
+      );
+      setMetaCountermeasures(integrated);
+      onIntegratedMetasGenerated(integrated);
+    } catch (err) {
+      console.error('メタ対策生成に失敗しました:', err);
     }
-
-    // メタ対策を統合（類似のものをマージ）
-    const integrated = integrateMetaCountermeasures(allMetas);
-    setMetaCountermeasures(integrated);
-    onIntegratedMetasGenerated(integrated);
-  };
-
-  const integrateMetaCountermeasures = (metas: MetaCountermeasure[]): MetaCountermeasure[] => {
-    // 軸ごとにグループ化
-    const grouped = new Map<string, MetaCountermeasure[]>();
-    metas.forEach(meta => {
-      const key = `${meta.target_axis}`;
-      if (!grouped.has(key)) {
-        grouped.set(key, []);
-      }
-      grouped.get(key)!.push(meta);
-    });
-
-    // 各グループ内で類似のアプローチを統合
-    const integrated: MetaCountermeasure[] = [];
-    grouped.forEach((metaGroup) => {
-      // アプローチの類似度でグループ化（簡易版：完全一致）
-      const approachMap = new Map<string, MetaCountermeasure[]>();
-      metaGroup.forEach(meta => {
-        if (!approachMap.has(meta.meta_approach)) {
-          approachMap.set(meta.meta_approach, []);
-        }
-        approachMap.get(meta.meta_approach)!.push(meta);
-      });
-
-      // 各アプローチグループから代表を選択（優先度が高いもの、または最初のもの）
-      approachMap.forEach((similarMetas) => {
-        if (similarMetas.length > 0) {
-          // 優先度が最も高いものを選択
-          const representative = similarMetas.reduce((best, current) => {
-            const currentPriority = current.priority || 0;
-            const bestPriority = best.priority || 0;
-            return currentPriority > bestPriority ? current : best;
-          }, similarMetas[0]);
-
-          integrated.push(representative);
-        }
-      });
-    });
-
-    return integrated;
   };
 
-  const handleExpandMeta = async (meta: MetaCountermeasure) => {
+  const handleExpandMeta = async (meta: IntegratedMetaCountermeasure) => {
     const newExpanded = new Set(expandedMetaIds);
 
     if (newExpanded.has(meta.meta_id)) {
@@ -154,7 +113,7 @@ export const MultiRiskEvaluationView: React.FC<MultiRiskEvaluationViewProps> = (
 
       if (!generatedCountermeasures.has(meta.meta_id)) {
         try {
-          const measures = await generateCountermeasuresFromMeta(meta.meta_id);
+          const measures = await expandIntegratedMeta(meta);
           const newMap = new Map(generatedCountermeasures);
           newMap.set(meta.meta_id, measures);
           setGeneratedCountermeasures(newMap);
@@ -7,10 +7,13 @@ import { apiClient } from '@/services/api';
 import type {
   RiskSituation,
   SituationCreate,
+  SituationReassessRequest,
+  SituationReassessResponse,
   IdentifiedRisk,
   RiskEvaluation,
   Countermeasure,
   MetaCountermeasure,
+  IntegratedMetaCountermeasure,
 } from '@/types';
 
 export const useRiskAssessment = () => {
@@ -47,6 +50,24 @@ export const useRiskAssessment = () => {
     }
   };
 
+  const reassessSituation = async (
+    situationId: string,
+    data: SituationReassessRequest
+  ): Promise<SituationReassessResponse> => {
+    setIsLoading(true);
+    setError(null);
+    try {
+      const result = await apiClient.reassessSituation(situationId, data);
+      return result;
+    } catch (err) {
+      const error = err as Error;
+      setError(error);
+      throw error;
+    } finally {
+      setIsLoading(false);
+    }
+  };
+
   const evaluateRisk = async (riskId: string): Promise<RiskEvaluation> => {
     setIsLoading(true);
     setError(null);
@@ -107,14 +128,49 @@ export const useRiskAssessment = () => {
     }
   };
 
+  const integrateMetaCountermeasures = async (
+    evaluationIds: string[]
+  ): Promise<IntegratedMetaCountermeasure[]> => {
+    setIsLoading(true);
+    setError(null);
+    try {
+      const metas = await apiClient.integrateMetaCountermeasures(evaluationIds);
+      return metas;
+    } catch (err) {
+      const error = err as Error;
+      setError(error);
+      throw error;
+    } finally {
+      setIsLoading(false);
+    }
+  };
+
+  const expandIntegratedMeta = async (meta: IntegratedMetaCountermeasure): Promise<Countermeasure[]> => {
+    setIsLoading(true);
+    setError(null);
+    try {
+      const countermeasures = await apiClient.expandIntegratedMeta(meta);
+      return countermeasures;
+    } catch (err) {
+      const error = err as Error;
+      setError(error);
+      throw error;
+    } finally {
+      setIsLoading(false);
+    }
+  };
+
   return {
     isLoading,
     error,
     createSituation,
     identifyRisks,
+    reassessSituation,
     evaluateRisk,
     generateCountermeasures,
     generateMetaCountermeasures,
     generateCountermeasuresFromMeta,
+    integrateMetaCountermeasures,
+    expandIntegratedMeta,
   };
 };
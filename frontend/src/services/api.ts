@@ -6,13 +6,29 @@ import axios, { AxiosInstance } from 'axios';
 import type {
   RiskSituation,
   SituationCreate,
+  SituationReassessRequest,
+  SituationReassessResponse,
   IdentifiedRisk,
   RiskEvaluation,
   Countermeasure,
   MetaCountermeasure,
+  IntegratedMetaCountermeasure,
   RisksListResponse,
   MetaCountermeasuresListResponse,
   CountermeasuresListResponse,
+  IntegratedMetaCountermeasuresListResponse,
+  CountermeasureSuggestion,
+  CountermeasureSuggestionsListResponse,
+  AssessmentSnapshot,
+  AssessmentSnapshotDetail,
+  SnapshotDiff,
+  SnapshotsListResponse,
+  SearchParams,
+  SearchHit,
+  SearchResponse,
+  ExportParams,
+  AutoAssessEvent,
+  EvaluateOptions,
 } from '@/types';
 
 class APIClient {
@@ -65,13 +81,109 @@ class APIClient {
     return response.data.identified_risks;
   }
 
+  /**
+   * 状況を編集し、差分のみリスクアセスメントをやり直す
+   */
+  async reassessSituation(
+    situationId: string,
+    data: SituationReassessRequest
+  ): Promise<SituationReassessResponse> {
+    const response = await this.client.post<SituationReassessResponse>(
+      `/situations/${situationId}/reassess`,
+      data
+    );
+    return response.data;
+  }
+
+  /**
+   * リスク特定から対策導出までを一括で実行し、進捗を届いた順に onEvent へ渡す
+   *
+   * サーバーはNDJSONで逐次返すため、axiosではなくfetchで読み出す。
+   */
+  async autoAssess(
+    situationId: string,
+    onEvent: (event: AutoAssessEvent) => void,
+    signal?: AbortSignal
+  ): Promise<void> {
+    const response = await fetch(
+      this.client.getUri({ url: `/situations/${situationId}/auto-assess` }),
+      { method: 'POST', signal }
+    );
+    if (!response.ok || !response.body) {
+      throw new Error(`auto-assess failed: ${response.status}`);
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop() ?? '';
+      lines.filter((line) => line.trim()).forEach((line) => onEvent(JSON.parse(line)));
+    }
+    if (buffer.trim()) {
+      onEvent(JSON.parse(buffer));
+    }
+  }
+
+  // スナップショット関連
+
+  /**
+   * 状況のツリー全体をバージョンとして保存
+   */
+  async createSnapshot(situationId: string, label?: string): Promise<AssessmentSnapshot> {
+    const response = await this.client.post<AssessmentSnapshot>(
+      `/situations/${situationId}/snapshots`,
+      { label }
+    );
+    return response.data;
+  }
+
+  /**
+   * 状況のスナップショットの一覧を取得
+   */
+  async getSnapshots(situationId: string): Promise<AssessmentSnapshot[]> {
+    const response = await this.client.get<SnapshotsListResponse>(
+      `/situations/${situationId}/snapshots`
+    );
+    return response.data.snapshots;
+  }
+
+  /**
+   * バージョンの状況ツリーを取得
+   */
+  async getSnapshot(situationId: string, version: number): Promise<AssessmentSnapshotDetail> {
+    const response = await this.client.get<AssessmentSnapshotDetail>(
+      `/situations/${situationId}/snapshots/${version}`
+    );
+    return response.data;
+  }
+
+  /**
+   * 2つのバージョンの差分を取得
+   */
+  async diffSnapshots(
+    situationId: string,
+    fromVersion: number,
+    toVersion: number
+  ): Promise<SnapshotDiff> {
+    const response = await this.client.get<SnapshotDiff>(
+      `/situations/${situationId}/snapshots/${fromVersion}/diff/${toVersion}`
+    );
+    return response.data;
+  }
+
   // リスク評価関連
 
   /**
-   * リスクを評価
+   * リスクを評価（samples を指定すると一貫性モード）
    */
-  async evaluateRisk(riskId: string): Promise<RiskEvaluation> {
-    const response = await this.client.post<RiskEvaluation>(`/risks/${riskId}/evaluate`);
+  async evaluateRisk(riskId: string, options?: EvaluateOptions): Promise<RiskEvaluation> {
+    const response = await this.client.post<RiskEvaluation>(`/risks/${riskId}/evaluate`, undefined, {
+      params: options,
+    });
     return response.data;
   }
 
@@ -95,6 +207,16 @@ class APIClient {
     return response.data.countermeasures;
   }
 
+  /**
+   * 対策ライブラリから類似した過去の対策を取得
+   */
+  async getCountermeasureSuggestions(evaluationId: string): Promise<CountermeasureSuggestion[]> {
+    const response = await this.client.get<CountermeasureSuggestionsListResponse>(
+      `/evaluations/${evaluationId}/countermeasure-suggestions`
+    );
+    return response.data.suggestions;
+  }
+
   /**
    * 評価に関連する対策を取得
    */
@@ -128,14 +250,70 @@ class APIClient {
   }
 
   /**
-   * メタ対策から具体的対策を生成
+   * メタ対策から具体的対策を生成（展開済みなら既存の対策を返す。forceで再生成）
+   */
+  async generateCountermeasuresFromMeta(metaId: string, force: boolean = false): Promise<Countermeasure[]> {
+    const response = await this.client.post<CountermeasuresListResponse>(
+      `/evaluations/meta/${metaId}/generate-countermeasures`,
+      undefined,
+      { params: force ? { force: true } : undefined }
+    );
+    return response.data.countermeasures;
+  }
+
+  /**
+   * 複数の評価のメタ対策を生成・統合
+   */
+  async integrateMetaCountermeasures(
+    evaluationIds: string[],
+    expand: boolean = false
+  ): Promise<IntegratedMetaCountermeasure[]> {
+    const response = await this.client.post<IntegratedMetaCountermeasuresListResponse>(
+      '/evaluations/meta/integrate',
+      { evaluation_ids: evaluationIds, expand }
+    );
+    return response.data.integrated_meta_countermeasures;
+  }
+
+  /**
+   * 統合メタ対策を具体的対策に展開（代表で1回だけ生成し、メンバーに複製）
    */
-  async generateCountermeasuresFromMeta(metaId: string): Promise<Countermeasure[]> {
+  async expandIntegratedMeta(meta: IntegratedMetaCountermeasure): Promise<Countermeasure[]> {
     const response = await this.client.post<CountermeasuresListResponse>(
-      `/evaluations/meta/${metaId}/generate-countermeasures`
+      `/evaluations/meta/${meta.meta_id}/expand-integrated`,
+      { member_meta_ids: meta.member_meta_ids }
     );
     return response.data.countermeasures;
   }
+
+  // 検索関連
+
+  /**
+   * リスク記述・評価根拠・対策・メタ対策を全文検索
+   */
+  async search(params: SearchParams): Promise<SearchHit[]> {
+    const response = await this.client.get<SearchResponse>('/search', {
+      params,
+      // kinds=risk&kinds=evaluation の形式で送る
+      paramsSerializer: { indexes: null },
+    });
+    return response.data.hits;
+  }
+
+  // 書き出し関連
+
+  /**
+   * アセスメントの書き出しURLを取得
+   *
+   * サーバーから逐次送られるため、ブラウザのダウンロードとして直接開く。
+   */
+  getExportUrl(params: ExportParams): string {
+    return this.client.getUri({
+      url: '/export',
+      params,
+      paramsSerializer: { indexes: null },
+    });
+  }
 }
 
 export const apiClient = new APIClient();
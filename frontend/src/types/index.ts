@@ -19,6 +19,30 @@ export interface SituationCreate {
   deployment_stage?: string;
 }
 
+export interface SituationReassessRequest extends SituationCreate {
+  guidewords?: string[]; // 再特定するガイドワード（省略時は全て）
+  evaluate?: boolean; // 新規・変化したリスクを評価するか
+}
+
+export interface RiskChange {
+  previous_risk_id: string;
+  risk_id: string;
+  similarity: number;
+}
+
+export interface SituationReassessResponse {
+  situation: RiskSituation;
+  changed_fields: string[];
+  added_sentences: string[];
+  removed_sentences: string[];
+  identified_risks: IdentifiedRisk[];
+  unchanged_risk_ids: string[];
+  changed_risks: RiskChange[];
+  added_risk_ids: string[];
+  removed_risk_ids: string[];
+  evaluations: RiskEvaluation[];
+}
+
 export interface IdentifiedRisk {
   risk_id: string;
   situation_id: string;
@@ -40,9 +64,20 @@ export interface RiskEvaluation {
   avoidability_rationale?: string;
   risk_level: '高' | '中' | '低';
   normalized_score?: number;
+  // 一貫性モードの統計（1回の評価では省略）
+  sample_count?: number;
+  severity_variance?: number;
+  frequency_variance?: number;
+  avoidability_variance?: number;
+  agreement?: number; // 集約したスコアと一致したサンプルの割合（最も低い軸）
   evaluated_at: string;
 }
 
+export interface EvaluateOptions {
+  samples?: number; // 2以上で一貫性モード（上限9）
+  aggregation?: 'median' | 'majority';
+}
+
 export interface MetaCountermeasure {
   meta_id: string;
   evaluation_id: string;
@@ -63,6 +98,19 @@ export interface Countermeasure {
   feasibility?: '高' | '中' | '低';
   implementation_timeline?: string;
   expected_effect?: string;
+  source_measure_id?: string; // 対策ライブラリから再利用した場合の再利用元
+}
+
+export interface CountermeasureSuggestion {
+  source_evaluation_id: string;
+  risk_description: string;
+  guideword: string;
+  similarity: number;
+  countermeasures: Countermeasure[];
+}
+
+export interface CountermeasureSuggestionsListResponse {
+  suggestions: CountermeasureSuggestion[];
 }
 
 export interface RisksListResponse {
@@ -73,6 +121,103 @@ export interface MetaCountermeasuresListResponse {
   meta_countermeasures: MetaCountermeasure[];
 }
 
+export interface IntegratedMetaCountermeasure extends MetaCountermeasure {
+  member_meta_ids: string[];
+  evaluation_ids: string[];
+  countermeasures: Countermeasure[];
+}
+
+export interface IntegratedMetaCountermeasuresListResponse {
+  integrated_meta_countermeasures: IntegratedMetaCountermeasure[];
+}
+
 export interface CountermeasuresListResponse {
   countermeasures: Countermeasure[];
 }
+
+export interface AssessmentSnapshot {
+  snapshot_id: string;
+  situation_id: string;
+  version: number;
+  label?: string;
+  is_keyframe: boolean;
+  change_count: number; // 直前のバージョンから変化した値の数
+  created_at: string;
+}
+
+export interface AssessmentSnapshotDetail extends AssessmentSnapshot {
+  tree: Record<string, any>;
+}
+
+export interface SnapshotChange {
+  path: string;
+  change: 'added' | 'removed' | 'changed';
+  before?: any;
+  after?: any;
+}
+
+export interface SnapshotDiff {
+  from_version: number;
+  to_version: number;
+  changes: SnapshotChange[];
+}
+
+export interface SnapshotsListResponse {
+  snapshots: AssessmentSnapshot[];
+}
+
+export type SearchKind = 'risk' | 'evaluation' | 'countermeasure' | 'meta_countermeasure';
+
+export interface SearchParams {
+  q: string;
+  kinds?: SearchKind[];
+  situation_id?: string;
+  min_severity?: number;
+  min_frequency?: number;
+  min_avoidability?: number;
+  risk_level?: '高' | '中' | '低';
+  limit?: number;
+}
+
+export interface SearchHit {
+  kind: SearchKind;
+  id: string;
+  field: string; // 一致した項目
+  text: string;
+  risk_id?: string;
+  situation_id?: string;
+  severity_score?: number;
+  frequency_score?: number;
+  avoidability_score?: number;
+  risk_level?: '高' | '中' | '低';
+}
+
+export interface SearchResponse {
+  query: string;
+  hits: SearchHit[];
+}
+
+export type ExportFormat = 'csv' | 'jsonl' | 'xlsx';
+
+export type ExportDataset = 'risks' | 'meta_countermeasures' | 'countermeasures';
+
+export interface ExportParams {
+  format: ExportFormat;
+  datasets?: ExportDataset[]; // CSVは1つのみ（省略時は risks）
+  situation_id?: string;
+}
+
+export type AutoAssessStage = 'risk' | 'evaluation' | 'countermeasures' | 'error' | 'done';
+
+export interface AutoAssessEvent {
+  stage: AutoAssessStage;
+  risk?: IdentifiedRisk;
+  evaluation?: RiskEvaluation;
+  countermeasures?: Countermeasure[];
+  strategy?: string; // 対策導出で選択した主要な戦略
+  failed_stage?: AutoAssessStage;
+  risk_id?: string;
+  detail?: string;
+  counts?: Record<'risk' | 'evaluation' | 'countermeasures' | 'error', number>;
+  elapsed?: number; // 秒
+}